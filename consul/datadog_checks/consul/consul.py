@@ -12,9 +12,11 @@ import requests
 from six import iteritems, iterkeys, itervalues
 from six.moves.urllib.parse import urljoin
 
-from datadog_checks.base import AgentCheck, is_affirmative
+from datadog_checks.base import AgentCheck, ConfigurationError, is_affirmative
 from datadog_checks.base.utils.containers import hash_mutable
 
+from .watch import DEFAULT_WATCH_WAIT, ConsulWatch
+
 EPOCH = datetime(1970, 1, 1)
 
 
@@ -46,6 +48,11 @@ class ConsulCheckInstanceState(object):
         self.local_config = None
         self.last_config_fetch_time = None
         self.last_known_leader = None
+        # endpoint --> ConsulWatch, in `watch` catalog checks mode
+        self.watches = {}
+        # (health state index, services index, culled services) --> catalog statuses computed from them
+        self.catalog_statuses_key = None
+        self.catalog_statuses = None
 
 
 class ConsulCheck(AgentCheck):
@@ -63,6 +70,13 @@ class ConsulCheck(AgentCheck):
     # cap on distinct Consul ServiceIDs to interrogate
     MAX_SERVICES = 50
 
+    # How the health of the nodes of each service is collected for catalog checks:
+    #   service: one /v1/health/service/<service> request per service
+    #   health_state: computed from the checks of /v1/health/state/any, already requested for the service checks
+    #   watch: like health_state, /v1/health/state/any and /v1/catalog/services are kept up to date with
+    #          blocking queries in the background instead of being requested at each run
+    CATALOG_CHECKS_MODES = ('service', 'health_state', 'watch')
+
     STATUS_SC = {
         'up': AgentCheck.OK,
         'passing': AgentCheck.OK,
@@ -77,30 +91,30 @@ class ConsulCheck(AgentCheck):
 
         self._instance_states = defaultdict(lambda: ConsulCheckInstanceState())
 
-    def consul_request(self, instance, endpoint):
-        url = urljoin(instance.get('url'), endpoint)
-        service_check_tags = ["url:{}".format(url)] + instance.get("tags", [])
-        try:
-
-            clientcertfile = instance.get('client_cert_file', self.init_config.get('client_cert_file', False))
-            privatekeyfile = instance.get('private_key_file', self.init_config.get('private_key_file', False))
-            cabundlefile = instance.get('ca_bundle_file', self.init_config.get('ca_bundle_file', True))
-            acl_token = instance.get('acl_token', None)
+    def _get_request_options(self, instance):
+        clientcertfile = instance.get('client_cert_file', self.init_config.get('client_cert_file', False))
+        privatekeyfile = instance.get('private_key_file', self.init_config.get('private_key_file', False))
+        cabundlefile = instance.get('ca_bundle_file', self.init_config.get('ca_bundle_file', True))
+        acl_token = instance.get('acl_token', None)
 
-            headers = {}
-            if acl_token:
-                headers['X-Consul-Token'] = acl_token
+        headers = {}
+        if acl_token:
+            headers['X-Consul-Token'] = acl_token
 
-            if clientcertfile:
-                if privatekeyfile:
-                    resp = requests.get(
-                        url, cert=(clientcertfile, privatekeyfile), verify=cabundlefile, headers=headers
-                    )
-                else:
-                    resp = requests.get(url, cert=clientcertfile, verify=cabundlefile, headers=headers)
+        options = {'verify': cabundlefile, 'headers': headers}
+        if clientcertfile:
+            if privatekeyfile:
+                options['cert'] = (clientcertfile, privatekeyfile)
             else:
-                resp = requests.get(url, verify=cabundlefile, headers=headers)
+                options['cert'] = clientcertfile
+
+        return options
 
+    def consul_request(self, instance, endpoint):
+        url = urljoin(instance.get('url'), endpoint)
+        service_check_tags = ["url:{}".format(url)] + instance.get("tags", [])
+        try:
+            resp = requests.get(url, **self._get_request_options(instance))
             resp.raise_for_status()
 
         except requests.exceptions.Timeout as e:
@@ -122,6 +136,30 @@ class ConsulCheck(AgentCheck):
 
         return resp.json()
 
+    def _get_watch_result(self, instance, instance_state, endpoint):
+        """
+        Return (index, result) of the blocking query watch of `endpoint`, (None, None) until it
+        has a result or when its last query failed. The watch is started on the first call.
+        """
+        watch = instance_state.watches.get(endpoint)
+        if watch is None:
+            watch = ConsulWatch(
+                urljoin(instance.get('url'), endpoint),
+                self._get_request_options(instance),
+                wait=int(instance.get('watch_wait', self.init_config.get('watch_wait', DEFAULT_WATCH_WAIT))),
+                log=self.log,
+            )
+            watch.start()
+            instance_state.watches[endpoint] = watch
+
+        return watch.get()
+
+    def stop(self):
+        for instance_state in itervalues(self._instance_states):
+            for watch in itervalues(instance_state.watches):
+                watch.stop()
+            instance_state.watches.clear()
+
     # Consul Config Accessors
     def _get_local_config(self, instance, instance_state):
         time_window = 0
@@ -274,6 +312,102 @@ class ConsulCheck(AgentCheck):
 
         return service_tags
 
+    def _get_nodes_with_services_from_health_state(self, health_state, services):
+        """
+        Rebuild the result of /v1/health/service/<service> for every service from the checks
+        of /v1/health/state/any: an entry per instance of the service, with the checks of its
+        node followed by its own checks.
+
+        Instances of a service without any health check are not listed by
+        /v1/health/state/any, so they are not counted.
+        """
+        node_checks = defaultdict(list)
+        # {service: {(node_id, service_id): [checks]}}
+        service_instances = defaultdict(lambda: defaultdict(list))
+        for check in health_state:
+            if not check.get('ServiceID'):
+                node_checks[check['Node']].append(check)
+            elif check.get('ServiceName') in services:
+                service_instances[check['ServiceName']][(check['Node'], check['ServiceID'])].append(check)
+
+        for service in services:
+            yield service, [
+                {'Node': {'Node': node_id}, 'Checks': node_checks[node_id] + checks}
+                for (node_id, _), checks in iteritems(service_instances[service])
+            ]
+
+    def _get_catalog_statuses(self, nodes_with_services):
+        """
+        Count the nodes of each service, and the services of each node, by status.
+
+        :param nodes_with_services: (service, result of /v1/health/service/<service>) pairs
+        :return: {service: {"up": 0, "passing": 0, "warning": 0, "critical": 0}},
+            {node_id: {"up": 0, "passing": 0, "warning": 0, "critical": 0}}
+        """
+        services_node_status = {}
+        nodes_to_service_status = defaultdict(lambda: defaultdict(int))
+
+        for service, nodes_with_service in nodes_with_services:
+            # {'up': 0, 'passing': 0, 'warning': 0, 'critical': 0}
+            node_status = defaultdict(int)
+            services_node_status[service] = node_status
+
+            for node in nodes_with_service:
+                # The node_id is n['Node']['Node']
+                node_id = node.get('Node', {}).get("Node")
+
+                # An additional service is registered on this node. Bump up the counter
+                nodes_to_service_status[node_id]["up"] += 1
+
+                # If there is no Check for the node then Consul and dd-agent consider it up
+                if 'Checks' not in node:
+                    node_status['passing'] += 1
+                    node_status['up'] += 1
+                else:
+                    found_critical = False
+                    found_warning = False
+                    found_serf_health = False
+
+                    for check in node['Checks']:
+                        if check['CheckID'] == 'serfHealth':
+                            found_serf_health = True
+
+                            # For backwards compatibility, the "up" node_status is computed
+                            # based on the total # of nodes 'running' as part of the service.
+
+                            # If the serfHealth is `critical` it means the Consul agent isn't even responding,
+                            # and we don't register the node as `up`
+                            if check['Status'] != 'critical':
+                                node_status["up"] += 1
+                                continue
+
+                        if check['Status'] == 'critical':
+                            found_critical = True
+                            break
+                        elif check['Status'] == 'warning':
+                            found_warning = True
+                            # Keep looping in case there is a critical status
+
+                    # Increment the counters based on what was found in Checks
+                    # `critical` checks override `warning`s, and if neither are found,
+                    # register the node as `passing`
+                    if found_critical:
+                        node_status['critical'] += 1
+                        nodes_to_service_status[node_id]["critical"] += 1
+                    elif found_warning:
+                        node_status['warning'] += 1
+                        nodes_to_service_status[node_id]["warning"] += 1
+                    else:
+                        if not found_serf_health:
+                            # We have not found a serfHealth check for this node, which is unexpected
+                            # If we get here assume this node's status is "up", since we register it as 'passing'
+                            node_status['up'] += 1
+
+                        node_status['passing'] += 1
+                        nodes_to_service_status[node_id]["passing"] += 1
+
+        return services_node_status, nodes_to_service_status
+
     def check(self, instance):
         # Instance state is mutable, any changes to it will be reflected in self._instance_states
         instance_state = self._instance_states[hash_mutable(instance)]
@@ -307,10 +441,27 @@ class ConsulCheck(AgentCheck):
         perform_network_latency_checks = is_affirmative(
             instance.get('network_latency_checks', self.init_config.get('network_latency_checks'))
         )
+        catalog_checks_mode = instance.get(
+            'catalog_checks_mode', self.init_config.get('catalog_checks_mode', 'service')
+        )
+        if catalog_checks_mode not in self.CATALOG_CHECKS_MODES:
+            raise ConfigurationError(
+                'Invalid catalog_checks_mode {}, expected one of {}'.format(
+                    catalog_checks_mode, ', '.join(self.CATALOG_CHECKS_MODES)
+                )
+            )
+        watch = catalog_checks_mode == 'watch'
 
+        health_state = None
+        health_state_index = None
         try:
             # Make service checks from health checks for all services in catalog
-            health_state = self.consul_request(instance, '/v1/health/state/any')
+            if watch:
+                health_state_index, health_state = self._get_watch_result(
+                    instance, instance_state, '/v1/health/state/any'
+                )
+            if health_state is None:
+                health_state = self.consul_request(instance, '/v1/health/state/any')
 
             sc = {}
             # compute the highest status level (OK < WARNING < CRITICAL) a a check among all the nodes is running on.
@@ -336,6 +487,7 @@ class ConsulCheck(AgentCheck):
 
         except Exception as e:
             self.log.error(e)
+            health_state = None
             self.service_check(self.CONSUL_CHECK, AgentCheck.CRITICAL, tags=service_check_tags)
         else:
             self.service_check(self.CONSUL_CHECK, AgentCheck.OK, tags=service_check_tags)
@@ -343,7 +495,12 @@ class ConsulCheck(AgentCheck):
         if perform_catalog_checks:
             # Collect node by service, and service by node counts for a whitelist of services
 
-            services = self.get_services_in_cluster(instance)
+            services = None
+            services_index = None
+            if watch:
+                services_index, services = self._get_watch_result(instance, instance_state, '/v1/catalog/services')
+            if services is None:
+                services = self.get_services_in_cluster(instance)
             service_whitelist = instance.get('service_whitelist', self.init_config.get('service_whitelist', []))
             max_services = instance.get('max_services', self.init_config.get('max_services', self.MAX_SERVICES))
 
@@ -351,10 +508,26 @@ class ConsulCheck(AgentCheck):
 
             services = self._cull_services_list(services, service_whitelist, max_services)
 
-            # {node_id: {"up: 0, "passing": 0, "warning": 0, "critical": 0}
-            nodes_to_service_status = defaultdict(lambda: defaultdict(int))
+            catalog_statuses_key = None
+            if health_state_index is not None and services_index is not None:
+                catalog_statuses_key = (health_state_index, services_index, tuple(sorted(services)))
+
+            if catalog_statuses_key is not None and catalog_statuses_key == instance_state.catalog_statuses_key:
+                # Nothing changed since the last run
+                services_node_status, nodes_to_service_status = instance_state.catalog_statuses
+            else:
+                if catalog_checks_mode == 'service' or health_state is None:
+                    nodes_with_services = (
+                        (service, self.get_nodes_with_service(instance, service)) for service in services
+                    )
+                else:
+                    nodes_with_services = self._get_nodes_with_services_from_health_state(health_state, services)
+
+                services_node_status, nodes_to_service_status = self._get_catalog_statuses(nodes_with_services)
+                instance_state.catalog_statuses_key = catalog_statuses_key
+                instance_state.catalog_statuses = services_node_status, nodes_to_service_status
 
-            for service in services:
+            for service, node_status in iteritems(services_node_status):
                 # For every service in the cluster,
                 # Gauge the following:
                 # `consul.catalog.nodes_up` : # of Nodes registered with that service
@@ -364,65 +537,6 @@ class ConsulCheck(AgentCheck):
 
                 service_tags = self._get_service_tags(service, services[service])
 
-                nodes_with_service = self.get_nodes_with_service(instance, service)
-
-                # {'up': 0, 'passing': 0, 'warning': 0, 'critical': 0}
-                node_status = defaultdict(int)
-
-                for node in nodes_with_service:
-                    # The node_id is n['Node']['Node']
-                    node_id = node.get('Node', {}).get("Node")
-
-                    # An additional service is registered on this node. Bump up the counter
-                    nodes_to_service_status[node_id]["up"] += 1
-
-                    # If there is no Check for the node then Consul and dd-agent consider it up
-                    if 'Checks' not in node:
-                        node_status['passing'] += 1
-                        node_status['up'] += 1
-                    else:
-                        found_critical = False
-                        found_warning = False
-                        found_serf_health = False
-
-                        for check in node['Checks']:
-                            if check['CheckID'] == 'serfHealth':
-                                found_serf_health = True
-
-                                # For backwards compatibility, the "up" node_status is computed
-                                # based on the total # of nodes 'running' as part of the service.
-
-                                # If the serfHealth is `critical` it means the Consul agent isn't even responding,
-                                # and we don't register the node as `up`
-                                if check['Status'] != 'critical':
-                                    node_status["up"] += 1
-                                    continue
-
-                            if check['Status'] == 'critical':
-                                found_critical = True
-                                break
-                            elif check['Status'] == 'warning':
-                                found_warning = True
-                                # Keep looping in case there is a critical status
-
-                        # Increment the counters based on what was found in Checks
-                        # `critical` checks override `warning`s, and if neither are found,
-                        # register the node as `passing`
-                        if found_critical:
-                            node_status['critical'] += 1
-                            nodes_to_service_status[node_id]["critical"] += 1
-                        elif found_warning:
-                            node_status['warning'] += 1
-                            nodes_to_service_status[node_id]["warning"] += 1
-                        else:
-                            if not found_serf_health:
-                                # We have not found a serfHealth check for this node, which is unexpected
-                                # If we get here assume this node's status is "up", since we register it as 'passing'
-                                node_status['up'] += 1
-
-                            node_status['passing'] += 1
-                            nodes_to_service_status[node_id]["passing"] += 1
-
                 for status_key in self.STATUS_SC:
                     status_value = node_status[status_key]
                     self.gauge(
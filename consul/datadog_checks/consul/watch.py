@@ -0,0 +1,92 @@
+# (C) Datadog, Inc. 2019
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+import logging
+import threading
+
+import requests
+
+# seconds
+DEFAULT_WATCH_WAIT = 300
+# Minimum time between two queries, Consul recommends rate limiting blocking queries
+# since a result that changes often would otherwise be fetched in a tight loop
+WATCH_MIN_INTERVAL = 1
+WATCH_RETRY_INTERVAL = 10
+WATCH_REQUEST_TIMEOUT = 10
+
+
+class ConsulWatch(object):
+    """
+    Keeps the result of a Consul endpoint up to date in a background thread, with blocking queries.
+
+    Each query is held by Consul until the result changes past the index of the previous one, or
+    until `wait` seconds elapse: the result is only downloaded and parsed again when it changed.
+    See https://www.consul.io/api/features/blocking.html
+    """
+
+    def __init__(self, url, request_options, wait=DEFAULT_WATCH_WAIT, log=None):
+        self.url = url
+        self.request_options = request_options
+        self.wait = wait
+        self.log = log or logging.getLogger(__name__)
+
+        self._index = None
+        self._result = None
+        self._error = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='ConsulWatch {}'.format(self.url))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def get(self):
+        """
+        Return (index, result) of the last query, (None, None) if there is no result yet or
+        the last query failed.
+        """
+        with self._lock:
+            if self._error is not None:
+                return None, None
+            return self._index, self._result
+
+    def _run(self):
+        session = requests.Session()
+        index = 0
+        while not self._stopped.is_set():
+            try:
+                resp = session.get(
+                    self.url,
+                    params={'index': index, 'wait': '{}s'.format(self.wait)},
+                    # Consul adds up to wait / 16 to the wait time to spread the responses
+                    timeout=self.wait + self.wait / 16.0 + WATCH_REQUEST_TIMEOUT,
+                    **self.request_options
+                )
+                resp.raise_for_status()
+                new_index = int(resp.headers.get('X-Consul-Index', 0))
+                changed = new_index != index or self._index is None
+                if changed:
+                    result = resp.json()
+            except Exception as e:
+                self.log.warning('Consul watch of %s failed, retrying in %ss: %s', self.url, WATCH_RETRY_INTERVAL, e)
+                with self._lock:
+                    self._error = e
+                index = 0
+                self._stopped.wait(WATCH_RETRY_INTERVAL)
+                continue
+
+            if changed:
+                with self._lock:
+                    self._index = new_index
+                    self._result = result
+                    self._error = None
+
+            # The index can go backwards, e.g. after the raft state of the servers is restored
+            index = new_index if new_index >= index else 0
+            if changed:
+                self._stopped.wait(WATCH_MIN_INTERVAL)
@@ -17,6 +17,14 @@ MOCK_CONFIG_LEADER_CHECK = {'url': 'http://localhost:8500', 'catalog_checks': Tr
 
 MOCK_CONFIG_SELF_LEADER_CHECK = {'url': 'http://localhost:8500', 'catalog_checks': True, 'self_leader_check': True}
 
+MOCK_CONFIG_HEALTH_STATE = {
+    'url': 'http://localhost:8500',
+    'catalog_checks': True,
+    'catalog_checks_mode': 'health_state',
+}
+
+MOCK_CONFIG_WATCH = {'url': 'http://localhost:8500', 'catalog_checks': True, 'catalog_checks_mode': 'watch'}
+
 MOCK_CONFIG_NETWORK_LATENCY_CHECKS = {
     'url': 'http://localhost:8500',
     'catalog_checks': True,
@@ -402,3 +410,29 @@ def mock_get_cluster_leader_A(instance):
 
 def mock_get_cluster_leader_B(instance):
     return 'My New Leader'
+
+
+def _mock_check_state(node, check_id, status, service=''):
+    return {
+        "Node": node,
+        "CheckID": check_id,
+        "Name": check_id,
+        "Status": status,
+        "Notes": "",
+        "Output": "",
+        "ServiceID": service,
+        "ServiceName": service,
+    }
+
+
+def mock_get_health_state(instance, endpoint):
+    return [
+        _mock_check_state("node-1", "serfHealth", "passing"),
+        _mock_check_state("node-2", "serfHealth", "passing"),
+        _mock_check_state("node-3", "serfHealth", "critical"),
+        _mock_check_state("node-1", "service:service-1", "passing", "service-1"),
+        _mock_check_state("node-2", "service:service-1", "critical", "service-1"),
+        _mock_check_state("node-3", "service:service-1", "passing", "service-1"),
+        _mock_check_state("node-1", "service:service-2", "warning", "service-2"),
+        _mock_check_state("node-1", "service:service-2-http", "passing", "service-2"),
+    ]
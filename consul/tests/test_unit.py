@@ -2,11 +2,13 @@
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
 import logging
+import threading
 
 import mock
 import pytest
 
 from datadog_checks.consul import ConsulCheck
+from datadog_checks.consul.watch import ConsulWatch
 from datadog_checks.utils.containers import hash_mutable
 
 from . import common, consul_mocks
@@ -171,6 +173,136 @@ def test_service_checks(aggregator):
     aggregator.assert_service_check('consul.check', count=5)
 
 
+def test_catalog_checks_health_state(aggregator):
+    consul_check = ConsulCheck(common.CHECK_NAME, {}, {})
+    my_mocks = consul_mocks._get_consul_mocks()
+    my_mocks['consul_request'] = consul_mocks.mock_get_health_state
+    my_mocks['get_nodes_with_service'] = mock.MagicMock()
+    consul_mocks.mock_check(consul_check, my_mocks)
+    consul_check.check(consul_mocks.MOCK_CONFIG_HEALTH_STATE)
+
+    # The health of the nodes is computed from the health state, without a request per service
+    consul_check.get_nodes_with_service.assert_not_called()
+
+    service_1_tags = [
+        'consul_datacenter:dc1',
+        'consul_service_id:service-1',
+        'consul_service-1_service_tag:az-us-east-1a',
+    ]
+    aggregator.assert_metric('consul.catalog.nodes_up', value=2, tags=service_1_tags)
+    aggregator.assert_metric('consul.catalog.nodes_passing', value=1, tags=service_1_tags)
+    aggregator.assert_metric('consul.catalog.nodes_warning', value=0, tags=service_1_tags)
+    # node-3 is not up, its agent is not responding
+    aggregator.assert_metric('consul.catalog.nodes_critical', value=2, tags=service_1_tags)
+
+    service_2_tags = [
+        'consul_datacenter:dc1',
+        'consul_service_id:service-2',
+        'consul_service-2_service_tag:az-us-east-1a',
+    ]
+    aggregator.assert_metric('consul.catalog.nodes_up', value=1, tags=service_2_tags)
+    aggregator.assert_metric('consul.catalog.nodes_warning', value=1, tags=service_2_tags)
+
+    service_3_tags = [
+        'consul_datacenter:dc1',
+        'consul_service_id:service-3',
+        'consul_service-3_service_tag:az-us-east-1a',
+    ]
+    aggregator.assert_metric('consul.catalog.nodes_up', value=0, tags=service_3_tags)
+
+    node_1_tags = ['consul_datacenter:dc1', 'consul_node_id:node-1']
+    aggregator.assert_metric('consul.catalog.services_passing', value=1, tags=node_1_tags)
+    aggregator.assert_metric('consul.catalog.services_warning', value=1, tags=node_1_tags)
+    node_2_tags = ['consul_datacenter:dc1', 'consul_node_id:node-2']
+    aggregator.assert_metric('consul.catalog.services_critical', value=1, tags=node_2_tags)
+
+
+def test_catalog_checks_health_state_matches_service(aggregator):
+    consul_check = ConsulCheck(common.CHECK_NAME, {}, {})
+    services = consul_mocks.mock_get_services_in_cluster(None)
+    health_state = consul_mocks.mock_get_health_check(None, '/v1/health/state/any')
+
+    nodes_with_services = list(consul_check._get_nodes_with_services_from_health_state(health_state, services))
+    assert [service for service, _ in nodes_with_services] == list(services)
+
+    health_state = consul_mocks.mock_get_health_state(None, '/v1/health/state/any')
+    nodes_with_services = dict(consul_check._get_nodes_with_services_from_health_state(health_state, services))
+    assert sorted(node['Node']['Node'] for node in nodes_with_services['service-1']) == ['node-1', 'node-2', 'node-3']
+    # Checks of the node first, like /v1/health/service/<service>
+    assert [check['CheckID'] for check in nodes_with_services['service-2'][0]['Checks']] == [
+        'serfHealth',
+        'service:service-2',
+        'service:service-2-http',
+    ]
+
+
+def test_catalog_checks_watch(aggregator):
+    consul_check = ConsulCheck(common.CHECK_NAME, {}, {})
+    my_mocks = consul_mocks._get_consul_mocks()
+    my_mocks['consul_request'] = mock.MagicMock()
+    consul_mocks.mock_check(consul_check, my_mocks)
+
+    watch_results = {
+        '/v1/health/state/any': (10, consul_mocks.mock_get_health_state(None, None)),
+        '/v1/catalog/services': (20, consul_mocks.mock_get_services_in_cluster(None)),
+    }
+    with mock.patch.object(
+        consul_check,
+        '_get_watch_result',
+        side_effect=lambda instance, instance_state, endpoint: watch_results[endpoint],
+    ):
+        with mock.patch.object(consul_check, '_get_catalog_statuses', wraps=consul_check._get_catalog_statuses):
+            consul_check.check(consul_mocks.MOCK_CONFIG_WATCH)
+            consul_check.check(consul_mocks.MOCK_CONFIG_WATCH)
+
+            # Nothing changed, the statuses are computed once
+            assert consul_check._get_catalog_statuses.call_count == 1
+
+            watch_results['/v1/health/state/any'] = (11, consul_mocks.mock_get_health_state(None, None))
+            consul_check.check(consul_mocks.MOCK_CONFIG_WATCH)
+            assert consul_check._get_catalog_statuses.call_count == 2
+
+    # The health state and the services come from the watches
+    consul_check.consul_request.assert_not_called()
+
+    service_1_tags = [
+        'consul_datacenter:dc1',
+        'consul_service_id:service-1',
+        'consul_service-1_service_tag:az-us-east-1a',
+    ]
+    aggregator.assert_metric('consul.catalog.nodes_critical', value=2, tags=service_1_tags, count=3)
+
+
+def test_consul_watch():
+    responses = [({'X-Consul-Index': '5'}, ['a']), ({'X-Consul-Index': '5'}, ['a']), ({'X-Consul-Index': '7'}, ['b'])]
+    indexes = []
+    done = threading.Event()
+
+    def get(url, params=None, **kwargs):
+        indexes.append(params['index'])
+        if not responses:
+            done.set()
+            # Blocks until the result changes
+            watch._stopped.wait()
+            raise Exception('stopped')
+        headers, result = responses.pop(0)
+        return mock.MagicMock(headers=headers, json=mock.MagicMock(return_value=result))
+
+    watch = ConsulWatch('http://localhost:8500/v1/catalog/services', {})
+    assert watch.get() == (None, None)
+    with mock.patch('datadog_checks.consul.watch.requests.Session') as session, mock.patch(
+        'datadog_checks.consul.watch.WATCH_MIN_INTERVAL', 0
+    ):
+        session.return_value.get.side_effect = get
+        watch.start()
+        assert done.wait(5)
+        try:
+            assert watch.get() == (7, ['b'])
+            assert indexes == [0, 5, 5, 7]
+        finally:
+            watch.stop()
+
+
 def test_cull_services_list():
     consul_check = ConsulCheck(common.CHECK_NAME, {}, {})
     my_mocks = consul_mocks._get_consul_mocks()
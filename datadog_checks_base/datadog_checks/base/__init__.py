@@ -7,6 +7,7 @@ from .checks.openmetrics import OpenMetricsBaseCheck
 from .config import is_affirmative
 from .errors import ConfigurationError
 from .utils.common import ensure_bytes, ensure_unicode, to_string
+from .utils.tagging import TagSet
 
 # Windows-only
 try:
@@ -27,6 +28,7 @@ __all__ = [
     'OpenMetricsBaseCheck',
     'PDHBaseCheck',
     'ConfigurationError',
+    'TagSet',
     'ensure_bytes',
     'ensure_unicode',
     'is_affirmative',
@@ -21,6 +21,7 @@ from ..utils.common import ensure_bytes, ensure_unicode, to_string
 from ..utils.http import RequestsWrapper
 from ..utils.limiter import Limiter
 from ..utils.proxy import config_proxy_skip
+from ..utils.tagging import TagSet
 
 try:
     import datadog_agent
@@ -52,6 +53,16 @@ if datadog_agent.get_config('disable_unsafe_yaml'):
 # Metric types for which it's only useful to submit once per set of tags
 ONE_PER_CONTEXT_METRIC_TYPES = [aggregator.GAUGE, aggregator.RATE, aggregator.MONOTONIC_COUNT]
 
+# Metric types that can be used with `AgentCheck.submit_metrics`
+METRIC_TYPES = {
+    'gauge': aggregator.GAUGE,
+    'count': aggregator.COUNT,
+    'monotonic_count': aggregator.MONOTONIC_COUNT,
+    'rate': aggregator.RATE,
+    'histogram': aggregator.HISTOGRAM,
+    'historate': aggregator.HISTORATE,
+}
+
 
 class __AgentCheck(object):
     """The base class for any Agent based integrations.
@@ -220,7 +231,9 @@ class __AgentCheck(object):
         return config_proxy_skip(proxies, uri, skip)
 
     def _context_uid(self, mtype, name, tags=None, hostname=None):
-        return '{}-{}-{}-{}'.format(mtype, name, tags if tags is None else hash(frozenset(tags)), hostname)
+        if tags is not None:
+            tags = tags.context_hash if isinstance(tags, TagSet) else hash(frozenset(tags))
+        return '{}-{}-{}-{}'.format(mtype, name, tags, hostname)
 
     def _submit_metric(self, mtype, name, value, tags=None, hostname=None, device_name=None):
         if value is None:
@@ -255,6 +268,75 @@ class __AgentCheck(object):
 
         aggregator.submit_metric(self, self.check_id, mtype, self._format_namespace(name), value, tags, hostname)
 
+    def submit_metrics(self, metrics, tags=None, hostname=None):
+        """Submit a batch of metrics at once.
+
+        Tags shared by the whole batch are normalized once, and the batch is handed to
+        the aggregator in a single call when it supports it.
+
+        :param metrics: an iterable of ``(type, name, value)`` tuples, optionally followed by a list of
+            tags specific to the point and a hostname, i.e. ``(type, name, value, tags, hostname)``. The
+            type is one of ``gauge``, ``count``, ``monotonic_count``, ``rate``, ``histogram`` or ``historate``.
+        :param list tags: (optional) a list of tags to associate with every metric of the batch.
+        :param str hostname: (optional) a hostname to associate with the metrics that don't have one.
+            Defaults to the current host.
+        """
+        shared_tags = self._normalize_tags_type(tags)
+        if hostname is None:
+            hostname = ''
+
+        batch = []
+        for metric in metrics:
+            mtype, name, value = metric[:3]
+            if value is None:
+                # ignore metric sample
+                continue
+
+            try:
+                mtype = METRIC_TYPES[mtype]
+            except KeyError:
+                raise ValueError('Metric: {} has unsupported type: {}'.format(repr(name), repr(mtype)))
+
+            metric_tags = shared_tags
+            if len(metric) > 3 and metric[3]:
+                metric_tags = shared_tags + self._normalize_tags_type(metric[3], metric_name=name)
+
+            metric_hostname = hostname
+            if len(metric) > 4 and metric[4] is not None:
+                metric_hostname = metric[4]
+
+            if self.metric_limiter:
+                if mtype in ONE_PER_CONTEXT_METRIC_TYPES:
+                    if self.metric_limiter.is_reached():
+                        continue
+                else:
+                    context = self._context_uid(mtype, name, metric_tags, metric_hostname)
+                    if self.metric_limiter.is_reached(context):
+                        continue
+
+            try:
+                value = float(value)
+            except ValueError:
+                err_msg = 'Metric: {} has non float value: {}. Only float values can be submitted as metrics.'.format(
+                    repr(name), repr(value)
+                )
+                if using_stub_aggregator:
+                    raise ValueError(err_msg)
+                self.warning(err_msg)
+                continue
+
+            batch.append((mtype, self._format_namespace(name), value, metric_tags, metric_hostname))
+
+        if not batch:
+            return
+
+        # Agents that predate the batch API only expose the single metric submission
+        if hasattr(aggregator, 'submit_metrics'):
+            aggregator.submit_metrics(self, self.check_id, batch)
+        else:
+            for mtype, name, value, metric_tags, metric_hostname in batch:
+                aggregator.submit_metric(self, self.check_id, mtype, name, value, metric_tags, metric_hostname)
+
     def gauge(self, name, value, tags=None, hostname=None, device_name=None):
         """Sample a gauge metric.
 
@@ -571,7 +653,11 @@ class __AgentCheckPy3(__AgentCheck):
         - append `device_name` as `device:` tag
         - normalize tags type
         - doesn't mutate the passed list, returns a new list
+        - `TagSet` instances are already normalized and returned as is
         """
+        if isinstance(tags, TagSet) and not device_name:
+            return tags
+
         normalized_tags = []
 
         if device_name:
@@ -633,7 +719,11 @@ class __AgentCheckPy2(__AgentCheck):
         - append `device_name` as `device:` tag
         - normalize tags type
         - doesn't mutate the passed list, returns a new list
+        - `TagSet` instances are already normalized and returned as is
         """
+        if isinstance(tags, TagSet) and not device_name:
+            return tags
+
         normalized_tags = []
 
         if device_name:
@@ -2,18 +2,19 @@
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
 
-from fnmatch import fnmatchcase
+import re
+import time
+from fnmatch import translate
 from math import isinf, isnan
 from os.path import isfile
 
 import requests
-from prometheus_client.parser import text_fd_to_metric_families
 from six import PY3, iteritems, itervalues, string_types
-from urllib3 import disable_warnings
-from urllib3.exceptions import InsecureRequestWarning
 
 from ...config import is_affirmative
 from ...errors import CheckException
+from ...utils.http import RequestsWrapper
+from ...utils.prometheus.parser import text_fd_to_metric_families
 from .. import AgentCheck
 
 if PY3:
@@ -35,10 +36,18 @@ class OpenMetricsScraperMixin(object):
 
     KUBERNETES_TOKEN_PATH = '/var/run/secrets/kubernetes.io/serviceaccount/token'
 
+    # Maximum number of memoized label tags kept from one run to the next
+    LABEL_TAGS_CACHE_SIZE = 100000
+
     def __init__(self, *args, **kwargs):
         # Initialize AgentCheck's base class
         super(OpenMetricsScraperMixin, self).__init__(*args, **kwargs)
 
+        # `RequestsWrapper` instances used to poll endpoints, keyed by endpoint, TLS settings and
+        # authentication, along with the last time each one was used
+        self._http_handlers = {}
+        self._http_handlers_last_used = {}
+
     def create_scraper_configuration(self, instance=None):
 
         # We can choose to create a default mixin configuration for an empty instance
@@ -89,6 +98,10 @@ class OpenMetricsScraperMixin(object):
         # `_metrics_wildcards` holds the potential wildcards to match for metrics
         config['_metrics_wildcards'] = None
 
+        # `_submission_plan` holds the lookup structures derived from the configuration
+        # and reused for every sample, see `_get_submission_plan`
+        config['_submission_plan'] = None
+
         # `prometheus_metrics_prefix` allows to specify a prefix that all
         # prometheus metrics should have. This can be used when the prometheus
         # endpoint we are scrapping allows to add a custom prefix to it's
@@ -212,6 +225,18 @@ class OpenMetricsScraperMixin(object):
         config['username'] = instance.get('username', default_instance.get('username', None))
         config['password'] = instance.get('password', default_instance.get('password', None))
 
+        # Whether or not to keep the connection to the endpoint open between check runs
+        config['persist_connections'] = is_affirmative(
+            instance.get('persist_connections', default_instance.get('persist_connections', False))
+        )
+
+        # Number of seconds after which a persistent connection that was not used is closed
+        config['persist_connections_idle_timeout'] = float(
+            instance.get(
+                'persist_connections_idle_timeout', default_instance.get('persist_connections_idle_timeout', 300)
+            )
+        )
+
         # Custom tags that will be sent with each metric
         config['custom_tags'] = instance.get('tags', [])
 
@@ -251,13 +276,32 @@ class OpenMetricsScraperMixin(object):
         if scraper_config['_text_filter_blacklist']:
             input_gen = self._text_filter_input(input_gen, scraper_config)
 
-        for metric in text_fd_to_metric_families(input_gen):
+        family_filter = self._get_family_filter(scraper_config)
+
+        for metric in text_fd_to_metric_families(input_gen, family_filter=family_filter):
             metric.type = scraper_config['type_overrides'].get(metric.name, metric.type)
             if metric.type not in self.METRIC_TYPES:
                 continue
             metric.name = self._remove_metric_prefix(metric.name, scraper_config)
             yield metric
 
+    def _get_family_filter(self, scraper_config):
+        """
+        Build the function deciding, from its name and type, whether a metric family should be parsed.
+        Families that would be discarded anyway are skipped before their samples get tokenized:
+            - families whose type, after `type_overrides`, is not supported
+            - families in `ignore_metrics` that are not needed for `label_joins`
+        """
+        type_overrides = scraper_config['type_overrides']
+        skipped_metrics = self._get_submission_plan(scraper_config)['skipped_metrics']
+
+        def family_filter(name, typ):
+            if type_overrides.get(name, typ) not in self.METRIC_TYPES:
+                return False
+            return self._remove_metric_prefix(name, scraper_config) not in skipped_metrics
+
+        return family_filter
+
     def _text_filter_input(self, input_gen, scraper_config):
         """
         Filters out the text input line by line to avoid parsing and processing
@@ -284,6 +328,9 @@ class OpenMetricsScraperMixin(object):
         """
         response = self.poll(scraper_config)
         try:
+            # rebuild the submission plan if the configuration changed since the last run
+            self._refresh_submission_plan(scraper_config)
+
             # no dry run if no label joins
             if not scraper_config['label_joins']:
                 scraper_config['_dry_run'] = False
@@ -375,7 +422,9 @@ class OpenMetricsScraperMixin(object):
         # If targeted metric, store labels
         self._store_labels(metric, scraper_config)
 
-        if metric.name in scraper_config['ignore_metrics']:
+        plan = self._get_submission_plan(scraper_config)
+
+        if metric.name in plan['ignore_metrics']:
             return  # Ignore the metric
 
         if self._filter_metric(metric):
@@ -404,14 +453,9 @@ class OpenMetricsScraperMixin(object):
                         "No handler function named '{0}' defined".format(metric.name)
                     )
             else:
-                # build the wildcard list if first pass
-                if scraper_config['_metrics_wildcards'] is None:
-                    scraper_config['_metrics_wildcards'] = [x for x in scraper_config['metrics_mapper'] if '*' in x]
-
                 # try matching wildcard (generic check)
-                for wildcard in scraper_config['_metrics_wildcards']:
-                    if fnmatchcase(metric.name, wildcard):
-                        self.submit_openmetric(metric.name, metric, scraper_config)
+                for _ in range(self._count_wildcard_matches(metric.name, plan)):
+                    self.submit_openmetric(metric.name, metric, scraper_config)
 
     def poll(self, scraper_config, headers=None):
         """
@@ -468,39 +512,76 @@ class OpenMetricsScraperMixin(object):
             auth_header = {'Authorization': 'Bearer {}'.format(bearer_token)}
             headers.update(auth_header)
 
-        # Determine the SSL verification settings
-        cert = None
-        if isinstance(scraper_config['ssl_cert'], string_types):
-            if isinstance(scraper_config['ssl_private_key'], string_types):
-                cert = (scraper_config['ssl_cert'], scraper_config['ssl_private_key'])
-            else:
-                cert = scraper_config['ssl_cert']
+        http_handler = self.get_http_handler(endpoint, scraper_config)
 
-        verify = scraper_config['ssl_verify']
-        # TODO: deprecate use as `ssl_verify` boolean
-        if scraper_config['ssl_ca_cert'] is False:
-            verify = False
+        # The timeout set on a persistent session is ignored by `requests`, it must be passed to each request
+        return http_handler.get(endpoint, headers=headers, stream=True, timeout=http_handler.options['timeout'])
 
-        if isinstance(scraper_config['ssl_ca_cert'], string_types):
-            verify = scraper_config['ssl_ca_cert']
-        elif verify is False:
-            disable_warnings(InsecureRequestWarning)
+    def get_http_handler(self, endpoint, scraper_config):
+        """
+        Get the `RequestsWrapper` used to poll an endpoint.
 
-        # Determine the authentication settings
-        username = scraper_config['username']
-        password = scraper_config['password']
-        auth = (username, password) if username is not None and password is not None else None
+        Handlers are cached by endpoint, TLS settings and authentication so that, when `persist_connections`
+        is enabled, the same connection pool is reused across check runs. Handlers that have not been used
+        for `persist_connections_idle_timeout` seconds are evicted and their connections closed.
+        """
+        now = time.time()
+        key = self._get_http_handler_key(endpoint, scraper_config)
 
-        return requests.get(
+        self._evict_idle_http_handlers(now, scraper_config['persist_connections_idle_timeout'], exclude=key)
+
+        http_handler = self._http_handlers.get(key)
+        if http_handler is None:
+            http_handler = self._http_handlers[key] = self._create_http_handler(scraper_config)
+
+        self._http_handlers_last_used[key] = now
+
+        return http_handler
+
+    def _get_http_handler_key(self, endpoint, scraper_config):
+        return (
             endpoint,
-            headers=headers,
-            stream=True,
-            timeout=scraper_config['prometheus_timeout'],
-            cert=cert,
-            verify=verify,
-            auth=auth,
+            scraper_config['ssl_cert'],
+            scraper_config['ssl_private_key'],
+            scraper_config['ssl_ca_cert'],
+            scraper_config['ssl_verify'],
+            scraper_config['username'],
+            scraper_config['password'],
+            scraper_config['prometheus_timeout'],
+            scraper_config['persist_connections'],
         )
 
+    def _create_http_handler(self, scraper_config):
+        # TODO: deprecate use of `ssl_ca_cert` as `ssl_verify` boolean
+        verify = scraper_config['ssl_verify'] and scraper_config['ssl_ca_cert'] is not False
+        ca_cert = scraper_config['ssl_ca_cert'] if scraper_config['ssl_ca_cert'] is not False else None
+
+        # Translate the scraper configuration to the standard HTTP options
+        http_config = {
+            'password': scraper_config['password'],
+            'persist_connections': scraper_config['persist_connections'],
+            'timeout': scraper_config['prometheus_timeout'],
+            'tls_ca_cert': ca_cert,
+            'tls_cert': scraper_config['ssl_cert'],
+            'tls_ignore_warning': not verify,
+            'tls_private_key': scraper_config['ssl_private_key'],
+            'tls_verify': verify,
+            'username': scraper_config['username'],
+        }
+
+        # Only the proxy set in the environment applies to the scrapes, as it did when `requests` was called
+        # directly: the proxies of `init_config` and of the Agent are meant for the intake and would route the
+        # scrapes of in-cluster endpoints through it
+        init_config = {'log_requests': (self.init_config or {}).get('log_requests', False), 'use_agent_proxy': False}
+
+        return RequestsWrapper(http_config, init_config, logger=self.log)
+
+    def _evict_idle_http_handlers(self, now, idle_timeout, exclude=None):
+        for key, last_used in list(iteritems(self._http_handlers_last_used)):
+            if key != exclude and now - last_used > idle_timeout:
+                self._http_handlers.pop(key).close_session()
+                del self._http_handlers_last_used[key]
+
     def get_hostname_for_sample(self, sample, scraper_config):
         """
         Expose the label_to_hostname mapping logic to custom handler methods
@@ -563,6 +644,9 @@ class OpenMetricsScraperMixin(object):
         """
         Extracts metrics from a prometheus summary metric and sends them as gauges
         """
+        sum_metric_name = '{}.{}.sum'.format(scraper_config['namespace'], metric_name)
+        count_metric_name = '{}.{}.count'.format(scraper_config['namespace'], metric_name)
+        quantile_metric_name = '{}.{}.quantile'.format(scraper_config['namespace'], metric_name)
         for sample in metric.samples:
             val = sample[self.SAMPLE_VALUE]
             if not self._is_value_valid(val):
@@ -571,34 +655,21 @@ class OpenMetricsScraperMixin(object):
             custom_hostname = self._get_hostname(hostname, sample, scraper_config)
             if sample[self.SAMPLE_NAME].endswith("_sum"):
                 tags = self._metric_tags(metric_name, val, sample, scraper_config, hostname=custom_hostname)
-                self.gauge(
-                    "{}.{}.sum".format(scraper_config['namespace'], metric_name),
-                    val,
-                    tags=tags,
-                    hostname=custom_hostname,
-                )
+                self.gauge(sum_metric_name, val, tags=tags, hostname=custom_hostname)
             elif sample[self.SAMPLE_NAME].endswith("_count"):
                 tags = self._metric_tags(metric_name, val, sample, scraper_config, hostname=custom_hostname)
-                self.gauge(
-                    "{}.{}.count".format(scraper_config['namespace'], metric_name),
-                    val,
-                    tags=tags,
-                    hostname=custom_hostname,
-                )
+                self.gauge(count_metric_name, val, tags=tags, hostname=custom_hostname)
             else:
                 sample[self.SAMPLE_LABELS]["quantile"] = float(sample[self.SAMPLE_LABELS]["quantile"])
                 tags = self._metric_tags(metric_name, val, sample, scraper_config, hostname=custom_hostname)
-                self.gauge(
-                    "{}.{}.quantile".format(scraper_config['namespace'], metric_name),
-                    val,
-                    tags=tags,
-                    hostname=custom_hostname,
-                )
+                self.gauge(quantile_metric_name, val, tags=tags, hostname=custom_hostname)
 
     def _submit_gauges_from_histogram(self, metric_name, metric, scraper_config, hostname=None):
         """
         Extracts metrics from a prometheus histogram and sends them as gauges
         """
+        sum_metric_name = '{}.{}.sum'.format(scraper_config['namespace'], metric_name)
+        count_metric_name = '{}.{}.count'.format(scraper_config['namespace'], metric_name)
         for sample in metric.samples:
             val = sample[self.SAMPLE_VALUE]
             if not self._is_value_valid(val):
@@ -607,22 +678,12 @@ class OpenMetricsScraperMixin(object):
             custom_hostname = self._get_hostname(hostname, sample, scraper_config)
             if sample[self.SAMPLE_NAME].endswith("_sum"):
                 tags = self._metric_tags(metric_name, val, sample, scraper_config, hostname)
-                self.gauge(
-                    "{}.{}.sum".format(scraper_config['namespace'], metric_name),
-                    val,
-                    tags=tags,
-                    hostname=custom_hostname,
-                )
+                self.gauge(sum_metric_name, val, tags=tags, hostname=custom_hostname)
             elif sample[self.SAMPLE_NAME].endswith("_count"):
                 tags = self._metric_tags(metric_name, val, sample, scraper_config, hostname)
                 if scraper_config['send_histograms_buckets']:
                     tags.append("upper_bound:none")
-                self.gauge(
-                    "{}.{}.count".format(scraper_config['namespace'], metric_name),
-                    val,
-                    tags=tags,
-                    hostname=custom_hostname,
-                )
+                self.gauge(count_metric_name, val, tags=tags, hostname=custom_hostname)
             elif (
                 scraper_config['send_histograms_buckets']
                 and sample[self.SAMPLE_NAME].endswith("_bucket")
@@ -630,25 +691,103 @@ class OpenMetricsScraperMixin(object):
             ):
                 sample[self.SAMPLE_LABELS]["le"] = float(sample[self.SAMPLE_LABELS]["le"])
                 tags = self._metric_tags(metric_name, val, sample, scraper_config, hostname)
-                self.gauge(
-                    "{}.{}.count".format(scraper_config['namespace'], metric_name),
-                    val,
-                    tags=tags,
-                    hostname=custom_hostname,
-                )
+                self.gauge(count_metric_name, val, tags=tags, hostname=custom_hostname)
 
     def _metric_tags(self, metric_name, val, sample, scraper_config, hostname=None):
         custom_tags = scraper_config['custom_tags']
         _tags = list(custom_tags)
         _tags.extend(scraper_config['_metric_tags'])
-        for label_name, label_value in iteritems(sample[self.SAMPLE_LABELS]):
-            if label_name not in scraper_config['exclude_labels']:
-                tag_name = scraper_config['labels_mapper'].get(label_name, label_name)
-                _tags.append('{}:{}'.format(tag_name, label_value))
+        plan = self._get_submission_plan(scraper_config)
+        label_tags = plan['label_tags']
+        for label in iteritems(sample[self.SAMPLE_LABELS]):
+            try:
+                tag = label_tags[label]
+            except KeyError:
+                tag = label_tags[label] = self._label_tag(label, plan)
+            # excluded labels are memoized as `None`
+            if tag is not None:
+                _tags.append(tag)
         return self._finalize_tags_to_submit(
             _tags, metric_name, val, sample, custom_tags=custom_tags, hostname=hostname
         )
 
+    def _label_tag(self, label, plan):
+        label_name, label_value = label
+        if label_name in plan['exclude_labels']:
+            return None
+        tag_name = plan['labels_mapper'].get(label_name, label_name)
+        return '{}:{}'.format(tag_name, label_value)
+
+    def _get_submission_plan(self, scraper_config):
+        """
+        Get the lookup structures used to process every sample of a scraper configuration:
+            - `ignore_metrics` and `exclude_labels` as sets
+            - the ignored metrics that do not need to be parsed at all
+            - a copy of `labels_mapper`
+            - a single regex matching any of the `metrics_mapper` wildcards
+            - memoized wildcard matches by metric name
+            - memoized `<tag>:<value>` strings by (label name, label value)
+
+        The plan is built on first use and rebuilt by `_refresh_submission_plan` when the
+        configuration it was derived from changes.
+        """
+        plan = scraper_config.get('_submission_plan')
+        if plan is None:
+            plan = scraper_config['_submission_plan'] = self._build_submission_plan(scraper_config)
+        return plan
+
+    def _refresh_submission_plan(self, scraper_config):
+        plan = scraper_config.get('_submission_plan')
+        if plan is None:
+            return
+
+        if plan['signature'] != self._get_submission_plan_signature(scraper_config):
+            scraper_config['_submission_plan'] = None
+        elif len(plan['label_tags']) > self.LABEL_TAGS_CACHE_SIZE:
+            plan['label_tags'].clear()
+
+    def _build_submission_plan(self, scraper_config):
+        wildcards = [x for x in scraper_config['metrics_mapper'] if '*' in x]
+        scraper_config['_metrics_wildcards'] = wildcards
+
+        return {
+            'signature': self._get_submission_plan_signature(scraper_config),
+            'ignore_metrics': frozenset(scraper_config['ignore_metrics']),
+            # ignored metrics still need to be parsed if labels are joined from them
+            'skipped_metrics': frozenset(scraper_config['ignore_metrics']).difference(scraper_config['label_joins']),
+            'exclude_labels': frozenset(scraper_config['exclude_labels']),
+            'labels_mapper': dict(scraper_config['labels_mapper']),
+            'wildcards': [re.compile(translate(wildcard)) for wildcard in wildcards],
+            'wildcards_pattern': re.compile('|'.join(translate(wildcard) for wildcard in wildcards))
+            if wildcards
+            else None,
+            'wildcard_matches': {},
+            'label_tags': {},
+        }
+
+    def _get_submission_plan_signature(self, scraper_config):
+        return (
+            tuple(scraper_config['ignore_metrics']),
+            tuple(sorted(scraper_config['label_joins'])),
+            tuple(scraper_config['exclude_labels']),
+            tuple(sorted(iteritems(scraper_config['labels_mapper']))),
+            tuple(sorted(x for x in scraper_config['metrics_mapper'] if '*' in x)),
+        )
+
+    def _count_wildcard_matches(self, metric_name, plan):
+        try:
+            return plan['wildcard_matches'][metric_name]
+        except KeyError:
+            pass
+
+        count = 0
+        if plan['wildcards_pattern'] is not None and plan['wildcards_pattern'].match(metric_name):
+            # a metric is submitted once per matching wildcard
+            count = sum(1 for wildcard in plan['wildcards'] if wildcard.match(metric_name))
+
+        plan['wildcard_matches'][metric_name] = count
+        return count
+
     def _is_value_valid(self, val):
         return not (isnan(val) or isinf(val))
 
@@ -50,13 +50,39 @@ class AggregatorStub(object):
         self._asserted = set()
         self._service_checks = defaultdict(list)
         self._events = []
+        self._reset_indexes()
+
+    def _reset_indexes(self):
+        # Normalized metrics by name, by (name, frozenset(tags)), by (name, tag) and by (name, hostname)
+        self._metrics_by_name = defaultdict(list)
+        self._metrics_by_tags = defaultdict(list)
+        self._metrics_by_tag = defaultdict(list)
+        self._metrics_by_hostname = defaultdict(list)
 
     @classmethod
     def is_aggregate(cls, mtype):
         return mtype in cls.AGGREGATE_TYPES
 
+    def _add_metric(self, stub):
+        self._metrics[stub.name].append(stub)
+
+        # Index the normalized metric, so that assertions don't normalize and scan all the metrics
+        metric = MetricStub(
+            ensure_unicode(stub.name), stub.type, stub.value, normalize_tags(stub.tags), ensure_unicode(stub.hostname)
+        )
+        tags = metric.tags or []
+        self._metrics_by_name[metric.name].append(metric)
+        self._metrics_by_tags[metric.name, frozenset(tags)].append(metric)
+        for tag in set(tags):
+            self._metrics_by_tag[metric.name, tag].append(metric)
+        self._metrics_by_hostname[metric.name, metric.hostname].append(metric)
+
     def submit_metric(self, check, check_id, mtype, name, value, tags, hostname):
-        self._metrics[name].append(MetricStub(name, mtype, value, tags, hostname))
+        self._add_metric(MetricStub(name, mtype, value, tags, hostname))
+
+    def submit_metrics(self, check, check_id, metrics):
+        for mtype, name, value, tags, hostname in metrics:
+            self._add_metric(MetricStub(name, mtype, value, tags, hostname))
 
     def submit_service_check(self, check, check_id, name, status, tags, hostname, message):
         self._service_checks[name].append(ServiceCheckStub(check_id, name, status, tags, hostname, message))
@@ -68,16 +94,7 @@ class AggregatorStub(object):
         """
         Return the metrics received under the given name
         """
-        return [
-            MetricStub(
-                ensure_unicode(stub.name),
-                stub.type,
-                stub.value,
-                normalize_tags(stub.tags),
-                ensure_unicode(stub.hostname),
-            )
-            for stub in self._metrics.get(to_string(name), [])
-        ]
+        return list(self._metrics_by_name.get(ensure_unicode(name), []))
 
     def service_checks(self, name):
         """
@@ -121,10 +138,7 @@ class AggregatorStub(object):
         """
         self._asserted.add(metric_name)
 
-        candidates = []
-        for metric in self.metrics(metric_name):
-            if tag in metric.tags:
-                candidates.append(metric)
+        candidates = self._metrics_by_tag.get((ensure_unicode(metric_name), ensure_unicode(tag)), [])
 
         if count is not None:
             assert len(candidates) == count
@@ -161,8 +175,16 @@ class AggregatorStub(object):
         self._asserted.add(name)
         tags = normalize_tags(tags, sort=True)
 
+        # Start from the smallest index matching the assertion
+        if tags:
+            metrics = self._metrics_by_tags.get((ensure_unicode(name), frozenset(tags)), [])
+        elif hostname:
+            metrics = self._metrics_by_hostname.get((ensure_unicode(name), ensure_unicode(hostname)), [])
+        else:
+            metrics = self._metrics_by_name.get(ensure_unicode(name), [])
+
         candidates = []
-        for metric in self.metrics(name):
+        for metric in metrics:
             if value is not None and not self.is_aggregate(metric.type) and value != metric.value:
                 continue
 
@@ -189,6 +211,18 @@ class AggregatorStub(object):
             msg = "Needed at least {} candidates for '{}', got {}".format(at_least, name, len(candidates))
             assert len(candidates) >= at_least, msg
 
+    def assert_metrics(self, metrics, **kwargs):
+        """
+        Assert several metrics were processed by this stub. `metrics` are the names of the metrics, or dicts
+        of `assert_metric` arguments, and `kwargs` are the arguments shared by all the assertions, e.g.
+        `aggregator.assert_metrics(METRICS, tags=tags, count=1)`
+        """
+        for metric in metrics:
+            if isinstance(metric, dict):
+                self.assert_metric(**dict(kwargs, **metric))
+            else:
+                self.assert_metric(metric, **kwargs)
+
     def assert_service_check(self, name, status=None, tags=None, count=None, at_least=1, hostname=None, message=None):
         """
         Assert a service check was processed by this stub
@@ -228,6 +262,7 @@ class AggregatorStub(object):
         self._asserted = set()
         self._service_checks = defaultdict(list)
         self._events = []
+        self._reset_indexes()
 
     def all_metrics_asserted(self):
         assert self.metrics_asserted_pct >= 100.0
@@ -244,8 +279,8 @@ class AggregatorStub(object):
         candidates = []
         self._asserted.add(metric_name)
 
-        for metric in self.metrics(metric_name):
-            tags = metric.tags
+        for metric in self._metrics_by_name.get(ensure_unicode(metric_name), []):
+            tags = metric.tags or []
             gtags = [t for t in tags if t.startswith(tag_prefix)]
             if len(gtags) > 0:
                 candidates.append(metric)
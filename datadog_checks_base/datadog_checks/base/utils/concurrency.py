@@ -0,0 +1,88 @@
+# (C) Datadog, Inc. 2019
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+from six import itervalues
+from six.moves import queue
+
+from ..checks.libs.thread_pool import Pool
+
+
+class ThreadPoolMapper(object):
+    """
+    Call a function on many items, e.g. to send requests, with at most `size` calls running at the same time.
+
+    The thread pools are created on first use and kept across check runs, one by key (e.g. the URL of the
+    monitored instance) so that each instance gets the concurrency it is configured with. Call `terminate`
+    from the `stop` method of the check.
+
+        results = self._mapper.map(self._get_stats, urls, size=instance.get('max_concurrent_requests', 1), key=url)
+        for url, stats, e in results:
+            ...
+    """
+
+    def __init__(self):
+        self._pools = {}
+
+    def map(self, func, items, size=1, key=None):
+        """
+        Return the list of (item, result, exception) in the order of the items, `exception` is None when
+        the call succeeded. With a size of 1 the calls are run one after the other, without any thread.
+        """
+
+        def call(item):
+            try:
+                return item, func(item), None
+            except Exception as e:
+                return item, None, e
+
+        size = int(size)
+        if size <= 1 or len(items) <= 1:
+            return [call(item) for item in items]
+
+        return self._get_pool(size, key).map(call, items)
+
+    def imap_unordered(self, func, items, size=1, key=None):
+        """
+        Like `map`, but yield the (item, result, exception) in the order the calls complete, so that the
+        results can be handled while the other calls are still running. `items` can be any iterable.
+        """
+        size = int(size)
+        if size <= 1:
+            for item in items:
+                try:
+                    yield item, func(item), None
+                except Exception as e:
+                    yield item, None, e
+            return
+
+        results = queue.Queue()
+
+        def call(item):
+            try:
+                results.put((item, func(item), None))
+            except Exception as e:
+                results.put((item, None, e))
+
+        pool = self._get_pool(size, key)
+        count = 0
+        for item in items:
+            pool.apply_async(call, (item,))
+            count += 1
+
+        for _ in range(count):
+            yield results.get()
+
+    def _get_pool(self, size, key):
+        pool_size, pool = self._pools.get(key, (None, None))
+        if pool_size != size:
+            # First use, or the configured size changed
+            if pool is not None:
+                pool.terminate()
+            pool = Pool(size)
+            self._pools[key] = (size, pool)
+        return pool
+
+    def terminate(self):
+        for _, pool in itervalues(self._pools):
+            pool.terminate()
+        self._pools.clear()
@@ -0,0 +1,79 @@
+# (C) Datadog, Inc. 2019
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+from six import iteritems
+
+
+class PathExtractor(object):
+    """
+    Extract the values found at dotted paths, e.g. `thread_pool.bulk.queue`, in nested dictionaries.
+
+    `spec` is an iterable of (path, target) pairs, the target is anything the caller needs to submit
+    the value, e.g. a metric name or a (name, type, transform) description. The paths are split once
+    and merged into a tree: each document is then traversed once, and the keys shared by several paths
+    are only looked up once.
+
+        extractor = PathExtractor([('mem.used', 'system.mem.used'), ('mem.free', 'system.mem.free')])
+        for metric, value in extractor.extract(document):
+            self.gauge(metric, value)
+    """
+
+    def __init__(self, spec, separator='.'):
+        self.paths = []
+        self._tree = {}
+
+        for path, target in spec:
+            self.paths.append(path)
+
+            children = self._tree
+            keys = path.split(separator)
+            for i, key in enumerate(keys):
+                if key not in children:
+                    children[key] = ([], {}, [])
+                node = children[key]
+
+                # Every target below the node, to report them as missing at once
+                node[2].append(target)
+                if i == len(keys) - 1:
+                    node[0].append(target)
+                children = node[1]
+
+        self._tree = self._compile(self._tree)
+
+    @classmethod
+    def _compile(cls, children):
+        # Tuples of (key, targets, children, all targets), with empty children replaced by None
+        return tuple(
+            (key, tuple(targets), cls._compile(node_children) if node_children else None, tuple(all_targets))
+            for key, (targets, node_children, all_targets) in iteritems(children)
+        )
+
+    def extract(self, data, include_missing=False):
+        """
+        Yield (target, value) for each path found in `data`. The paths that cannot be followed, because a
+        key is missing or a value along the path is not a dictionary, are skipped, unless `include_missing`
+        is set: their value is then None.
+        """
+        stack = [(self._tree, data)]
+        while stack:
+            nodes, data = stack.pop()
+
+            if not isinstance(data, dict):
+                if include_missing:
+                    for _, _, _, all_targets in nodes:
+                        for target in all_targets:
+                            yield target, None
+                continue
+
+            for key, targets, children, all_targets in nodes:
+                if key not in data:
+                    if include_missing:
+                        for target in all_targets:
+                            yield target, None
+                    continue
+
+                value = data[key]
+                for target in targets:
+                    yield target, value
+                if children is not None:
+                    stack.append((children, value))
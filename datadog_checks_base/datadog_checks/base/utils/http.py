@@ -265,6 +265,12 @@ class RequestsWrapper(object):
 
         return self._session
 
+    def close_session(self):
+        """Close the persistent session, if any. A new one will be created on next use."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
     def __del__(self):  # no cov
         try:
             self._session.close()
@@ -0,0 +1,143 @@
+# (C) Datadog, Inc. 2019
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+import re
+
+from prometheus_client.core import Metric
+
+# The metric name is everything up to the labels or the value
+METRIC_NAME = re.compile(r'[^\s{]+')
+
+# A `name="value"` label pair, the value may contain escaped quotes
+LABEL_PAIR = re.compile(r'([^\s=,{}]+)\s*=\s*"([^"\\]*(?:\\.[^"\\]*)*)"')
+
+# Sample names each type of metric family is made of
+TYPE_SUFFIXES = {
+    'counter': ('',),
+    'gauge': ('',),
+    'summary': ('_count', '_sum', ''),
+    'histogram': ('_count', '_sum', '_bucket'),
+}
+
+
+def text_fd_to_metric_families(fd, family_filter=None):
+    """
+    Parse the Prometheus text format from an iterable of lines, yielding `prometheus_client.core.Metric` objects.
+
+    This is a drop-in replacement for `prometheus_client.parser.text_fd_to_metric_families` that avoids
+    parsing the samples of metric families that are not wanted. If `family_filter` is provided, it is
+    called once per metric family with its name and type, as soon as both are known, and the samples
+    of the families for which it returns a falsy value are skipped without being tokenized.
+
+    Samples are `(name, labels, value)` tuples, where `labels` is a dictionary.
+    """
+    name = ''
+    documentation = ''
+    typ = 'untyped'
+    samples = []
+    allowed_names = ()
+
+    # Whether or not samples of the current family should be parsed, `None` means not decided yet
+    wanted = None
+
+    for line in fd:
+        line = line.strip()
+
+        if not line:
+            continue
+
+        if line[0] == '#':
+            parts = line.split(None, 3)
+            if len(parts) < 3:
+                continue
+
+            if parts[1] == 'HELP':
+                if parts[2] != name:
+                    if name and wanted is not False:
+                        yield build_metric(name, documentation, typ, samples)
+                    # New metric
+                    name = parts[2]
+                    typ = 'untyped'
+                    samples = []
+                    allowed_names = (name,)
+                    wanted = None
+                documentation = replace_help_escaping(parts[3]) if len(parts) == 4 else ''
+            elif parts[1] == 'TYPE':
+                if parts[2] != name:
+                    if name and wanted is not False:
+                        yield build_metric(name, documentation, typ, samples)
+                    # New metric
+                    name = parts[2]
+                    documentation = ''
+                    samples = []
+                typ = parts[3] if len(parts) == 4 else 'untyped'
+                allowed_names = tuple(name + suffix for suffix in TYPE_SUFFIXES.get(typ, ('',)))
+                wanted = None if family_filter is None else bool(family_filter(name, typ))
+            continue
+
+        match = METRIC_NAME.match(line)
+        sample_name = match.group()
+        if sample_name in allowed_names:
+            if wanted is None:
+                wanted = True if family_filter is None else bool(family_filter(name, typ))
+            if wanted:
+                samples.append(parse_sample(line, sample_name, match.end()))
+            continue
+
+        # Sample not belonging to the current family, yield it immediately as an untyped singleton
+        if name and wanted is not False:
+            yield build_metric(name, documentation, typ, samples)
+        name = ''
+        documentation = ''
+        typ = 'untyped'
+        samples = []
+        allowed_names = ()
+        wanted = None
+
+        if family_filter is None or family_filter(sample_name, 'untyped'):
+            yield build_metric(sample_name, '', 'untyped', [parse_sample(line, sample_name, match.end())])
+
+    if name and wanted is not False:
+        yield build_metric(name, documentation, typ, samples)
+
+
+def text_string_to_metric_families(text, family_filter=None):
+    """
+    Parse the Prometheus text format from a string, see `text_fd_to_metric_families`.
+    """
+    for metric_family in text_fd_to_metric_families(text.splitlines(), family_filter=family_filter):
+        yield metric_family
+
+
+def build_metric(name, documentation, typ, samples):
+    metric = Metric(name, documentation, typ)
+    metric.samples = samples
+    return metric
+
+
+def parse_sample(line, name, position):
+    labels = {}
+
+    if line[position] == '{':
+        # Label values may contain braces, but the value and timestamp may not
+        label_end = line.rindex('}')
+        labels_string = line[position + 1 : label_end]
+        if '\\' in labels_string:
+            for label_name, label_value in LABEL_PAIR.findall(labels_string):
+                labels[label_name] = replace_escaping(label_value)
+        else:
+            labels = dict(LABEL_PAIR.findall(labels_string))
+        position = label_end + 1
+
+    # Ignore the timestamp, if any
+    value = line[position:].split(None, 1)[0]
+
+    return name, labels, float(value)
+
+
+def replace_help_escaping(s):
+    return s.replace('\\n', '\n').replace('\\\\', '\\')
+
+
+def replace_escaping(s):
+    return s.replace('\\n', '\n').replace('\\\\', '\\').replace('\\"', '"')
@@ -1,8 +1,89 @@
 # (C) Datadog, Inc. 2018
 # All rights reserved
 # Licensed under Simplified BSD License (see LICENSE)
+import logging
+
+from six import binary_type, text_type
+
+from .common import to_string
 
 try:
     import tagger
 except ImportError:
     from ..stubs import tagger  # noqa: F401
+
+LOGGER = logging.getLogger(__file__)
+
+
+class TagSet(tuple):
+    """
+    An immutable and hashable sequence of tags, normalized once at creation.
+
+    It can be passed anywhere the `tags` argument of a submission method is expected, in which
+    case tags are not normalized again. This makes it cheap to submit many points with the same
+    base tags. Adding tags returns a new `TagSet` and leaves the original untouched::
+
+        base_tags = TagSet(['db:postgres', 'env:prod'])
+        self.gauge('metric', 1, tags=base_tags + ['table:users'])
+
+    `None` tags are dropped, like the tags that are not strings or not valid utf-8, with a warning.
+    """
+
+    def __new__(cls, tags=()):
+        if isinstance(tags, TagSet):
+            return tags
+
+        return cls._from_normalized(normalize_tags(tags))
+
+    @classmethod
+    def _from_normalized(cls, tags):
+        tag_set = tuple.__new__(cls, tags)
+        tag_set._hash = None
+        tag_set._context_hash = None
+        return tag_set
+
+    def __add__(self, other):
+        if not other:
+            return self
+        return self._from_normalized(tuple.__add__(self, TagSet(other)))
+
+    def __radd__(self, other):
+        if not other:
+            return self
+        return self._from_normalized(tuple.__add__(TagSet(other), self))
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = tuple.__hash__(self)
+        return self._hash
+
+    @property
+    def context_hash(self):
+        """
+        Hash of the tags regardless of their order, used to identify a metric context.
+        """
+        if self._context_hash is None:
+            self._context_hash = hash(frozenset(self))
+        return self._context_hash
+
+    def __repr__(self):
+        return 'TagSet({})'.format(list(self))
+
+
+def normalize_tags(tags):
+    normalized_tags = []
+
+    for tag in tags:
+        if tag is None:
+            continue
+
+        if not isinstance(tag, (binary_type, text_type)):
+            LOGGER.warning('Tag `%r` must be a string, ignoring tag', tag)
+            continue
+
+        try:
+            normalized_tags.append(to_string(tag))
+        except UnicodeError:
+            LOGGER.warning('Error decoding tag `%r` as utf-8, ignoring tag', tag)
+
+    return normalized_tags
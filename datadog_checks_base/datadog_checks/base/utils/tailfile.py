@@ -2,106 +2,176 @@
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
 import binascii
+import json
 import os
-from stat import ST_INO, ST_SIZE
 
-from .common import ensure_bytes
+from six import PY3
 
 
 class TailFile(object):
+    """
+    Follow a file, calling `callback` with each new line.
+
+    The file is kept open between reads, and its lines are split from large binary chunks. Rotation
+    and truncation are detected each time the end of the file is reached. If `offset_path` is set,
+    the position of the last line read is saved there, to resume from it after a restart.
+    """
 
     CRC_SIZE = 16
+    CHUNK_SIZE = 64 * 1024
 
-    def __init__(self, logger, path, callback):
+    def __init__(self, logger, path, callback, offset_path=None):
         self._path = path
+        self._offset_path = offset_path
         self._f = None
         self._inode = None
-        self._size = 0
         self._crc = None
+        # Position of the end of the last complete line read, an incomplete line is kept in the buffer
+        # until its end is written
+        self._position = 0
+        self._buffer = b''
         self._log = logger
         self._callback = callback
 
-    def _open_file(self, move_end=False, pos=False):
+    def _open_file(self, move_end=False, resume=False):
+        self._close_file()
+
+        self._f = open(self._path, 'rb')
+        stat = os.fstat(self._f.fileno())
+        self._inode = stat.st_ino
+        self._crc = self._compute_crc(stat.st_size)
+
+        position = self._load_offset(stat.st_size) if resume else None
+        if position is not None:
+            self._log.debug("Resuming file %s at %s", self._path, position)
+        elif move_end:
+            self._log.debug("Opening file %s", self._path)
+            position = stat.st_size
+        else:
+            self._log.debug("Opening file %s from the beginning", self._path)
+            position = 0
+
+        self._seek(position)
 
-        already_open = False
-        # close and reopen to handle logrotate
+    def _close_file(self):
         if self._f is not None:
             self._f.close()
             self._f = None
-            already_open = True
-
-        stat = os.stat(self._path)
-        inode = stat[ST_INO]
-        size = stat[ST_SIZE]
-
-        # Compute CRC of the beginning of the file
-        crc = None
-        if size >= self.CRC_SIZE:
-            tmp_file = open(self._path, 'r')
-            data = ensure_bytes(tmp_file.read(self.CRC_SIZE))
-            crc = binascii.crc32(data)
-
-        if already_open:
-            # Check if file has been removed
-            if self._inode is not None and inode != self._inode:
-                self._log.debug("File removed, reopening")
-                move_end = False
-                pos = False
-
-            # Check if file has been truncated
-            elif self._size > 0 and size < self._size:
-                self._log.debug("File truncated, reopening")
-                move_end = False
-                pos = False
-
-            # Check if file has been truncated and too much data has
-            # alrady been written (copytruncate and opened files...)
-            if size >= self.CRC_SIZE and self._crc is not None and crc != self._crc:
-                self._log.debug("Beginning of file modified, reopening")
-                move_end = False
-                pos = False
-
-        self._inode = inode
-        self._size = size
+
+    def _seek(self, position):
+        self._f.seek(position)
+        self._position = position
+        self._buffer = b''
+
+    def _compute_crc(self, size):
+        """Compute the CRC of the beginning of the file, without moving the current position."""
+        if size < self.CRC_SIZE:
+            return None
+
+        position = self._f.tell()
+        self._f.seek(0)
+        data = self._f.read(self.CRC_SIZE)
+        self._f.seek(position)
+        return binascii.crc32(data) & 0xFFFFFFFF
+
+    def _check_file(self):
+        """
+        Handle the rotation or the truncation of the file, once its end has been reached.
+        """
+        try:
+            stat = os.stat(self._path)
+        except OSError:
+            # The file has been removed, keep the current one until a new one is created
+            return
+
+        if stat.st_ino != self._inode:
+            self._log.debug("File removed, reopening")
+            # Lines written before the rotation
+            for _ in self._read_lines():
+                pass
+            self._open_file()
+            return
+
+        crc = self._compute_crc(stat.st_size)
+        if stat.st_size < self._position:
+            self._log.debug("File truncated, reopening")
+            self._seek(0)
+        elif self._crc is not None and crc != self._crc:
+            # The file has been truncated and too much data has already been written
+            # (copytruncate and opened files...)
+            self._log.debug("Beginning of file modified, reopening")
+            self._seek(0)
         self._crc = crc
 
-        self._f = open(self._path, 'r')
-        if move_end:
-            self._log.debug("Opening file %s" % (self._path))
-            self._f.seek(0, os.SEEK_END)
-        elif pos:
-            self._log.debug("Reopening file %s at %s" % (self._path, pos))
-            self._f.seek(pos)
+    def _load_offset(self, size):
+        """
+        Return the position saved for the file currently open, None if there is none.
+        """
+        if not self._offset_path:
+            return None
 
-        return True
+        try:
+            with open(self._offset_path, 'r') as f:
+                state = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if not isinstance(state, dict) or state.get('path') != self._path:
+            return None
+
+        # The file has been rotated or truncated while it was not followed
+        if (
+            state.get('inode') != self._inode
+            or state.get('offset', 0) > size
+            or (state.get('crc') is not None and state['crc'] != self._crc)
+        ):
+            return 0
+
+        return state['offset']
+
+    def _save_offset(self):
+        if not self._offset_path:
+            return
+
+        state = {'path': self._path, 'inode': self._inode, 'offset': self._position, 'crc': self._crc}
+        try:
+            with open(self._offset_path, 'w') as f:
+                json.dump(state, f)
+        except (IOError, OSError) as e:
+            self._log.debug("Unable to save the offset of %s to %s: %s", self._path, self._offset_path, e)
+
+    def _read_lines(self):
+        """Read until the end of the file, yield each time the callback returns True."""
+        while True:
+            chunk = self._f.read(self.CHUNK_SIZE)
+            if not chunk:
+                return
+
+            lines = (self._buffer + chunk).split(b'\n')
+            self._buffer = lines.pop()
+            for line in lines:
+                self._position += len(line) + 1
+                line = line.strip(b'\x00').rstrip(b'\r')  # a truncate may have create holes in the file
+                if self._callback(line.decode('utf-8', 'replace') if PY3 else line):
+                    yield
 
     def tail(self, line_by_line=True, move_end=True):
         """Read line-by-line and run callback on each line.
         line_by_line: yield each time a callback has returned True
-        move_end: start from the last line of the log"""
+        move_end: start from the last line of the log, unless a saved offset is found"""
         try:
-            self._open_file(move_end=move_end)
+            self._open_file(move_end=move_end, resume=True)
 
             while True:
-                pos = self._f.tell()
-                line = self._f.readline()
-                if line:
-                    line = line.strip(chr(0))  # a truncate may have create holes in the file
-                    if self._callback(line.rstrip("\n")):
-                        if line_by_line:
-                            yield True
-                            pos = self._f.tell()
-                            self._open_file(move_end=False, pos=pos)
-                        else:
-                            continue
-                    else:
-                        continue
-                else:
-                    yield True
-                    assert pos == self._f.tell()
-                    self._open_file(move_end=False, pos=pos)
+                for _ in self._read_lines():
+                    if line_by_line:
+                        yield True
+                self._save_offset()
+                yield True
+                self._check_file()
 
         except Exception as e:
             # log but survive
             self._log.exception(e)
-            raise StopIteration(e)
+        finally:
+            self._close_file()
@@ -7,7 +7,7 @@ import mock
 import pytest
 from six import PY3
 
-from datadog_checks.base import AgentCheck
+from datadog_checks.base import AgentCheck, TagSet
 from datadog_checks.base.checks.base import datadog_agent
 
 
@@ -117,6 +117,62 @@ class TestMetrics:
         aggregator.assert_metric(metric_name, count=0)
 
 
+class TestSubmitMetrics:
+    def test_batch(self, aggregator):
+        check = AgentCheck()
+        check.__NAMESPACE__ = 'test'
+
+        check.submit_metrics(
+            [
+                ('gauge', 'gauge', 1),
+                ('rate', 'rate', 2, ['foo:bar']),
+                ('monotonic_count', 'monotonic_count', 3, None, 'host'),
+                ('count', 'count', 4, [b'baz:qux']),
+                ('gauge', 'none', None),
+            ],
+            tags=['shared:tag'],
+        )
+
+        aggregator.assert_metric('test.gauge', 1, tags=['shared:tag'], metric_type=aggregator.GAUGE, count=1)
+        aggregator.assert_metric('test.rate', 2, tags=['shared:tag', 'foo:bar'], metric_type=aggregator.RATE, count=1)
+        aggregator.assert_metric(
+            'test.monotonic_count', 3, tags=['shared:tag'], hostname='host', metric_type=aggregator.MONOTONIC_COUNT
+        )
+        aggregator.assert_metric('test.count', 4, tags=['shared:tag', 'baz:qux'], metric_type=aggregator.COUNT, count=1)
+        aggregator.assert_all_metrics_covered()
+
+    def test_single_aggregator_call(self, aggregator):
+        check = AgentCheck()
+
+        with mock.patch.object(aggregator, 'submit_metric') as submit_metric:
+            check.submit_metrics([('gauge', 'metric', 1), ('gauge', 'metric', 2)], tags=['foo:bar'], hostname='host')
+
+        submit_metric.assert_not_called()
+        aggregator.assert_metric('metric', 1, tags=['foo:bar'], hostname='host', count=1)
+        aggregator.assert_metric('metric', 2, tags=['foo:bar'], hostname='host', count=1)
+
+    def test_invalid_type(self, aggregator):
+        check = AgentCheck()
+
+        with pytest.raises(ValueError):
+            check.submit_metrics([('unknown', 'metric', 1)])
+
+    def test_non_float_metric(self, aggregator):
+        check = AgentCheck()
+
+        with pytest.raises(ValueError):
+            check.submit_metrics([('gauge', 'metric', '85k')])
+        aggregator.assert_metric('metric', count=0)
+
+    def test_metric_limit(self, aggregator):
+        check = LimitedCheck()
+
+        check.submit_metrics([('gauge', 'metric', i) for i in range(20)])
+
+        assert len(check.get_warnings()) == 1
+        assert len(aggregator.metrics('metric')) == 10
+
+
 class TestEvents:
     def test_valid_event(self, aggregator):
         check = AgentCheck()
@@ -232,6 +288,23 @@ class TestTags:
 
         assert isinstance(normalized_device_tag, str if PY3 else bytes)
 
+    def test_tag_set(self):
+        check = AgentCheck()
+        tags = TagSet(['foo:bar'])
+
+        assert check._normalize_tags_type(tags, None) is tags
+        assert check._normalize_tags_type(tags, 'device') == ['device:device', 'foo:bar']
+
+    def test_tag_set_submission(self, aggregator):
+        check = AgentCheck()
+        tags = TagSet(['foo:bar', b'bytes:tag'])
+
+        check.gauge('metric', 1, tags=tags + ['extra:tag'])
+        check.service_check('service_check', AgentCheck.OK, tags=tags)
+
+        aggregator.assert_metric('metric', 1, tags=['foo:bar', 'bytes:tag', 'extra:tag'], count=1)
+        aggregator.assert_service_check('service_check', tags=['foo:bar', 'bytes:tag'], count=1)
+
     def test_duplicated_device_name(self):
         check = AgentCheck()
         tags = []
@@ -298,6 +371,9 @@ class TestLimits:
         assert uid != check._context_uid(aggregator.GAUGE, "test.metric", ["two"], None)
         assert uid != check._context_uid(aggregator.GAUGE, "test.metric", ["one", "two"], "host")
 
+        # Tag sets identify the same context as lists
+        assert uid == check._context_uid(aggregator.GAUGE, "test.metric", TagSet(["two", "one"]), None)
+
     def test_metric_limit_gauges(self, aggregator):
         check = LimitedCheck()
         assert check.get_warnings() == []
@@ -0,0 +1,63 @@
+# (C) Datadog, Inc. 2019
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+import pytest
+
+from datadog_checks.base import AgentCheck
+from datadog_checks.base.stubs.aggregator import AggregatorStub
+
+
+@pytest.fixture
+def stub():
+    stub = AggregatorStub()
+    stub.submit_metric(None, '', AggregatorStub.GAUGE, 'foo', 1, [b'a:1', b'b:2'], 'host1')
+    stub.submit_metric(None, '', AggregatorStub.GAUGE, 'foo', 2, ['b:2', 'a:1'], 'host2')
+    stub.submit_metric(None, '', AggregatorStub.GAUGE, 'foo', 3, ['a:1'], 'host1')
+    stub.submit_metrics(
+        None, '', [(AggregatorStub.COUNT, 'bar', 2, None, ''), (AggregatorStub.COUNT, 'bar', 3, ['c:3'], '')]
+    )
+    return stub
+
+
+class TestAggregatorStub:
+    def test_metrics(self, stub):
+        assert [m.value for m in stub.metrics('foo')] == [1, 2, 3]
+        assert stub.metrics('foo')[0].tags == [u'a:1', u'b:2']
+        assert stub.metrics('unknown') == []
+
+    def test_assert_metric(self, stub):
+        stub.assert_metric('foo', count=3)
+        stub.assert_metric('foo', tags=['b:2', 'a:1'], count=2)
+        stub.assert_metric('foo', value=2, tags=['a:1', 'b:2'], count=1)
+        stub.assert_metric('foo', hostname='host1', count=2)
+        stub.assert_metric('foo', tags=['a:1'], hostname='host1', count=1)
+        stub.assert_metric('foo', tags=['a:1', 'a:1'], count=0)
+        stub.assert_metric('bar', value=5, metric_type=AggregatorStub.COUNT)
+
+        with pytest.raises(AssertionError):
+            stub.assert_metric('foo', tags=['c:3'])
+
+    def test_assert_metric_has_tag(self, stub):
+        stub.assert_metric_has_tag('foo', 'a:1', count=3)
+        stub.assert_metric_has_tag('foo', 'b:2', count=2)
+        stub.assert_metric_has_tag('bar', 'c:3', count=1)
+        stub.assert_metric_has_tag_prefix('foo', 'b:', count=2)
+
+    def test_assert_metrics(self, stub):
+        stub.assert_metrics(['foo', 'bar'])
+        stub.assert_metrics([{'name': 'foo', 'value': 3}, {'name': 'bar', 'value': 5, 'count': 2}], at_least=1)
+        stub.assert_metrics(['foo'], tags=['a:1', 'b:2'], count=2)
+        stub.assert_all_metrics_covered()
+
+        with pytest.raises(AssertionError):
+            stub.assert_metrics(['foo', 'baz'])
+
+    def test_reset(self, stub):
+        stub.reset()
+        stub.assert_metric('foo', count=0)
+        stub.assert_metric_has_tag('foo', 'a:1', count=0)
+
+    def test_check_submission(self, aggregator):
+        check = AgentCheck('test', {}, [{}])
+        check.gauge('test.metric', 1, tags=['foo:bar'], hostname='host')
+        aggregator.assert_metric('test.metric', value=1, tags=['foo:bar'], hostname='host')
@@ -0,0 +1,88 @@
+# (C) Datadog, Inc. 2019
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+import os
+
+import pytest
+from prometheus_client import parser
+
+from datadog_checks.base.utils.extractor import PathExtractor
+from datadog_checks.base.utils.prometheus.parser import text_fd_to_metric_families
+from datadog_checks.dev import get_here
+
+FIXTURES = os.path.join(get_here(), 'fixtures', 'prometheus')
+
+
+def read_lines(fixture):
+    with open(os.path.join(FIXTURES, fixture), 'r') as f:
+        return f.read().split('\n')
+
+
+def consume(metric_families):
+    for _ in metric_families:
+        pass
+
+
+@pytest.mark.parametrize('fixture', ['cadvisor.txt', 'ksm.txt'])
+def test_prometheus_client_parser(benchmark, fixture):
+    lines = read_lines(fixture)
+
+    benchmark(lambda: consume(parser.text_fd_to_metric_families(lines)))
+
+
+@pytest.mark.parametrize('fixture', ['cadvisor.txt', 'ksm.txt'])
+def test_parser(benchmark, fixture):
+    lines = read_lines(fixture)
+
+    benchmark(lambda: consume(text_fd_to_metric_families(lines)))
+
+
+@pytest.mark.parametrize('fixture', ['cadvisor.txt', 'ksm.txt'])
+def test_parser_family_filter(benchmark, fixture):
+    lines = read_lines(fixture)
+
+    # Only keep a handful of families, as checks typically do
+    def family_filter(name, typ):
+        return name.startswith(('container_cpu', 'kube_pod_container'))
+
+    benchmark(lambda: consume(text_fd_to_metric_families(lines, family_filter=family_filter)))
+
+
+def nested_documents():
+    """
+    200 documents of 300 metrics each, nested 3 levels deep as in the node stats of Elasticsearch
+    """
+    spec = [('group{}.sub{}.metric{}'.format(i // 30, i // 10, i), 'metric{}'.format(i)) for i in range(300)]
+    documents = []
+    for _ in range(200):
+        document = {}
+        for path, _ in spec:
+            group, sub, metric = path.split('.')
+            document.setdefault(group, {}).setdefault(sub, {})[metric] = 1
+        documents.append(document)
+
+    return spec, documents
+
+
+def test_nested_paths_split(benchmark):
+    spec, documents = nested_documents()
+
+    def extract():
+        for document in documents:
+            for path, _ in spec:
+                value = document
+                for key in path.split('.'):
+                    value = value.get(key)
+
+    benchmark(extract)
+
+
+def test_nested_paths_extractor(benchmark):
+    spec, documents = nested_documents()
+    extractor = PathExtractor(spec)
+
+    def extract():
+        for document in documents:
+            consume(extractor.extract(document))
+
+    benchmark(extract)
@@ -372,6 +372,19 @@ class TestSession:
             assert hasattr(http.session, key)
             assert getattr(http.session, key) == value
 
+    def test_close_session(self):
+        instance = {}
+        init_config = {}
+        http = RequestsWrapper(instance, init_config)
+        session = http.session
+
+        with mock.patch.object(session, 'close') as close:
+            http.close_session()
+
+        close.assert_called_once_with()
+        assert http._session is None
+        assert http.session is not session
+
 
 class TestRemapper:
     def test_legacy_no_proxy(self):
@@ -12,6 +12,7 @@ import requests
 from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily, SummaryMetricFamily
 from six import iteritems
 
+from datadog_checks.base.checks.openmetrics import mixins
 from datadog_checks.checks.openmetrics import OpenMetricsBaseCheck
 from datadog_checks.dev import get_here
 
@@ -991,6 +992,88 @@ def test_ignore_metric(aggregator, mocked_prometheus_check, ref_gauge):
     aggregator.assert_metric('prometheus.process.vm.bytes', count=0)
 
 
+def test_process_metric_wildcards(aggregator, mocked_prometheus_check, mocked_prometheus_scraper_config, ref_gauge):
+    """ Metrics matching wildcards are submitted once per matching wildcard """
+    check = mocked_prometheus_check
+    mocked_prometheus_scraper_config['_dry_run'] = False
+    mocked_prometheus_scraper_config['metrics_mapper'] = {
+        'process_*': 'process_*',
+        '*_bytes': '*_bytes',
+        'go_*': 'go_*',
+    }
+
+    check.process_metric(ref_gauge, mocked_prometheus_scraper_config)
+    aggregator.assert_metric('prometheus.process_virtual_memory_bytes', 54927360.0, tags=[], count=2)
+
+    plan = mocked_prometheus_scraper_config['_submission_plan']
+    assert plan['wildcard_matches'] == {'process_virtual_memory_bytes': 2}
+
+
+def test_submission_plan_refresh(aggregator, mocked_prometheus_check, mocked_prometheus_scraper_config, text_data):
+    """ The submission plan is reused across runs and rebuilt when the configuration changes """
+    check = mocked_prometheus_check
+    check.poll = mock.MagicMock(return_value=MockResponse(text_data, text_content_type))
+
+    check.process(mocked_prometheus_scraper_config)
+    plan = mocked_prometheus_scraper_config['_submission_plan']
+    aggregator.assert_metric('prometheus.process.vm.bytes', count=1)
+
+    check.process(mocked_prometheus_scraper_config)
+    assert mocked_prometheus_scraper_config['_submission_plan'] is plan
+
+    mocked_prometheus_scraper_config['ignore_metrics'] = ['process_virtual_memory_bytes']
+    aggregator.reset()
+    check.process(mocked_prometheus_scraper_config)
+    assert mocked_prometheus_scraper_config['_submission_plan'] is not plan
+    assert mocked_prometheus_scraper_config['_submission_plan']['ignore_metrics'] == {'process_virtual_memory_bytes'}
+    aggregator.assert_metric('prometheus.process.vm.bytes', count=0)
+
+
+def test_metric_tags_memoized(aggregator, mocked_prometheus_check, mocked_prometheus_scraper_config):
+    """ Label tags are computed once per (label, value) pair, excluded labels included """
+    ref_gauge = GaugeMetricFamily(
+        'process_virtual_memory_bytes', 'Virtual memory size in bytes.', labels=['my_1st_label', 'my_2nd_label']
+    )
+    ref_gauge.add_metric(['value_1', 'value_2'], 1.0)
+    ref_gauge.add_metric(['value_1', 'value_3'], 2.0)
+
+    check = mocked_prometheus_check
+    mocked_prometheus_scraper_config['labels_mapper'] = {'my_1st_label': 'transformed_1st'}
+    mocked_prometheus_scraper_config['exclude_labels'] = ['my_2nd_label']
+    check.submit_openmetric('process.vm.bytes', ref_gauge, mocked_prometheus_scraper_config)
+
+    aggregator.assert_metric('prometheus.process.vm.bytes', 1.0, tags=['transformed_1st:value_1'], count=1)
+    aggregator.assert_metric('prometheus.process.vm.bytes', 2.0, tags=['transformed_1st:value_1'], count=1)
+    assert mocked_prometheus_scraper_config['_submission_plan']['label_tags'] == {
+        ('my_1st_label', 'value_1'): 'transformed_1st:value_1',
+        ('my_2nd_label', 'value_2'): None,
+        ('my_2nd_label', 'value_3'): None,
+    }
+
+
+def test_parse_metric_family_skips_unwanted(mocked_prometheus_check, mocked_prometheus_scraper_config, text_data):
+    """ Unsupported and ignored metric families are skipped by the parser, unless needed for label joins """
+    check = mocked_prometheus_check
+    mocked_prometheus_scraper_config['ignore_metrics'] = ['go_goroutines', 'process_virtual_memory_bytes']
+    mocked_prometheus_scraper_config['label_joins'] = {
+        'process_virtual_memory_bytes': {'label_to_match': 'foo', 'labels_to_get': []}
+    }
+
+    with mock.patch(
+        'datadog_checks.base.checks.openmetrics.mixins.text_fd_to_metric_families',
+        wraps=mixins.text_fd_to_metric_families,
+    ) as parse:
+        response = MockResponse(text_data, text_content_type)
+        names = [metric.name for metric in check.parse_metric_family(response, mocked_prometheus_scraper_config)]
+
+    family_filter = parse.call_args[1]['family_filter']
+    assert not family_filter('go_goroutines', 'gauge')
+    assert not family_filter('some_metric', 'untyped')
+    assert family_filter('process_virtual_memory_bytes', 'gauge')
+    assert 'go_goroutines' not in names
+    assert 'process_virtual_memory_bytes' in names
+
+
 def test_label_joins(aggregator, mocked_prometheus_check, mocked_prometheus_scraper_config, mock_get):
     """ Tests label join on text format """
     check = mocked_prometheus_check
@@ -1527,6 +1610,90 @@ def test_health_service_check_failing(aggregator, mocked_prometheus_check, mocke
     )
 
 
+def test_http_handler_options(mocked_prometheus_check, mocked_prometheus_scraper_config):
+    """ Tests the scraper configuration is translated to the standard HTTP options """
+    check = mocked_prometheus_check
+    endpoint = mocked_prometheus_scraper_config['prometheus_url']
+
+    mocked_prometheus_scraper_config['ssl_cert'] = '/path/to/cert'
+    mocked_prometheus_scraper_config['ssl_private_key'] = '/path/to/key'
+    mocked_prometheus_scraper_config['ssl_ca_cert'] = '/path/to/ca'
+    mocked_prometheus_scraper_config['username'] = 'user'
+    mocked_prometheus_scraper_config['password'] = 'pass'
+    mocked_prometheus_scraper_config['prometheus_timeout'] = 42
+
+    http_handler = check.get_http_handler(endpoint, mocked_prometheus_scraper_config)
+
+    assert http_handler.options['cert'] == ('/path/to/cert', '/path/to/key')
+    assert http_handler.options['verify'] == '/path/to/ca'
+    assert http_handler.options['auth'] == ('user', 'pass')
+    assert http_handler.options['timeout'] == 42
+    assert http_handler.persist_connections is False
+
+    mocked_prometheus_scraper_config['ssl_ca_cert'] = False
+    http_handler = check.get_http_handler(endpoint, mocked_prometheus_scraper_config)
+
+    assert http_handler.options['verify'] is False
+    assert http_handler.ignore_tls_warning is True
+
+
+def test_http_handler_persist_connections(mocked_prometheus_check, text_data):
+    """ Tests the persistent session is reused across runs """
+    check = mocked_prometheus_check
+    instance = dict(PROMETHEUS_CHECK_INSTANCE, persist_connections=True)
+    scraper_config = check.create_scraper_configuration(instance)
+    endpoint = scraper_config['prometheus_url']
+
+    mock_response = mock.MagicMock(
+        status_code=200, iter_lines=lambda **kwargs: text_data.split("\n"), headers={'Content-Type': text_content_type}
+    )
+    with mock.patch('requests.Session.get', return_value=mock_response) as session_get:
+        check.process(scraper_config)
+        check.process(scraper_config)
+
+    assert session_get.call_count == 2
+    assert session_get.call_args[1]['timeout'] == scraper_config['prometheus_timeout']
+    assert len(check._http_handlers) == 1
+
+    http_handler = check.get_http_handler(endpoint, scraper_config)
+    assert http_handler.persist_connections is True
+    assert http_handler._session is not None
+
+
+def test_http_handler_proxy(mocked_prometheus_check, mocked_prometheus_scraper_config):
+    """ Tests only the environment proxy applies to the scrapes """
+    check = mocked_prometheus_check
+    check.init_config = {'proxy': {'http': 'http://intake.proxy:3128'}}
+
+    with mock.patch('datadog_checks.base.utils.http.datadog_agent.get_config') as get_config:
+        http_handler = check.get_http_handler(
+            mocked_prometheus_scraper_config['prometheus_url'], mocked_prometheus_scraper_config
+        )
+
+    assert http_handler.options['proxies'] is None
+    assert get_config.call_count == 0
+
+
+def test_http_handler_idle_eviction(mocked_prometheus_check, mocked_prometheus_scraper_config):
+    """ Tests handlers of endpoints that are no longer polled are evicted """
+    check = mocked_prometheus_check
+    mocked_prometheus_scraper_config['persist_connections_idle_timeout'] = 60
+
+    with mock.patch('datadog_checks.base.utils.http.RequestsWrapper.close_session') as close_session:
+        with mock.patch('time.time', return_value=1000):
+            check.get_http_handler('http://old.endpoint/metrics', mocked_prometheus_scraper_config)
+
+        with mock.patch('time.time', return_value=1030):
+            check.get_http_handler('http://new.endpoint/metrics', mocked_prometheus_scraper_config)
+        assert len(check._http_handlers) == 2
+        assert close_session.call_count == 0
+
+        with mock.patch('time.time', return_value=1070):
+            check.get_http_handler('http://new.endpoint/metrics', mocked_prometheus_scraper_config)
+        assert len(check._http_handlers) == 1
+        assert close_session.call_count == 1
+
+
 def test_text_filter_input(mocked_prometheus_check, mocked_prometheus_scraper_config):
     check = mocked_prometheus_check
     mocked_prometheus_scraper_config['_text_filter_blacklist'] = ["string1", "string2"]
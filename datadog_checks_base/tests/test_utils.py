@@ -1,11 +1,22 @@
 # (C) Datadog, Inc. 2018-2019
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
+import logging
+import os
+import threading
+import time
 from decimal import ROUND_HALF_DOWN
 
+import pytest
+from six import PY3
+
 from datadog_checks.base.utils.common import pattern_filter, round_value
+from datadog_checks.base.utils.concurrency import ThreadPoolMapper
 from datadog_checks.base.utils.containers import iter_unique
+from datadog_checks.base.utils.extractor import PathExtractor
 from datadog_checks.base.utils.limiter import Limiter
+from datadog_checks.base.utils.tagging import TagSet
+from datadog_checks.base.utils.tailfile import TailFile
 
 
 class Item:
@@ -142,3 +153,240 @@ class TestContainers:
         ]
 
         assert len(list(iter_unique(custom_queries))) == 1
+
+
+class TestThreadPoolMapper:
+    @staticmethod
+    def invert(item):
+        if item == 0:
+            raise ZeroDivisionError('zero')
+        return 1.0 / item
+
+    def test_serial(self):
+        mapper = ThreadPoolMapper()
+        results = mapper.map(self.invert, [1, 0, 4])
+
+        assert [(item, result) for item, result, _ in results] == [(1, 1.0), (0, None), (4, 0.25)]
+        assert [type(e) for _, _, e in results] == [type(None), ZeroDivisionError, type(None)]
+        assert mapper._pools == {}
+
+    def test_concurrent(self):
+        mapper = ThreadPoolMapper()
+        try:
+            results = mapper.map(self.invert, list(range(1, 21)), size=4, key='a')
+            assert [result for _, result, _ in results] == [1.0 / i for i in range(1, 21)]
+
+            # The pools are kept by key, until their size changes
+            _, pool = mapper._pools['a']
+            mapper.map(self.invert, [1, 2], size=4, key='a')
+            mapper.map(self.invert, [1, 2], size=2, key='b')
+            assert mapper._pools['a'][1] is pool
+            assert len(mapper._pools) == 2
+            mapper.map(self.invert, [1, 2], size=3, key='a')
+            assert mapper._pools['a'] != (4, pool)
+        finally:
+            mapper.terminate()
+        assert mapper._pools == {}
+
+    @pytest.mark.parametrize('size', [1, 4])
+    def test_imap_unordered(self, size):
+        mapper = ThreadPoolMapper()
+        running = []
+        max_running = []
+        lock = threading.Lock()
+
+        def call(item):
+            with lock:
+                running.append(item)
+                max_running.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.remove(item)
+            return self.invert(item)
+
+        try:
+            results = sorted(mapper.imap_unordered(call, iter(range(10)), size=size), key=lambda result: result[0])
+        finally:
+            mapper.terminate()
+
+        assert [(item, result) for item, result, _ in results] == [(0, None)] + [(i, 1.0 / i) for i in range(1, 10)]
+        assert isinstance(results[0][2], ZeroDivisionError)
+        assert max(max_running) <= size
+
+
+class TestTagSet:
+    def test_normalization(self):
+        tags = TagSet(['foo:bar', b'bytes:tag', u'unicode:tag', None])
+        tag_type = str if PY3 else bytes
+
+        assert list(tags) == ['foo:bar', 'bytes:tag', 'unicode:tag']
+        assert all(isinstance(tag, tag_type) for tag in tags)
+
+    def test_invalid_tag(self, caplog):
+        tags = TagSet(['foo:bar', 42, b'\xff:tag'])
+
+        # Dropped with a warning, like the tags submitted without a TagSet
+        assert list(tags) == ['foo:bar']
+        assert len([r for r in caplog.records if r.levelno == logging.WARNING]) == 2
+
+    def test_no_copy(self):
+        tags = TagSet(['foo:bar'])
+
+        assert TagSet(tags) is tags
+        assert tags + [] is tags
+
+    def test_add(self):
+        tags = TagSet(['foo:bar'])
+
+        extended = tags + [b'baz:qux']
+        assert isinstance(extended, TagSet)
+        assert list(extended) == ['foo:bar', 'baz:qux']
+        assert list(tags) == ['foo:bar']
+
+        prepended = ['baz:qux'] + tags
+        assert isinstance(prepended, TagSet)
+        assert list(prepended) == ['baz:qux', 'foo:bar']
+
+    def test_hash(self):
+        tags = TagSet(['foo:bar', 'baz:qux'])
+
+        assert hash(tags) == hash(TagSet(['foo:bar', 'baz:qux']))
+        assert tags.context_hash == TagSet(['baz:qux', 'foo:bar']).context_hash
+        assert tags.context_hash == hash(frozenset(['foo:bar', 'baz:qux']))
+        assert {tags: 1}[TagSet(['foo:bar', 'baz:qux'])] == 1
+
+
+class TestPathExtractor:
+    DOCUMENT = {'mem': {'used': 1, 'free': 2, 'swap': None}, 'uptime': 3, 'cpu': 'n/a', 'disk': {'io': {'reads': 4}}}
+
+    def test_extract(self):
+        extractor = PathExtractor(
+            [
+                ('mem.used', 'mem_used'),
+                ('mem.free', 'mem_free'),
+                ('mem.swap', 'mem_swap'),
+                ('uptime', 'uptime'),
+                ('uptime', 'uptime_alias'),
+                ('disk.io.reads', 'reads'),
+                ('disk.io.writes', 'writes'),
+                ('cpu.user', 'cpu_user'),
+                ('net.bytes', 'net_bytes'),
+            ]
+        )
+
+        assert sorted(extractor.extract(self.DOCUMENT), key=lambda p: p[0]) == [
+            ('mem_free', 2),
+            ('mem_swap', None),
+            ('mem_used', 1),
+            ('reads', 4),
+            ('uptime', 3),
+            ('uptime_alias', 3),
+        ]
+        assert extractor.paths[:2] == ['mem.used', 'mem.free']
+
+    def test_include_missing(self):
+        extractor = PathExtractor(
+            [('mem.used', 'mem_used'), ('cpu.user', 'cpu_user'), ('net.in.bytes', 'in'), ('net.out.bytes', 'out')]
+        )
+
+        assert sorted(extractor.extract(self.DOCUMENT, include_missing=True)) == [
+            ('cpu_user', None),
+            ('in', None),
+            ('mem_used', 1),
+            ('out', None),
+        ]
+
+    def test_separator(self):
+        extractor = PathExtractor([('disk/io/reads', 'reads')], separator='/')
+
+        assert list(extractor.extract(self.DOCUMENT)) == [('reads', 4)]
+        assert list(extractor.extract([])) == []
+
+
+class TestTailFile:
+    @staticmethod
+    def _tail(path, lines, offset_path=None, line_by_line=False):
+        tail = TailFile(logging.getLogger(__name__), str(path), lambda line: lines.append(line) or True, offset_path)
+        gen = tail.tail(line_by_line=line_by_line, move_end=True)
+        next(gen)
+        return gen
+
+    def test_new_lines(self, tmpdir):
+        path = tmpdir.join('file.log')
+        path.write('old\n')
+        lines = []
+        gen = self._tail(path, lines)
+        assert lines == []
+
+        with open(str(path), 'a') as f:
+            f.write('line 1\r\nline 2\nincomplete')
+        next(gen)
+        assert lines == ['line 1', 'line 2']
+
+        with open(str(path), 'a') as f:
+            f.write(' line\n')
+        next(gen)
+        assert lines == ['line 1', 'line 2', 'incomplete line']
+
+    def test_line_by_line(self, tmpdir):
+        path = tmpdir.join('file.log')
+        path.write('')
+        lines = []
+        gen = self._tail(path, lines, line_by_line=True)
+
+        path.write('line 1\nline 2\n', mode='a')
+        next(gen)
+        assert lines == ['line 1']
+        next(gen)
+        assert lines == ['line 1', 'line 2']
+
+    def test_rotation(self, tmpdir):
+        path = tmpdir.join('file.log')
+        path.write('old\n')
+        lines = []
+        gen = self._tail(path, lines)
+
+        path.write('line 1\n', mode='a')
+        os.rename(str(path), str(tmpdir.join('file.log.1')))
+        path.write('line 2\n')
+        next(gen)
+        next(gen)
+        assert lines == ['line 1', 'line 2']
+
+    def test_truncation(self, tmpdir):
+        path = tmpdir.join('file.log')
+        path.write('a long enough old line\n')
+        lines = []
+        gen = self._tail(path, lines)
+
+        path.write('line 1 is long enough\n')
+        next(gen)
+        next(gen)
+        assert lines == ['line 1 is long enough']
+
+        # Truncated and rewritten past the previous position (copytruncate)
+        path.write('a long enough new line\nline 2\n')
+        next(gen)
+        next(gen)
+        assert lines == ['line 1 is long enough', 'a long enough new line', 'line 2']
+
+    def test_saved_offset(self, tmpdir):
+        path = tmpdir.join('file.log')
+        offset_path = str(tmpdir.join('file.offset'))
+        path.write('old\n')
+        lines = []
+        gen = self._tail(path, lines, offset_path)
+        path.write('line 1\n', mode='a')
+        next(gen)
+        gen.close()
+
+        # Lines written while the file was not followed are read after a restart
+        path.write('line 2\n', mode='a')
+        gen = self._tail(path, lines, offset_path)
+        assert lines == ['line 1', 'line 2']
+
+        # Without a saved offset, the file is read from its end
+        os.remove(offset_path)
+        path.write('line 3\n', mode='a')
+        self._tail(path, lines, offset_path)
+        assert lines == ['line 1', 'line 2']
@@ -0,0 +1,100 @@
+# (C) Datadog, Inc. 2019
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+import math
+import os
+
+import pytest
+from prometheus_client import parser
+
+from datadog_checks.base.utils.prometheus.parser import text_fd_to_metric_families, text_string_to_metric_families
+from datadog_checks.dev import get_here
+
+FIXTURES = os.path.join(get_here(), 'fixtures', 'prometheus')
+
+TEXT = """# HELP go_goroutines Number of goroutines that currently exist.
+# TYPE go_goroutines gauge
+go_goroutines 73
+# HELP http_request_duration_seconds A histogram of the request duration.
+# TYPE http_request_duration_seconds histogram
+http_request_duration_seconds_bucket{le="0.5",handler="/api"} 129389
+http_request_duration_seconds_bucket{le="+Inf",handler="/api"} 144320
+http_request_duration_seconds_sum{handler="/api"} 53423
+http_request_duration_seconds_count{handler="/api"} 144320
+# HELP rpc_duration_seconds A summary of the RPC duration in seconds.
+# TYPE rpc_duration_seconds summary
+rpc_duration_seconds{quantile="0.5"} 4773 1395066363000
+rpc_duration_seconds_sum 1.7560473e+07
+rpc_duration_seconds_count 2693
+# TYPE escaped counter
+escaped{path="C:\\\\dir\\\\",quote="\\"quoted\\"",brace="{}",multi="a\\nb"} NaN
+orphan_metric{a="b"} -Inf
+"""
+
+
+def to_tuples(metric_families):
+    return [
+        (metric.name, metric.type, metric.documentation, [(n, l, repr(v)) for n, l, v in metric.samples])
+        for metric in metric_families
+    ]
+
+
+def test_parse():
+    metrics = list(text_string_to_metric_families(TEXT))
+
+    assert [(metric.name, metric.type) for metric in metrics] == [
+        ('go_goroutines', 'gauge'),
+        ('http_request_duration_seconds', 'histogram'),
+        ('rpc_duration_seconds', 'summary'),
+        ('escaped', 'counter'),
+        ('orphan_metric', 'untyped'),
+    ]
+    assert metrics[0].documentation == 'Number of goroutines that currently exist.'
+    assert metrics[0].samples == [('go_goroutines', {}, 73.0)]
+    assert metrics[1].samples[1] == (
+        'http_request_duration_seconds_bucket',
+        {'le': '+Inf', 'handler': '/api'},
+        144320.0,
+    )
+    assert metrics[2].samples[0] == ('rpc_duration_seconds', {'quantile': '0.5'}, 4773.0)
+
+    name, labels, value = metrics[3].samples[0]
+    assert labels == {'path': 'C:\\dir\\', 'quote': '"quoted"', 'brace': '{}', 'multi': 'a\nb'}
+    assert math.isnan(value)
+
+    assert metrics[4].samples == [('orphan_metric', {'a': 'b'}, float('-inf'))]
+
+
+def test_family_filter():
+    calls = []
+
+    def family_filter(name, typ):
+        calls.append((name, typ))
+        return typ != 'histogram' and name != 'orphan_metric'
+
+    metrics = list(text_string_to_metric_families(TEXT, family_filter=family_filter))
+
+    assert [metric.name for metric in metrics] == ['go_goroutines', 'rpc_duration_seconds', 'escaped']
+    assert calls == [
+        ('go_goroutines', 'gauge'),
+        ('http_request_duration_seconds', 'histogram'),
+        ('rpc_duration_seconds', 'summary'),
+        ('escaped', 'counter'),
+        ('orphan_metric', 'untyped'),
+    ]
+
+
+def test_family_filter_skips_tokenizing():
+    lines = ['# TYPE skipped gauge', 'skipped{invalid 1', '# TYPE kept gauge', 'kept 1']
+
+    metrics = list(text_fd_to_metric_families(lines, family_filter=lambda name, typ: name == 'kept'))
+
+    assert to_tuples(metrics) == [('kept', 'gauge', '', [('kept', {}, '1.0')])]
+
+
+@pytest.mark.parametrize('fixture', ['cadvisor.txt', 'ksm.txt', 'metrics.txt', 'deprecated.txt'])
+def test_same_as_prometheus_client(fixture):
+    with open(os.path.join(FIXTURES, fixture), 'r') as f:
+        lines = f.read().split('\n')
+
+    assert to_tuples(text_fd_to_metric_families(lines)) == to_tuples(parser.text_fd_to_metric_families(lines))
@@ -1,16 +1,44 @@
 # (C) Datadog, Inc. 2018
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
-from fnmatch import fnmatch
-from os.path import abspath, exists, join, relpath
+from fnmatch import translate
+from os.path import abspath, exists, join, normcase, relpath
 from re import compile as re_compile
 from time import time
 
 from datadog_checks.checks import AgentCheck
+from datadog_checks.checks.libs.thread_pool import Pool
 from datadog_checks.config import is_affirmative
 from datadog_checks.errors import ConfigurationError
 
-from .traverse import walk
+from .traverse import scan, walk
+
+# Number of threads used to scan the sub-directories in the incremental mode
+DEFAULT_SCAN_THREADS = 4
+
+
+def compile_pattern(pattern):
+    """Compile a `fnmatch` pattern once, to match it against many paths."""
+    return re_compile(translate(normcase(pattern))).match
+
+
+def pattern_filter(pattern_match, directory, root):
+    """Return a function telling whether a file of `root`, given its name, matches the pattern.
+
+    Both the path of the file relative to `directory` and its absolute path are checked,
+    the latter for compatibility with previous agent versions.
+    """
+    rel_root = relpath(root, directory)
+    if rel_root == '.':
+        rel_root = ''
+
+    def file_filter(file_name):
+        return (
+            pattern_match(normcase(join(rel_root, file_name))) is not None
+            or pattern_match(normcase(join(root, file_name))) is not None
+        )
+
+    return file_filter
 
 
 class DirectoryCheck(AgentCheck):
@@ -31,10 +59,20 @@ class DirectoryCheck(AgentCheck):
                       Useful for very large directories. default False
         `ignore_missing` - boolean, when true do not raise an exception on missing/inaccessible directories.
                            default False
+        `incremental_scan` - boolean, when true sub-directories are scanned in parallel and the files of
+                             the directories that did not change since the previous run are not read again.
+                             default False
+        `scan_threads` - integer, the number of threads used by `incremental_scan`. default 4
     """
 
     SOURCE_TYPE_NAME = 'system'
 
+    def __init__(self, *args, **kwargs):
+        super(DirectoryCheck, self).__init__(*args, **kwargs)
+
+        # Results of the previous incremental scan, for each configuration: directory path -> DirectoryScan
+        self._scans = {}
+
     def check(self, instance):
         try:
             directory = instance['directory']
@@ -53,6 +91,8 @@ class DirectoryCheck(AgentCheck):
         filegauges = is_affirmative(instance.get('filegauges', False))
         countonly = is_affirmative(instance.get('countonly', False))
         ignore_missing = is_affirmative(instance.get('ignore_missing', False))
+        incremental_scan = is_affirmative(instance.get('incremental_scan', False))
+        scan_threads = max(int(instance.get('scan_threads', DEFAULT_SCAN_THREADS)), 1)
         custom_tags = instance.get('tags', [])
 
         if not exists(abs_directory):
@@ -66,6 +106,23 @@ class DirectoryCheck(AgentCheck):
 
             self.log.warning(msg)
 
+        if incremental_scan:
+            self._get_stats_incremental(
+                abs_directory,
+                name,
+                dirtagname,
+                filetagname,
+                filegauges,
+                pattern,
+                exclude_dirs_pattern,
+                dirs_patterns_full,
+                recursive,
+                countonly,
+                custom_tags,
+                scan_threads,
+            )
+            return
+
         self._get_stats(
             abs_directory,
             name,
@@ -99,6 +156,8 @@ class DirectoryCheck(AgentCheck):
         directory_bytes = 0
         directory_files = 0
 
+        pattern_match = compile_pattern(pattern) if pattern else None
+
         # If we do not want to recursively search sub-directories only get the root.
         walker = walk(directory) if recursive else (next(walk(directory)),)
 
@@ -114,16 +173,12 @@ class DirectoryCheck(AgentCheck):
                 else:
                     dirs[:] = [d for d in dirs if not exclude_dirs_pattern.search(d.name)]
 
+            file_filter = pattern_filter(pattern_match, directory, root) if pattern_match else None
+
             for file_entry in files:
-                if pattern:
-                    # Check if the path of the file relative to the directory
-                    # matches the pattern. Also check if the absolute path of the
-                    # filename matches the pattern, for compatibility with previous
-                    # agent versions.
-                    filename = join(root, file_entry.name)
-                    if not (fnmatch(filename, pattern) or fnmatch(relpath(filename, directory), pattern)):
-                        directory_files -= 1
-                        continue
+                if file_filter is not None and not file_filter(file_entry.name):
+                    directory_files -= 1
+                    continue
 
                 # We're just looking to count the files.
                 if countonly:
@@ -137,24 +192,102 @@ class DirectoryCheck(AgentCheck):
                 else:
                     # file specific metrics
                     directory_bytes += file_stat.st_size
-                    if filegauges and directory_files <= 20:
-                        filetags = ['{}:{}'.format(filetagname, join(root, file_entry.name))]
-                        filetags.extend(dirtags)
-                        self.gauge('system.disk.directory.file.bytes', file_stat.st_size, tags=filetags)
-                        self.gauge(
-                            'system.disk.directory.file.modified_sec_ago', time() - file_stat.st_mtime, tags=filetags
-                        )
-                        self.gauge(
-                            'system.disk.directory.file.created_sec_ago', time() - file_stat.st_ctime, tags=filetags
-                        )
-                    else:
-                        self.histogram('system.disk.directory.file.bytes', file_stat.st_size, tags=dirtags)
-                        self.histogram(
-                            'system.disk.directory.file.modified_sec_ago', time() - file_stat.st_mtime, tags=dirtags
-                        )
-                        self.histogram(
-                            'system.disk.directory.file.created_sec_ago', time() - file_stat.st_ctime, tags=dirtags
-                        )
+                    self._submit_file_stats(
+                        join(root, file_entry.name),
+                        file_stat.st_size,
+                        file_stat.st_mtime,
+                        file_stat.st_ctime,
+                        filegauges and directory_files <= 20,
+                        filetagname,
+                        dirtags,
+                    )
+
+        # number of files
+        self.gauge('system.disk.directory.files', directory_files, tags=dirtags)
+
+        # total file size
+        if not countonly:
+            self.gauge('system.disk.directory.bytes', directory_bytes, tags=dirtags)
+
+    def _get_stats_incremental(
+        self,
+        directory,
+        name,
+        dirtagname,
+        filetagname,
+        filegauges,
+        pattern,
+        exclude_dirs_pattern,
+        dirs_patterns_full,
+        recursive,
+        countonly,
+        tags,
+        scan_threads,
+    ):
+        """Same as `_get_stats`, but the directories of each level of the tree are scanned in parallel, and
+        the directories whose entries did not change since the previous run are not read again: the files
+        they contain are not stat'ed, the stats of the previous run are reported instead.
+        """
+        dirtags = ['{}:{}'.format(dirtagname, name)]
+        dirtags.extend(tags)
+        directory_bytes = 0
+        directory_files = 0
+
+        pattern_match = compile_pattern(pattern) if pattern else None
+        scans_key = (directory, pattern, countonly)
+        previous_scans = self._scans.get(scans_key, {})
+        scans = {}
+
+        def scan_directory(root):
+            file_filter = pattern_filter(pattern_match, directory, root) if pattern_match else None
+            return root, scan(root, previous_scans.get(root), file_filter, not countonly, self._stat_error)
+
+        def sub_directories(directory_scan):
+            if not recursive:
+                return []
+            if exclude_dirs_pattern is None:
+                return [path for _, path in directory_scan.dirs]
+            if dirs_patterns_full:
+                return [path for _, path in directory_scan.dirs if not exclude_dirs_pattern.search(path)]
+            return [path for dir_name, path in directory_scan.dirs if not exclude_dirs_pattern.search(dir_name)]
+
+        pool = Pool(scan_threads)
+        try:
+            level = [directory]
+            while level:
+                next_level = []
+                for root, directory_scan in pool.map(scan_directory, level):
+                    scans[root] = directory_scan
+                    next_level.extend(sub_directories(directory_scan))
+                level = next_level
+        finally:
+            pool.terminate()
+            pool.join()
+
+        # Directories that are gone are forgotten
+        self._scans[scans_key] = scans
+
+        # Report in the same order as `_get_stats`
+        roots = [directory]
+        while roots:
+            directory_scan = scans[roots.pop()]
+            roots.extend(reversed(sub_directories(directory_scan)))
+
+            if not countonly:
+                for i, (path, file_stat, position) in enumerate(directory_scan.files):
+                    if file_stat is None:
+                        continue
+
+                    # Count the files like `_get_stats`: all the files of the directory are counted,
+                    # minus the files before this one that were filtered out
+                    file_number = directory_files + directory_scan.file_count - (position - i)
+                    size, mtime, ctime = file_stat
+                    directory_bytes += size
+                    self._submit_file_stats(
+                        path, size, mtime, ctime, filegauges and file_number <= 20, filetagname, dirtags
+                    )
+
+            directory_files += len(directory_scan.files)
 
         # number of files
         self.gauge('system.disk.directory.files', directory_files, tags=dirtags)
@@ -162,3 +295,18 @@ class DirectoryCheck(AgentCheck):
         # total file size
         if not countonly:
             self.gauge('system.disk.directory.bytes', directory_bytes, tags=dirtags)
+
+    def _stat_error(self, path, error):
+        self.warning('DirectoryCheck: could not stat file {} - {}'.format(path, error))
+
+    def _submit_file_stats(self, path, size, mtime, ctime, filegauge, filetagname, dirtags):
+        if filegauge:
+            filetags = ['{}:{}'.format(filetagname, path)]
+            filetags.extend(dirtags)
+            self.gauge('system.disk.directory.file.bytes', size, tags=filetags)
+            self.gauge('system.disk.directory.file.modified_sec_ago', time() - mtime, tags=filetags)
+            self.gauge('system.disk.directory.file.created_sec_ago', time() - ctime, tags=filetags)
+        else:
+            self.histogram('system.disk.directory.file.bytes', size, tags=dirtags)
+            self.histogram('system.disk.directory.file.modified_sec_ago', time() - mtime, tags=dirtags)
+            self.histogram('system.disk.directory.file.created_sec_ago', time() - ctime, tags=dirtags)
@@ -1,12 +1,28 @@
 # (C) Datadog, Inc. 2018
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
+import os
 import platform
 import sys
+import time
+from collections import namedtuple
 
 import six
 from scandir import scandir
 
+# Result of the scan of a single directory:
+# - `signature`: identifies the state of the directory entries, it changes when a file is added, removed or renamed
+# - `dirs`: list of (name, path) of the sub-directories
+# - `files`: list of (path, stat, position) of the files selected by the filter, `stat` is a (size, mtime, ctime)
+#   tuple or None if the file was not (or could not be) stat'ed, `position` is the index of the file among all
+#   the files of the directory
+# - `file_count`: number of files in the directory, selected by the filter or not
+DirectoryScan = namedtuple('DirectoryScan', ('signature', 'dirs', 'files', 'file_count'))
+
+# Directories modified more recently than this number of seconds are always scanned again, since
+# a change happening right after the scan could leave the modification time unchanged.
+MODIFICATION_TIME_RESOLUTION = 1
+
 
 def _walk(top):
     """Modified version of https://docs.python.org/3/library/os.html#os.scandir
@@ -49,6 +65,69 @@ def _walk(top):
             yield entry
 
 
+def directory_signature(top):
+    """Return what identifies the state of the entries of a directory, None if it cannot be stat'ed
+    or if it was modified too recently to be trusted.
+    """
+    try:
+        dir_stat = os.stat(top)
+    except OSError:
+        return None
+
+    if time.time() - dir_stat.st_mtime < MODIFICATION_TIME_RESOLUTION:
+        return None
+
+    return dir_stat.st_dev, dir_stat.st_ino, getattr(dir_stat, 'st_mtime_ns', dir_stat.st_mtime)
+
+
+def scan(top, previous=None, file_filter=None, stat_files=True, on_error=None):
+    """Scan the entries of a single directory, without recursing.
+
+    If `previous` is the `DirectoryScan` of a previous call and the directory did not change since then,
+    it is returned as is: neither the directory entries nor the files are read again.
+
+    `file_filter` is called with the name of each file and returns whether the file should be selected.
+    `on_error` is called with the path and the error for each selected file that could not be stat'ed.
+    """
+    signature = directory_signature(top)
+    if signature is not None and previous is not None and previous.signature == signature:
+        return previous
+
+    dirs = []
+    files = []
+    file_count = 0
+    for _, dir_entries, file_entries in walk_one(top):
+        for dir_entry in dir_entries:
+            dirs.append((dir_entry.name, dir_entry.path))
+
+        file_count += len(file_entries)
+        for position, file_entry in enumerate(file_entries):
+            if file_filter is not None and not file_filter(file_entry.name):
+                continue
+
+            path = file_entry.path
+            file_stat = None
+            if stat_files:
+                try:
+                    st = file_entry.stat()
+                except OSError as e:
+                    if on_error is not None:
+                        on_error(path, e)
+                else:
+                    file_stat = (st.st_size, st.st_mtime, st.st_ctime)
+
+            files.append((path, file_stat, position))
+
+    return DirectoryScan(signature, dirs, files, file_count)
+
+
+def walk_one(top):
+    """Only return the first level of `walk`, if the directory can be read."""
+    for entry in walk(top):
+        yield entry
+        break
+
+
 if six.PY3 or platform.system() != 'Windows':
     walk = _walk
 else:
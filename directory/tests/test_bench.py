@@ -21,3 +21,17 @@ def test_run(benchmark):
         benchmark(c.check, instance)
     finally:
         shutil.rmtree(temp_dir)
+
+
+def test_run_incremental(benchmark):
+    temp_dir = tempfile.mkdtemp()
+    command = [sys.executable, '-m', 'virtualenv', temp_dir]
+    instance = {'directory': temp_dir, 'recursive': True, 'incremental_scan': True}
+
+    try:
+        subprocess.call(command)
+        c = DirectoryCheck('directory', None, {}, [instance])
+
+        benchmark(c.check, instance)
+    finally:
+        shutil.rmtree(temp_dir)
@@ -4,6 +4,7 @@
 import os
 import shutil
 import tempfile
+import time
 
 import mock
 import pytest
@@ -137,6 +138,77 @@ def test_file_metrics(aggregator):
         assert aggregator.metrics_asserted_pct == 100.0
 
 
+def _submitted(aggregator):
+    return sorted(
+        (name, stub.type, sorted(stub.tags), stub.value if name.endswith('bytes') or name.endswith('files') else None)
+        for name in aggregator.metric_names
+        for stub in aggregator.metrics(name)
+    )
+
+
+@pytest.mark.parametrize('countonly', [False, True])
+@pytest.mark.parametrize('filegauges', [False, True])
+def test_incremental_scan_same_metrics(aggregator, filegauges, countonly):
+    check = DirectoryCheck('directory', {}, {})
+    config_stubs = common.get_config_stubs(temp_dir, filegauges=filegauges)
+    config_stubs.append({'directory': temp_dir, 'recursive': True, 'exclude_dirs': ['^sub'], 'tags': ['optional:tag1']})
+
+    for config in config_stubs:
+        config['countonly'] = countonly
+
+        aggregator.reset()
+        check.check(config)
+        expected = _submitted(aggregator)
+
+        aggregator.reset()
+        check.check(dict(config, incremental_scan=True, scan_threads=2))
+        assert _submitted(aggregator) == expected
+
+
+def test_incremental_scan_same_file_gauges(aggregator):
+    check = DirectoryCheck('directory', {}, {})
+    with temp_directory() as td:
+        for i in range(15):
+            create_file(os.path.join(td, 'a_{}.log'.format(i)))
+            create_file(os.path.join(td, 'b_{}.txt'.format(i)))
+        config = {'directory': td, 'pattern': '*.log', 'filegauges': True}
+
+        check.check(config)
+        expected = _submitted(aggregator)
+
+        aggregator.reset()
+        check.check(dict(config, incremental_scan=True))
+        # The same files are reported as gauges, the others as histograms
+        assert _submitted(aggregator) == expected
+
+
+def test_incremental_scan_reuses_unchanged_directories(aggregator):
+    check = DirectoryCheck('directory', {}, {})
+    with temp_directory() as td:
+        for sub in ('a', 'b'):
+            for i in range(3):
+                create_file(os.path.join(td, sub, 'file_{}'.format(i)))
+        instance = {'directory': td, 'recursive': True, 'pattern': 'a/*', 'incremental_scan': True}
+
+        with mock.patch('datadog_checks.directory.traverse.MODIFICATION_TIME_RESOLUTION', 0):
+            check.check(instance)
+            aggregator.assert_metric('system.disk.directory.files', value=3)
+
+            aggregator.reset()
+            with mock.patch('datadog_checks.directory.traverse.walk_one') as walk_one:
+                check.check(instance)
+                # Nothing changed, no directory is read again
+                walk_one.assert_not_called()
+            aggregator.assert_metric('system.disk.directory.files', value=3)
+
+            # Make sure the modification time of the directory changes
+            time.sleep(0.01)
+            create_file(os.path.join(td, 'a', 'new_file'))
+            aggregator.reset()
+            check.check(instance)
+            aggregator.assert_metric('system.disk.directory.files', value=4)
+
+
 def test_non_existent_directory():
     """
     Missing or inaccessible directory coverage.
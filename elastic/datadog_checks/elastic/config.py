@@ -27,6 +27,7 @@ ESInstanceConfig = namedtuple(
         'ssl_verify',
         'ssl_cert',
         'ssl_key',
+        'filter_responses',
     ],
 )
 
@@ -51,6 +52,7 @@ def from_instance(instance):
         cluster_stats = is_affirmative(instance.get('is_external', False))
     pending_task_stats = is_affirmative(instance.get('pending_task_stats', True))
     admin_forwarder = is_affirmative(instance.get('admin_forwarder', False))
+    filter_responses = is_affirmative(instance.get('filter_responses', True))
 
     # Support URLs that have a path in them from the config, for
     # backwards-compatibility.
@@ -89,5 +91,6 @@ def from_instance(instance):
         url=url,
         username=instance.get('username'),
         pending_task_stats=pending_task_stats,
+        filter_responses=filter_responses,
     )
     return config
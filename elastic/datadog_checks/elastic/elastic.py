@@ -9,16 +9,25 @@ from six import iteritems, itervalues
 from six.moves.urllib.parse import urljoin
 
 from datadog_checks.base import AgentCheck, to_string
+from datadog_checks.base.utils.extractor import PathExtractor
 from datadog_checks.base.utils.headers import headers
 
 from .config import from_instance
 from .metrics import (
     CLUSTER_PENDING_TASKS,
+    FILTER_PATH_SUBSTITUTES,
     health_stats_for_version,
     index_stats_for_version,
     pshard_stats_for_version,
     stats_for_version,
 )
+from .utils import get_filter_path
+
+# Columns of the `_cat/indices` API used by the check
+CAT_INDICES_COLUMNS = 'index,health,pri,rep,docs.count,docs.deleted,pri.store.size,store.size'
+
+# Paths of the node stats used, besides the metrics, to tag them
+NODE_STATS_EXTRA_PATHS = ('cluster_name', 'nodes.*.name', 'nodes.*.host', 'nodes.*.hostname')
 
 
 class AuthenticationError(requests.exceptions.HTTPError):
@@ -34,6 +43,13 @@ class ESCheck(AgentCheck):
         AgentCheck.__init__(self, name, init_config, agentConfig, instances)
         # Host status needs to persist across all checks
         self.cluster_status = {}
+        # Metric extractors, by kind of stats and ES version
+        self._extractors = {}
+        self._pending_tasks_extractor = self._build_extractor(CLUSTER_PENDING_TASKS)
+        # `filter_path` parameters, by kind of stats and ES version
+        self._filter_paths = {}
+        # Connections are kept open across runs
+        self.session = requests.Session()
 
     def check(self, instance):
         config = from_instance(instance)
@@ -48,14 +64,17 @@ class ESCheck(AgentCheck):
             raise
 
         health_url, stats_url, pshard_stats_url, pending_tasks_url = self._get_urls(version, config.cluster_stats)
-        stats_metrics = stats_for_version(version)
-        pshard_stats_metrics = pshard_stats_for_version(version)
+        stats_metrics = self._get_extractor('stats', version, stats_for_version)
+        pshard_stats_metrics = self._get_extractor('pshard_stats', version, pshard_stats_for_version)
 
         # Load stats data.
         # This must happen before other URL processing as the cluster name
         # is retrieved here, and added to the tag list.
         stats_url = self._join_url(config.url, stats_url, admin_forwarder)
-        stats_data = self._get_data(stats_url, config)
+        stats_params = self._get_filter_params(
+            config, version, 'stats', stats_metrics, prefix='nodes.*.', extra=NODE_STATS_EXTRA_PATHS
+        )
+        stats_data = self._get_data(stats_url, config, params=stats_params)
         if stats_data.get('cluster_name'):
             # retrieve the cluster name from the data, and append it to the
             # master tag list.
@@ -70,7 +89,10 @@ class ESCheck(AgentCheck):
             send_sc = bubble_ex = not config.pshard_graceful_to
             pshard_stats_url = self._join_url(config.url, pshard_stats_url, admin_forwarder)
             try:
-                pshard_stats_data = self._get_data(pshard_stats_url, config, send_sc=send_sc)
+                pshard_stats_params = self._get_filter_params(config, version, 'pshard_stats', pshard_stats_metrics)
+                pshard_stats_data = self._get_data(
+                    pshard_stats_url, config, send_sc=send_sc, params=pshard_stats_params
+                )
                 self._process_pshard_stats_data(pshard_stats_data, config, pshard_stats_metrics)
             except requests.ReadTimeout as e:
                 if bubble_ex:
@@ -128,15 +150,15 @@ class ESCheck(AgentCheck):
             return urljoin(base, url)
 
     def _get_index_metrics(self, config, admin_forwarder, version):
-        cat_url = '/_cat/indices?format=json&bytes=b'
+        cat_url = '/_cat/indices?format=json&bytes=b&h={}'.format(CAT_INDICES_COLUMNS)
         index_url = self._join_url(config.url, cat_url, admin_forwarder)
         index_resp = self._get_data(index_url, config)
-        index_stats_metrics = index_stats_for_version(version)
+        index_stats_metrics = self._get_extractor('index_stats', version, index_stats_for_version)
         health_stat = {'green': 0, 'yellow': 1, 'red': 2}
         for idx in index_resp:
             tags = config.tags + ['index_name:' + idx['index']]
             # we need to remap metric names because the ones from elastic
-            # contain dots and that would confuse `_process_metric()` (sic)
+            # contain dots and that would confuse `_process_metrics()` (sic)
             index_data = {
                 'docs_count': idx.get('docs.count'),
                 'docs_deleted': idx.get('docs.deleted'),
@@ -157,10 +179,7 @@ class ESCheck(AgentCheck):
                     del index_data[key]
                     self.log.warning("The index metric data for %s was not found", key)
 
-            for metric in index_stats_metrics:
-                # metric description
-                desc = index_stats_metrics[metric]
-                self._process_metric(index_data, metric, *desc, tags=tags)
+            self._process_metrics(index_data, index_stats_metrics, tags=tags)
 
     def _get_urls(self, version, cluster_stats):
         """
@@ -182,7 +201,21 @@ class ESCheck(AgentCheck):
 
         return health_url, stats_url, pshard_stats_url, pending_tasks_url
 
-    def _get_data(self, url, config, send_sc=True):
+    def _get_filter_params(self, config, version, kind, extractor, prefix='', extra=()):
+        """
+        Return the query parameters keeping only the paths of the metrics of `extractor`
+        in the response, response filtering is available starting with ES 1.6.0
+        """
+        if not config.filter_responses or version < [1, 6, 0]:
+            return None
+
+        key = (kind, tuple(version))
+        if key not in self._filter_paths:
+            paths = [FILTER_PATH_SUBSTITUTES.get(path, path) for path in extractor.paths]
+            self._filter_paths[key] = get_filter_path(paths, prefix=prefix, extra=extra)
+        return {'filter_path': self._filter_paths[key]}
+
+    def _get_data(self, url, config, send_sc=True, params=None):
         """
         Hit a given URL and return the parsed json
         """
@@ -210,8 +243,14 @@ class ESCheck(AgentCheck):
 
         resp = None
         try:
-            resp = requests.get(
-                url, timeout=config.timeout, headers=headers(self.agentConfig), auth=auth, verify=verify, cert=cert
+            resp = self.session.get(
+                url,
+                params=params,
+                timeout=config.timeout,
+                headers=headers(self.agentConfig),
+                auth=auth,
+                verify=verify,
+                cert=cert,
             )
             resp.raise_for_status()
         except Exception as e:
@@ -249,10 +288,7 @@ class ESCheck(AgentCheck):
             'pending_tasks_time_in_queue': average_time_in_queue // (total or 1),
         }
 
-        for metric in CLUSTER_PENDING_TASKS:
-            # metric description
-            desc = CLUSTER_PENDING_TASKS[metric]
-            self._process_metric(node_data, metric, *desc, tags=config.tags)
+        self._process_metrics(node_data, self._pending_tasks_extractor, tags=config.tags)
 
     def _process_stats_data(self, data, stats_metrics, config):
         for node_data in itervalues(data.get('nodes', {})):
@@ -274,38 +310,45 @@ class ESCheck(AgentCheck):
                         metric_hostname = node_data[k]
                         break
 
-            for metric, desc in iteritems(stats_metrics):
-                self._process_metric(node_data, metric, *desc, tags=metrics_tags, hostname=metric_hostname)
+            self._process_metrics(node_data, stats_metrics, tags=metrics_tags, hostname=metric_hostname)
 
     def _process_pshard_stats_data(self, data, config, pshard_stats_metrics):
-        for metric, desc in iteritems(pshard_stats_metrics):
-            self._process_metric(data, metric, *desc, tags=config.tags)
+        self._process_metrics(data, pshard_stats_metrics, tags=config.tags)
 
-    def _process_metric(self, data, metric, xtype, path, xform=None, tags=None, hostname=None):
+    def _get_extractor(self, kind, version, metrics_for_version):
         """
-        data: dictionary containing all the stats
-        metric: datadog metric
-        path: corresponding path in data, flattened, e.g. thread_pool.bulk.queue
-        xform: a lambda to apply to the numerical value
+        Return the extractor of the metrics returned by `metrics_for_version`, built once per ES version
         """
-        value = data
+        key = (kind, tuple(version))
+        extractor = self._extractors.get(key)
+        if extractor is None:
+            extractor = self._extractors[key] = self._build_extractor(metrics_for_version(version))
+        return extractor
+
+    @staticmethod
+    def _build_extractor(metrics):
+        return PathExtractor(
+            (desc[1], (metric, desc[0], desc[1], desc[2] if len(desc) > 2 else None))
+            for metric, desc in iteritems(metrics)
+        )
 
-        # Traverse the nested dictionaries
-        for key in path.split('.'):
+    def _process_metrics(self, data, extractor, tags=None, hostname=None):
+        """
+        data: dictionary containing all the stats
+        extractor: `PathExtractor` of the metrics, each path is the corresponding path in data, flattened,
+            e.g. thread_pool.bulk.queue, and each target a (metric, type, path, xform) tuple, where
+            xform is a lambda to apply to the numerical value
+        """
+        for (metric, xtype, path, xform), value in extractor.extract(data, include_missing=True):
             if value is not None:
-                value = value.get(key)
+                if xform:
+                    value = xform(value)
+                if xtype == "gauge":
+                    self.gauge(metric, value, tags=tags, hostname=hostname)
+                else:
+                    self.rate(metric, value, tags=tags, hostname=hostname)
             else:
-                break
-
-        if value is not None:
-            if xform:
-                value = xform(value)
-            if xtype == "gauge":
-                self.gauge(metric, value, tags=tags, hostname=hostname)
-            else:
-                self.rate(metric, value, tags=tags, hostname=hostname)
-        else:
-            self.log.debug("Metric not found: %s -> %s", path, metric)
+                self.log.debug("Metric not found: %s -> %s", path, metric)
 
     def _process_health_data(self, data, config, version):
         cluster_status = data.get('status')
@@ -320,10 +363,8 @@ class ESCheck(AgentCheck):
             event = self._create_event(cluster_status, tags=config.tags)
             self.event(event)
 
-        cluster_health_metrics = health_stats_for_version(version)
-
-        for metric, desc in iteritems(cluster_health_metrics):
-            self._process_metric(data, metric, *desc, tags=config.tags)
+        cluster_health_metrics = self._get_extractor('health_stats', version, health_stats_for_version)
+        self._process_metrics(data, cluster_health_metrics, tags=config.tags)
 
         # Process the service check
         if cluster_status == 'green':
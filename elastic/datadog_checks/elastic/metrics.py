@@ -6,6 +6,13 @@ from .utils import ms_to_second
 # Metrics definition format is a dictionary mapping:
 # datadog_metric_name --> (datadog_metric_type, es_metric_name, optional_conversion_func)
 
+# The paths of the metrics computed from a whole object of the response, mapped to the path of a smaller
+# part of the object that is enough to compute them, to filter the response
+FILTER_PATH_SUBSTITUTES = {
+    # one key for each index
+    'indices': 'indices.*.primaries.docs.count'
+}
+
 # Clusterwise metrics, pre aggregated on ES, compatible with all ES versions
 PRIMARY_SHARD_METRICS = {
     'elasticsearch.primaries.docs.count': ('gauge', '_all.primaries.docs.count'),
@@ -3,6 +3,27 @@
 # Licensed under Simplified BSD License (see LICENSE)
 from __future__ import division
 
+# Elasticsearch rejects the requests whose first line is longer than 4KB by default
+FILTER_PATH_MAX_LENGTH = 2048
+
 
 def ms_to_second(ms):
     return ms / 1000
+
+
+def get_filter_path(paths, prefix='', extra=(), max_length=FILTER_PATH_MAX_LENGTH):
+    """
+    Build the `filter_path` parameter keeping only `paths` in a response, each prefixed by `prefix`,
+    and the `extra` paths. A filter keeps everything below the path it matches: the paths are cut to
+    fewer keys until the parameter fits in `max_length` characters.
+    """
+    paths = [path.split('.') for path in paths]
+    depth = max(len(keys) for keys in paths) if paths else 1
+
+    while True:
+        filters = set(extra)
+        filters.update(prefix + '.'.join(keys[:depth]) for keys in paths)
+        filter_path = ','.join(sorted(filters))
+        if len(filter_path) <= max_length or depth == 1:
+            return filter_path
+        depth -= 1
@@ -37,6 +37,7 @@ def test_from_instance_defaults():
     assert c.url == 'http://example.com'
     assert c.username is None
     assert c.pending_task_stats is True
+    assert c.filter_responses is True
 
 
 @pytest.mark.unit
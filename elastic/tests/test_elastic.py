@@ -18,6 +18,7 @@ from datadog_checks.elastic.metrics import (
     pshard_stats_for_version,
     stats_for_version,
 )
+from datadog_checks.elastic.utils import get_filter_path
 
 from .common import CLUSTER_TAG, PASSWORD, URL, USER
 
@@ -74,6 +75,46 @@ def test__get_urls(elastic_check):
     assert pending_tasks_url == '/_cluster/pending_tasks'
 
 
+@pytest.mark.unit
+def test__get_filter_params(elastic_check):
+    config = from_instance({'url': URL})
+    stats_metrics = elastic_check._get_extractor('stats', [6, 0, 0], stats_for_version)
+    pshard_stats_metrics = elastic_check._get_extractor('pshard_stats', [6, 0, 0], pshard_stats_for_version)
+
+    params = elastic_check._get_filter_params(
+        config, [6, 0, 0], 'stats', stats_metrics, prefix='nodes.*.', extra=['cluster_name', 'nodes.*.name']
+    )
+    filters = params['filter_path'].split(',')
+    assert 'cluster_name' in filters
+    assert 'nodes.*.name' in filters
+    assert all(f.startswith('nodes.*.') for f in filters if f != 'cluster_name')
+    assert len(params['filter_path']) <= 2048
+
+    params = elastic_check._get_filter_params(config, [6, 0, 0], 'pshard_stats', pshard_stats_metrics)
+    filters = params['filter_path'].split(',')
+    assert '_all.primaries.docs.count' in filters
+    assert filters[-1] == 'indices.*.primaries.docs.count'
+    assert all(f.startswith('_all.primaries.') for f in filters[:-1])
+
+    # Response filtering is not available, or disabled
+    assert elastic_check._get_filter_params(config, [1, 5, 0], 'pshard_stats', pshard_stats_metrics) is None
+    config = from_instance({'url': URL, 'filter_responses': False})
+    assert elastic_check._get_filter_params(config, [6, 0, 0], 'pshard_stats', pshard_stats_metrics) is None
+
+
+@pytest.mark.unit
+def test_get_filter_path():
+    paths = ['jvm.mem.heap_used', 'jvm.mem.heap_max', 'jvm.threads.count', 'os.cpu.percent']
+
+    assert get_filter_path(paths, prefix='nodes.*.', extra=['cluster_name']) == (
+        'cluster_name,nodes.*.jvm.mem.heap_max,nodes.*.jvm.mem.heap_used,nodes.*.jvm.threads.count,'
+        'nodes.*.os.cpu.percent'
+    )
+    # The paths are cut until the parameter is short enough
+    assert get_filter_path(paths, max_length=40) == 'jvm.mem,jvm.threads,os.cpu'
+    assert get_filter_path(paths, max_length=10) == 'jvm,os'
+
+
 def test_check(dd_environment, elastic_check, instance, aggregator, cluster_tags, node_tags):
     config = from_instance(instance)
     es_version = elastic_check._get_es_version(config)
@@ -8,9 +8,14 @@ KAFKA_NO_ERROR = kafka_errors.NoError.errno
 KAFKA_UNKNOWN_ERROR = kafka_errors.UnknownError.errno
 KAFKA_UNKNOWN_TOPIC_OR_PARTITION = kafka_errors.UnknownTopicOrPartitionError.errno
 KAFKA_NOT_LEADER_FOR_PARTITION = kafka_errors.NotLeaderForPartitionError.errno
+KAFKA_GROUP_LOAD_IN_PROGRESS = kafka_errors.GroupLoadInProgressError.errno
+KAFKA_GROUP_COORDINATOR_NOT_AVAILABLE = kafka_errors.GroupCoordinatorNotAvailableError.errno
+KAFKA_NOT_COORDINATOR_FOR_GROUP = kafka_errors.NotCoordinatorForGroupError.errno
 
 DEFAULT_KAFKA_TIMEOUT = 5
 DEFAULT_ZK_TIMEOUT = 5
 DEFAULT_KAFKA_RETRIES = 3
+# Zookeeper reads waiting for a response at the same time
+DEFAULT_ZK_MAX_IN_FLIGHT = 100
 
 CONTEXT_UPPER_BOUND = 200
@@ -4,11 +4,12 @@
 from __future__ import division
 
 import random
-from collections import defaultdict
+from collections import defaultdict, deque
 from time import sleep, time
 
 from kafka import errors as kafka_errors
 from kafka.client import KafkaClient
+from kafka.future import Future
 from kafka.protocol.commit import GroupCoordinatorRequest, OffsetFetchRequest
 from kafka.protocol.offset import OffsetRequest, OffsetResetStrategy
 from kafka.structs import TopicPartition
@@ -23,8 +24,12 @@ from .constants import (
     CONTEXT_UPPER_BOUND,
     DEFAULT_KAFKA_RETRIES,
     DEFAULT_KAFKA_TIMEOUT,
+    DEFAULT_ZK_MAX_IN_FLIGHT,
     DEFAULT_ZK_TIMEOUT,
+    KAFKA_GROUP_COORDINATOR_NOT_AVAILABLE,
+    KAFKA_GROUP_LOAD_IN_PROGRESS,
     KAFKA_NO_ERROR,
+    KAFKA_NOT_COORDINATOR_FOR_GROUP,
     KAFKA_NOT_LEADER_FOR_PARTITION,
     KAFKA_UNKNOWN_ERROR,
     KAFKA_UNKNOWN_TOPIC_OR_PARTITION,
@@ -48,9 +53,13 @@ class LegacyKafkaCheck_0_10_2(AgentCheck):
         self._kafka_timeout = int(init_config.get('kafka_timeout', DEFAULT_KAFKA_TIMEOUT))
         self.context_limit = int(init_config.get('max_partition_contexts', CONTEXT_UPPER_BOUND))
         self._broker_retries = int(init_config.get('kafka_retries', DEFAULT_KAFKA_RETRIES))
+        self._zk_max_in_flight = max(int(init_config.get('zk_max_in_flight', DEFAULT_ZK_MAX_IN_FLIGHT)), 1)
         self._zk_last_ts = {}
 
         self.kafka_clients = {}
+        self.zk_clients = {}
+        # kafka client --> {consumer group: node id of its coordinator}
+        self._group_coordinators = defaultdict(dict)
 
     def check(self, instance):
         # For calculating lag, we have to fetch offsets from both kafka and
@@ -157,6 +166,11 @@ class LegacyKafkaCheck_0_10_2(AgentCheck):
         """
         for cli in itervalues(self.kafka_clients):
             cli.close()
+        self._group_coordinators.clear()
+
+        for zk_conn in itervalues(self.zk_clients):
+            self._close_zk_client(zk_conn)
+        self.zk_clients.clear()
 
     def _get_kafka_client(self, instance):
         kafka_conn_str = instance.get('kafka_connect_str')
@@ -187,6 +201,39 @@ class LegacyKafkaCheck_0_10_2(AgentCheck):
 
         return self.kafka_clients[instance_key]
 
+    def _get_zk_client(self, zk_hosts_ports):
+        """
+        Return the Zookeeper client of `zk_hosts_ports`, it is kept connected between runs.
+
+        Kazoo reconnects a started client by itself, a client that is not connected anymore
+        is replaced so that the check fails like it used to when Zookeeper can't be reached.
+        """
+        key = hash_mutable(zk_hosts_ports)
+        zk_conn = self.zk_clients.get(key)
+        if zk_conn is not None and zk_conn.connected:
+            return zk_conn
+
+        if zk_conn is not None:
+            del self.zk_clients[key]
+            self._close_zk_client(zk_conn)
+
+        zk_conn = KazooClient(zk_hosts_ports, timeout=self._zk_timeout)
+        try:
+            zk_conn.start(timeout=self._zk_timeout)
+        except Exception:
+            self._close_zk_client(zk_conn)
+            raise
+
+        self.zk_clients[key] = zk_conn
+        return zk_conn
+
+    def _close_zk_client(self, zk_conn):
+        try:
+            zk_conn.stop()
+            zk_conn.close()
+        except Exception:
+            self.log.exception('Error cleaning up Zookeeper connection')
+
     def _ensure_ready_node(self, client, node_id):
         if node_id is None:
             raise Exception("node_id is None")
@@ -210,40 +257,82 @@ class LegacyKafkaCheck_0_10_2(AgentCheck):
 
                 raise future.exception
 
-    def _make_blocking_req(self, client, request, node_id=None):
-        if node_id is None:
-            node_id = client.least_loaded_node()
+    def _make_parallel_reqs(self, client, node_requests):
+        """
+        Send requests to many brokers at once and wait for all their responses.
+
+        The requests of a broker are pipelined, up to the maximum number of in-flight requests
+        of its connection, instead of waiting for a response before sending the next request.
+
+        :param list node_requests: (node_id, request) pairs
+        :return: the futures of the requests, in the same order. A request that could not be sent
+            or did not get a response in time has a future that did not succeed.
+        """
+        futures = [None] * len(node_requests)
+        pending = defaultdict(deque)
+        for i, (node_id, request) in enumerate(node_requests):
+            pending[node_id].append((i, request))
 
-        self._ensure_ready_node(client, node_id)
+        for node_id in list(pending):
+            try:
+                self._ensure_ready_node(client, node_id)
+            except Exception as e:
+                for i, _ in pending.pop(node_id):
+                    futures[i] = Future().failure(e)
+
+        deadline = time() + client.config['request_timeout_ms'] / 1000
+        while True:
+            for node_id, requests in iteritems(pending):
+                while requests and client.ready(node_id):
+                    i, request = requests.popleft()
+                    futures[i] = client.send(node_id, request)
+
+            if all(future is not None and future.is_done for future in futures):
+                break
+            remaining = deadline - time()
+            if remaining <= 0:
+                break
+            client.poll(timeout_ms=remaining * 1000)
 
-        future = client.send(node_id, request)
-        client.poll(future=future)  # block until we get response.
-        assert future.succeeded()
-        response = future.value
+        for requests in itervalues(pending):
+            for i, _ in requests:
+                futures[i] = Future().failure(kafka_errors.KafkaTimeoutError())
 
-        return response
+        return futures
+
+    def _get_group_coordinators(self, client, consumer_groups):
+        """
+        Find the node id of the coordinator of each consumer group.
 
-    def _get_group_coordinator(self, client, group):
-        request = GroupCoordinatorRequest[0](group)
+        The coordinators are kept for the next runs. The GroupCoordinatorRequests of all the
+        groups without a known coordinator are sent to a broker at once, and the next brokers
+        are only asked about the groups that it could not find.
+        """
+        coordinators = self._group_coordinators[client]
+        broker_ids = [broker.nodeId for broker in client.cluster.brokers()]
 
-        # not all brokers might return a good response... Try all of them
-        coord_id = None
+        missing = [group for group in consumer_groups if coordinators.get(group) not in broker_ids]
         for _ in range(self._broker_retries):
-            for broker in client.cluster.brokers():
-                try:
-                    coord_resp = self._make_blocking_req(client, request, node_id=broker.nodeId)
+            for broker_id in broker_ids:
+                if not missing:
+                    return coordinators
+
+                requests = [(broker_id, GroupCoordinatorRequest[0](group)) for group in missing]
+                futures = self._make_parallel_reqs(client, requests)
+
+                still_missing = []
+                for group, future in zip(missing, futures):
                     # 0 means that there is no error
-                    if coord_resp and coord_resp.error_code == 0:
-                        client.cluster.add_group_coordinator(group, coord_resp)
+                    if future.succeeded() and future.value.error_code == 0:
+                        client.cluster.add_group_coordinator(group, future.value)
                         coord_id = client.cluster.coordinator_for_group(group)
                         if coord_id is not None and coord_id >= 0:
-                            return coord_id
-                except AssertionError:
-                    continue
-            else:
-                coord_id = None
+                            coordinators[group] = coord_id
+                            continue
+                    still_missing.append(group)
+                missing = still_missing
 
-        return coord_id
+        return coordinators
 
     def _process_highwater_offsets(self, response):
         highwater_offsets = {}
@@ -294,8 +383,8 @@ class LegacyKafkaCheck_0_10_2(AgentCheck):
         producing. No need to limit this for performance because fetching broker
         offsets from Kafka is a relatively inexpensive operation.
 
-        Sends one OffsetRequest per broker to get offsets for all partitions
-        where that broker is the leader:
+        Sends one OffsetRequest per broker, to all the brokers at once, to get
+        offsets for all partitions where that broker is the leader:
         https://cwiki.apache.org/confluence/display/KAFKA/A+Guide+To+The+Kafka+Protocol#AGuideToTheKafkaProtocol-OffsetAPI(AKAListOffset)
 
         Can we cleanup connections on agent restart?
@@ -325,6 +414,7 @@ class LegacyKafkaCheck_0_10_2(AgentCheck):
                     leader_tp[partition_leader][topic].add(partition)
 
         max_offsets = 1
+        requests = []
         for node_id, tps in iteritems(leader_tp):
             # Construct the OffsetRequest
             request = OffsetRequest[0](
@@ -334,9 +424,12 @@ class LegacyKafkaCheck_0_10_2(AgentCheck):
                     for topic, partitions in iteritems(tps)
                 ],
             )
+            requests.append((node_id, request))
 
-            response = self._make_blocking_req(cli, request, node_id=node_id)
-            offsets, unled = self._process_highwater_offsets(response)
+        for future in self._make_parallel_reqs(cli, requests):
+            if not future.succeeded():
+                raise future.exception or kafka_errors.KafkaTimeoutError()
+            offsets, unled = self._process_highwater_offsets(future.value)
             highwater_offsets.update(offsets)
             topic_partitions_without_a_leader.extend(unled)
 
@@ -398,6 +491,35 @@ class LegacyKafkaCheck_0_10_2(AgentCheck):
             self.log.exception('Could not read %s from %s', name_for_error, zk_path)
         return children
 
+    def _get_zk_nodes(self, fetch, zk_paths, name_for_error):
+        """
+        Read many Zookeeper nodes with the async API of kazoo, at most `zk_max_in_flight` reads
+        are waiting for a response at the same time.
+
+        :param fetch: async read method of the client, `get_async` or `get_children_async`
+        :return: list of (path, result) for the nodes that could be read
+        """
+        results = []
+        in_flight = deque()
+
+        def wait_oldest():
+            zk_path, async_result = in_flight.popleft()
+            try:
+                results.append((zk_path, async_result.get(timeout=self._zk_timeout)))
+            except NoNodeError:
+                self.log.info('No zookeeper node at %s', zk_path)
+            except Exception:
+                self.log.exception('Could not read %s from %s', name_for_error, zk_path)
+
+        for zk_path in zk_paths:
+            if len(in_flight) >= self._zk_max_in_flight:
+                wait_oldest()
+            in_flight.append((zk_path, fetch(zk_path)))
+        while in_flight:
+            wait_oldest()
+
+        return results
+
     def _get_zk_consumer_offsets(self, zk_hosts_ports, consumer_groups=None, zk_prefix=''):
         """
         Fetch Consumer Group offsets from Zookeeper.
@@ -405,6 +527,8 @@ class LegacyKafkaCheck_0_10_2(AgentCheck):
         Also fetch consumer_groups, topics, and partitions if not
         already specified in consumer_groups.
 
+        The nodes of each level of the tree are read concurrently, see _get_zk_nodes().
+
         :param dict consumer_groups: The consumer groups, topics, and partitions
             that you want to fetch offsets for. If consumer_groups is None, will
             fetch offsets for all consumer_groups. For examples of what this
@@ -417,112 +541,133 @@ class LegacyKafkaCheck_0_10_2(AgentCheck):
         zk_path_consumer = zk_prefix + '/consumers/'
         zk_path_topic_tmpl = zk_path_consumer + '{group}/offsets/'
         zk_path_partition_tmpl = zk_path_topic_tmpl + '{topic}/'
-
-        zk_conn = KazooClient(zk_hosts_ports, timeout=self._zk_timeout)
-        zk_conn.start()
-        try:
-            if consumer_groups is None:
-                # If consumer groups aren't specified, fetch them from ZK
-                consumer_groups = {
-                    consumer_group: None
-                    for consumer_group in self._get_zk_path_children(zk_conn, zk_path_consumer, 'consumer groups')
-                }
-
-            for consumer_group, topics in iteritems(consumer_groups):
-                if not topics:
-                    # If topics are't specified, fetch them from ZK
-                    zk_path_topics = zk_path_topic_tmpl.format(group=consumer_group)
-                    topics = {topic: None for topic in self._get_zk_path_children(zk_conn, zk_path_topics, 'topics')}
-                    consumer_groups[consumer_group] = topics
-
-                for topic, partitions in iteritems(topics):
-                    if partitions:
-                        partitions = set(partitions)  # defend against bad user input
-                    else:
-                        # If partitions aren't specified, fetch them from ZK
-                        zk_path_partitions = zk_path_partition_tmpl.format(group=consumer_group, topic=topic)
-                        # Zookeeper returns the partition IDs as strings because
-                        # they are extracted from the node path
-                        partitions = [
-                            int(x) for x in self._get_zk_path_children(zk_conn, zk_path_partitions, 'partitions')
-                        ]
-                        consumer_groups[consumer_group][topic] = partitions
-
-                    # Fetch consumer offsets for each partition from ZK
-                    for partition in partitions:
-                        zk_path = (zk_path_partition_tmpl + '{partition}/').format(
-                            group=consumer_group, topic=topic, partition=partition
-                        )
-                        try:
-                            consumer_offset = int(zk_conn.get(zk_path)[0])
-                            key = (consumer_group, topic, partition)
-                            zk_consumer_offsets[key] = consumer_offset
-                        except NoNodeError:
-                            self.log.info('No zookeeper node at %s', zk_path)
-                        except Exception:
-                            self.log.exception('Could not read consumer offset from %s', zk_path)
-        finally:
+        zk_path_offset_tmpl = zk_path_partition_tmpl + '{partition}/'
+
+        zk_conn = self._get_zk_client(zk_hosts_ports)
+
+        if consumer_groups is None:
+            # If consumer groups aren't specified, fetch them from ZK
+            consumer_groups = {
+                consumer_group: None
+                for consumer_group in self._get_zk_path_children(zk_conn, zk_path_consumer, 'consumer groups')
+            }
+
+        # If topics aren't specified, fetch them from ZK
+        topic_paths = {}
+        for consumer_group, topics in iteritems(consumer_groups):
+            if not topics:
+                topic_paths[zk_path_topic_tmpl.format(group=consumer_group)] = consumer_group
+                consumer_groups[consumer_group] = {}
+        for zk_path, children in self._get_zk_nodes(zk_conn.get_children_async, topic_paths, 'topics'):
+            consumer_groups[topic_paths[zk_path]] = {topic: None for topic in children}
+
+        # If partitions aren't specified, fetch them from ZK
+        partition_paths = {}
+        for consumer_group, topics in iteritems(consumer_groups):
+            for topic, partitions in iteritems(topics):
+                if not partitions:
+                    partition_paths[zk_path_partition_tmpl.format(group=consumer_group, topic=topic)] = (
+                        consumer_group,
+                        topic,
+                    )
+                    topics[topic] = []
+        for zk_path, children in self._get_zk_nodes(zk_conn.get_children_async, partition_paths, 'partitions'):
+            consumer_group, topic = partition_paths[zk_path]
+            # Zookeeper returns the partition IDs as strings because
+            # they are extracted from the node path
+            consumer_groups[consumer_group][topic] = [int(x) for x in children]
+
+        # Fetch consumer offsets for each partition from ZK
+        offset_paths = {}
+        for consumer_group, topics in iteritems(consumer_groups):
+            for topic, partitions in iteritems(topics):
+                # set() defends against bad user input
+                for partition in set(partitions):
+                    zk_path = zk_path_offset_tmpl.format(group=consumer_group, topic=topic, partition=partition)
+                    offset_paths[zk_path] = (consumer_group, topic, partition)
+        for zk_path, (value, _) in self._get_zk_nodes(zk_conn.get_async, offset_paths, 'consumer offset'):
             try:
-                zk_conn.stop()
-                zk_conn.close()
-            except Exception:
-                self.log.exception('Error cleaning up Zookeeper connection')
+                zk_consumer_offsets[offset_paths[zk_path]] = int(value)
+            except ValueError:
+                self.log.exception('Could not read consumer offset from %s', zk_path)
+
         return zk_consumer_offsets, consumer_groups
 
     def _get_kafka_consumer_offsets(self, instance, consumer_groups):
         """
         retrieve consumer offsets via the new consumer api. Offsets in this version are stored directly
         in kafka (__consumer_offsets topic) rather than in zookeeper
+
+        The OffsetFetchRequests of all the consumer groups are sent at once, each one to the
+        coordinator of its group, or to all the brokers when the coordinator is not known.
         """
         consumer_offsets = {}
         topics = defaultdict(set)
 
         cli = self._get_kafka_client(instance)
+        coordinators = self._get_group_coordinators(cli, consumer_groups)
+        broker_ids = [b.nodeId for b in cli.cluster.brokers()]
 
+        groups = []
+        requests = []
         for consumer_group, topic_partitions in iteritems(consumer_groups):
+            coordinator_id = coordinators.get(consumer_group)
+            if coordinator_id is not None:
+                node_ids = [coordinator_id]
+            else:
+                node_ids = broker_ids
+                self.log.info("unable to find group coordinator for %s", consumer_group)
+
+            # Kafka protocol uses OffsetFetchRequests to retrieve consumer offsets:
+            # https://kafka.apache.org/protocol#The_Messages_OffsetFetch
+            # https://cwiki.apache.org/confluence/display/KAFKA/A+Guide+To+The+Kafka+Protocol#AGuideToTheKafkaProtocol-OffsetFetchRequest
             try:
-                coordinator_id = self._get_group_coordinator(cli, consumer_group)
-                if coordinator_id:
-                    offsets = self._get_consumer_offsets(cli, consumer_group, topic_partitions, coordinator_id)
-                else:
-                    offsets = self._get_consumer_offsets(cli, consumer_group, topic_partitions)
-                    self.log.info("unable to find group coordinator for %s", consumer_group)
-
-                for (topic, partition), offset in iteritems(offsets):
-                    topics[topic].update([partition])
-                    key = (consumer_group, topic, partition)
-                    consumer_offsets[key] = offset
+                request = OffsetFetchRequest[1](
+                    consumer_group, list(iteritems(self._get_topic_partitions(cli, topic_partitions or {})))
+                )
             except Exception:
-                self.log.exception('Could not read consumer offsets from kafka.')
+                self.log.exception('Could not read consumer offsets of %s from kafka.', consumer_group)
+                continue
+            for node_id in node_ids:
+                groups.append(consumer_group)
+                requests.append((node_id, request))
+
+        for consumer_group, future in zip(groups, self._make_parallel_reqs(cli, requests)):
+            if not future.succeeded():
+                self.log.error(
+                    'Could not read consumer offsets of %s from kafka: %s',
+                    consumer_group,
+                    future.exception or 'no response',
+                )
+                # Look the coordinator up again on the next run, it may have moved
+                coordinators.pop(consumer_group, None)
+                continue
+
+            for (topic, partition_offsets) in future.value.topics:
+                for partition, offset, _, error_code in partition_offsets:
+                    if error_code in (
+                        KAFKA_NOT_COORDINATOR_FOR_GROUP,
+                        KAFKA_GROUP_COORDINATOR_NOT_AVAILABLE,
+                        KAFKA_GROUP_LOAD_IN_PROGRESS,
+                    ):
+                        coordinators.pop(consumer_group, None)
+                    if error_code != 0:
+                        continue
+                    topics[topic].update([partition])
+                    consumer_offsets[(consumer_group, topic, partition)] = offset
 
         return consumer_offsets, topics
 
-    def _get_consumer_offsets(self, client, consumer_group, topic_partitions, coord_id=None):
+    def _get_topic_partitions(self, client, topic_partitions):
         tps = defaultdict(set)
         for topic, partitions in iteritems(topic_partitions):
             if len(partitions) == 0:
                 partitions = client.cluster.available_partitions_for_topic(topic)
+                if partitions is None:
+                    self.log.warning("Unable to find the partitions of topic %s, is it known by kafka?", topic)
+                    partitions = ()
             tps[topic] = tps[text_type(topic)].union(set(partitions))
-
-        consumer_offsets = {}
-        if coord_id is not None and coord_id >= 0:
-            broker_ids = [coord_id]
-        else:
-            broker_ids = [b.nodeId for b in client.cluster.brokers()]
-
-        for broker_id in broker_ids:
-            # Kafka protocol uses OffsetFetchRequests to retrieve consumer offsets:
-            # https://kafka.apache.org/protocol#The_Messages_OffsetFetch
-            # https://cwiki.apache.org/confluence/display/KAFKA/A+Guide+To+The+Kafka+Protocol#AGuideToTheKafkaProtocol-OffsetFetchRequest
-            request = OffsetFetchRequest[1](consumer_group, list(iteritems(tps)))
-            response = self._make_blocking_req(client, request, node_id=broker_id)
-            for (topic, partition_offsets) in response.topics:
-                for partition, offset, _, error_code in partition_offsets:
-                    if error_code != 0:
-                        continue
-                    consumer_offsets[(topic, partition)] = offset
-
-        return consumer_offsets
+        return tps
 
     def _should_zk(self, zk_hosts_ports, interval, kafka_collect=False):
         if not kafka_collect or not interval:
@@ -533,7 +678,7 @@ class LegacyKafkaCheck_0_10_2(AgentCheck):
 
         should_zk = False
         if now - last >= interval:
-            self._zk_last_ts[zk_hosts_ports_hash] = last
+            self._zk_last_ts[zk_hosts_ports_hash] = now
             should_zk = True
 
         return should_zk
@@ -0,0 +1,130 @@
+# (C) Datadog, Inc. 2019
+# All rights reserved
+# Licensed under Simplified BSD License (see LICENSE)
+import mock
+import pytest
+from kazoo.exceptions import NoNodeError
+
+from datadog_checks.base.utils.containers import hash_mutable
+from datadog_checks.kafka_consumer.legacy_0_10_2 import LegacyKafkaCheck_0_10_2
+
+pytestmark = pytest.mark.unit
+
+
+class FakeAsyncResult(object):
+    def __init__(self, value):
+        self.value = value
+
+    def get(self, timeout=None):
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+
+class FakeZKClient(object):
+    """
+    In memory Zookeeper tree, keeps track of the reads waiting for a response.
+    """
+
+    connected = True
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _read(self, value):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        result = FakeAsyncResult(value)
+        get = result.get
+
+        def done(timeout=None):
+            self.in_flight -= 1
+            return get(timeout)
+
+        result.get = done
+        return result
+
+    def get_async(self, path):
+        if path not in self.nodes:
+            return self._read(NoNodeError())
+        return self._read((self.nodes[path], None))
+
+    def get_children(self, path):
+        prefix = path.rstrip('/') + '/'
+        return sorted({p[len(prefix) :].split('/')[0] for p in self.nodes if p.startswith(prefix)})
+
+    def get_children_async(self, path):
+        children = self.get_children(path)
+        if not children:
+            return self._read(NoNodeError())
+        return self._read(children)
+
+
+@pytest.fixture
+def zk_nodes():
+    nodes = {}
+    for group in ('group1', 'group2'):
+        for partition in range(50):
+            nodes['/consumers/{}/offsets/marvel/{}/'.format(group, partition)] = str(partition * 10)
+    nodes['/consumers/group2/offsets/dc/0/'] = '5'
+    return nodes
+
+
+def test_zk_consumer_offsets_discovery(zk_nodes):
+    check = LegacyKafkaCheck_0_10_2('kafka_consumer', {'zk_max_in_flight': 8}, [{}])
+    zk_conn = FakeZKClient(zk_nodes)
+    check.zk_clients[hash_mutable('localhost:2181')] = zk_conn
+
+    offsets, consumer_groups = check._get_zk_consumer_offsets('localhost:2181')
+
+    assert len(offsets) == 101
+    assert offsets[('group1', 'marvel', 49)] == 490
+    assert offsets[('group2', 'dc', 0)] == 5
+    assert sorted(consumer_groups['group2']) == ['dc', 'marvel']
+    assert zk_conn.max_in_flight == 8
+    assert zk_conn.in_flight == 0
+
+
+def test_zk_consumer_offsets_explicit_groups(zk_nodes):
+    check = LegacyKafkaCheck_0_10_2('kafka_consumer', {}, [{}])
+    zk_conn = FakeZKClient(zk_nodes)
+    check.zk_clients[hash_mutable('localhost:2181')] = zk_conn
+
+    offsets, _ = check._get_zk_consumer_offsets(
+        'localhost:2181', {'group1': {'marvel': [1, 1, 2, 99]}, 'group2': {'unknown': None}}
+    )
+
+    # Missing nodes are skipped
+    assert offsets == {('group1', 'marvel', 1): 10, ('group1', 'marvel', 2): 20}
+
+
+def test_kafka_consumer_offsets_group_errors():
+    check = LegacyKafkaCheck_0_10_2('kafka_consumer', {}, [{}])
+    partitions = {'marvel': {0, 1}, 'unknown': None}
+
+    def available_partitions_for_topic(topic):
+        if topic == 'broken':
+            raise Exception('broken topic')
+        return partitions[topic]
+
+    cli = mock.MagicMock()
+    cli.cluster.available_partitions_for_topic.side_effect = available_partitions_for_topic
+    cli.cluster.brokers.return_value = []
+    future = mock.MagicMock()
+    future.succeeded.return_value = True
+    future.value.topics = [('marvel', [(0, 5, '', 0), (1, 7, '', 0)])]
+    check._get_kafka_client = mock.MagicMock(return_value=cli)
+    check._get_group_coordinators = mock.MagicMock(return_value={'group1': 0, 'group2': 0, 'group3': 0})
+    check._make_parallel_reqs = mock.MagicMock(return_value=[future, future])
+
+    offsets, topics = check._get_kafka_consumer_offsets(
+        {}, {'group1': {'marvel': []}, 'group2': {'broken': []}, 'group3': {'unknown': []}}
+    )
+
+    # The broken group is skipped, the unknown topic has no partitions
+    requests = check._make_parallel_reqs.call_args[0][1]
+    assert sorted(request.consumer_group for _, request in requests) == ['group1', 'group3']
+    assert [request.topics for _, request in requests if request.consumer_group == 'group3'] == [[('unknown', set())]]
+    assert offsets[('group1', 'marvel', 1)] == 7
@@ -13,7 +13,7 @@ from six.moves.urllib.parse import urlparse
 
 from datadog_checks.base.utils.tagging import tagger
 
-from .common import get_pod_by_uid, is_static_pending_pod, tags_for_docker, tags_for_pod
+from .common import is_static_pending_pod, tags_for_docker, tags_for_pod
 
 """kubernetes check
 Collects metrics from cAdvisor instance
@@ -151,7 +151,7 @@ class CadvisorScraper(object):
 
         # FIXME we are forced to do that because the Kubelet PodList isn't updated
         # for static pods, see https://github.com/kubernetes/kubernetes/pull/59948
-        pod = get_pod_by_uid(pod_uid, pod_list)
+        pod = pod_list_utils.get_pod_by_uid(pod_uid)
         if pod is not None and is_static_pending_pod(pod):
             in_static_pod = True
 
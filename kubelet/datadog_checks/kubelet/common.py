@@ -2,6 +2,8 @@
 # All rights reserved
 # Licensed under Simplified BSD License (see LICENSE)
 
+from six import iteritems
+
 from datadog_checks.base.utils.tagging import tagger
 
 try:
@@ -74,48 +76,148 @@ def is_static_pending_pod(pod):
         return False
 
 
+def _pod_signature(pod):
+    """
+    Everything PodListUtils indexes about a pod, the pod must be indexed again when it changes.
+    The resourceVersion alone is not enough: the Kubelet updates the status of its pods locally.
+    """
+    metadata = pod.get("metadata", {})
+    pod_status = pod.get("status", {})
+    return (
+        metadata.get("resourceVersion"),
+        metadata.get("namespace"),
+        metadata.get("name"),
+        metadata.get("annotations", {}).get("kubernetes.io/config.source"),
+        pod_status.get("phase"),
+        "containerStatuses" in pod_status,
+        tuple(
+            (ctr.get('containerID'), ctr.get('name'), ctr.get('image'))
+            for ctr in pod_status.get('containerStatuses', [])
+        ),
+    )
+
+
 class PodListUtils(object):
     """
     Queries the podlist and the agent6's filtering logic to determine whether to
     send metrics for a given container.
     Results and podlist are cached between calls to avoid the repeated python-go switching
     cost (filter called once per prometheus metric), hence the PodListUtils object MUST
-    be re-created at every check run.
+    be updated with the new podlist at every check run.
+
+    The pods are indexed by uid and by (namespace, name), their containers by id and by
+    (namespace, pod name, container name). When updated, only the pods that changed since
+    the previous podlist are indexed again, and the filtering results of the containers
+    that are still running are kept.
 
     Containers that are part of a static pod are not filtered, as we cannot curently
     reliably determine their image name to pass to the filtering logic.
     """
 
     def __init__(self, podlist):
+        self.pods = {}
         self.containers = {}
         self.static_pod_uids = set()
         self.cache = {}
         self.pod_uid_by_name_tuple = {}
         self.container_id_by_name_tuple = {}
 
-        if podlist is None:
-            return
+        # uid --> (signature, name_tuple, container ids, container name tuples)
+        self._pod_entries = {}
+
+        self.update(podlist)
 
-        pods = podlist.get('items') or []
+    def update(self, podlist):
+        """
+        Index the pods of a new podlist, the pods that are unchanged since the previous
+        podlist keep their entries.
+
+        :param podlist: podlist dict object
+        """
+        pods = (podlist or {}).get('items') or []
 
+        seen = set()
         for pod in pods:
-            metadata = pod.get("metadata", {})
-            uid = metadata.get("uid")
-            namespace = metadata.get("namespace")
-            pod_name = metadata.get("name")
-            self.pod_uid_by_name_tuple[(namespace, pod_name)] = uid
-
-            # FIXME we are forced to do that because the Kubelet PodList isn't updated
-            # for static pods, see https://github.com/kubernetes/kubernetes/pull/59948
-            if is_static_pending_pod(pod):
-                self.static_pod_uids.add(uid)
-
-            for ctr in pod.get('status', {}).get('containerStatuses', []):
-                cid = ctr.get('containerID')
-                if not cid:
+            uid = pod.get("metadata", {}).get("uid")
+            seen.add(uid)
+            # The content of the pod is read from the latest podlist even if it is unchanged
+            self.pods[uid] = pod
+
+            signature = _pod_signature(pod)
+            entry = self._pod_entries.get(uid)
+            if entry is not None:
+                if entry[0] == signature:
                     continue
-                self.containers[cid] = ctr
-                self.container_id_by_name_tuple[(namespace, pod_name, ctr.get('name'))] = cid
+                self._remove_pod(uid)
+            self._add_pod(uid, pod, signature)
+
+        for uid in set(self._pod_entries) - seen:
+            self._remove_pod(uid)
+            self.pods.pop(uid, None)
+
+        # Only keep the filtering results of known containers, system slices are cheap to filter again
+        self.cache = {cid: excluded for cid, excluded in iteritems(self.cache) if cid in self.containers}
+
+    def _add_pod(self, uid, pod, signature):
+        metadata = pod.get("metadata", {})
+        namespace = metadata.get("namespace")
+        pod_name = metadata.get("name")
+        name_tuple = (namespace, pod_name)
+        self.pod_uid_by_name_tuple[name_tuple] = uid
+
+        # FIXME we are forced to do that because the Kubelet PodList isn't updated
+        # for static pods, see https://github.com/kubernetes/kubernetes/pull/59948
+        if is_static_pending_pod(pod):
+            self.static_pod_uids.add(uid)
+
+        cids = []
+        ctr_name_tuples = []
+        for ctr in pod.get('status', {}).get('containerStatuses', []):
+            cid = ctr.get('containerID')
+            if not cid:
+                continue
+            ctr_name_tuple = (namespace, pod_name, ctr.get('name'))
+            self.containers[cid] = ctr
+            self.container_id_by_name_tuple[ctr_name_tuple] = cid
+            cids.append(cid)
+            ctr_name_tuples.append(ctr_name_tuple)
+
+        self._pod_entries[uid] = (signature, name_tuple, cids, ctr_name_tuples)
+
+    def _remove_pod(self, uid):
+        _, name_tuple, cids, ctr_name_tuples = self._pod_entries.pop(uid)
+        # Another pod may have taken the same name since then
+        if self.pod_uid_by_name_tuple.get(name_tuple) == uid:
+            del self.pod_uid_by_name_tuple[name_tuple]
+        self.static_pod_uids.discard(uid)
+
+        for cid in cids:
+            self.containers.pop(cid, None)
+        for ctr_name_tuple in ctr_name_tuples:
+            if self.container_id_by_name_tuple.get(ctr_name_tuple) in cids:
+                del self.container_id_by_name_tuple[ctr_name_tuple]
+
+    def get_pod_by_uid(self, uid):
+        """
+        Get the pod from its uid
+
+        :param uid: pod uid
+        :return: pod dict object or None
+        """
+        return self.pods.get(uid)
+
+    def is_host_networked(self, uid):
+        """
+        Return if the pod is on host Network
+        Return False if the Pod isn't in the pod list
+
+        :param uid: pod uid
+        :return: bool
+        """
+        pod = self.pods.get(uid)
+        if pod is None:
+            return False
+        return pod.get('spec', {}).get('hostNetwork', False)
 
     def get_uid_by_name_tuple(self, name_tuple):
         """
@@ -136,6 +136,10 @@ class KubeletCheck(CadvisorPrometheusScraperMixin, OpenMetricsBaseCheck, Cadviso
 
         self.kubelet_scraper_config = self.get_scraper_config(kubelet_instance)
 
+        self.pod_list = None
+        # Kept between runs, updated with the pods that changed at each run
+        self.pod_list_utils = None
+
     def _create_kubelet_prometheus_instance(self, instance):
         """
         Create a copy of the instance and set default values.
@@ -214,7 +218,10 @@ class KubeletCheck(CadvisorPrometheusScraperMixin, OpenMetricsBaseCheck, Cadviso
             self.log.debug('cAdvisor not found, running in prometheus mode: %s' % str(e))
 
         self.pod_list = self.retrieve_pod_list()
-        self.pod_list_utils = PodListUtils(self.pod_list)
+        if self.pod_list_utils is None:
+            self.pod_list_utils = PodListUtils(self.pod_list)
+        else:
+            self.pod_list_utils.update(self.pod_list)
 
         self._report_node_metrics(self.instance_tags)
         self._report_pods_running(self.pod_list, self.instance_tags)
@@ -232,9 +239,8 @@ class KubeletCheck(CadvisorPrometheusScraperMixin, OpenMetricsBaseCheck, Cadviso
             self.log.debug('processing kubelet metrics')
             self.process(self.kubelet_scraper_config)
 
-        # Free up memory
+        # Only needed during the run, `pod_list_utils` keeps the pods it indexed to update them at the next run
         self.pod_list = None
-        self.pod_list_utils = None
 
     def perform_kubelet_query(self, url, verbose=True, timeout=10, stream=False):
         """
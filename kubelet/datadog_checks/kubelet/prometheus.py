@@ -10,7 +10,7 @@ from six import iteritems
 from datadog_checks.base.utils.tagging import tagger
 from datadog_checks.checks.openmetrics import OpenMetricsBaseCheck
 
-from .common import get_pod_by_uid, is_static_pending_pod
+from .common import is_static_pending_pod
 
 METRIC_TYPES = ['counter', 'gauge', 'summary']
 
@@ -205,10 +205,7 @@ class CadvisorPrometheusScraperMixin(object):
         :param pod_uid: str
         :return: bool
         """
-        for pod in self.pod_list['items']:
-            if pod.get('metadata', {}).get('uid', '') == pod_uid:
-                return pod.get('spec', {}).get('hostNetwork', False)
-        return False
+        return self.pod_list_utils.is_host_networked(pod_uid)
 
     def _get_pod_by_metric_label(self, labels):
         """
@@ -216,7 +213,7 @@ class CadvisorPrometheusScraperMixin(object):
         :return:
         """
         pod_uid = self._get_pod_uid(labels)
-        return get_pod_by_uid(pod_uid, self.pod_list)
+        return self.pod_list_utils.get_pod_by_uid(pod_uid)
 
     @staticmethod
     def _get_kube_container_name(labels):
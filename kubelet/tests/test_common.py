@@ -175,3 +175,66 @@ def test_credentials_token_noverify():
     assert scraper_config['ssl_cert'] is None
     assert scraper_config['ssl_private_key'] is None
     assert scraper_config['extra_headers'] == {}
+
+
+def test_pod_list_utils_indexes():
+    podlist = json.loads(mock_from_file('pods.json'))
+    pod_list_utils = PodListUtils(podlist)
+
+    pod = pod_list_utils.get_pod_by_uid("260c2b1d43b094af6d6b4ccba082c2db")
+    assert pod is not None
+    assert pod["metadata"]["name"] == "kube-proxy-gke-haissam-default-pool-be5066f1-wnvn"
+    assert pod_list_utils.get_pod_by_uid("unknown") is None
+
+    assert pod_list_utils.is_host_networked("260c2b1d43b094af6d6b4ccba082c2db") is True
+    assert pod_list_utils.is_host_networked("2edfd4d9-10ce-11e8-bd5a-42010af00137") is False
+    assert pod_list_utils.is_host_networked("unknown") is False
+
+
+def test_pod_list_utils_update(monkeypatch):
+    is_excluded = mock.Mock(return_value=False)
+    monkeypatch.setattr('datadog_checks.kubelet.common.is_excluded', is_excluded)
+
+    podlist = json.loads(mock_from_file('pods.json'))
+    pod_list_utils = PodListUtils(podlist)
+    cid = "docker://5741ed2471c0e458b6b95db40ba05d1a5ee168256638a0264f08703e48d76561"
+    assert pod_list_utils.is_excluded(cid) is False
+    assert is_excluded.call_count == 1
+
+    # Same pods: the filtering results are kept
+    pod_list_utils.update(json.loads(mock_from_file('pods.json')))
+    assert pod_list_utils.is_excluded(cid) is False
+    assert is_excluded.call_count == 1
+
+    # The container restarted with a new id, the fluentd pod is indexed again
+    podlist = json.loads(mock_from_file('pods.json'))
+    fluentd = [p for p in podlist['items'] if p['metadata']['uid'] == "2edfd4d9-10ce-11e8-bd5a-42010af00137"][0]
+    for ctr in fluentd['status']['containerStatuses']:
+        if ctr['containerID'] == cid:
+            ctr['containerID'] = "docker://restarted"
+    pod_list_utils.update(podlist)
+
+    assert cid not in pod_list_utils.containers
+    assert cid not in pod_list_utils.cache
+    assert "docker://restarted" in pod_list_utils.containers
+    assert (
+        pod_list_utils.get_cid_by_name_tuple(
+            (fluentd['metadata']['namespace'], fluentd['metadata']['name'], 'fluentd-gcp')
+        )
+        == "docker://restarted"
+    )
+    assert pod_list_utils.get_pod_by_uid("2edfd4d9-10ce-11e8-bd5a-42010af00137") is fluentd
+
+    # The pod is gone
+    podlist['items'].remove(fluentd)
+    pod_list_utils.update(podlist)
+    assert pod_list_utils.get_pod_by_uid("2edfd4d9-10ce-11e8-bd5a-42010af00137") is None
+    assert pod_list_utils.get_uid_by_name_tuple((fluentd['metadata']['namespace'], fluentd['metadata']['name'])) is None
+    assert "docker://restarted" not in pod_list_utils.containers
+
+    # Results match a PodListUtils built from scratch
+    fresh = PodListUtils(podlist)
+    assert fresh.containers == pod_list_utils.containers
+    assert fresh.pod_uid_by_name_tuple == pod_list_utils.pod_uid_by_name_tuple
+    assert fresh.container_id_by_name_tuple == pod_list_utils.container_id_by_name_tuple
+    assert fresh.static_pod_uids == pod_list_utils.static_pod_uids
@@ -47,9 +47,13 @@ from simplejson import JSONDecodeError
 from six import iteritems, itervalues
 from six.moves.urllib.parse import urljoin, urlsplit, urlunsplit
 
+from datadog_checks.base.utils.concurrency import ThreadPoolMapper
 from datadog_checks.checks import AgentCheck
 from datadog_checks.config import _is_affirmative
 
+# Number of requests to the application masters running at the same time
+DEFAULT_MAX_CONCURRENT_REQUESTS = 1
+
 
 class MapReduceCheck(AgentCheck):
     # Default Settings
@@ -100,6 +104,12 @@ class MapReduceCheck(AgentCheck):
         'totalCounterValue': ('mapreduce.job.counter.total_counter_value', INCREMENT),
     }
 
+    # Fields of a job changing whenever tasks are added to it
+    MAPREDUCE_JOB_TASKS_TOTAL_FIELDS = ('mapsTotal', 'reducesTotal')
+
+    # States of the tasks that won't change anymore
+    MAPREDUCE_TASK_FINISHED_STATES = ('SUCCEEDED', 'FAILED', 'KILLED')
+
     MAPREDUCE_MAP_TASK_METRICS = {'elapsedTime': ('mapreduce.job.map.task.elapsed_time', HISTOGRAM)}
 
     MAPREDUCE_REDUCE_TASK_METRICS = {'elapsedTime': ('mapreduce.job.reduce.task.elapsed_time', HISTOGRAM)}
@@ -113,6 +123,19 @@ class MapReduceCheck(AgentCheck):
         # Parse job specific counters
         self.job_specific_counters = self._parse_job_specific_counters(init_config)
 
+        # Connections are kept open across runs
+        self.session = requests.Session()
+
+        # Runs the requests to the application masters concurrently
+        self._mapper = ThreadPoolMapper()
+
+        # Tasks of each job: {job_id: {'tasks_total': tasks_total, 'tasks': {task_id: task_metrics}}}
+        self._tasks_by_job = {}
+
+    def stop(self):
+        self._mapper.terminate()
+        self.session.close()
+
     def check(self, instance):
         # Get properties from conf file
         rm_address = instance.get('resourcemanager_uri')
@@ -157,14 +180,14 @@ class MapReduceCheck(AgentCheck):
         )
 
         # Get the applications from the application master
-        running_jobs = self._mapreduce_job_metrics(running_apps, auth, ssl_verify, tags)
+        running_jobs = self._mapreduce_job_metrics(instance, running_apps, auth, ssl_verify, tags)
 
         # # Get job counter metrics
-        self._mapreduce_job_counters_metrics(running_jobs, auth, ssl_verify, tags)
+        self._mapreduce_job_counters_metrics(instance, running_jobs, auth, ssl_verify, tags)
 
         # Get task metrics
         if collect_task_metrics:
-            self._mapreduce_task_metrics(running_jobs, auth, ssl_verify, tags)
+            self._mapreduce_task_metrics(instance, running_jobs, auth, ssl_verify, tags)
 
         # Report success after gathering all metrics from Application Master
         if running_jobs:
@@ -272,6 +295,14 @@ class MapReduceCheck(AgentCheck):
 
         return job_counter
 
+    def _map_concurrently(self, instance, func, items):
+        """
+        Call `func` on every item, with at most `max_concurrent_requests` calls running at the same time.
+        Return the list of (item, result, exception), see `ThreadPoolMapper`.
+        """
+        size = instance.get('max_concurrent_requests', DEFAULT_MAX_CONCURRENT_REQUESTS)
+        return self._mapper.map(func, items, size=size, key=instance.get('resourcemanager_uri'))
+
     def _get_running_app_ids(self, rm_address, auth, ssl_verify):
         """
         Return a dictionary of {app_id: (app_name, tracking_url)} for the running MapReduce applications
@@ -301,7 +332,7 @@ class MapReduceCheck(AgentCheck):
 
         return running_apps
 
-    def _mapreduce_job_metrics(self, running_apps, auth, ssl_verify, addl_tags):
+    def _mapreduce_job_metrics(self, instance, running_apps, auth, ssl_verify, addl_tags):
         """
         Get metrics for each MapReduce job.
         Return a dictionary for each MapReduce job
@@ -310,17 +341,25 @@ class MapReduceCheck(AgentCheck):
             'job_name': job_name,
             'app_name': app_name,
             'user_name': user_name,
-            'tracking_url': tracking_url
+            'tracking_url': tracking_url,
+            'tasks_total': the values of MAPREDUCE_JOB_TASKS_TOTAL_FIELDS
         }
         """
-        running_jobs = {}
 
-        for app_name, tracking_url in itervalues(running_apps):
-
-            metrics_json = self._rest_request_to_json(
+        def get_jobs(app):
+            app_name, tracking_url = app
+            return self._rest_request_to_json(
                 tracking_url, auth, ssl_verify, self.MAPREDUCE_JOBS_PATH, self.MAPREDUCE_SERVICE_CHECK
             )
 
+        running_jobs = {}
+
+        for (app_name, tracking_url), metrics_json, e in self._map_concurrently(
+            instance, get_jobs, list(itervalues(running_apps))
+        ):
+            if e is not None:
+                raise e
+
             if metrics_json.get('jobs'):
                 if metrics_json['jobs'].get('job'):
 
@@ -337,6 +376,9 @@ class MapReduceCheck(AgentCheck):
                                 'app_name': str(app_name),
                                 'user_name': str(user_name),
                                 'tracking_url': self._join_url_dir(tracking_url, self.MAPREDUCE_JOBS_PATH, job_id),
+                                'tasks_total': tuple(
+                                    job_json.get(field) for field in self.MAPREDUCE_JOB_TASKS_TOTAL_FIELDS
+                                ),
                             }
 
                             tags = [
@@ -351,97 +393,161 @@ class MapReduceCheck(AgentCheck):
 
         return running_jobs
 
-    def _mapreduce_job_counters_metrics(self, running_jobs, auth, ssl_verify, addl_tags):
+    def _mapreduce_job_counters_metrics(self, instance, running_jobs, auth, ssl_verify, addl_tags):
         """
         Get custom metrics specified for each counter
         """
-        for job_metrics in itervalues(running_jobs):
-            job_name = job_metrics['job_name']
 
-            # Check if the job_name exist in the custom metrics
-            if self.general_counters or (job_name in self.job_specific_counters):
-                job_specific_metrics = self.job_specific_counters.get(job_name)
+        def get_counters(job_metrics):
+            return self._rest_request_to_json(
+                job_metrics['tracking_url'], auth, ssl_verify, 'counters', self.MAPREDUCE_SERVICE_CHECK, tags=addl_tags
+            )
 
-                metrics_json = self._rest_request_to_json(
-                    job_metrics['tracking_url'],
-                    auth,
-                    ssl_verify,
-                    'counters',
-                    self.MAPREDUCE_SERVICE_CHECK,
-                    tags=addl_tags,
-                )
+        # Only the jobs whose name exist in the custom metrics
+        jobs = [
+            job_metrics
+            for job_metrics in itervalues(running_jobs)
+            if self.general_counters or job_metrics['job_name'] in self.job_specific_counters
+        ]
+
+        for job_metrics, metrics_json, e in self._map_concurrently(instance, get_counters, jobs):
+            if e is not None:
+                raise e
+
+            job_name = job_metrics['job_name']
+            job_specific_metrics = self.job_specific_counters.get(job_name)
 
-                if metrics_json.get('jobCounters'):
-                    if metrics_json['jobCounters'].get('counterGroup'):
+            if metrics_json.get('jobCounters'):
+                if metrics_json['jobCounters'].get('counterGroup'):
 
-                        # Cycle through all the counter groups for this job
-                        for counter_group in metrics_json['jobCounters']['counterGroup']:
-                            group_name = counter_group.get('counterGroupName')
+                    # Cycle through all the counter groups for this job
+                    for counter_group in metrics_json['jobCounters']['counterGroup']:
+                        group_name = counter_group.get('counterGroupName')
 
-                            if group_name:
-                                counter_metrics = set([])
+                        if group_name:
+                            counter_metrics = set([])
 
-                                # Add any counters in the job specific metrics
-                                if job_specific_metrics and group_name in job_specific_metrics:
-                                    counter_metrics = counter_metrics.union(job_specific_metrics[group_name])
+                            # Add any counters in the job specific metrics
+                            if job_specific_metrics and group_name in job_specific_metrics:
+                                counter_metrics = counter_metrics.union(job_specific_metrics[group_name])
 
-                                # Add any counters in the general metrics
-                                if group_name in self.general_counters:
-                                    counter_metrics = counter_metrics.union(self.general_counters[group_name])
+                            # Add any counters in the general metrics
+                            if group_name in self.general_counters:
+                                counter_metrics = counter_metrics.union(self.general_counters[group_name])
 
-                                if counter_metrics:
-                                    # Cycle through all the counters in this counter group
-                                    if counter_group.get('counter'):
-                                        for counter in counter_group['counter']:
-                                            counter_name = counter.get('name')
+                            if counter_metrics:
+                                # Cycle through all the counters in this counter group
+                                if counter_group.get('counter'):
+                                    for counter in counter_group['counter']:
+                                        counter_name = counter.get('name')
 
-                                            # Check if the counter name is in the custom metrics for this group name
-                                            if counter_name and counter_name in counter_metrics:
-                                                tags = [
-                                                    'app_name:' + job_metrics.get('app_name'),
-                                                    'user_name:' + job_metrics.get('user_name'),
-                                                    'job_name:' + job_name,
-                                                    'counter_name:' + str(counter_name).lower(),
-                                                ]
+                                        # Check if the counter name is in the custom metrics for this group name
+                                        if counter_name and counter_name in counter_metrics:
+                                            tags = [
+                                                'app_name:' + job_metrics.get('app_name'),
+                                                'user_name:' + job_metrics.get('user_name'),
+                                                'job_name:' + job_name,
+                                                'counter_name:' + str(counter_name).lower(),
+                                            ]
 
-                                                tags.extend(addl_tags)
+                                            tags.extend(addl_tags)
 
-                                                self._set_metrics_from_json(
-                                                    counter, self.MAPREDUCE_JOB_COUNTER_METRICS, tags
-                                                )
+                                            self._set_metrics_from_json(
+                                                counter, self.MAPREDUCE_JOB_COUNTER_METRICS, tags
+                                            )
 
-    def _mapreduce_task_metrics(self, running_jobs, auth, ssl_verify, addl_tags):
+    def _mapreduce_task_metrics(self, instance, running_jobs, auth, ssl_verify, addl_tags):
         """
         Get metrics for each MapReduce task
-        Return a dictionary of {task_id: 'tracking_url'} for each MapReduce task
+
+        The tasks of a job are only listed again when tasks were added to the job since the last listing,
+        otherwise only the tasks that were not finished are fetched again, one by one.
         """
-        for job_stats in itervalues(running_jobs):
+
+        def task_metrics(task):
+            # Only keep what is needed to submit the metrics of the task later
+            metrics = {'type': task.get('type'), 'state': task.get('state')}
+            for status in self.MAPREDUCE_MAP_TASK_METRICS:
+                metrics[status] = task.get(status)
+            for status in self.MAPREDUCE_REDUCE_TASK_METRICS:
+                metrics[status] = task.get(status)
+            return metrics
+
+        def get_tasks(request):
+            job_id, task_id = request
+            if task_id is None:
+                metrics_json = self._rest_request_to_json(
+                    running_jobs[job_id]['tracking_url'],
+                    auth,
+                    ssl_verify,
+                    'tasks',
+                    self.MAPREDUCE_SERVICE_CHECK,
+                    tags=addl_tags,
+                )
+                if metrics_json.get('tasks'):
+                    return metrics_json['tasks'].get('task') or []
+                return []
 
             metrics_json = self._rest_request_to_json(
-                job_stats['tracking_url'], auth, ssl_verify, 'tasks', self.MAPREDUCE_SERVICE_CHECK, tags=addl_tags
+                running_jobs[job_id]['tracking_url'],
+                auth,
+                ssl_verify,
+                'tasks',
+                self.MAPREDUCE_SERVICE_CHECK,
+                addl_tags,
+                task_id,
             )
+            if metrics_json.get('task'):
+                return [metrics_json['task']]
+            return []
+
+        # Forget the jobs that are not running anymore
+        for job_id in list(self._tasks_by_job):
+            if job_id not in running_jobs:
+                del self._tasks_by_job[job_id]
+
+        # A task ID of None lists all the tasks of the job
+        task_requests = []
+        for job_id, job_stats in iteritems(running_jobs):
+            job_tasks = self._tasks_by_job.get(job_id)
+            if job_tasks is None or job_tasks['tasks_total'] != job_stats['tasks_total']:
+                task_requests.append((job_id, None))
+            else:
+                task_requests.extend(
+                    (job_id, task_id)
+                    for task_id, task in iteritems(job_tasks['tasks'])
+                    if task['state'] not in self.MAPREDUCE_TASK_FINISHED_STATES
+                )
 
-            if metrics_json.get('tasks'):
-                if metrics_json['tasks'].get('task'):
+        for (job_id, task_id), tasks, e in self._map_concurrently(instance, get_tasks, task_requests):
+            if e is not None:
+                raise e
+            if task_id is None:
+                self._tasks_by_job[job_id] = {'tasks_total': running_jobs[job_id]['tasks_total'], 'tasks': {}}
+            for task in tasks:
+                task_id = task.get('id')
+                if task_id:
+                    self._tasks_by_job[job_id]['tasks'][task_id] = task_metrics(task)
 
-                    for task in metrics_json['tasks']['task']:
-                        task_type = task.get('type')
+        for job_id, job_stats in iteritems(running_jobs):
+            for task in itervalues(self._tasks_by_job[job_id]['tasks']):
+                task_type = task.get('type')
 
-                        if task_type:
-                            tags = [
-                                'app_name:' + job_stats['app_name'],
-                                'user_name:' + job_stats['user_name'],
-                                'job_name:' + job_stats['job_name'],
-                                'task_type:' + str(task_type).lower(),
-                            ]
+                if task_type:
+                    tags = [
+                        'app_name:' + job_stats['app_name'],
+                        'user_name:' + job_stats['user_name'],
+                        'job_name:' + job_stats['job_name'],
+                        'task_type:' + str(task_type).lower(),
+                    ]
 
-                            tags.extend(addl_tags)
+                    tags.extend(addl_tags)
 
-                            if task_type == 'MAP':
-                                self._set_metrics_from_json(task, self.MAPREDUCE_MAP_TASK_METRICS, tags)
+                    if task_type == 'MAP':
+                        self._set_metrics_from_json(task, self.MAPREDUCE_MAP_TASK_METRICS, tags)
 
-                            elif task_type == 'REDUCE':
-                                self._set_metrics_from_json(task, self.MAPREDUCE_REDUCE_TASK_METRICS, tags)
+                    elif task_type == 'REDUCE':
+                        self._set_metrics_from_json(task, self.MAPREDUCE_REDUCE_TASK_METRICS, tags)
 
     def _set_metrics_from_json(self, metrics_json, metrics, tags):
         """
@@ -491,7 +597,9 @@ class MapReduceCheck(AgentCheck):
             url = urljoin(url, '?' + query)
 
         try:
-            response = requests.get(url, auth=auth, verify=ssl_verify, timeout=self.default_integration_http_timeout)
+            response = self.session.get(
+                url, auth=auth, verify=ssl_verify, timeout=self.default_integration_http_timeout
+            )
             response.raise_for_status()
             response_json = response.json()
 
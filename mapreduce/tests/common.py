@@ -16,6 +16,7 @@ JOB_ID = 'job_1453738555560_0001'
 JOB_NAME = 'WordCount'
 USER_NAME = 'vagrant'
 TASK_ID = 'task_1453738555560_0001_m_000000'
+REDUCE_TASK_ID = 'task_1453738555560_0001_r_000000'
 CLUSTER_NAME = 'MapReduceCluster'
 
 # Resource manager URI
@@ -28,6 +29,8 @@ YARN_APPS_URL_BASE = '{}/{}'.format(RM_URI, MapReduceCheck.YARN_APPS_PATH)
 MR_JOBS_URL = '{}/proxy/{}/{}'.format(RM_URI, APP_ID, MapReduceCheck.MAPREDUCE_JOBS_PATH)
 MR_JOB_COUNTERS_URL = '{}/{}/{}'.format(MR_JOBS_URL, JOB_ID, 'counters')
 MR_TASKS_URL = '{}/{}/{}'.format(MR_JOBS_URL, JOB_ID, 'tasks')
+MR_MAP_TASK_URL = '{}/{}'.format(MR_TASKS_URL, TASK_ID)
+MR_REDUCE_TASK_URL = '{}/{}'.format(MR_TASKS_URL, REDUCE_TASK_ID)
 
 TEST_USERNAME = 'admin'
 TEST_PASSWORD = 'password'
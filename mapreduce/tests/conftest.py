@@ -21,6 +21,8 @@ from .common import (
     INSTANCE_INTEGRATION,
     MR_JOB_COUNTERS_URL,
     MR_JOBS_URL,
+    MR_MAP_TASK_URL,
+    MR_REDUCE_TASK_URL,
     MR_TASKS_URL,
     TEST_PASSWORD,
     TEST_USERNAME,
@@ -51,13 +53,13 @@ def instance():
 
 @pytest.fixture
 def mocked_request():
-    with patch("requests.get", new=requests_get_mock):
+    with patch("requests.Session.get", side_effect=requests_get_mock):
         yield
 
 
 @pytest.fixture
 def mocked_auth_request():
-    with patch("requests.get", new=requests_auth_mock):
+    with patch("requests.Session.get", side_effect=requests_auth_mock):
         yield
 
 
@@ -131,6 +133,18 @@ def requests_get_mock(*args, **kwargs):
             body = f.read()
             return MockResponse(body, 200)
 
+    elif url == MR_MAP_TASK_URL:
+        task_metrics_file = os.path.join(HERE, "fixtures", "map_task_metrics")
+        with open(task_metrics_file, "r") as f:
+            body = f.read()
+            return MockResponse(body, 200)
+
+    elif url == MR_REDUCE_TASK_URL:
+        task_metrics_file = os.path.join(HERE, "fixtures", "reduce_task_metrics")
+        with open(task_metrics_file, "r") as f:
+            body = f.read()
+            return MockResponse(body, 200)
+
 
 def requests_auth_mock(*args, **kwargs):
     # Make sure we're passing in authentication
@@ -2,6 +2,7 @@
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
 
+from mock import patch
 from six import iteritems
 
 from datadog_checks.mapreduce import MapReduceCheck
@@ -21,8 +22,12 @@ from .common import (
     MAPREDUCE_REDUCE_TASK_METRIC_VALUES,
     MR_AUTH_CONFIG,
     MR_CONFIG,
+    MR_MAP_TASK_URL,
+    MR_REDUCE_TASK_URL,
+    MR_TASKS_URL,
     RM_URI,
 )
+from .conftest import requests_get_mock
 
 
 def test_check(aggregator, mocked_request):
@@ -106,3 +111,49 @@ def test_auth(aggregator, mocked_auth_request):
     aggregator.assert_service_check(
         MapReduceCheck.MAPREDUCE_SERVICE_CHECK, status=MapReduceCheck.OK, tags=service_check_tags, count=1
     )
+
+
+def test_tasks_listed_on_new_tasks(aggregator):
+    """
+    Test that the tasks of a job are only listed once, then only the tasks not finished are fetched again
+    """
+    instance = dict(MR_CONFIG["instances"][0], max_concurrent_requests=4)
+    mapreduce = MapReduceCheck("mapreduce", INIT_CONFIG, {})
+
+    with patch("requests.Session.get", side_effect=requests_get_mock) as get:
+        try:
+            mapreduce.check(instance)
+            assert [call[0][0] for call in get.call_args_list].count(MR_TASKS_URL) == 1
+
+            # Both tasks were running, the map task has finished since
+            get.reset_mock()
+            aggregator.reset()
+            mapreduce.check(instance)
+            urls = [call[0][0] for call in get.call_args_list]
+            assert MR_TASKS_URL not in urls
+            assert urls.count(MR_MAP_TASK_URL) == 1
+            assert urls.count(MR_REDUCE_TASK_URL) == 1
+
+            # Only the reduce task is still running, the finished map task is still reported
+            get.reset_mock()
+            aggregator.reset()
+            mapreduce.check(instance)
+            urls = [call[0][0] for call in get.call_args_list]
+            assert MR_TASKS_URL not in urls
+            assert MR_MAP_TASK_URL not in urls
+            assert urls.count(MR_REDUCE_TASK_URL) == 1
+        finally:
+            mapreduce.stop()
+
+    aggregator.assert_metric(
+        'mapreduce.job.map.task.elapsed_time',
+        value=99870000,
+        tags=MAPREDUCE_MAP_TASK_METRIC_TAGS + CUSTOM_TAGS,
+        count=1,
+    )
+    aggregator.assert_metric(
+        'mapreduce.job.reduce.task.elapsed_time',
+        value=125956,
+        tags=MAPREDUCE_REDUCE_TASK_METRIC_TAGS + CUSTOM_TAGS,
+        count=1,
+    )
@@ -14,11 +14,17 @@ from six.moves.urllib.parse import unquote_plus, urlsplit
 
 from datadog_checks.base import AgentCheck, is_affirmative
 from datadog_checks.base.utils.common import round_value
+from datadog_checks.base.utils.concurrency import ThreadPoolMapper
+from datadog_checks.base.utils.containers import hash_mutable
+from datadog_checks.base.utils.extractor import PathExtractor
 
 if PY3:
     long = int
 
 DEFAULT_TIMEOUT = 30
+DEFAULT_MAX_CONCURRENT_STATS_COMMANDS = 1
+# seconds, 0 to collect the databases and collections stats at every run
+DEFAULT_STATS_MIN_COLLECTION_INTERVAL = 0
 GAUGE = AgentCheck.gauge
 RATE = AgentCheck.rate
 ALLOWED_CUSTOM_METRICS_TYPES = ['gauge', 'rate', 'count', 'monotonic_count']
@@ -430,10 +436,33 @@ class MongoDb(AgentCheck):
         # List of metrics to collect per instance
         self.metrics_to_collect_by_instance = {}
 
+        # Extractors of the metrics to collect from the server status and from the dbstats, per instance
+        self.metrics_extractors_by_instance = {}
+
+        self.top_metrics_extractor = PathExtractor((m, m) for m in self.TOP_METRICS)
+
         self.collection_metrics_names = []
         for key in self.COLLECTION_METRICS:
             self.collection_metrics_names.append(key.split('.')[1])
 
+        # Clients reused across runs, and the clients already authenticated
+        self._clients = {}
+        self._authenticated_clients = set()
+
+        # Last collection of the databases and collections stats, by server
+        self._last_stats_collection = {}
+
+        # Runs the dbstats and collstats commands concurrently
+        self._mapper = ThreadPoolMapper()
+
+    def stop(self):
+        self._mapper.terminate()
+
+        for client in itervalues(self._clients):
+            client.close()
+        self._clients = {}
+        self._authenticated_clients = set()
+
     @classmethod
     def get_library_versions(cls):
         return {'pymongo': pymongo.version}
@@ -537,6 +566,18 @@ class MongoDb(AgentCheck):
             self.metrics_to_collect_by_instance[instance_key] = self._build_metric_list_to_collect(additional_metrics)
         return self.metrics_to_collect_by_instance[instance_key]
 
+    def _get_metrics_extractors(self, instance_key, metrics_to_collect):
+        """
+        Return the extractors of the metrics to collect from the server status and from the dbstats,
+        the metrics are of the form: x.y.z with z optional and can be found at status[x][y][z]
+        """
+        if instance_key not in self.metrics_extractors_by_instance:
+            self.metrics_extractors_by_instance[instance_key] = (
+                PathExtractor((m, m) for m in metrics_to_collect if not m.startswith('stats')),
+                PathExtractor((m, m) for m in metrics_to_collect if m.startswith('stats.')),
+            )
+        return self.metrics_extractors_by_instance[instance_key]
+
     def _resolve_metric(self, original_metric_name, metrics_to_collect, prefix=""):
         """
         Return the submit method and the metric name to use.
@@ -610,6 +651,49 @@ class MongoDb(AgentCheck):
 
         return authenticated
 
+    def _get_client(self, server, timeout, read_preference, ssl_params, replicaset=None):
+        """
+        Return a client for the server, and the key it is cached with. Creating a client triggers the
+        discovery of the topology of the cluster, the clients are kept across runs.
+        """
+        key = (server, timeout, read_preference.name, replicaset, hash_mutable(ssl_params))
+        if key not in self._clients:
+            options = {}
+            if replicaset is not None:
+                options['replicaset'] = replicaset
+            options.update(ssl_params)
+
+            self._clients[key] = pymongo.mongo_client.MongoClient(
+                server,
+                socketTimeoutMS=timeout,
+                connectTimeoutMS=timeout,
+                serverSelectionTimeoutMS=timeout,
+                read_preference=read_preference,
+                **options
+            )
+        return key, self._clients[key]
+
+    def _map_concurrently(self, instance, func, items):
+        """
+        Call `func` on every item, with at most `max_concurrent_stats_commands` calls running at the same time.
+        Return the list of (item, result, exception), see `ThreadPoolMapper`.
+        """
+        size = instance.get('max_concurrent_stats_commands', DEFAULT_MAX_CONCURRENT_STATS_COMMANDS)
+        return self._mapper.map(func, items, size=size, key=instance.get('server'))
+
+    def _should_collect_stats(self, instance, server, now):
+        """
+        Whether the stats of the databases and the collections are due, they are collected at a slower
+        pace than the server status with `stats_min_collection_interval`. The time of the last collection
+        is only recorded once the stats were collected, with `_set_stats_collected`.
+        """
+        interval = float(instance.get('stats_min_collection_interval', DEFAULT_STATS_MIN_COLLECTION_INTERVAL))
+        last = self._last_stats_collection.get(server)
+        return last is None or now - last >= interval
+
+    def _set_stats_collected(self, server, now):
+        self._last_stats_collection[server] = now
+
     @classmethod
     def _parse_uri(cls, server, sanitize_username=False):
         """
@@ -806,6 +890,7 @@ class MongoDb(AgentCheck):
         # Get the list of metrics to collect
         collect_tcmalloc_metrics = 'tcmalloc' in additional_metrics
         metrics_to_collect = self._get_metrics_to_collect(server, additional_metrics)
+        status_extractor, dbstats_extractor = self._get_metrics_extractors(server, metrics_to_collect)
 
         # Tagging
         tags = instance.get('tags', [])
@@ -830,14 +915,7 @@ class MongoDb(AgentCheck):
 
         timeout = float(instance.get('timeout', DEFAULT_TIMEOUT)) * 1000
         try:
-            cli = pymongo.mongo_client.MongoClient(
-                server,
-                socketTimeoutMS=timeout,
-                connectTimeoutMS=timeout,
-                serverSelectionTimeoutMS=timeout,
-                read_preference=pymongo.ReadPreference.PRIMARY_PREFERRED,
-                **ssl_params
-            )
+            client_key, cli = self._get_client(server, timeout, pymongo.ReadPreference.PRIMARY_PREFERRED, ssl_params)
             # some commands can only go against the admin DB
             admindb = cli['admin']
             db = cli[db_name]
@@ -853,7 +931,8 @@ class MongoDb(AgentCheck):
             self.log.debug(u"A username is required to authenticate to `%s`", server)
             do_auth = False
 
-        if do_auth:
+        # The credentials are kept by the client, and used again when it reconnects
+        if do_auth and client_key not in self._authenticated_clients:
             if auth_source:
                 msg = "authSource was specified in the the server URL: using '%s' as the authentication database"
                 self.log.info(msg, auth_source)
@@ -862,6 +941,7 @@ class MongoDb(AgentCheck):
                 )
             else:
                 self._authenticate(db, username, password, use_x509, clean_server_name, service_check_tags)
+            self._authenticated_clients.add(client_key)
 
         try:
             status = db.command('serverStatus', tcmalloc=collect_tcmalloc_metrics)
@@ -894,17 +974,11 @@ class MongoDb(AgentCheck):
 
                     # need a new connection to deal with replica sets
                     setname = replSet.get('set')
-                    cli_rs = pymongo.mongo_client.MongoClient(
-                        server,
-                        socketTimeoutMS=timeout,
-                        connectTimeoutMS=timeout,
-                        serverSelectionTimeoutMS=timeout,
-                        replicaset=setname,
-                        read_preference=pymongo.ReadPreference.NEAREST,
-                        **ssl_params
+                    client_rs_key, cli_rs = self._get_client(
+                        server, timeout, pymongo.ReadPreference.NEAREST, ssl_params, replicaset=setname
                     )
 
-                    if do_auth:
+                    if do_auth and client_rs_key not in self._authenticated_clients:
                         if auth_source:
                             self._authenticate(
                                 cli_rs[auth_source], username, password, use_x509, server, service_check_tags
@@ -913,6 +987,7 @@ class MongoDb(AgentCheck):
                             self._authenticate(
                                 cli_rs[db_name], username, password, use_x509, server, service_check_tags
                             )
+                        self._authenticated_clients.add(client_rs_key)
 
                     # Replication set information
                     replset_name = replSet['set']
@@ -973,25 +1048,20 @@ class MongoDb(AgentCheck):
         dbnames = cli.database_names()
         self.gauge('mongodb.dbs', len(dbnames), tags=tags)
 
-        for db_n in dbnames:
-            db_aux = cli[db_n]
-            dbstats[db_n] = {'stats': db_aux.command('dbstats')}
+        # The stats of the other databases and of the collections are collected at a slower pace
+        stats_time = time.time()
+        collect_stats = self._should_collect_stats(instance, server, stats_time)
+        if collect_stats:
+            other_dbnames = [db_n for db_n in dbnames if db_n != db_name]
+            for db_n, stats, e in self._map_concurrently(
+                instance, lambda db_n: cli[db_n].command('dbstats'), other_dbnames
+            ):
+                if e is not None:
+                    raise e
+                dbstats[db_n] = {'stats': stats}
 
         # Go through the metrics and save the values
-        for metric_name in metrics_to_collect:
-            # each metric is of the form: x.y.z with z optional
-            # and can be found at status[x][y][z]
-            value = status
-
-            if metric_name.startswith('stats'):
-                continue
-            else:
-                try:
-                    for c in metric_name.split("."):
-                        value = value[c]
-                except KeyError:
-                    continue
-
+        for metric_name, value in status_extractor.extract(status):
             # value is now status[x][y][z]
             if not isinstance(value, (int, long, float)):
                 raise TypeError(
@@ -1005,15 +1075,7 @@ class MongoDb(AgentCheck):
             submit_method(self, metric_name_alias, value, tags=tags)
 
         for st, value in iteritems(dbstats):
-            for metric_name in metrics_to_collect:
-                if not metric_name.startswith('stats.'):
-                    continue
-
-                try:
-                    val = value['stats'][metric_name.split('.')[1]]
-                except KeyError:
-                    continue
-
+            for metric_name, val in dbstats_extractor.extract(value):
                 # value is now status[x][y][z]
                 if not isinstance(val, (int, long, float)):
                     raise TypeError(
@@ -1052,16 +1114,7 @@ class MongoDb(AgentCheck):
                     ns_tags = tags + ["db:%s" % dbname, "collection:%s" % collname]
 
                     # iterate over DBTOP metrics
-                    for m in self.TOP_METRICS:
-                        # each metric is of the form: x.y.z with z optional
-                        # and can be found at ns_metrics[x][y][z]
-                        value = ns_metrics
-                        try:
-                            for c in m.split("."):
-                                value = value[c]
-                        except Exception:
-                            continue
-
+                    for m, value in self.top_metrics_extractor.extract(ns_metrics):
                         # value is now status[x][y][z]
                         if not isinstance(value, (int, long, float)):
                             raise TypeError(
@@ -1127,11 +1180,15 @@ class MongoDb(AgentCheck):
             # Ensure that you're on the right db
             db = cli[db_name]
             # grab the collections from the configutation
-            coll_names = instance.get('collections', [])
+            coll_names = instance.get('collections', []) if collect_stats else []
+            # grab the stats from the collections
+            collstats = self._map_concurrently(
+                instance, lambda coll_name: db.command("collstats", coll_name), coll_names
+            )
             # loop through the collections
-            for coll_name in coll_names:
-                # grab the stats from the collection
-                stats = db.command("collstats", coll_name)
+            for coll_name, stats, e in collstats:
+                if e is not None:
+                    raise e
                 # loop through the metrics
                 for m in self.collection_metrics_names:
                     coll_tags = tags + ["db:%s" % db_name, "collection:%s" % coll_name]
@@ -1154,6 +1211,9 @@ class MongoDb(AgentCheck):
                             'collection.%s' % m, self.COLLECTION_METRICS
                         )
                         submit_method(self, metric_name_alias, value, tags=coll_tags)
+
+            if collect_stats:
+                self._set_stats_collected(server, stats_time)
         except Exception as e:
             self.log.warning(u"Failed to record `collection` metrics.")
             self.log.exception(e)
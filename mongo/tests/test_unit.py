@@ -4,6 +4,7 @@
 import logging
 
 import mock
+import pymongo
 import pytest
 from six import iteritems
 
@@ -147,3 +148,61 @@ def test_server_uri_sanitization(check):
     for server, expected_clean_name in server_names:
         _, _, _, _, clean_name, _ = _parse_uri(server, sanitize_username=True)
         assert expected_clean_name == clean_name
+
+
+@pytest.mark.unit
+def test_get_client(check):
+    """
+    Clients are reused across runs, one per server, read preference, replica set and SSL options.
+    """
+    with mock.patch(
+        'pymongo.mongo_client.MongoClient', side_effect=lambda *args, **kwargs: mock.MagicMock()
+    ) as mongo_client:
+        key, client = check._get_client('mongodb://localhost:27017', 1000, pymongo.ReadPreference.PRIMARY, {})
+        assert check._get_client('mongodb://localhost:27017', 1000, pymongo.ReadPreference.PRIMARY, {}) == (key, client)
+        check._get_client('mongodb://localhost:27017', 1000, pymongo.ReadPreference.NEAREST, {}, replicaset='rs0')
+        check._get_client('mongodb://localhost:27017', 1000, pymongo.ReadPreference.PRIMARY, {'ssl': True})
+        assert mongo_client.call_count == 3
+        assert mongo_client.call_args_list[1][1]['replicaset'] == 'rs0'
+
+        check.stop()
+        assert client.close.call_count == 1
+        assert check._clients == {}
+
+
+@pytest.mark.unit
+def test_should_collect_stats(check):
+    instance = {'server': 'mongodb://localhost:27017', 'stats_min_collection_interval': 60}
+    assert check._should_collect_stats(instance, instance['server'], 1000)
+    # Not recorded until the stats are collected
+    assert check._should_collect_stats(instance, instance['server'], 1030)
+    check._set_stats_collected(instance['server'], 1000)
+    assert not check._should_collect_stats(instance, instance['server'], 1030)
+    assert check._should_collect_stats(instance, instance['server'], 1060)
+
+    # Collected at every run by default
+    check._set_stats_collected('mongodb://other:27017', 1000)
+    assert check._should_collect_stats({}, 'mongodb://other:27017', 1000)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('max_concurrent_stats_commands', [1, 4])
+def test_map_concurrently(check, max_concurrent_stats_commands):
+    instance = {'max_concurrent_stats_commands': max_concurrent_stats_commands}
+
+    def command(db_name):
+        if db_name == 'error':
+            raise Exception('dbstats failed')
+        return {'db': db_name}
+
+    try:
+        results = check._map_concurrently(instance, command, ['db1', 'error', 'db2'])
+    finally:
+        check.stop()
+
+    assert [(item, result) for item, result, _ in results] == [
+        ('db1', {'db': 'db1'}),
+        ('error', None),
+        ('db2', {'db': 'db2'}),
+    ]
+    assert str(results[1][2]) == 'dbstats failed'
@@ -3,13 +3,15 @@
 # Licensed under a 3-clause BSD style license (see LICENSE)
 from __future__ import division
 
+import hashlib
 import json
+import os
 import re
 from collections import namedtuple
 
 from six import PY3, next
 
-from datadog_checks.base import AgentCheck
+from datadog_checks.base import AgentCheck, ensure_bytes
 from datadog_checks.base.utils.tailfile import TailFile
 
 if not PY3:
@@ -104,6 +106,7 @@ class Nagios(AgentCheck):
                 nagios_conf = {}
                 instance_key = None
                 custom_tag = instance.get('tags', [])
+                offsets_dir = instance.get('offsets_dir')
 
                 if 'nagios_conf' in instance:  # conf.d check
                     conf_path = instance['nagios_conf']
@@ -138,6 +141,7 @@ class Nagios(AgentCheck):
                             gauge_func=self.gauge,
                             freq=check_freq,
                             passive_checks=instance.get('passive_checks_events', False),
+                            offsets_dir=offsets_dir,
                         )
                     )
                 if (
@@ -156,6 +160,7 @@ class Nagios(AgentCheck):
                             gauge_func=self.gauge,
                             freq=check_freq,
                             tags=custom_tag,
+                            offsets_dir=offsets_dir,
                         )
                     )
                 if (
@@ -174,6 +179,7 @@ class Nagios(AgentCheck):
                             gauge_func=self.gauge,
                             freq=check_freq,
                             tags=custom_tag,
+                            offsets_dir=offsets_dir,
                         )
                     )
 
@@ -222,7 +228,9 @@ class Nagios(AgentCheck):
 
 
 class NagiosTailer(object):
-    def __init__(self, log_path, file_template, logger, hostname, event_func, gauge_func, freq, tags=None):
+    def __init__(
+        self, log_path, file_template, logger, hostname, event_func, gauge_func, freq, tags=None, offsets_dir=None
+    ):
         """
         :param log_path: string, path to the file to parse
         :param file_template: string, format of the perfdata file
@@ -232,6 +240,7 @@ class NagiosTailer(object):
         :param gauge_func: function to report a gauge
         :param freq: int, size of bucket to aggregate perfdata metrics
         :param tags: list, list of custom tags
+        :param offsets_dir: string, directory where the position read in the file is saved
         """
 
         self.log_path = log_path
@@ -248,7 +257,13 @@ class NagiosTailer(object):
         if file_template is not None:
             self.compile_file_template(file_template)
 
-        self.tail = TailFile(self.log, self.log_path, self._parse_line)
+        offset_path = None
+        if offsets_dir:
+            offset_path = os.path.join(
+                offsets_dir, 'nagios_{}.offset'.format(hashlib.md5(ensure_bytes(log_path)).hexdigest())
+            )
+
+        self.tail = TailFile(self.log, self.log_path, self._parse_line, offset_path=offset_path)
         self.gen = self.tail.tail(line_by_line=False, move_end=True)
         next(self.gen)
 
@@ -276,7 +291,17 @@ class NagiosTailer(object):
 
 class NagiosEventLogTailer(NagiosTailer):
     def __init__(
-        self, log_path, file_template, logger, hostname, tags, event_func, gauge_func, freq, passive_checks=False
+        self,
+        log_path,
+        file_template,
+        logger,
+        hostname,
+        tags,
+        event_func,
+        gauge_func,
+        freq,
+        passive_checks=False,
+        offsets_dir=None,
     ):
         """
         :param log_path: string, path to the file to parse
@@ -287,12 +312,13 @@ class NagiosEventLogTailer(NagiosTailer):
         :param gauge_func: function to report a gauge
         :param freq: int, size of bucket to aggregate perfdata metrics
         :param passive_checks: bool, enable or not passive checks events
+        :param offsets_dir: string, directory where the position read in the file is saved
         """
 
         self.passive_checks = passive_checks
         self.tags = tags
         super(NagiosEventLogTailer, self).__init__(
-            log_path, file_template, logger, hostname, event_func, gauge_func, freq
+            log_path, file_template, logger, hostname, event_func, gauge_func, freq, offsets_dir=offsets_dir
         )
 
     def _parse_line(self, line):
@@ -0,0 +1,103 @@
+# (C) Datadog, Inc. 2019
+# All rights reserved
+# Licensed under Simplified BSD License (see LICENSE)
+
+"""
+Count the sockets by connection state on Linux, without running `ss` or `netstat`.
+"""
+
+import socket
+import struct
+from collections import Counter
+
+# TCP states of the kernel, named like netstat does, see include/net/tcp_states.h
+TCP_STATES = {
+    1: "ESTABLISHED",
+    2: "SYN_SENT",
+    3: "SYN_RECV",
+    4: "FIN_WAIT1",
+    5: "FIN_WAIT2",
+    6: "TIME_WAIT",
+    7: "CLOSE",
+    8: "CLOSE_WAIT",
+    9: "LAST_ACK",
+    10: "LISTEN",
+    11: "CLOSING",
+    # Request sockets, /proc/net/tcp shows them as SYN_RECV
+    12: "SYN_RECV",
+}
+
+NETLINK_SOCK_DIAG = 4
+SOCK_DIAG_BY_FAMILY = 20
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+NLMSG_ERROR = 0x2
+NLMSG_DONE = 0x3
+# struct nlmsghdr: length, type, flags, sequence number, port id
+NLMSG_HEADER = struct.Struct('=IHHII')
+# struct inet_diag_req_v2 without its inet_diag_sockid: family, protocol, extensions, padding, states
+INET_DIAG_REQUEST = struct.Struct('=BBBBI')
+INET_DIAG_SOCKID_SIZE = 48
+ALL_STATES = 0xFFFFFFFF
+RECV_BUFFER_SIZE = 1 << 16
+
+
+def count_proc_net_states(path, ipv6=False):
+    """
+    Count the sockets listed in a /proc/net/{tcp,tcp6,udp,udp6} file by state.
+
+    The lines are read one at a time and only the hex state column is sliced, the addresses
+    have a fixed width so its position is known from the first colon:
+       sl  local_address rem_address   st tx_queue ...
+        0: 0100007F:1F90 00000000:0000 0A 00000000:00000000 ...
+    Returns a Counter state -> number of sockets
+    """
+    # Addresses are 8 hex digits long for IPv4, 32 for IPv6, followed by a colon and a 4 hex digits port
+    offset = 2 + 2 * ((32 if ipv6 else 8) + 6)
+
+    counts = Counter()
+    with open(path, 'r') as f:
+        # Skip the header
+        next(f, None)
+        for line in f:
+            start = line.index(':') + offset
+            counts[line[start : start + 2]] += 1
+
+    return Counter({int(state, 16): count for state, count in counts.items()})
+
+
+def count_sock_diag_states(family, protocol):
+    """
+    Count the sockets of the network namespace of the process by state, with a
+    sock_diag netlink dump like `ss` does, see man 7 sock_diag.
+    Raises socket.error if netlink is not available.
+    Returns a Counter state -> number of sockets
+    """
+    request = INET_DIAG_REQUEST.pack(family, protocol, 0, 0, ALL_STATES) + b'\0' * INET_DIAG_SOCKID_SIZE
+    header = NLMSG_HEADER.pack(NLMSG_HEADER.size + len(request), SOCK_DIAG_BY_FAMILY, NLM_F_REQUEST | NLM_F_DUMP, 1, 0)
+
+    counts = Counter()
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_SOCK_DIAG)
+    try:
+        sock.sendall(header + request)
+        while True:
+            data = bytearray(sock.recv(RECV_BUFFER_SIZE))
+            if not data:
+                return counts
+
+            offset = 0
+            while offset + NLMSG_HEADER.size <= len(data):
+                length, message_type, _, _, _ = NLMSG_HEADER.unpack_from(data, offset)
+                if message_type == NLMSG_DONE:
+                    return counts
+                if message_type == NLMSG_ERROR:
+                    (error,) = struct.unpack_from('=i', data, offset + NLMSG_HEADER.size)
+                    raise socket.error(-error, 'sock_diag request failed')
+
+                # struct inet_diag_msg starts with the family and the state of the socket
+                counts[data[offset + NLMSG_HEADER.size + 1]] += 1
+
+                # Messages are aligned on 4 bytes
+                offset += (length + 3) & ~3
+    finally:
+        sock.close()
@@ -12,13 +12,15 @@ import socket
 from collections import defaultdict
 
 import psutil
-from six import PY3, iteritems
+from six import PY3, iteritems, itervalues
 
 from datadog_checks.checks import AgentCheck
 from datadog_checks.utils.common import pattern_filter
 from datadog_checks.utils.platform import Platform
 from datadog_checks.utils.subprocess_output import SubprocessOutputEmptyError, get_subprocess_output
 
+from .connections import TCP_STATES, count_proc_net_states, count_sock_diag_states
+
 if PY3:
     long = int
 
@@ -57,6 +59,7 @@ class Network(AgentCheck):
         self._collect_cx_state = instance.get('collect_connection_state', False)
         self._collect_rate_metrics = instance.get('collect_rate_metrics', True)
         self._collect_count_metrics = instance.get('collect_count_metrics', False)
+        self._cx_state_source = instance.get('connection_state_source', 'proc')
 
         # This decides whether we should split or combine connection states,
         # along with a few other things
@@ -279,7 +282,7 @@ class Network(AgentCheck):
         """
         _check_linux can be run inside a container and still collects the network metrics from the host
         For that procfs_path can be set to something like "/host/proc"
-        When a custom procfs_path is set, the collect_connection_state option is ignored
+        When a custom procfs_path is set, the connection states can only be collected from procfs
         """
         proc_location = self.agentConfig.get('procfs_path', '/proc').rstrip('/')
         custom_tags = instance.get('tags', [])
@@ -287,7 +290,12 @@ class Network(AgentCheck):
         if Platform.is_containerized() and proc_location != "/proc":
             proc_location = "%s/1" % proc_location
 
-        if self._is_collect_cx_state_runnable(proc_location):
+        if self._cx_state_source != 'ss':
+            if self._collect_cx_state:
+                metrics = self._get_cx_state_native(proc_location)
+                for metric, value in iteritems(metrics):
+                    self.gauge(metric, value, tags=custom_tags)
+        elif self._is_collect_cx_state_runnable(proc_location):
             try:
                 self.log.debug("Using `ss` to collect connection state")
                 # Try using `ss` for increased performance over `netstat`
@@ -486,6 +494,60 @@ class Network(AgentCheck):
         except SubprocessOutputEmptyError:
             self.log.debug("Couldn't use {} to get conntrack stats".format(conntrack_path))
 
+    def _get_cx_state_native(self, proc_location):
+        """
+        Count the connections by state without running `ss` or `netstat`, from
+        the sock_diag netlink interface if `connection_state_source` is `netlink`
+        or from /proc/net/{tcp,tcp6,udp,udp6}.
+        Returns a dict metric_name -> value
+        """
+        states_by_proto = None
+        if self._cx_state_source == 'netlink':
+            # Netlink only sees the sockets of the network namespace of the agent
+            if proc_location == "/proc":
+                states_by_proto = self._get_cx_states_netlink()
+            else:
+                self.log.debug("Custom /proc path %s: not using netlink to collect connection state", proc_location)
+        if states_by_proto is None:
+            states_by_proto = self._get_cx_states_proc(proc_location)
+
+        metrics = {}
+        for _, val in iteritems(self.cx_state_gauge):
+            metrics[val] = 0
+        for (protocol, ip_version), states in iteritems(states_by_proto):
+            proto = "{}{}".format(protocol, ip_version)
+            if protocol == 'udp':
+                metrics[self.cx_state_gauge[proto, 'connections']] += sum(itervalues(states))
+                continue
+            for state, count in iteritems(states):
+                state_name = TCP_STATES.get(state)
+                if state_name in self.tcp_states['netstat']:
+                    metrics[self.cx_state_gauge[proto, self.tcp_states['netstat'][state_name]]] += count
+        return metrics
+
+    def _get_cx_states_proc(self, proc_location):
+        states_by_proto = {}
+        for ip_version in ['4', '6']:
+            for protocol in ['tcp', 'udp']:
+                path = "{}/net/{}{}".format(proc_location, protocol, '6' if ip_version == '6' else '')
+                try:
+                    states_by_proto[protocol, ip_version] = count_proc_net_states(path, ipv6=ip_version == '6')
+                except IOError:
+                    # No IPv6 support
+                    self.log.debug("Unable to read %s.", path)
+        return states_by_proto
+
+    def _get_cx_states_netlink(self):
+        states_by_proto = {}
+        try:
+            for ip_version, family in [('4', socket.AF_INET), ('6', socket.AF_INET6)]:
+                for protocol, ip_protocol in [('tcp', socket.IPPROTO_TCP), ('udp', socket.IPPROTO_UDP)]:
+                    states_by_proto[protocol, ip_version] = count_sock_diag_states(family, ip_protocol)
+        except (AttributeError, socket.error) as e:
+            self.log.debug("Unable to use netlink to collect connection state, using /proc instead: %s", e)
+            return None
+        return states_by_proto
+
     def _parse_linux_cx_state(self, lines, tcp_states, state_col, protocol=None, ip_version=None):
         """
         Parse the output of the command that retrieves the connection state (either `ss` or `netstat`)
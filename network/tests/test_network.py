@@ -88,7 +88,7 @@ def netstat_subprocess_mock(*args, **kwargs):
 
 @pytest.mark.skipif(platform.system() != 'Linux', reason="Only runs on Unix systems")
 def test_cx_state(aggregator, check):
-    instance = {'collect_connection_state': True}
+    instance = {'collect_connection_state': True, 'connection_state_source': 'ss'}
     with mock.patch('datadog_checks.network.network.get_subprocess_output') as out:
         out.side_effect = ss_subprocess_mock
         check._collect_cx_state = True
@@ -103,6 +103,49 @@ def test_cx_state(aggregator, check):
             aggregator.assert_metric(metric, value=value)
 
 
+@pytest.mark.skipif(platform.system() != 'Linux', reason="Only runs on Unix systems")
+def test_cx_state_proc(aggregator, check):
+    instance = {'collect_connection_state': True}
+    check.agentConfig['procfs_path'] = os.path.join(FIXTURE_DIR, 'proc')
+    with mock.patch.object(check, '_submit_devicemetrics'), mock.patch(
+        'datadog_checks.network.network.open', mock.mock_open(read_data='\n\n'), create=True
+    ) as proc_open, mock.patch('datadog_checks.network.network.get_subprocess_output') as out:
+        check.check(instance)
+        out.assert_not_called()
+        proc_open.assert_any_call(os.path.join(FIXTURE_DIR, 'proc', 'net', 'dev'), 'r')
+
+    for metric, value in iteritems(CX_STATE_GAUGES_VALUES):
+        aggregator.assert_metric(metric, value=value)
+
+
+@pytest.mark.skipif(platform.system() != 'Linux', reason="Only runs on Unix systems")
+def test_cx_state_netlink(check):
+    check._setup_metrics({})
+    check._cx_state_source = 'netlink'
+
+    # Only used for the namespace of the agent
+    with mock.patch('datadog_checks.network.network.count_sock_diag_states') as count_sock_diag_states:
+        metrics = check._get_cx_state_native(os.path.join(FIXTURE_DIR, 'proc'))
+        count_sock_diag_states.assert_not_called()
+    assert metrics == CX_STATE_GAUGES_VALUES
+
+    # Falls back to procfs when netlink is not available
+    with mock.patch(
+        'datadog_checks.network.network.count_sock_diag_states', side_effect=socket.error
+    ), mock.patch.object(check, '_get_cx_states_proc', return_value={}) as get_cx_states_proc:
+        check._get_cx_state_native('/proc')
+        get_cx_states_proc.assert_called_once_with('/proc')
+
+    # Sees the sockets of the agent
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        assert check._get_cx_state_native('/proc')['system.net.tcp4.listening'] >= 1
+    finally:
+        listener.close()
+
+
 def test_add_conntrack_stats_metrics(aggregator, check):
     mocked_conntrack_stats = (
         "cpu=0 found=27644 invalid=19060 ignore=485633411 insert=0 insert_failed=1 "
@@ -1,12 +1,14 @@
 # (C) Datadog, Inc. 2018
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
+import threading
+import time
 from os import environ
 
 import requests
 import simplejson as json
 from openstack import connection
-from six.moves.urllib.parse import urljoin
+from six.moves.urllib.parse import urljoin, urlparse
 
 from datadog_checks.config import is_affirmative
 
@@ -22,6 +24,8 @@ from .exceptions import (
 from .settings import (
     DEFAULT_API_REQUEST_TIMEOUT,
     DEFAULT_KEYSTONE_API_VERSION,
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
+    DEFAULT_MAX_REQUESTS_PER_SECOND,
     DEFAULT_MAX_RETRY,
     DEFAULT_NEUTRON_API_VERSION,
     DEFAULT_PAGINATED_LIMIT,
@@ -37,6 +41,8 @@ class ApiFactory(object):
         ssl_verify = is_affirmative(instance_config.get("ssl_verify", True))
         paginated_limit = instance_config.get('paginated_limit', DEFAULT_PAGINATED_LIMIT)
         request_timeout = instance_config.get('request_timeout', DEFAULT_API_REQUEST_TIMEOUT)
+        max_concurrent_requests = int(instance_config.get('max_concurrent_requests', DEFAULT_MAX_CONCURRENT_REQUESTS))
+        max_requests_per_second = float(instance_config.get('max_requests_per_second', DEFAULT_MAX_REQUESTS_PER_SECOND))
         user = instance_config.get("user")
         openstack_config_file_path = instance_config.get("openstack_config_file_path")
         openstack_cloud_name = instance_config.get("openstack_cloud_name")
@@ -53,6 +59,8 @@ class ApiFactory(object):
                 ssl_verify=ssl_verify,
                 proxies=proxies,
                 limit=paginated_limit,
+                max_concurrent_requests=max_concurrent_requests,
+                max_requests_per_second=max_requests_per_second,
             )
             api.connect(user)
         else:
@@ -62,6 +70,29 @@ class ApiFactory(object):
         return api
 
 
+class RateLimiter(object):
+    """
+    Spaces out calls to at most `max_per_second` per second, threadsafe. No limit if it is 0.
+    """
+
+    def __init__(self, max_per_second):
+        self.interval = 1.0 / max_per_second if max_per_second > 0 else 0
+        self._next_call = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+
+        with self._lock:
+            now = time.time()
+            call_time = max(now, self._next_call)
+            self._next_call = call_time + self.interval
+
+        if call_time > now:
+            time.sleep(call_time - now)
+
+
 class AbstractApi(object):
     def __init__(self, logger):
         self.logger = logger
@@ -267,6 +298,8 @@ class SimpleApi(AbstractApi):
         proxies=None,
         timeout=DEFAULT_API_REQUEST_TIMEOUT,
         limit=DEFAULT_PAGINATED_LIMIT,
+        max_concurrent_requests=DEFAULT_MAX_CONCURRENT_REQUESTS,
+        max_requests_per_second=DEFAULT_MAX_REQUESTS_PER_SECOND,
     ):
         super(SimpleApi, self).__init__(logger)
 
@@ -282,6 +315,17 @@ class SimpleApi(AbstractApi):
         # Cache for the `_make_request` method
         self.cache = {}
 
+        # Keep-alive connections shared by all the requests, with a connection per concurrent request
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(max_concurrent_requests, 1))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # Requests to each endpoint (host and port) are rate limited separately
+        self.max_requests_per_second = max_requests_per_second
+        self._rate_limiters = {}
+        self._rate_limiters_lock = threading.Lock()
+
     def connect(self, user):
         credentials = Authenticator.from_config(
             self.logger, self.keystone_endpoint, user, self.ssl_verify, self.proxies, self.timeout
@@ -306,8 +350,9 @@ class SimpleApi(AbstractApi):
             self.logger.debug("Request found in cache. cache key %s", cache_key)
             return self.cache.get(cache_key)
 
+        self._get_rate_limiter(url).wait()
         try:
-            resp = requests.get(
+            resp = self.session.get(
                 url, headers=headers, verify=self.ssl_verify, params=params, timeout=self.timeout, proxies=self.proxies
             )
             resp.raise_for_status()
@@ -330,6 +375,13 @@ class SimpleApi(AbstractApi):
         self.cache[cache_key] = jresp
         return jresp
 
+    def _get_rate_limiter(self, url):
+        endpoint = urlparse(url).netloc
+        with self._rate_limiters_lock:
+            if endpoint not in self._rate_limiters:
+                self._rate_limiters[endpoint] = RateLimiter(self.max_requests_per_second)
+            return self._rate_limiters[endpoint]
+
     def get_keystone_endpoint(self):
         self._make_request(self.keystone_endpoint, self.headers)
 
@@ -11,6 +11,7 @@ from six import iteritems, itervalues
 
 from datadog_checks.base import AgentCheck, is_affirmative
 from datadog_checks.base.utils.common import pattern_filter
+from datadog_checks.base.utils.concurrency import ThreadPoolMapper
 
 from .api import ApiFactory
 from .exceptions import (
@@ -23,6 +24,7 @@ from .exceptions import (
     MissingNovaEndpoint,
 )
 from .retry import BackOffRetry
+from .settings import DEFAULT_MAX_CONCURRENT_REQUESTS
 from .utils import traced
 
 SOURCE_TYPE = 'openstack'
@@ -119,6 +121,9 @@ class OpenStackControllerCheck(AgentCheck):
         # BackOffRetry supports multiple instances
         self._backoff = BackOffRetry()
 
+        # Threads making the per-server and per-project API calls, kept across runs
+        self._mapper = ThreadPoolMapper()
+
         # Ex: servers_cache = {
         #   'servers': {<server_id>: <server_metadata>},
         #   'changes_since': <ISO8601 date time>
@@ -133,6 +138,9 @@ class OpenStackControllerCheck(AgentCheck):
     def delete_api_cache(self):
         self._api = None
 
+    def stop(self):
+        self._mapper.terminate()
+
     def collect_networks_metrics(self, tags, network_ids, exclude_network_id_rules):
         """
         Collect stats for all reachable networks
@@ -388,6 +396,35 @@ class OpenStackControllerCheck(AgentCheck):
         return servers
 
     def collect_server_diagnostic_metrics(self, server_details, tags=None, use_shortname=False):
+        server_stats = None
+        error = None
+        try:
+            server_stats = self.get_server_diagnostics(server_details.get('server_id'))
+        except Exception as e:
+            error = e
+        self.submit_server_diagnostic_metrics(
+            server_details, server_stats, error=error, tags=tags, use_shortname=use_shortname
+        )
+
+    def collect_servers_diagnostic_metrics(self, servers, max_concurrent_requests, tags=None, use_shortname=False):
+        """
+        Fetch the diagnostics of the servers concurrently, the metrics of a server are submitted
+        as soon as its diagnostics are received.
+        """
+
+        def get_server_diagnostics(server_details):
+            return self.get_server_diagnostics(server_details.get('server_id'))
+
+        for server_details, server_stats, error in self._mapper.imap_unordered(
+            get_server_diagnostics, servers, size=max_concurrent_requests
+        ):
+            self.submit_server_diagnostic_metrics(
+                server_details, server_stats, error=error, tags=tags, use_shortname=use_shortname
+            )
+
+    def submit_server_diagnostic_metrics(
+        self, server_details, server_stats, error=None, tags=None, use_shortname=False
+    ):
         def _is_valid_metric(label):
             return label in NOVA_SERVER_METRICS or any(seg in label for seg in NOVA_SERVER_INTERFACE_SEGMENTS)
 
@@ -407,23 +444,21 @@ class OpenStackControllerCheck(AgentCheck):
         hypervisor_hostname = server_details.get('hypervisor_hostname')
         project_name = server_details.get('project_name')
 
-        try:
-            server_stats = self.get_server_diagnostics(server_id)
-        except InstancePowerOffFailure:  # 409 response code came back fro nova
+        if isinstance(error, InstancePowerOffFailure):  # 409 response code came back fro nova
             self.log.debug("Server %s is powered off and cannot be monitored", server_id)
             return
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 404:
-                self.log.debug("Server %s is not in an ACTIVE state and cannot be monitored, %s", server_id, e)
+        elif isinstance(error, requests.exceptions.HTTPError):
+            if error.response.status_code == 404:
+                self.log.debug("Server %s is not in an ACTIVE state and cannot be monitored, %s", server_id, error)
             else:
                 self.warning(
                     "Received HTTP Error when reaching the Diagnostics endpoint for server:{}, {}".format(
-                        e, server_name
+                        error, server_name
                     )
                 )
             return
-        except Exception as e:
-            self.warning("Unknown error when monitoring %s : %s" % (server_id, e))
+        elif error is not None:
+            self.warning("Unknown error when monitoring %s : %s" % (server_id, error))
             return
 
         if server_stats:
@@ -456,6 +491,27 @@ class OpenStackControllerCheck(AgentCheck):
                     )
 
     def collect_project_limit(self, project, tags=None):
+        self.log.debug("Collecting metrics for project. name: {} id: {}".format(project.get('name'), project['id']))
+        self.submit_project_limit(project, self.get_project_limits(project['id']), tags=tags)
+
+    def collect_projects_limits(self, projects, max_concurrent_requests, tags=None):
+        """
+        Fetch the limits of the projects concurrently, the metrics of a project are submitted
+        as soon as its limits are received.
+        """
+
+        def get_project_limits(project):
+            self.log.debug("Collecting metrics for project. name: {} id: {}".format(project.get('name'), project['id']))
+            return self.get_project_limits(project['id'])
+
+        for project, server_stats, error in self._mapper.imap_unordered(
+            get_project_limits, projects, size=max_concurrent_requests
+        ):
+            if error is not None:
+                raise error
+            self.submit_project_limit(project, server_stats, tags=tags)
+
+    def submit_project_limit(self, project, server_stats, tags=None):
         # NOTE: starting from Version 3.10 (Queens)
         # We can use /v3/limits (Unified Limits API) if not experimental any more.
         def _is_valid_metric(label):
@@ -467,8 +523,6 @@ class OpenStackControllerCheck(AgentCheck):
         project_name = project.get('name')
         project_id = project.get('id')
 
-        self.log.debug("Collecting metrics for project. name: {} id: {}".format(project_name, project['id']))
-        server_stats = self.get_project_limits(project['id'])
         server_tags.append('tenant_id:{}'.format(project_id))
 
         if project_name:
@@ -697,6 +751,7 @@ class OpenStackControllerCheck(AgentCheck):
         collect_server_diagnostic_metrics = is_affirmative(instance.get('collect_server_diagnostic_metrics', True))
         collect_server_flavor_metrics = is_affirmative(instance.get('collect_server_flavor_metrics', True))
         use_shortname = is_affirmative(instance.get('use_shortname', False))
+        max_concurrent_requests = int(instance.get('max_concurrent_requests', DEFAULT_MAX_CONCURRENT_REQUESTS))
 
         try:
             # Authenticate and add the instance api to apis cache
@@ -716,8 +771,7 @@ class OpenStackControllerCheck(AgentCheck):
             projects = self.get_projects(include_project_name_rules, exclude_project_name_rules)
 
             if collect_project_metrics:
-                for project in itervalues(projects):
-                    self.collect_project_limit(project, custom_tags)
+                self.collect_projects_limits(itervalues(projects), max_concurrent_requests, tags=custom_tags)
 
             servers = self.populate_servers_cache(projects, exclude_server_id_rules)
 
@@ -732,8 +786,9 @@ class OpenStackControllerCheck(AgentCheck):
             if collect_server_diagnostic_metrics or collect_server_flavor_metrics:
                 if collect_server_diagnostic_metrics:
                     self.log.debug("Fetch stats from %s server(s)" % len(servers))
-                    for server in itervalues(servers):
-                        self.collect_server_diagnostic_metrics(server, tags=custom_tags, use_shortname=use_shortname)
+                    self.collect_servers_diagnostic_metrics(
+                        itervalues(servers), max_concurrent_requests, tags=custom_tags, use_shortname=use_shortname
+                    )
                 if collect_server_flavor_metrics:
                     if len(servers) >= 1 and 'flavor_id' in next(itervalues(servers)):
                         self.log.debug("Fetch server flavors")
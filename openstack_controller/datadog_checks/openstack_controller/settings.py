@@ -7,3 +7,5 @@ DEFAULT_NEUTRON_API_VERSION = 'v2.0'
 DEFAULT_API_REQUEST_TIMEOUT = 10  # seconds
 DEFAULT_PAGINATED_LIMIT = 1000
 DEFAULT_MAX_RETRY = 3
+DEFAULT_MAX_CONCURRENT_REQUESTS = 1
+DEFAULT_MAX_REQUESTS_PER_SECOND = 0  # no limit
@@ -3,13 +3,14 @@
 # Licensed under Simplified BSD License (see LICENSE)
 import copy
 import logging
+import time
 
 import mock
 import pytest
 import requests
 import simplejson as json
 
-from datadog_checks.openstack_controller.api import ApiFactory, Authenticator, Credential, SimpleApi
+from datadog_checks.openstack_controller.api import ApiFactory, Authenticator, Credential, RateLimiter, SimpleApi
 from datadog_checks.openstack_controller.exceptions import (
     AuthenticationNeeded,
     IncompleteIdentity,
@@ -727,7 +728,7 @@ def test__make_request_failure():
         api = ApiFactory.create(log, None, instance)
 
     response_mock = mock.MagicMock()
-    with mock.patch("datadog_checks.openstack_controller.api.requests.get", return_value=response_mock):
+    with mock.patch.object(api.session, "get", return_value=response_mock):
         response_mock.raise_for_status.side_effect = requests.exceptions.HTTPError
         response_mock.status_code = 401
         with pytest.raises(AuthenticationNeeded):
@@ -924,3 +925,18 @@ def test_get_project_limits(aggregator):
     ):
         api = SimpleApi(None, None)
         assert api.get_project_limits(None) == common.EXAMPLE_GET_PROJECT_LIMITS_RETURN_VALUE
+
+
+def test_rate_limiter():
+    rate_limiter = RateLimiter(50)
+    start = time.time()
+    for _ in range(5):
+        rate_limiter.wait()
+    assert time.time() - start >= 0.08
+
+    # No limit
+    rate_limiter = RateLimiter(0)
+    start = time.time()
+    for _ in range(100):
+        rate_limiter.wait()
+    assert time.time() - start < 0.05
@@ -1,6 +1,7 @@
 # (C) Datadog, Inc. 2018
 # All rights reserved
 # Licensed under Simplified BSD License (see LICENSE)
+import itertools
 import re
 import socket
 import string
@@ -55,6 +56,60 @@ class PartialFormatter(string.Formatter):
 fmt = PartialFormatter()
 
 
+class RelationsFilter(object):
+    """Compiled `relations` configuration, gives the schemas allowed for the tables returned by the
+    relation-specific queries.
+    """
+
+    def __init__(self, relations_config):
+        self.config = relations_config
+        self.names = {}
+        self.regexes = []
+        for name, element in iteritems(relations_config):
+            if 'relation_name' in element:
+                self.names[name] = set(element['schemas'])
+            else:
+                self.regexes.append((re.compile(element['relation_regex']), set(element['schemas'])))
+
+        # Single regex discarding the tables matching none of the regexes at once
+        self.combined_regex = None
+        if len(self.regexes) > 1:
+            try:
+                self.combined_regex = re.compile('|'.join('(?:{})'.format(r.pattern) for r, _ in self.regexes))
+            except re.error:
+                pass
+
+        # Values of the {relations_names} and {relations_regexes} parameters of the queries
+        self.query_params = {
+            'relations_names': ', '.join(
+                "'{0}'".format(k) for k, v in iteritems(relations_config) if 'relation_name' in v
+            ),
+            'relations_regexes': ', '.join(
+                "'{0}'".format(k) for k, v in iteritems(relations_config) if 'relation_regex' in v
+            ),
+        }
+
+        # Schemas allowed, by table name
+        self._table_schemas = {}
+
+    def get_schemas(self, table):
+        """Return the set of schemas allowed for the table, None if the table is not in the configuration."""
+        if table in self._table_schemas:
+            return self._table_schemas[table]
+
+        if table in self.names:
+            schemas = self.names[table]
+        elif self.combined_regex is not None and not self.combined_regex.match(table):
+            schemas = None
+        else:
+            # Find all matching regexes. Required if the same table matches two different regex
+            matching = [regex_schemas for regex, regex_schemas in self.regexes if regex.match(table)]
+            schemas = set().union(*matching) if matching else None
+
+        self._table_schemas[table] = schemas
+        return schemas
+
+
 class PostgreSql(AgentCheck):
     """Collects per-database, and optionally per-relation metrics, custom metrics
     """
@@ -386,6 +441,15 @@ GROUP BY datid, datname
         self.replication_metrics = {}
         self.activity_metrics = {}
         self.custom_metrics = {}
+        self.relations_filters = {}
+        # Rendered queries, by instance and query template
+        self.queries = {}
+        # Tags of the rows of the queries, by instance and descriptors values, for the current and the previous run
+        self.descriptors_tags = {}
+        # Names of the queries prepared on the server, by instance. Only used with psycopg2 when
+        # `use_prepared_statements` is enabled, pg8000 already prepares every query it runs.
+        self.prepared_statements = {}
+        self._prepared_statement_ids = itertools.count()
 
         # Deprecate custom_metrics in favor of custom_queries
         if instances is not None and any('custom_metrics' in instance for instance in instances):
@@ -703,8 +767,62 @@ GROUP BY datid, datname
                 self.log.warning('Unhandled relations config type: {}'.format(element))
         return config
 
+    def _get_relations_filter(self, key, relations):
+        """Compile the relations configuration once per instance, None if it has no valid relation"""
+        if key not in self.relations_filters:
+            relations_config = self._build_relations_config(relations)
+            self.relations_filters[key] = RelationsFilter(relations_config) if relations_config else None
+        return self.relations_filters[key]
+
+    def _get_query(self, key, scope, cols, relations_filter):
+        """Render the query of a scope once per instance"""
+        query_key = (key, scope['query'], tuple(cols), scope['relation'])
+        query = self.queries.get(query_key)
+        if query is None:
+            query = fmt.format(scope['query'], metrics_columns=", ".join(cols))
+            # if this is a relation-specific query, we need to list all relations last
+            if scope['relation'] and relations_filter is not None:
+                query = query.format(**relations_filter.query_params)
+            else:
+                query = query.replace(r'%', r'%%')
+            self.queries[query_key] = query
+        return query
+
+    def _execute_query(self, cursor, key, query):
+        """
+        Run a query, prepared on the server the first time it is run on the connection when using psycopg2
+        """
+        prepared_statements = self.prepared_statements.get(key)
+        if prepared_statements is None:
+            cursor.execute(query)
+            return
+
+        name = prepared_statements.get(query)
+        if name is None:
+            name = 'datadog_{}'.format(next(self._prepared_statement_ids))
+            cursor.execute('PREPARE {} AS {}'.format(name, query))
+            prepared_statements[query] = name
+        cursor.execute('EXECUTE {}'.format(name))
+
+    def _get_descriptors_tags_cache(self, key, instance_tags):
+        """
+        Tags of the rows by descriptors values (e.g. schema, table and index), for the current and the previous run.
+        Both are reset when the instance tags change.
+        """
+        cached_instance_tags, cache, previous_cache = self.descriptors_tags.get(key, (None, None, None))
+        if cached_instance_tags != instance_tags:
+            cache, previous_cache = {}, {}
+            self.descriptors_tags[key] = (list(instance_tags), cache, previous_cache)
+        return cache, previous_cache
+
+    def _rotate_descriptors_tags_cache(self, key):
+        """Start a new run: only the tags of the rows seen during the previous run are kept"""
+        if key in self.descriptors_tags:
+            instance_tags, cache, _ = self.descriptors_tags[key]
+            self.descriptors_tags[key] = (instance_tags, {}, cache)
+
     def _query_scope(
-        self, cursor, scope, key, db, instance_tags, is_custom_metrics, programming_error, relations_config
+        self, cursor, scope, key, db, instance_tags, is_custom_metrics, programming_error, relations_filter
     ):
         if scope is None:
             return None
@@ -718,22 +836,17 @@ GROUP BY datid, datname
         cols = list(scope['metrics'])  # list of metrics to query, in some order
         # we must remember that order to parse results
 
+        query = self._get_query(key, scope, cols, relations_filter)
         try:
-            query = fmt.format(scope['query'], metrics_columns=", ".join(cols))
-            # if this is a relation-specific query, we need to list all relations last
-            if scope['relation'] and len(relations_config) > 0:
-                rel_names = ', '.join("'{0}'".format(k) for k, v in relations_config.items() if 'relation_name' in v)
-                rel_regex = ', '.join("'{0}'".format(k) for k, v in relations_config.items() if 'relation_regex' in v)
-                self.log.debug("Running query: {} with relations matching: {}".format(query, rel_names + rel_regex))
-                cursor.execute(query.format(relations_names=rel_names, relations_regexes=rel_regex))
-            else:
-                self.log.debug("Running query: %s" % query)
-                cursor.execute(query.replace(r'%', r'%%'))
+            self.log.debug("Running query: %s", query)
+            self._execute_query(cursor, key, query)
 
             results = cursor.fetchall()
         except programming_error as e:
             log_func("Not all metrics may be available: %s" % str(e))
             db.rollback()
+            # Prepare it again next time, in case it was lost with the transaction
+            self.prepared_statements.get(key, {}).pop(query, None)
             return None
 
         if not results:
@@ -748,6 +861,8 @@ GROUP BY datid, datname
             results = results[:MAX_CUSTOM_RESULTS]
 
         desc = scope['descriptors']
+        desc_names = tuple(x[1] for x in desc)
+        tags_cache, previous_tags_cache = self._get_descriptors_tags_cache(key, instance_tags)
 
         # parse & submit results
         # A row should look like this
@@ -758,44 +873,42 @@ GROUP BY datid, datname
             # Check that all columns will be processed
             assert len(row) == len(cols) + len(desc)
 
-            # build a map of descriptors and their values
-            desc_map = dict(zip([x[1] for x in desc], row[0 : len(desc)]))
+            desc_values = tuple(row[0 : len(desc)])
 
             # if relations *and* schemas are set, filter out table not
             # matching the schema in the configuration
-            if scope['relation'] and len(relations_config) > 0 and 'schema' in desc_map and 'table' in desc_map:
+            if scope['relation'] and relations_filter is not None and 'schema' in desc_names and 'table' in desc_names:
+                # build a map of descriptors and their values
+                desc_map = dict(zip(desc_names, desc_values))
                 row_table = desc_map['table']
                 row_schema = desc_map['schema']
 
-                if row_table in relations_config:
-                    config_table_objects = [relations_config[row_table]]
-                else:
-                    # Find all matching regexes. Required if the same table matches two different regex
-                    regex_configs = (v for v in relations_config.values() if 'relation_regex' in v)
-                    config_table_objects = [r for r in regex_configs if re.match(r['relation_regex'], row_table)]
-
-                if not config_table_objects:
+                config_schemas = relations_filter.get_schemas(row_table)
+                if config_schemas is None:
                     self.log.info("Got row %s.%s, but not relation", row_schema, row_table)
-                else:
-                    # Create set of all schemas by flattening and removing duplicates
-                    config_schemas = {s for r in config_table_objects for s in r['schemas']}
-                    if ALL_SCHEMAS in config_schemas:
-                        self.log.debug("All schemas are allowed for table %s.%s", row_schema, row_table)
-                    elif row_schema not in config_schemas:
-                        self.log.debug("Skipping non matched schema %s for table %s", desc_map['schema'], row_table)
-                        continue
+                elif ALL_SCHEMAS in config_schemas:
+                    self.log.debug("All schemas are allowed for table %s.%s", row_schema, row_table)
+                elif row_schema not in config_schemas:
+                    self.log.debug("Skipping non matched schema %s for table %s", row_schema, row_table)
+                    continue
 
             # Build tags
             # descriptors are: (pg_name, dd_tag_name): value
-            # Special-case the "db" tag, which overrides the one that is passed as instance_tag
-            # The reason is that pg_stat_database returns all databases regardless of the
-            # connection.
-            if not scope['relation']:
-                tags = [t for t in instance_tags if not t.startswith("db:")]
-            else:
-                tags = [t for t in instance_tags]
+            tags_key = (scope['relation'], desc_names, desc_values)
+            tags = tags_cache.get(tags_key)
+            if tags is None:
+                tags = previous_tags_cache.get(tags_key)
+            if tags is None:
+                # Special-case the "db" tag, which overrides the one that is passed as instance_tag
+                # The reason is that pg_stat_database returns all databases regardless of the
+                # connection.
+                if not scope['relation']:
+                    tags = [t for t in instance_tags if not t.startswith("db:")]
+                else:
+                    tags = [t for t in instance_tags]
 
-            tags += [("%s:%s" % (k, v)) for (k, v) in iteritems(desc_map)]
+                tags += [("%s:%s" % (k, v)) for (k, v) in zip(desc_names, desc_values)]
+            tags_cache[tags_key] = tags
 
             # [(metric-map, value), (metric-map, value), ...]
             # metric-map is: (dd_name, "rate"|"gauge")
@@ -844,10 +957,10 @@ GROUP BY datid, datname
             metric_scope.append(self.COUNT_METRICS)
 
         # Do we need relation-specific metrics?
-        relations_config = {}
+        relations_filter = None
         if relations:
             metric_scope += [self.REL_METRICS, self.IDX_METRICS, self.SIZE_METRICS, self.STATIO_METRICS]
-            relations_config = self._build_relations_config(relations)
+            relations_filter = self._get_relations_filter(key, relations)
 
         replication_metrics = self._get_replication_metrics(key, db)
         if replication_metrics is not None:
@@ -858,7 +971,7 @@ GROUP BY datid, datname
         try:
             cursor = db.cursor()
             results_len = self._query_scope(
-                cursor, db_instance_metrics, key, db, instance_tags, False, programming_error, relations_config
+                cursor, db_instance_metrics, key, db, instance_tags, False, programming_error, relations_filter
             )
             if results_len is not None:
                 self.gauge(
@@ -866,21 +979,21 @@ GROUP BY datid, datname
                 )
 
             self._query_scope(
-                cursor, bgw_instance_metrics, key, db, instance_tags, False, programming_error, relations_config
+                cursor, bgw_instance_metrics, key, db, instance_tags, False, programming_error, relations_filter
             )
             self._query_scope(
-                cursor, archiver_instance_metrics, key, db, instance_tags, False, programming_error, relations_config
+                cursor, archiver_instance_metrics, key, db, instance_tags, False, programming_error, relations_filter
             )
 
             if collect_activity_metrics:
                 activity_metrics = self._get_activity_metrics(key, db, user)
                 self._query_scope(
-                    cursor, activity_metrics, key, db, instance_tags, False, programming_error, relations_config
+                    cursor, activity_metrics, key, db, instance_tags, False, programming_error, relations_filter
                 )
 
             for scope in list(metric_scope) + custom_metrics:
                 self._query_scope(
-                    cursor, scope, key, db, instance_tags, scope in custom_metrics, programming_error, relations_config
+                    cursor, scope, key, db, instance_tags, scope in custom_metrics, programming_error, relations_filter
                 )
 
             cursor.close()
@@ -916,6 +1029,8 @@ GROUP BY datid, datname
                 else:
                     connection = connect_fct(host=host, user=user, password=password, database=dbname, ssl=ssl)
                 self.dbs[key] = connection
+                # Statements are prepared per connection
+                self.prepared_statements.pop(key, None)
                 return connection
             except Exception as e:
                 message = u'Error establishing postgres connection: %s' % (str(e))
@@ -1082,6 +1197,7 @@ GROUP BY datid, datname
         collect_database_size_metrics = is_affirmative(instance.get('collect_database_size_metrics', True))
         collect_default_db = is_affirmative(instance.get('collect_default_database', False))
         tag_replication_role = is_affirmative(instance.get('tag_replication_role', False))
+        use_prepared_statements = is_affirmative(instance.get('use_prepared_statements', False))
 
         if relations and not dbname:
             self.warning('"dbname" parameter must be set when using the "relations" parameter.')
@@ -1114,11 +1230,16 @@ GROUP BY datid, datname
         self.log.debug("Custom metrics: %s" % custom_metrics)
 
         connect_fct, interface_error, programming_error = self._get_pg_attrs(instance)
+        # pg8000 already prepares every query it runs
+        use_prepared_statements = use_prepared_statements and connect_fct is psycopg2_connect
+        self._rotate_descriptors_tags_cache(key)
 
         # Collect metrics
         try:
             # Check version
             db = self.get_connection(key, host, port, user, password, dbname, ssl, connect_fct, tags)
+            if use_prepared_statements:
+                self.prepared_statements.setdefault(key, {})
             version = self._get_version(key, db)
             self.log.debug("Running check against version %s" % version)
             if tag_replication_role:
@@ -1142,6 +1263,8 @@ GROUP BY datid, datname
         except ShouldRestartException:
             self.log.info("Resetting the connection")
             db = self.get_connection(key, host, port, user, password, dbname, ssl, connect_fct, tags, use_cached=False)
+            if use_prepared_statements:
+                self.prepared_statements.setdefault(key, {})
             self._collect_stats(
                 key,
                 db,
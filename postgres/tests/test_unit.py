@@ -4,6 +4,8 @@
 import pytest
 from mock import MagicMock
 
+from datadog_checks.postgres.postgres import ALL_SCHEMAS, RelationsFilter
+
 # Mark the entire module as tests of type `unit`
 pytestmark = pytest.mark.unit
 
@@ -263,3 +265,94 @@ def test_malformed_get_custom_queries(check):
             query_return, malformed_custom_query_column['name'], malformed_custom_query['metric_prefix']
         )
     )
+
+
+def test_relations_filter(check):
+    relations_config = check._build_relations_config(
+        [
+            'persons',
+            {'relation_regex': 'pers.*', 'schemas': ['public']},
+            {'relation_regex': 'person_.*', 'schemas': ['hr']},
+            {'relation_name': 'breed', 'schemas': ['public', 'pets']},
+        ]
+    )
+    relations_filter = RelationsFilter(relations_config)
+
+    # Explicit names take precedence over the regexes
+    assert relations_filter.get_schemas('persons') == {ALL_SCHEMAS}
+    # All the matching regexes are used
+    assert relations_filter.get_schemas('person_1') == {'public', 'hr'}
+    assert relations_filter.get_schemas('persona') == {'public'}
+    assert relations_filter.get_schemas('breed') == {'public', 'pets'}
+    assert relations_filter.get_schemas('kennel') is None
+    assert relations_filter.query_params == {
+        'relations_names': "'persons', 'breed'",
+        'relations_regexes': "'pers.*', 'person_.*'",
+    }
+
+
+def test_query_scope_relations(check, aggregator):
+    relations_filter = check._get_relations_filter(KEY, [{'relation_regex': 'persons_.*', 'schemas': ['public']}])
+    db = MagicMock()
+    cursor = MagicMock()
+    values = (10,) * len(check.REL_METRICS['metrics'])
+    cursor.fetchall.return_value = [
+        ('persons_1', 'public') + values,
+        ('persons_1', 'private') + values,
+        ('pets', 'public') + values,
+    ]
+    check.prepared_statements[KEY] = {}
+    instance_tags = ['foo:bar', 'db:dbname']
+
+    for _ in range(2):
+        check._query_scope(cursor, check.REL_METRICS, KEY, db, instance_tags, False, Exception, relations_filter)
+
+    # The query is prepared once, then executed by name
+    executed = [c[0][0] for c in cursor.execute.call_args_list]
+    assert len(executed) == 3
+    assert executed[0].startswith('PREPARE datadog_')
+    assert "relname ~ ANY(array['persons_.*']::text[])" in executed[0]
+    assert executed[1] == executed[2] == 'EXECUTE {}'.format(executed[0].split()[1])
+
+    tags = ['foo:bar', 'db:dbname', 'table:persons_1', 'schema:public']
+    aggregator.assert_metric('postgresql.seq_scans', tags=tags, count=2)
+    aggregator.assert_metric('postgresql.seq_scans', tags=['foo:bar', 'db:dbname', 'table:pets', 'schema:public'])
+    aggregator.assert_metric('postgresql.seq_scans', count=4)
+
+
+@pytest.mark.parametrize('use_prepared_statements', [False, True])
+def test_use_prepared_statements(check, use_prepared_statements):
+    pytest.importorskip('psycopg2')
+    instance = {
+        'host': 'localhost',
+        'port': 5432,
+        'username': 'user',
+        'dbname': 'dbname',
+        'use_psycopg2': True,
+        'use_prepared_statements': use_prepared_statements,
+    }
+    check.get_connection = MagicMock()
+    check._get_version = MagicMock(return_value=[9, 6, 0])
+    check._collect_stats = MagicMock()
+    check._get_custom_queries = MagicMock()
+
+    check.check(instance)
+
+    assert (('localhost', 5432, 'dbname') in check.prepared_statements) is use_prepared_statements
+
+
+def test_descriptors_tags_cache_eviction(check):
+    db = MagicMock()
+    cursor = MagicMock()
+    values = (10,) * len(check.REL_METRICS['metrics'])
+    instance_tags = ['foo:bar', 'db:dbname']
+
+    for tables in (['persons', 'pets'], ['persons'], ['persons']):
+        check._rotate_descriptors_tags_cache(KEY)
+        cursor.fetchall.return_value = [(table, 'public') + values for table in tables]
+        check._query_scope(cursor, check.REL_METRICS, KEY, db, instance_tags, False, Exception, None)
+
+    # The tags of the dropped table are forgotten
+    cache, previous_cache = check._get_descriptors_tags_cache(KEY, instance_tags)
+    assert [desc_values for _, _, desc_values in cache] == [('persons', 'public')]
+    assert [desc_values for _, _, desc_values in previous_cache] == [('persons', 'public')]
@@ -0,0 +1,92 @@
+# (C) Datadog, Inc. 2019
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+import os
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+import psutil
+
+# Long enough for all the instances of a collection cycle to share the same snapshot
+DEFAULT_SHARED_PROCESS_LIST_CACHE_DURATION = 15
+
+# `name` and `cmdline` are the `psutil.AccessDenied` error raised when they could not be read
+ProcessEntry = namedtuple('ProcessEntry', ('pid', 'name', 'cmdline'))
+
+
+class ProcessList(object):
+    """
+    Snapshot of the process table: the name and command line of every process, read once.
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.pids = {entry.pid for entry in entries}
+
+        # Index the processes by name for `exact_match`, names are case insensitive on Windows
+        self.pids_by_name = defaultdict(set)
+        self.name_denied = []
+        for entry in entries:
+            if isinstance(entry.name, psutil.AccessDenied):
+                self.name_denied.append(entry)
+            else:
+                self.pids_by_name[normalize_name(entry.name)].add(entry.pid)
+
+    @classmethod
+    def from_process_table(cls):
+        entries = []
+        for proc in psutil.process_iter():
+            try:
+                with proc.oneshot():
+                    try:
+                        name = proc.name()
+                    except psutil.AccessDenied as e:
+                        name = e
+                    try:
+                        cmdline = ' '.join(proc.cmdline())
+                    except psutil.AccessDenied as e:
+                        cmdline = e
+                    except psutil.NoSuchProcess:
+                        # Zombies have a name but no command line, they are still found by name
+                        cmdline = ''
+            except psutil.NoSuchProcess:
+                # The process disappeared while scanning
+                continue
+
+            entries.append(ProcessEntry(proc.pid, name, cmdline))
+
+        return cls(entries)
+
+
+class ProcessListCache(object):
+    """
+    Process table snapshot shared by all the instances of the check, it is read again
+    when it is older than `cache_duration` seconds.
+    ProcessListCache is threadsafe, instances of the check can run concurrently.
+    """
+
+    def __init__(self, cache_duration=DEFAULT_SHARED_PROCESS_LIST_CACHE_DURATION):
+        self.cache_duration = cache_duration
+        self._process_list = None
+        self._last_ts = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            now = time.time()
+            if self._process_list is None or now - self._last_ts > self.cache_duration:
+                self._process_list = ProcessList.from_process_table()
+                self._last_ts = now
+            return self._process_list
+
+    def reset(self):
+        with self._lock:
+            self._process_list = None
+            self._last_ts = 0
+
+
+def normalize_name(name):
+    if os.name == 'nt':
+        return name.lower()
+    return name
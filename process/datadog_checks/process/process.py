@@ -3,7 +3,6 @@
 # Licensed under a 3-clause BSD style license (see LICENSE)
 from __future__ import division
 
-import os
 import re
 import subprocess
 import time
@@ -16,6 +15,8 @@ from datadog_checks.checks import AgentCheck
 from datadog_checks.config import _is_affirmative
 from datadog_checks.utils.platform import Platform
 
+from .cache import DEFAULT_SHARED_PROCESS_LIST_CACHE_DURATION, ProcessListCache, normalize_name
+
 DEFAULT_AD_CACHE_DURATION = 120
 DEFAULT_PID_CACHE_DURATION = 120
 
@@ -53,10 +54,26 @@ ATTR_TO_METRIC_RATE = {
 }
 
 
+# Numbered or named back-references can't be used once the search strings are combined into one regex
+BACK_REFERENCE = re.compile(r'\\[1-9]|\(\?P=')
+# Inline flags, e.g. `(?i)`, would apply to every search string once they are combined
+INLINE_FLAGS = re.compile(r'\(\?[aiLmsux]+\)')
+
+
 class ProcessCheck(AgentCheck):
+    # The process table is read once and shared by all the instances of the check
+    process_list_cache = ProcessListCache()
+
     def __init__(self, name, init_config, agentConfig, instances=None):
         AgentCheck.__init__(self, name, init_config, agentConfig, instances)
 
+        self.process_list_cache.cache_duration = int(
+            init_config.get('shared_process_list_cache_duration', DEFAULT_SHARED_PROCESS_LIST_CACHE_DURATION)
+        )
+
+        # Compiled `search_string` matchers, indexed by search strings
+        self._matchers = {}
+
         # ad stands for access denied
         # We cache the PIDs getting this error and don't iterate on them more often than `access_denied_cache_duration``
         # This cache is for all PIDs so it's global, but it should be refreshed by instance
@@ -109,59 +126,99 @@ class ProcessCheck(AgentCheck):
 
         refresh_ad_cache = self.should_refresh_ad_cache(name)
 
-        matching_pids = set()
+        process_list = self.process_list_cache.get()
+        # FIXME 8.x: All has been deprecated
+        # from the doc, should be removed
+        match_all = 'All' in search_string
+
+        if exact_match:
+            matching_pids, denied = self._find_pids_by_name(process_list, search_string, match_all)
+        else:
+            matching_pids, denied = self._find_pids_by_cmdline(process_list, search_string, match_all)
 
-        for proc in psutil.process_iter():
+        if not refresh_ad_cache:
             # Skip access denied processes
-            if not refresh_ad_cache and proc.pid in self.ad_cache:
-                continue
+            matching_pids.difference_update(self.ad_cache)
+            denied = [(pid, error) for pid, error in denied if pid not in self.ad_cache]
+        else:
+            self.ad_cache.difference_update(process_list.pids)
 
-            found = False
-            for string in search_string:
-                try:
-                    # FIXME 8.x: All has been deprecated
-                    # from the doc, should be removed
-                    if string == 'All':
-                        found = True
-                    if exact_match:
-                        if os.name == 'nt':
-                            if proc.name().lower() == string.lower():
-                                found = True
-                        else:
-                            if proc.name() == string:
-                                found = True
-
-                    else:
-                        cmdline = proc.cmdline()
-                        if os.name == 'nt':
-                            lstring = string.lower()
-                            if re.search(lstring, ' '.join(cmdline).lower()):
-                                found = True
-                        else:
-                            if re.search(string, ' '.join(cmdline)):
-                                found = True
-                except psutil.NoSuchProcess:
-                    self.log.warning('Process disappeared while scanning')
-                except psutil.AccessDenied as e:
-                    ad_error_logger('Access denied to process with PID {}'.format(proc.pid))
-                    ad_error_logger('Error: {}'.format(e))
-                    if refresh_ad_cache:
-                        self.ad_cache.add(proc.pid)
-                    if not ignore_ad:
-                        raise
-                else:
-                    if refresh_ad_cache:
-                        self.ad_cache.discard(proc.pid)
-                    if found:
-                        matching_pids.add(proc.pid)
-                        break
+        for pid, error in denied:
+            ad_error_logger('Access denied to process with PID {}'.format(pid))
+            ad_error_logger('Error: {}'.format(error))
+            if refresh_ad_cache:
+                self.ad_cache.add(pid)
 
-        self.pid_cache[name] = matching_pids
-        self.last_pid_cache_ts[name] = time.time()
         if refresh_ad_cache:
+            # All the denied processes are cached, they are not retried before the next refresh
             self.last_ad_cache_ts[name] = time.time()
+        if denied and not ignore_ad:
+            raise denied[0][1]
+
+        self.pid_cache[name] = matching_pids
+        self.last_pid_cache_ts[name] = time.time()
         return matching_pids
 
+    @staticmethod
+    def _find_pids_by_name(process_list, search_string, match_all):
+        """
+        Return the pids of the processes whose name is one of the search strings, using the index of the process
+        list, and the (pid, error) of the processes whose name could not be read.
+        """
+        denied = [(entry.pid, entry.name) for entry in process_list.name_denied]
+        if match_all:
+            return process_list.pids - {pid for pid, _ in denied}, denied
+
+        matching_pids = set()
+        for string in search_string:
+            matching_pids.update(process_list.pids_by_name.get(normalize_name(string), ()))
+        return matching_pids, denied
+
+    def _find_pids_by_cmdline(self, process_list, search_string, match_all):
+        """
+        Return the pids of the processes whose command line matches any of the search strings,
+        and the (pid, error) of the processes whose command line could not be read.
+        """
+        matcher = self._get_cmdline_matcher(search_string)
+        matching_pids = set()
+        denied = []
+        for pid, _, cmdline in process_list.entries:
+            if isinstance(cmdline, psutil.AccessDenied):
+                denied.append((pid, cmdline))
+            elif match_all or matcher(normalize_name(cmdline)):
+                matching_pids.add(pid)
+        return matching_pids, denied
+
+    def _get_cmdline_matcher(self, search_string):
+        """
+        Return a function telling whether a command line matches any of the search strings, which are compiled
+        once into a single regex. Search strings are case insensitive on Windows.
+
+        The search strings using back-references or inline flags, or that cannot be compiled together, are
+        compiled on their own.
+        """
+        key = tuple(search_string)
+        matcher = self._matchers.get(key)
+        if matcher is None:
+            strings = [normalize_name(string) for string in search_string]
+            matcher = None
+            if not any(BACK_REFERENCE.search(string) or INLINE_FLAGS.search(string) for string in strings):
+                try:
+                    matcher = re.compile('|'.join('(?:{})'.format(string) for string in strings)).search
+                except (re.error, AssertionError):
+                    # Python 2 raises an AssertionError above 100 groups
+                    pass
+
+            if matcher is None:
+                patterns = [re.compile(string) for string in strings]
+
+                def matcher(cmdline):
+                    return any(pattern.search(cmdline) for pattern in patterns)
+
+            self._matchers[key] = matcher
+
+        return matcher
+
     def psutil_wrapper(self, process, method, accessors, try_sudo, *args, **kwargs):
         """
         A psutil wrapper that is calling
@@ -13,6 +13,12 @@ def dd_environment():
     yield common.INSTANCE
 
 
+@pytest.fixture(autouse=True)
+def reset_process_list_cache():
+    # The process list is shared by all the check instances, don't reuse it across tests
+    ProcessCheck.process_list_cache.reset()
+
+
 @pytest.fixture
 def check():
     return ProcessCheck(common.CHECK_NAME, {}, {})
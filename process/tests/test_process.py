@@ -2,13 +2,15 @@
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
 import os
+import time
 
 import psutil
 import pytest
-from mock import patch
+from mock import MagicMock, patch
 from six import iteritems
 
 from datadog_checks.process import ProcessCheck
+from datadog_checks.process.cache import ProcessEntry, ProcessList, ProcessListCache
 
 from . import common
 
@@ -99,6 +101,7 @@ def test_ad_cache(aggregator):
     # Reset caches
     process.last_ad_cache_ts = {}
     process.last_pid_cache_ts = {}
+    process.process_list_cache.reset()
 
     # Shouldn't throw an exception
     process.check(config['instances'][0])
@@ -329,3 +332,102 @@ def test_relocated_procfs(aggregator):
     expected_tags = generate_expected_tags(config['instances'][0])
     expected_tags += ['process:moved_procfs']
     aggregator.assert_service_check('process.up', count=1, tags=expected_tags)
+
+
+def _process_list(*entries):
+    return ProcessList([ProcessEntry(*entry) for entry in entries])
+
+
+def test_process_list_zombie():
+    zombie = MagicMock(pid=1)
+    zombie.name.return_value = 'defunct'
+    zombie.cmdline.side_effect = psutil.ZombieProcess(1)
+    gone = MagicMock(pid=2)
+    gone.name.side_effect = psutil.NoSuchProcess(2)
+
+    with patch('psutil.process_iter', return_value=[zombie, gone]):
+        process_list = ProcessList.from_process_table()
+
+    # Zombies are still found by name, the processes that disappeared are skipped
+    assert process_list.entries == [ProcessEntry(1, 'defunct', '')]
+    assert process_list.pids_by_name['defunct'] == {1}
+
+
+def test_process_list_shared_by_instances():
+    instances = [
+        {'name': 'py', 'search_string': ['python'], 'exact_match': False},
+        {'name': 'pytest', 'search_string': ['pytest'], 'exact_match': False},
+    ]
+    checks = [ProcessCheck(common.CHECK_NAME, {}, {}, [instance]) for instance in instances]
+
+    with patch('psutil.process_iter', wraps=psutil.process_iter) as process_iter:
+        for check, instance in zip(checks, instances):
+            assert os.getpid() in check.find_pids(instance['name'], instance['search_string'], False)
+
+    process_iter.assert_called_once()
+
+
+def test_process_list_cache_duration():
+    cache = ProcessListCache(cache_duration=0)
+    with patch('psutil.process_iter', return_value=[]) as process_iter:
+        cache.get()
+        time.sleep(0.01)
+        cache.get()
+        assert process_iter.call_count == 2
+
+        cache.cache_duration = 60
+        cache.get()
+        assert process_iter.call_count == 2
+
+
+def test_find_pids_exact_match():
+    process = ProcessCheck(common.CHECK_NAME, {}, {})
+    process_list = _process_list(
+        (1, 'init', 'init'), (2, 'nginx', 'nginx: master'), (3, 'nginx', 'nginx: worker'), (4, 'redis', 'redis')
+    )
+
+    with patch.object(process.process_list_cache, 'get', return_value=process_list):
+        assert process.find_pids('a', ['nginx', 'redis'], True) == {2, 3, 4}
+        assert process.find_pids('b', ['ngin'], True) == set()
+        assert process.find_pids('c', ['All'], True) == {1, 2, 3, 4}
+
+
+def test_find_pids_cmdline():
+    process = ProcessCheck(common.CHECK_NAME, {}, {})
+    process_list = _process_list(
+        (1, 'init', '/sbin/init'), (2, 'nginx', 'nginx: master'), (3, 'nginx', 'nginx: worker'), (4, 'redis', 'redis')
+    )
+
+    with patch.object(process.process_list_cache, 'get', return_value=process_list):
+        assert process.find_pids('a', ['master$', '^red'], False) == {2, 4}
+        # Back-references can't be combined, each search string is matched on its own
+        assert process.find_pids('b', [r'(s)\1', r'(n)gin'], False) == {2, 3}
+        assert process.find_pids('c', [r'(i)n\1'], False) == {1}
+        assert process.find_pids('d', ['All'], False) == {1, 2, 3, 4}
+        # Inline flags only apply to their own search string
+        assert process.find_pids('e', ['MASTER', '(?i)REDIS'], False) == {4}
+        assert process.find_pids('f', ['(?i)MASTER', 'init'], False) == {1, 2}
+
+
+def test_find_pids_cmdline_not_combined():
+    process = ProcessCheck(common.CHECK_NAME, {}, {})
+    process_list = _process_list((1, 'init', '/sbin/init'), (2, 'nginx', 'nginx: master'))
+
+    with patch.object(process.process_list_cache, 'get', return_value=process_list):
+        # The same group name can't be defined twice in the combined regex
+        assert process.find_pids('a', ['(?P<name>init)', '(?P<name>master)'], False) == {1, 2}
+
+
+def test_find_pids_access_denied():
+    process = ProcessCheck(common.CHECK_NAME, {}, {})
+    denied = psutil.AccessDenied()
+    process_list = _process_list((1, 'init', denied), (2, denied, denied), (3, 'foo', 'foo'))
+
+    with patch.object(process.process_list_cache, 'get', return_value=process_list):
+        with pytest.raises(psutil.AccessDenied):
+            process.find_pids('a', ['foo'], False, ignore_ad=False)
+        # All the denied processes were cached
+        assert process.ad_cache == {1, 2}
+
+        assert process.find_pids('a', ['foo'], False, ignore_ad=False) == {3}
+        assert process.find_pids('b', ['All'], True) == {1, 3}
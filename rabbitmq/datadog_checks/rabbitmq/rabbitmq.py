@@ -128,6 +128,24 @@ TAGS_MAP = {
 
 METRIC_SUFFIX = {EXCHANGE_TYPE: "exchange", QUEUE_TYPE: "queue", NODE_TYPE: "node", OVERVIEW_TYPE: "overview"}
 
+FAMILY_TAGS = {EXCHANGE_TYPE: 'exchange_family', QUEUE_TYPE: 'queue_family'}
+
+# The filters using back-references or inline flags, e.g. `(?i)`, change meaning once combined in a single regex
+UNCOMBINABLE_FILTER = re.compile(r'\\[1-9]|\(\?P=|\(\?[aiLmsux]+\)')
+
+# Only the fields used by the check are requested, with the `columns` parameter of the management API,
+# e.g. `message_stats/ack` => `message_stats.ack`
+COLUMNS = {
+    object_type: ','.join(
+        sorted(
+            {'name', 'vhost'}
+            | {tag for tag in TAGS_MAP[object_type] if tag not in FAMILY_TAGS.values()}
+            | {attribute.replace('/', '.') for attribute, _, _ in ATTRIBUTES[object_type]}
+        )
+    )
+    for object_type in (EXCHANGE_TYPE, QUEUE_TYPE, NODE_TYPE)
+}
+
 
 class RabbitMQException(Exception):
     pass
@@ -143,6 +161,9 @@ class RabbitMQ(AgentCheck):
         AgentCheck.__init__(self, name, init_config, agentConfig, instances)
         self.already_alerted = []
         self.cached_vhosts = {}  # this is used to send CRITICAL rabbitmq.aliveness check if the server goes down
+        self.session = requests.Session()
+        # Compiled regexes filters, by list of regexes
+        self._filter_regexes = {}
 
     def _get_config(self, instance):
         # make sure 'rabbitmq_api_url' is present and get parameters
@@ -179,6 +200,9 @@ class RabbitMQ(AgentCheck):
             NODE_TYPE: int(instance.get('max_detailed_nodes', MAX_DETAILED_NODES)),
         }
 
+        # Number of objects per request, 0 to fetch all of them with a single request
+        page_size = {QUEUE_TYPE: int(instance.get('queues_page_size', 0))}
+
         # List of queues/nodes to collect metrics from
         specified = {
             EXCHANGE_TYPE: {
@@ -196,7 +220,7 @@ class RabbitMQ(AgentCheck):
 
         auth = (username, password)
 
-        return base_url, max_detailed, specified, auth, ssl_verify, custom_tags, suppress_warning
+        return base_url, max_detailed, specified, auth, ssl_verify, custom_tags, suppress_warning, page_size
 
     def _get_vhosts(self, instance, base_url, auth=None, ssl_verify=True):
         vhosts = instance.get('vhosts')
@@ -211,7 +235,16 @@ class RabbitMQ(AgentCheck):
         return vhosts
 
     def check(self, instance):
-        base_url, max_detailed, specified, auth, ssl_verify, custom_tags, suppress_warning = self._get_config(instance)
+        (
+            base_url,
+            max_detailed,
+            specified,
+            auth,
+            ssl_verify,
+            custom_tags,
+            suppress_warning,
+            page_size,
+        ) = self._get_config(instance)
         try:
             with warnings.catch_warnings():
                 vhosts = self._get_vhosts(instance, base_url, auth=auth, ssl_verify=ssl_verify)
@@ -236,6 +269,7 @@ class RabbitMQ(AgentCheck):
                     custom_tags,
                     auth=auth,
                     ssl_verify=ssl_verify,
+                    page_size=page_size.get(EXCHANGE_TYPE, 0),
                 )
                 self.get_stats(
                     instance,
@@ -247,6 +281,7 @@ class RabbitMQ(AgentCheck):
                     custom_tags,
                     auth=auth,
                     ssl_verify=ssl_verify,
+                    page_size=page_size.get(QUEUE_TYPE, 0),
                 )
                 self.get_stats(
                     instance,
@@ -258,6 +293,7 @@ class RabbitMQ(AgentCheck):
                     custom_tags,
                     auth=auth,
                     ssl_verify=ssl_verify,
+                    page_size=page_size.get(NODE_TYPE, 0),
                 )
                 self.get_overview_stats(instance, base_url, custom_tags, auth=auth, ssl_verify=ssl_verify)
 
@@ -297,12 +333,17 @@ class RabbitMQ(AgentCheck):
                     message="Could not contact aliveness API",
                 )
 
-    def _get_data(self, url, auth=None, ssl_verify=True, proxies=None):
+    def _get_data(self, url, auth=None, ssl_verify=True, proxies=None, params=None):
         if proxies is None:
             proxies = {}
         try:
-            r = requests.get(
-                url, auth=auth, proxies=proxies, timeout=self.default_integration_http_timeout, verify=ssl_verify
+            r = self.session.get(
+                url,
+                params=params,
+                auth=auth,
+                proxies=proxies,
+                timeout=self.default_integration_http_timeout,
+                verify=ssl_verify,
             )
             r.raise_for_status()
             return r.json()
@@ -311,56 +352,113 @@ class RabbitMQ(AgentCheck):
         except ValueError as e:
             raise RabbitMQException('Cannot parse JSON response from API url: {} {}'.format(url, str(e)))
 
+    def _get_data_pages(self, url, page_size=0, auth=None, ssl_verify=True, proxies=None, params=None):
+        """
+        Yield the lists of objects returned by the API, `page_size` objects at a time if set.
+
+        Pagination requires RabbitMQ 3.6.2+, the objects are then returned under `items`.
+        """
+        if not page_size:
+            yield self._get_data(url, auth=auth, ssl_verify=ssl_verify, proxies=proxies, params=params)
+            return
+
+        page = 1
+        while True:
+            page_params = dict(params or {}, page=page, page_size=page_size)
+            data = self._get_data(url, auth=auth, ssl_verify=ssl_verify, proxies=proxies, params=page_params)
+            yield data.get('items', [])
+            if page >= data.get('page_count', 0):
+                break
+            page += 1
+
+    def _get_filter_regexes(self, regex_filters):
+        """
+        Compile the regexes filters, the result is cached across runs.
+
+        The filters are combined in a single regex: each one is an alternative anchored at the start of
+        the name, with a lookahead searching the filter anywhere in it. The alternatives are tried in
+        the order of the configuration, so the result is the same as one `re.search` per filter.
+
+        Return a list of (regex, {alternative group name: index of the first group of the filter}),
+        the mapping is None for the filters that cannot be combined (they use backreferences or inline
+        flags, or the combined regex does not compile) and are compiled on their own.
+        """
+        key = tuple(regex_filters)
+        if key in self._filter_regexes:
+            return self._filter_regexes[key]
+
+        if any(UNCOMBINABLE_FILTER.search(regex_filter) for regex_filter in regex_filters):
+            compiled = [(re.compile(regex_filter), None) for regex_filter in regex_filters]
+            self._filter_regexes[key] = compiled
+            return compiled
+
+        alternatives = []
+        family_groups = {}
+        for i, regex_filter in enumerate(regex_filters):
+            group_name = '_filter{}'.format(i)
+            alternatives.append(r'(?=[\s\S]*?(?P<{}>{}))'.format(group_name, regex_filter))
+            family_groups[group_name] = re.compile(regex_filter).groups > 0
+
+        try:
+            regex = re.compile(r'^(?:{})'.format('|'.join(alternatives)))
+        except (re.error, AssertionError):
+            # Python 2 raises an AssertionError above 100 groups
+            compiled = [(re.compile(regex_filter), None) for regex_filter in regex_filters]
+        else:
+            for group_name, has_groups in iteritems(family_groups):
+                family_groups[group_name] = regex.groupindex[group_name] + 1 if has_groups else None
+            compiled = [(regex, family_groups)]
+
+        self._filter_regexes[key] = compiled
+        return compiled
+
+    @staticmethod
+    def _match_filter_regexes(regexes, name):
+        """
+        Return whether the name matches one of the compiled filters, and the first group it captured.
+        """
+        for regex, family_groups in regexes:
+            if family_groups is None:
+                match = regex.search(name)
+                family_group = 1 if regex.groups else None
+            else:
+                match = regex.match(name)
+                family_group = family_groups[match.lastgroup] if match else None
+            if match:
+                return True, match.group(family_group) if family_group else None
+        return False, None
+
     def _filter_list(self, data, explicit_filters, regex_filters, object_type, tag_families):
-        if explicit_filters or regex_filters:
-            matching_lines = []
-            for data_line in data:
-                name = data_line.get("name")
+        """
+        Return the objects matching the filters. The explicit filters that matched an object are
+        removed from `explicit_filters`, so it can be shared by successive calls.
+        """
+        if not explicit_filters and not regex_filters:
+            return data
+
+        regexes = self._get_filter_regexes(regex_filters)
+        family_tag = FAMILY_TAGS.get(object_type) if is_affirmative(tag_families) else None
+
+        matching_lines = []
+        for data_line in data:
+            names = [data_line.get("name")]
+            # Absolute names work only for queues and exchanges
+            if object_type == QUEUE_TYPE or object_type == EXCHANGE_TYPE:
+                names.append('{}/{}'.format(data_line.get("vhost"), names[0]))
+
+            for name in names:
                 if name in explicit_filters:
                     matching_lines.append(data_line)
                     explicit_filters.remove(name)
-                    continue
-
-                match_found = False
-                for p in regex_filters:
-                    match = re.search(p, name)
-                    if match:
-                        if is_affirmative(tag_families) and match.groups():
-                            if object_type == QUEUE_TYPE:
-                                data_line["queue_family"] = match.groups()[0]
-                            if object_type == EXCHANGE_TYPE:
-                                data_line["exchange_family"] = match.groups()[0]
-                        matching_lines.append(data_line)
-                        match_found = True
-                        break
+                    break
 
+                match_found, family = self._match_filter_regexes(regexes, name)
                 if match_found:
-                    continue
-
-                # Absolute names work only for queues and exchanges
-                if object_type != QUEUE_TYPE and object_type != EXCHANGE_TYPE:
-                    continue
-                absolute_name = '{}/{}'.format(data_line.get("vhost"), name)
-                if absolute_name in explicit_filters:
+                    if family_tag and family is not None:
+                        data_line[family_tag] = family
                     matching_lines.append(data_line)
-                    explicit_filters.remove(absolute_name)
-                    continue
-
-                for p in regex_filters:
-                    match = re.search(p, absolute_name)
-                    if match:
-                        if is_affirmative(tag_families) and match.groups():
-                            if object_type == QUEUE_TYPE:
-                                data_line["queue_family"] = match.groups()[0]
-                            if object_type == EXCHANGE_TYPE:
-                                data_line["exchange_family"] = match.groups()[0]
-                        matching_lines.append(data_line)
-                        match_found = True
-                        break
-                if match_found:
-                    continue
-            return matching_lines
-        return data
+                    break
+        return matching_lines
 
     def _get_tags(self, data, object_type, custom_tags):
         tags = []
@@ -383,6 +481,7 @@ class RabbitMQ(AgentCheck):
         custom_tags,
         auth=None,
         ssl_verify=True,
+        page_size=0,
     ):
         """
         instance: the check instance
@@ -390,30 +489,40 @@ class RabbitMQ(AgentCheck):
         object_type: either QUEUE_TYPE or NODE_TYPE or EXCHANGE_TYPE
         max_detailed: the limit of objects to collect for this type
         filters: explicit or regexes filters of specified queues or nodes (specified in the yaml file)
+        page_size: the number of objects to fetch per request, 0 to fetch them all at once
         """
         instance_proxy = self.get_instance_proxy(instance, base_url)
-        # Make a copy of this list as we will remove items from it at each
+        # Make a copy of the explicit filters as we will remove items from it at each
         # iteration
-        explicit_filters = list(filters['explicit'])
+        explicit_filters = set(filters['explicit'])
         regex_filters = filters['regexes']
+        tag_families = instance.get("tag_families", False)
+
+        if len(explicit_filters) > max_detailed:
+            raise Exception("The maximum number of {} you can specify is {}.".format(object_type, max_detailed))
 
+        params = {'columns': COLUMNS[object_type]}
         data = []
 
         # only do this if vhosts were specified,
         # otherwise it'll just be making more queries for the same data
         if self._limit_vhosts(instance) and object_type == QUEUE_TYPE:
-            for vhost in limit_vhosts:
-                url = '{}/{}'.format(object_type, quote_plus(vhost))
-                try:
-                    data += self._get_data(
-                        urljoin(base_url, url), auth=auth, ssl_verify=ssl_verify, proxies=instance_proxy
-                    )
-                except Exception as e:
-                    self.log.debug("Couldn't grab queue data from vhost, {}: {}".format(vhost, e))
+            urls = [urljoin(base_url, '{}/{}'.format(object_type, quote_plus(vhost))) for vhost in limit_vhosts]
         else:
-            data = self._get_data(
-                urljoin(base_url, object_type), auth=auth, ssl_verify=ssl_verify, proxies=instance_proxy
-            )
+            urls = [urljoin(base_url, object_type)]
+
+        for url in urls:
+            try:
+                # a list of queues/nodes is specified. We process only those, filtering each page as
+                # it is fetched to only keep the matching objects in memory
+                for page in self._get_data_pages(
+                    url, page_size, auth=auth, ssl_verify=ssl_verify, proxies=instance_proxy, params=params
+                ):
+                    data += self._filter_list(page, explicit_filters, regex_filters, object_type, tag_families)
+            except Exception as e:
+                if len(urls) == 1:
+                    raise
+                self.log.debug("Couldn't grab queue data from vhost, {}: {}".format(url, e))
 
         """ data is a list of nodes or queues:
         data = [
@@ -515,14 +624,6 @@ class RabbitMQ(AgentCheck):
             ...
         ]
         """
-        if len(explicit_filters) > max_detailed:
-            raise Exception("The maximum number of {} you can specify is {}.".format(object_type, max_detailed))
-
-        # a list of queues/nodes is specified. We process only those
-        data = self._filter_list(
-            data, explicit_filters, regex_filters, object_type, instance.get("tag_families", False)
-        )
-
         # if no filters are specified, check everything according to the limits
         if len(data) > ALERT_THRESHOLD * max_detailed:
             # Post a message on the dogweb stream to warn
@@ -7,13 +7,13 @@ import pytest
 import requests
 
 from datadog_checks.rabbitmq import RabbitMQ
-from datadog_checks.rabbitmq.rabbitmq import RabbitMQException
+from datadog_checks.rabbitmq.rabbitmq import COLUMNS, EXCHANGE_TYPE, NODE_TYPE, QUEUE_TYPE, RabbitMQException
 
 
 @pytest.mark.unit
 def test__get_data(check):
-    with mock.patch('datadog_checks.rabbitmq.rabbitmq.requests') as r:
-        r.get.side_effect = [requests.exceptions.HTTPError, ValueError]
+    with mock.patch.object(check.session, 'get') as get:
+        get.side_effect = [requests.exceptions.HTTPError, ValueError]
         with pytest.raises(RabbitMQException) as e:
             check._get_data('')
             assert isinstance(e, RabbitMQException)
@@ -78,3 +78,94 @@ def test__check_aliveness(check, aggregator):
     with pytest.raises(RabbitMQException) as e:
         check._get_vhosts(instance, '')
         assert isinstance(e, RabbitMQException)
+
+
+@pytest.mark.unit
+def test__filter_list(check):
+    data = [
+        {'name': 'test1', 'vhost': '/'},
+        {'name': 'test1', 'vhost': 'myvhost'},
+        {'name': 'other', 'vhost': 'myvhost'},
+        {'name': 'queue.orders.42', 'vhost': '/'},
+        {'name': 'unmatched', 'vhost': '/'},
+    ]
+    explicit_filters = {'test1', 'myvhost/other'}
+    filtered = check._filter_list(
+        [dict(d) for d in data], explicit_filters, [r'orders\.(\d+)', r'queue\.(\w+)'], QUEUE_TYPE, True
+    )
+
+    # An explicit filter matches a single object
+    assert [(d['vhost'], d['name']) for d in filtered] == [
+        ('/', 'test1'),
+        ('myvhost', 'other'),
+        ('/', 'queue.orders.42'),
+    ]
+    assert explicit_filters == set()
+    # The first group of the first matching regex, in the order of the configuration, is the family
+    assert filtered[2]['queue_family'] == '42'
+
+    # Nodes do not have absolute names
+    assert check._filter_list([dict(d) for d in data], set(), [r'^myvhost/'], NODE_TYPE, False) == []
+    assert check._filter_list(data, set(), [], EXCHANGE_TYPE, False) is data
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    'regex_filters',
+    [
+        pytest.param([r'(?i)TEST\d', r'^x'], id='global flags'),
+        pytest.param([r'^x', r'(?i)TEST\d'], id='global flags not first'),
+        pytest.param([r'(t)es\1', r'^x'], id='backreferences'),
+        pytest.param([r'^x', r'(t)es\1'], id='backreferences not first'),
+    ],
+)
+def test__filter_list_not_combined(check, regex_filters):
+    data = [{'name': 'test1', 'vhost': '/'}, {'name': 'x', 'vhost': '/'}, {'name': 'y', 'vhost': '/'}]
+
+    filtered = check._filter_list(data, set(), regex_filters, EXCHANGE_TYPE, True)
+
+    assert [d['name'] for d in filtered] == ['test1', 'x']
+    assert len(check._get_filter_regexes(regex_filters)) == len(regex_filters)
+
+
+@pytest.mark.unit
+def test__filter_list_many_filters(check):
+    data = [{'name': 'test1', 'vhost': '/'}, {'name': 'test149', 'vhost': '/'}, {'name': 'y', 'vhost': '/'}]
+    regex_filters = [r'^(test){}$'.format(i) for i in range(150)]
+
+    filtered = check._filter_list(data, set(), regex_filters, EXCHANGE_TYPE, True)
+
+    assert [d['name'] for d in filtered] == ['test1', 'test149']
+
+
+@pytest.mark.unit
+def test_get_stats_paginated(check, aggregator):
+    instance = {'rabbitmq_api_url': 'http://example.com/api/', 'queues_regexes': [r'test\d']}
+    pages = {
+        1: {
+            'items': [{'name': 'test1', 'vhost': '/', 'messages': 1}, {'name': 'other', 'vhost': '/'}],
+            'page_count': 2,
+        },
+        2: {'items': [{'name': 'test2', 'vhost': '/', 'messages': 2}], 'page_count': 2},
+    }
+    check._get_data = mock.MagicMock(side_effect=lambda url, params=None, **kwargs: pages[params['page']])
+    check._get_queue_bindings_metrics = mock.MagicMock()
+
+    check.get_stats(
+        instance,
+        instance['rabbitmq_api_url'],
+        QUEUE_TYPE,
+        200,
+        {'explicit': [], 'regexes': instance['queues_regexes']},
+        [],
+        [],
+        page_size=1,
+    )
+
+    params = [call[1]['params'] for call in check._get_data.call_args_list]
+    assert [(p['page'], p['page_size']) for p in params] == [(1, 1), (2, 1)]
+    assert all(p['columns'] == COLUMNS[QUEUE_TYPE] for p in params)
+    assert 'message_stats.ack_details.rate' in COLUMNS[QUEUE_TYPE].split(',')
+    aggregator.assert_metric('rabbitmq.queue.messages', value=1, tags=['rabbitmq_queue:test1', 'rabbitmq_vhost:/'])
+    aggregator.assert_metric('rabbitmq.queue.messages', value=2, tags=['rabbitmq_queue:test2', 'rabbitmq_vhost:/'])
+    aggregator.assert_metric('rabbitmq.queue.messages', count=2)
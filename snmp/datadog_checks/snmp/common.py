@@ -0,0 +1,26 @@
+# (C) Datadog, Inc. 2019
+# All rights reserved
+# Licensed under Simplified BSD License (see LICENSE)
+from pyasn1.type.univ import Null
+from pysnmp import hlapi
+from pysnmp.smi.exval import endOfMibView, noSuchInstance, noSuchObject
+
+
+def reply_invalid(oid):
+    return noSuchInstance.isSameTypeWith(oid) or noSuchObject.isSameTypeWith(oid)
+
+
+def oid_tuple(name):
+    if isinstance(name, hlapi.ObjectIdentity):
+        return name.getOid().asTuple()
+    return name.asTuple()
+
+
+def walked_out_of_table(result_oid, value, prefix):
+    """
+    Whether a value returned by a walk of the table `prefix` is past its end: the walk then returns an empty
+    or `endOfMibView` value, or the OID following the table.
+    """
+    if isinstance(value, Null) or endOfMibView.isSameTypeWith(value):
+        return True
+    return oid_tuple(result_oid)[: len(prefix)] != prefix
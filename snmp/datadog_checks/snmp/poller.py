@@ -0,0 +1,243 @@
+# (C) Datadog, Inc. 2019
+# All rights reserved
+# Licensed under Simplified BSD License (see LICENSE)
+import time
+from collections import defaultdict, deque
+from functools import partial
+
+from pysnmp import hlapi
+from pysnmp.error import PySnmpError
+from pysnmp.hlapi.asyncore import bulkCmd, getCmd, nextCmd
+from pysnmp.proto import errind
+
+from datadog_checks.checks.network import Status
+
+from .common import oid_tuple, reply_invalid, walked_out_of_table
+
+# Requests of a device waiting for a response at the same time
+DEFAULT_DEVICE_MAX_IN_FLIGHT = 1
+
+
+class DevicePoll(object):
+    """
+    Queries of a device polled by a SnmpPoller, and their results.
+
+    Like `SnmpCheck.check_table`, each batch of OIDs is queried with a GET request first and the OIDs
+    that are not found are walked with GETBULK (or GETNEXT) requests. Errors are recorded in `instance`
+    the same way, so that the same service check is reported.
+    """
+
+    def __init__(self, instance, auth_data, transport_target, context_data, bulk_max_repetitions):
+        self.instance = instance
+        self.auth_data = auth_data
+        self.transport_target = transport_target
+        self.context_data = context_data
+        self.bulk_max_repetitions = bulk_max_repetitions
+
+        # query name --> var binds returned by the device
+        self.binds = defaultdict(list)
+        # Queries that could not be completed, the device is not queried anymore
+        self.failed = set()
+        self.warnings = []
+        self.timeouts = 0
+        self.start = None
+        self.end = None
+
+        self.requests = deque()
+        self.in_flight = 0
+
+    @property
+    def duration(self):
+        if self.start is None or self.end is None:
+            return None
+        return self.end - self.start
+
+    def fail(self, query, error_indication):
+        if isinstance(error_indication, errind.RequestTimedOut):
+            self.timeouts += 1
+        self.failed.add(query)
+        if "service_check_error" not in self.instance:
+            self.instance["service_check_error"] = "{} for instance {}".format(
+                error_indication, self.instance["ip_address"]
+            )
+
+    def set_error_status(self, error_status):
+        message = "{} for instance {}".format(error_status.prettyPrint(), self.instance["ip_address"])
+        self.instance["service_check_error"] = message
+
+        # submit CRITICAL service check if we can't connect to device
+        if 'unknownUserName' in message:
+            self.instance["service_check_severity"] = Status.CRITICAL
+        self.warnings.append(message)
+
+    def set_snmp_error(self, error):
+        message = "Fail to collect some metrics: {}".format(error)
+        if "service_check_error" not in self.instance:
+            self.instance["service_check_error"] = message
+        if "service_check_severity" not in self.instance:
+            self.instance["service_check_severity"] = Status.CRITICAL
+        self.warnings.append(message)
+
+
+class SnmpPoller(object):
+    """
+    Polls many devices concurrently with a single SnmpEngine: the requests of all the devices are sent
+    and their responses processed by the asyncore dispatcher of the engine, so a device that is slow
+    or unreachable doesn't delay the others. Each device has at most `max_in_flight` requests waiting
+    for a response.
+    """
+
+    def __init__(
+        self,
+        snmp_engine,
+        oid_batch_size,
+        max_in_flight=DEFAULT_DEVICE_MAX_IN_FLIGHT,
+        ignore_nonincreasing_oid=False,
+        timer=time.time,
+    ):
+        self.snmp_engine = snmp_engine
+        self.oid_batch_size = oid_batch_size
+        self.max_in_flight = max(max_in_flight, 1)
+        self.ignore_nonincreasing_oid = ignore_nonincreasing_oid
+        self.timer = timer
+        self.polls = []
+
+    def add(self, poll, queries):
+        """
+        Schedule the poll of a device.
+
+        :param queries: list of (query name, oids, lookup_mib)
+        """
+        for query, oids, lookup_mib in queries:
+            for first_oid in range(0, len(oids), self.oid_batch_size):
+                oids_batch = oids[first_oid : first_oid + self.oid_batch_size]
+                poll.requests.append((query, partial(self._get, poll, query, oids_batch, lookup_mib)))
+        self.polls.append(poll)
+
+    def run(self):
+        """
+        Poll all the devices and return once every request is complete.
+        """
+        for poll in self.polls:
+            poll.start = self.timer()
+            poll.end = poll.start
+            self._send_requests(poll)
+
+        self.snmp_engine.transportDispatcher.runDispatcher()
+        return self.polls
+
+    def _send_requests(self, poll):
+        while poll.requests and poll.in_flight < self.max_in_flight:
+            query, send = poll.requests.popleft()
+            if poll.failed:
+                # Like check_table, stop querying the device after a failure
+                continue
+
+            poll.in_flight += 1
+            try:
+                send()
+            except PySnmpError as e:
+                poll.in_flight -= 1
+                poll.set_snmp_error(e)
+
+    def _request_done(self, poll):
+        poll.in_flight -= 1
+        poll.end = self.timer()
+        self._send_requests(poll)
+
+    def _get(self, poll, query, oids, lookup_mib):
+        getCmd(
+            self.snmp_engine,
+            poll.auth_data,
+            poll.transport_target,
+            poll.context_data,
+            *oids,
+            lookupMib=lookup_mib,
+            cbFun=self._on_get_response,
+            cbCtx=(poll, query, lookup_mib)
+        )
+
+    def _on_get_response(
+        self, snmp_engine, send_request_handle, error_indication, error_status, error_index, var_binds, cb_ctx
+    ):
+        poll, query, lookup_mib = cb_ctx
+        try:
+            if error_indication:
+                poll.fail(query, error_indication)
+                return
+
+            missing_oids = []
+            for var in var_binds:
+                result_oid, value = var
+                if reply_invalid(value):
+                    missing_oids.append(oid_tuple(result_oid))
+                else:
+                    poll.binds[query].append(var)
+
+            if missing_oids:
+                # Walk the tables of the OIDs that were not found before sending the next batch
+                poll.requests.appendleft((query, partial(self._walk, poll, query, missing_oids, lookup_mib)))
+        finally:
+            self._request_done(poll)
+
+    def _walk(self, poll, query, oids, lookup_mib):
+        var_binds = [hlapi.ObjectType(hlapi.ObjectIdentity(oid)) for oid in oids]
+        cb_ctx = (poll, query, oids)
+        if poll.bulk_max_repetitions:
+            bulkCmd(
+                self.snmp_engine,
+                poll.auth_data,
+                poll.transport_target,
+                poll.context_data,
+                0,
+                poll.bulk_max_repetitions,
+                *var_binds,
+                lookupMib=lookup_mib,
+                cbFun=self._on_walk_response,
+                cbCtx=cb_ctx
+            )
+        else:
+            nextCmd(
+                self.snmp_engine,
+                poll.auth_data,
+                poll.transport_target,
+                poll.context_data,
+                *var_binds,
+                lookupMib=lookup_mib,
+                cbFun=self._on_walk_response,
+                cbCtx=cb_ctx
+            )
+
+    def _on_walk_response(
+        self, snmp_engine, send_request_handle, error_indication, error_status, error_index, var_bind_table, cb_ctx
+    ):
+        """
+        Keep the rows of the walked tables and return whether the walk should go on, it stops at the end
+        of the tables instead of walking through the entire MIB.
+        """
+        poll, query, prefixes = cb_ctx
+        walking = False
+        try:
+            if error_indication:
+                if not (self.ignore_nonincreasing_oid and isinstance(error_indication, errind.OidNotIncreasing)):
+                    poll.fail(query, error_indication)
+                return False
+
+            if error_status:
+                # noSuchName is the end of the MIB for SNMP v1 agents
+                if int(error_status) != 2:
+                    poll.set_error_status(error_status)
+                return False
+
+            for row in var_bind_table:
+                walking = False
+                for (result_oid, value), prefix in zip(row, prefixes):
+                    if walked_out_of_table(result_oid, value, prefix):
+                        continue
+                    poll.binds[query].append((result_oid, value))
+                    walking = True
+
+            return walking
+        finally:
+            if not walking:
+                self._request_done(poll)
@@ -0,0 +1,78 @@
+# (C) Datadog, Inc. 2019
+# All rights reserved
+# Licensed under Simplified BSD License (see LICENSE)
+from pysnmp import hlapi
+from pysnmp.proto import rfc1902
+
+
+class OIDColumn(object):
+    """
+    A column (or scalar) of a MIB: the numeric OID prefix of its cells, its symbol, and the table
+    row used to decode the index of a cell from the rest of its OID.
+    """
+
+    def __init__(self, prefix, symbol, row_node=None):
+        self.prefix = prefix
+        self.symbol = symbol
+        self.row_node = row_node
+
+    def get_indexes(self, suffix):
+        if self.row_node is not None:
+            return self.row_node.getIndicesFromInstId(suffix)
+        if suffix:
+            return (rfc1902.ObjectName(suffix),)
+        return ()
+
+
+class OIDResolver(object):
+    """
+    Resolves the numeric OIDs returned by a device into (metric symbol, indexes).
+
+    Resolving an OID with the MIBs is expensive, so the columns and scalars found are
+    cached by OID prefix: a walk of a table only resolves one OID per column with the
+    MIBs, the indexes of the other cells are decoded from the layout of the table row.
+    """
+
+    def __init__(self):
+        self._columns = {}
+        # Longest first, the most specific node wins
+        self._prefix_lengths = []
+
+    def resolve(self, oid, mib_view_controller, mibs_to_load):
+        """
+        :param oid: the numeric OID, as a tuple
+        :return: (symbol, indexes)
+        """
+        for length in self._prefix_lengths:
+            column = self._columns.get(oid[:length])
+            if column is not None:
+                return column.symbol, column.get_indexes(oid[length:])
+
+        object_identity = hlapi.ObjectIdentity(oid).loadMibs(*mibs_to_load).resolveWithMib(mib_view_controller)
+        _, symbol, indexes = object_identity.getMibSymbol()
+
+        column = self._get_column(object_identity.getMibNode(), symbol, mib_view_controller)
+        if column is not None and oid[: len(column.prefix)] == column.prefix:
+            self._columns[column.prefix] = column
+            if len(column.prefix) not in self._prefix_lengths:
+                self._prefix_lengths.append(len(column.prefix))
+                self._prefix_lengths.sort(reverse=True)
+
+        return symbol, indexes
+
+    @staticmethod
+    def _get_column(mib_node, symbol, mib_view_controller):
+        MibScalar, MibTableColumn = mib_view_controller.mibBuilder.importSymbols(
+            'SNMPv2-SMI', 'MibScalar', 'MibTableColumn'
+        )
+        prefix = tuple(mib_node.name)
+
+        if isinstance(mib_node, MibTableColumn):
+            row_mod_name, row_sym_name, _ = mib_view_controller.getNodeLocation(mib_node.name[:-1])
+            (row_node,) = mib_view_controller.mibBuilder.importSymbols(row_mod_name, row_sym_name)
+            return OIDColumn(prefix, symbol, row_node)
+        if isinstance(mib_node, MibScalar):
+            return OIDColumn(prefix, symbol)
+
+        # Other nodes can have columns or scalars below them that are not loaded yet, they are never cached
+        return None
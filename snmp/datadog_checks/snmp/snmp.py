@@ -8,12 +8,15 @@ from pyasn1.type.univ import OctetString
 from pysnmp import hlapi
 from pysnmp.error import PySnmpError
 from pysnmp.smi import builder, view
-from pysnmp.smi.exval import noSuchInstance, noSuchObject
 from six import iteritems
 
 from datadog_checks.checks.network import NetworkCheck, Status
 from datadog_checks.config import _is_affirmative
 
+from .common import oid_tuple, reply_invalid, walked_out_of_table
+from .poller import DEFAULT_DEVICE_MAX_IN_FLIGHT, DevicePoll, SnmpPoller
+from .resolver import OIDResolver
+
 # Additional types that are not part of the SNMP protocol. cf RFC 2856
 (CounterBasedGauge64, ZeroBasedCounter64) = builder.MibBuilder().importSymbols(
     "HCNUM-TC", "CounterBasedGauge64", "ZeroBasedCounter64"
@@ -34,9 +37,8 @@ SNMP_GAUGES = frozenset(
 
 DEFAULT_OID_BATCH_SIZE = 10
 
-
-def reply_invalid(oid):
-    return noSuchInstance.isSameTypeWith(oid) or noSuchObject.isSameTypeWith(oid)
+# Rows asked per GETBULK request when walking tables, 0 walks them with GETNEXT
+DEFAULT_BULK_MAX_REPETITIONS = 10
 
 
 class SnmpCheck(NetworkCheck):
@@ -55,6 +57,19 @@ class SnmpCheck(NetworkCheck):
         # Set OID batch size
         self.oid_batch_size = int(init_config.get("oid_batch_size", DEFAULT_OID_BATCH_SIZE))
 
+        # Set GETBULK max repetitions
+        self.bulk_max_repetitions = int(init_config.get("bulk_max_repetitions", DEFAULT_BULK_MAX_REPETITIONS))
+
+        # Per device cache of the MIB columns found in the results, see OIDResolver
+        self.oid_resolvers = defaultdict(OIDResolver)
+
+        # Created once, shared by all the devices polled by the check
+        self._snmp_engine = None
+        self._mib_view_controller = None
+
+        # Per instance cache of the parsed metrics definitions
+        self._parsed_metrics = {}
+
         # Load Custom MIB directory
         self.mibs_path = None
         self.ignore_nonincreasing_oid = False
@@ -67,13 +82,13 @@ class SnmpCheck(NetworkCheck):
     def _load_conf(self, instance):
         tags = instance.get("tags", [])
         ip_address = instance["ip_address"]
-        metrics = instance.get('metrics', [])
+        metrics = list(instance.get('metrics', []))
         if _is_affirmative(instance.get('use_global_metrics', True)):
             metrics.extend(self.init_config.get('global_metrics', []))
         timeout = int(instance.get('timeout', self.DEFAULT_TIMEOUT))
         retries = int(instance.get('retries', self.DEFAULT_RETRIES))
         enforce_constraints = _is_affirmative(instance.get('enforce_mib_constraints', True))
-        snmp_engine, mib_view_controller = self.create_snmp_engine(self.mibs_path)
+        snmp_engine, mib_view_controller = self.get_snmp_engine()
 
         return snmp_engine, mib_view_controller, ip_address, tags, metrics, timeout, retries, enforce_constraints
 
@@ -111,6 +126,15 @@ class SnmpCheck(NetworkCheck):
 
         return snmp_engine, mib_view_controller
 
+    def get_snmp_engine(self):
+        '''
+        Return the command generator and MIB view controller of the check,
+        they are created at the first call and reused afterwards.
+        '''
+        if self._snmp_engine is None:
+            self._snmp_engine, self._mib_view_controller = self.create_snmp_engine(self.mibs_path)
+        return self._snmp_engine, self._mib_view_controller
+
     @classmethod
     def get_auth_data(cls, instance):
         '''
@@ -179,6 +203,16 @@ class SnmpCheck(NetworkCheck):
         port = int(instance.get("port", 161))  # Default SNMP port
         return hlapi.UdpTransportTarget((ip_address, port), timeout=timeout, retries=retries)
 
+    def get_bulk_max_repetitions(self, instance):
+        '''
+        Return how many rows to ask in each GETBULK request of a table walk,
+        0 if the table has to be walked with GETNEXT requests.
+        '''
+        if "community_string" in instance and int(instance.get("snmp_version", 2)) == 1:
+            # GETBULK is not part of SNMP v1
+            return 0
+        return int(instance.get("bulk_max_repetitions", self.bulk_max_repetitions))
+
     def raise_on_error_indication(self, error_indication, instance):
         if error_indication:
             message = "{} for instance {}".format(error_indication, instance["ip_address"])
@@ -218,10 +252,11 @@ class SnmpCheck(NetworkCheck):
         transport_target = self.get_transport_target(instance, timeout, retries)
         auth_data = self.get_auth_data(instance)
         context_engine_id, context_name = self.get_context_data(instance)
+        bulk_max_repetitions = self.get_bulk_max_repetitions(instance)
+        oid_resolver = self.oid_resolvers[self._get_instance_key(instance)]
 
         first_oid = 0
         all_binds = []
-        results = defaultdict(dict)
 
         while first_oid < len(oids):
             try:
@@ -244,29 +279,49 @@ class SnmpCheck(NetworkCheck):
                 self.raise_on_error_indication(error_indication, instance)
 
                 missing_results = []
+                # The OIDs of the missing results, the prefixes of the tables walked to find them
+                missing_prefixes = []
                 complete_results = []
 
                 for var in var_binds:
                     result_oid, value = var
                     if reply_invalid(value):
-                        oid_tuple = result_oid.asTuple()
-                        missing_results.append(hlapi.ObjectType(hlapi.ObjectIdentity(oid_tuple)))
+                        missing_prefix = oid_tuple(result_oid)
+                        missing_prefixes.append(missing_prefix)
+                        missing_results.append(hlapi.ObjectType(hlapi.ObjectIdentity(missing_prefix)))
                     else:
                         complete_results.append(var)
 
                 if missing_results:
-                    # If we didn't catch the metric using snmpget, try snmpnext
-                    self.log.debug("Running SNMP command getNext on OIDS {}".format(missing_results))
-                    for error_indication, error_status, _, var_binds_table in hlapi.nextCmd(
-                        snmp_engine,
-                        auth_data,
-                        transport_target,
-                        hlapi.ContextData(context_engine_id, context_name),
-                        *missing_results,
-                        lookupMib=enforce_constraints,
-                        ignoreNonIncreasingOid=self.ignore_nonincreasing_oid,
-                        lexicographicMode=False  # Don't walk through the entire MIB, stop at end of table
-                    ):
+                    # If we didn't catch the metric using snmpget, walk the table with snmpbulk or snmpnext
+                    if bulk_max_repetitions:
+                        self.log.debug("Running SNMP command getBulk on OIDS {}".format(missing_results))
+                        walk = hlapi.bulkCmd(
+                            snmp_engine,
+                            auth_data,
+                            transport_target,
+                            hlapi.ContextData(context_engine_id, context_name),
+                            0,
+                            bulk_max_repetitions,
+                            *missing_results,
+                            lookupMib=enforce_constraints,
+                            ignoreNonIncreasingOid=self.ignore_nonincreasing_oid,
+                            lexicographicMode=False  # Don't walk through the entire MIB, stop at end of table
+                        )
+                    else:
+                        self.log.debug("Running SNMP command getNext on OIDS {}".format(missing_results))
+                        walk = hlapi.nextCmd(
+                            snmp_engine,
+                            auth_data,
+                            transport_target,
+                            hlapi.ContextData(context_engine_id, context_name),
+                            *missing_results,
+                            lookupMib=enforce_constraints,
+                            ignoreNonIncreasingOid=self.ignore_nonincreasing_oid,
+                            lexicographicMode=False  # Don't walk through the entire MIB, stop at end of table
+                        )
+
+                    for error_indication, error_status, _, var_binds_table in walk:
 
                         self.log.debug("Returned vars: {}".format(var_binds_table))
                         # Raise on error_indication
@@ -283,8 +338,11 @@ class SnmpCheck(NetworkCheck):
                             else:
                                 self.warning(message)
 
-                        for table_row in var_binds_table:
-                            complete_results.append(table_row)
+                        # The columns past the end of their table are dropped
+                        for table_row, prefix in zip(var_binds_table, missing_prefixes):
+                            result_oid, value = table_row
+                            if not walked_out_of_table(result_oid, value, prefix):
+                                complete_results.append(table_row)
 
                 all_binds.extend(complete_results)
 
@@ -302,15 +360,26 @@ class SnmpCheck(NetworkCheck):
         if "service_check_severity" in instance and len(all_binds):
             instance["service_check_severity"] = Status.WARNING
 
+        return self.build_results(
+            all_binds, lookup_names, enforce_constraints, mib_view_controller, mibs_to_load, oid_resolver
+        )
+
+    def build_results(
+        self, all_binds, lookup_names, enforce_constraints, mib_view_controller, mibs_to_load, oid_resolver
+    ):
+        '''
+        Build the dictionary returned by `check_table` from the var binds returned by the device.
+        '''
+        results = defaultdict(dict)
         for result_oid, value in all_binds:
             if lookup_names:
                 if not enforce_constraints:
                     # if enforce_constraints is false, then MIB resolution has not been done yet
                     # so we need to do it manually. We have to specify the mibs that we will need
-                    # to resolve the name.
-                    oid_to_resolve = hlapi.ObjectIdentity(result_oid.asTuple()).loadMibs(*mibs_to_load)
-                    result_oid = oid_to_resolve.resolveWithMib(mib_view_controller)
-                _, metric, indexes = result_oid.getMibSymbol()
+                    # to resolve the name. Columns already seen on this device are not resolved again.
+                    metric, indexes = oid_resolver.resolve(result_oid.asTuple(), mib_view_controller, mibs_to_load)
+                else:
+                    _, metric, indexes = result_oid.getMibSymbol()
                 results[metric][indexes] = value
             else:
                 oid = result_oid.asTuple()
@@ -371,11 +440,22 @@ class SnmpCheck(NetworkCheck):
 
         return table_oids, raw_oids, mibs_to_load
 
+    def get_parsed_metrics(self, instance, metrics, enforce_constraints):
+        '''
+        Same as `parse_metrics`, the metrics definitions of an instance are only parsed at the first run.
+        '''
+        key = self._get_instance_key(instance)
+        if key not in self._parsed_metrics:
+            self._parsed_metrics[key] = self.parse_metrics(metrics, enforce_constraints)
+        return self._parsed_metrics[key]
+
     def _check(self, instance):
         '''
         Perform two series of SNMP requests, one for all that have MIB asociated
         and should be looked up and one for those specified by oids
         '''
+        if instance.get('devices'):
+            return self._check_devices(instance)
 
         (
             snmp_engine,
@@ -390,7 +470,7 @@ class SnmpCheck(NetworkCheck):
 
         tags += ['snmp_device:{}'.format(ip_address)]
 
-        table_oids, raw_oids, mibs_to_load = self.parse_metrics(metrics, enforce_constraints)
+        table_oids, raw_oids, mibs_to_load = self.get_parsed_metrics(instance, metrics, enforce_constraints)
         try:
             if table_oids:
                 self.log.debug("Querying device %s for %s oids", ip_address, len(table_oids))
@@ -426,13 +506,115 @@ class SnmpCheck(NetworkCheck):
             self.warning(instance["service_check_error"])
         finally:
             # Report service checks
-            if "service_check_error" in instance:
-                status = Status.DOWN
-                if "service_check_severity" in instance:
-                    status = instance["service_check_severity"]
-                return [(self.SC_STATUS, status, instance["service_check_error"])]
+            return self.get_service_check_statuses(instance)
+
+    def get_service_check_statuses(self, instance):
+        if "service_check_error" in instance:
+            status = Status.DOWN
+            if "service_check_severity" in instance:
+                status = instance["service_check_severity"]
+            return [(self.SC_STATUS, status, instance["service_check_error"])]
+
+        return [(self.SC_STATUS, Status.UP, None)]
+
+    def get_device_instances(self, instance):
+        '''
+        Return one instance per device listed in `devices`, a device has
+        the settings of the instance unless it overrides them.
+        '''
+        device_instances = []
+        for device in instance['devices']:
+            device_instance = {
+                key: value for key, value in iteritems(instance) if key not in ('name', 'devices', 'metrics', 'tags')
+            }
+            device_instance.update(device)
+            device_instance['tags'] = instance.get('tags', []) + device.get('tags', [])
+            device_instance['name'] = self._get_instance_key(device_instance)
+            device_instances.append(device_instance)
+        return device_instances
+
+    def _check_devices(self, instance):
+        '''
+        Poll all the devices of the instance concurrently with the shared command
+        generator, and report the metrics and the service check of each device.
+        '''
+        metrics = list(instance.get('metrics', []))
+        if _is_affirmative(instance.get('use_global_metrics', True)):
+            metrics.extend(self.init_config.get('global_metrics', []))
+        enforce_constraints = _is_affirmative(instance.get('enforce_mib_constraints', True))
+        snmp_engine, mib_view_controller = self.get_snmp_engine()
+        table_oids, raw_oids, mibs_to_load = self.get_parsed_metrics(instance, metrics, enforce_constraints)
+
+        poller = SnmpPoller(
+            snmp_engine,
+            self.oid_batch_size,
+            max_in_flight=int(instance.get('device_max_in_flight', DEFAULT_DEVICE_MAX_IN_FLIGHT)),
+            ignore_nonincreasing_oid=self.ignore_nonincreasing_oid,
+        )
+        queries = []
+        if table_oids:
+            queries.append(('table', table_oids, enforce_constraints))
+        if raw_oids:
+            queries.append(('raw', raw_oids, False))
+
+        for device_instance in self.get_device_instances(instance):
+            timeout = int(device_instance.get('timeout', self.DEFAULT_TIMEOUT))
+            retries = int(device_instance.get('retries', self.DEFAULT_RETRIES))
+            try:
+                context_engine_id, context_name = self.get_context_data(device_instance)
+                poll = DevicePoll(
+                    device_instance,
+                    self.get_auth_data(device_instance),
+                    self.get_transport_target(device_instance, timeout, retries),
+                    hlapi.ContextData(context_engine_id, context_name),
+                    self.get_bulk_max_repetitions(device_instance),
+                )
+            except Exception as e:
+                self.warning("Invalid device configuration for instance {}: {}".format(instance.get('name'), e))
+                continue
+            poller.add(poll, queries)
+
+        self.log.debug("Polling %s devices for %s oids", len(poller.polls), len(table_oids) + len(raw_oids))
+        for poll in poller.run():
+            self._report_device_poll(poll, metrics, enforce_constraints, mib_view_controller, mibs_to_load)
+
+        # The service checks are reported for each device
+        return []
+
+    def _report_device_poll(self, poll, metrics, enforce_constraints, mib_view_controller, mibs_to_load):
+        device_instance = poll.instance
+        tags = device_instance['tags'] + ['snmp_device:{}'.format(device_instance['ip_address'])]
+        oid_resolver = self.oid_resolvers[device_instance['name']]
+
+        for message in poll.warnings:
+            self.warning(message)
+
+        # if we've collected some variables, it's not that bad.
+        if "service_check_severity" in device_instance and any(poll.binds.values()):
+            device_instance["service_check_severity"] = Status.WARNING
+
+        try:
+            if 'table' not in poll.failed and 'table' in poll.binds:
+                table_results = self.build_results(
+                    poll.binds['table'], True, enforce_constraints, mib_view_controller, mibs_to_load, oid_resolver
+                )
+                self.report_table_metrics(metrics, table_results, tags)
+
+            if 'raw' not in poll.failed and 'raw' in poll.binds:
+                raw_results = self.build_results(poll.binds['raw'], False, False, mib_view_controller, None, None)
+                self.report_raw_metrics(metrics, raw_results, tags)
+        except Exception as e:
+            if "service_check_error" not in device_instance:
+                device_instance["service_check_error"] = "Fail to collect metrics for {} - {}".format(
+                    device_instance['name'], e
+                )
+            self.warning(device_instance["service_check_error"])
+
+        self.gauge('datadog.agent.snmp.device_poll.time', poll.duration, tags=tags)
+        self.gauge('datadog.agent.snmp.device_poll.timeouts', poll.timeouts, tags=tags)
 
-            return [(self.SC_STATUS, Status.UP, None)]
+        for sc_name, status, msg in self.get_service_check_statuses(device_instance):
+            self.report_as_service_check(sc_name, status, device_instance, msg)
 
     def report_as_service_check(self, sc_name, status, instance, msg=None):
         sc_tags = ['snmp_device:{}'.format(instance["ip_address"])]
@@ -79,6 +79,7 @@ def test_snmpget(aggregator, check):
 
 def test_snmp_getnext_call(check):
     instance = common.generate_instance_config(common.PLAY_WITH_GET_NEXT_METRICS)
+    instance['bulk_max_repetitions'] = 0
 
     # Test that we invoke next with the correct keyword arguments that are hard to test otherwise
     with mock.patch("datadog_checks.snmp.snmp.hlapi.nextCmd") as nextCmd:
@@ -95,6 +96,54 @@ def test_snmp_getnext_call(check):
         assert ("lexicographicMode", False) in kwargs.items()
 
 
+def test_snmp_getbulk_call(check):
+    instance = common.generate_instance_config(common.PLAY_WITH_GET_NEXT_METRICS)
+
+    with mock.patch("datadog_checks.snmp.snmp.hlapi.bulkCmd") as bulkCmd:
+        check.check(instance)
+        args, kwargs = bulkCmd.call_args
+        # nonRepeaters, maxRepetitions
+        assert args[4:6] == (0, 10)
+        assert ("ignoreNonIncreasingOid", False) in kwargs.items()
+        assert ("lexicographicMode", False) in kwargs.items()
+
+        instance['bulk_max_repetitions'] = 25
+        check.check(instance)
+        args, _ = bulkCmd.call_args
+        assert args[4:6] == (0, 25)
+
+    # SNMP v1 has no GETBULK
+    instance['snmp_version'] = 1
+    with mock.patch("datadog_checks.snmp.snmp.hlapi.nextCmd") as nextCmd:
+        check.check(instance)
+        assert nextCmd.called
+
+
+def test_table_walks(aggregator):
+    """
+    GETBULK and GETNEXT walks return the same rows, with or without the MIB constraints
+    """
+    check = SnmpCheck('snmp', {}, {}, {})
+    instance = common.generate_instance_config(common.TABULAR_OBJECTS)
+
+    results = []
+    # The last run resolves the OIDs from the columns cached by the previous one
+    for bulk_max_repetitions, enforce_constraints in [(10, True), (0, True), (2, False), (10, False)]:
+        instance['bulk_max_repetitions'] = bulk_max_repetitions
+        instance['enforce_mib_constraints'] = enforce_constraints
+        check.check(instance)
+
+        rows = []
+        for symbol in common.TABULAR_OBJECTS[0]['symbols']:
+            for metric in aggregator.metrics("snmp." + symbol):
+                rows.append((metric.name, metric.value, tuple(sorted(metric.tags))))
+        results.append(sorted(rows))
+        aggregator.reset()
+
+    assert len(results[0]) == 8
+    assert all(rows == results[0] for rows in results)
+
+
 def test_custom_mib(aggregator):
     instance = common.generate_instance_config(common.DUMMY_MIB_OID)
     instance["community_string"] = "dummy"
@@ -412,3 +461,40 @@ def test_network_failure(aggregator, check):
     aggregator.assert_service_check("snmp.can_check", status=SnmpCheck.CRITICAL, tags=common.CHECK_TAGS, at_least=1)
 
     aggregator.all_metrics_asserted()
+
+
+def test_devices(aggregator, check):
+    """
+    Poll several devices concurrently, an unreachable device doesn't prevent collecting the others
+    """
+    instance = common.generate_instance_config(common.TABULAR_OBJECTS + common.SCALAR_OBJECTS)
+    instance['name'] = 'devices'
+    instance['tags'] = ['network:core']
+    instance['timeout'] = 1
+    instance['retries'] = 0
+    instance['devices'] = [
+        {'ip_address': common.HOST, 'tags': ['rack:1']},
+        {'ip_address': common.HOST, 'port': common.PORT + 1, 'tags': ['rack:2']},
+        {'ip_address': common.HOST, 'bulk_max_repetitions': 0, 'tags': ['rack:3']},
+    ]
+
+    check.check(instance)
+
+    for symbol in common.TABULAR_OBJECTS[0]['symbols']:
+        # 4 rows for each of the 2 devices that can be reached
+        aggregator.assert_metric("snmp." + symbol, count=8)
+
+    for rack in ('rack:1', 'rack:3'):
+        tags = ['network:core', rack] + common.CHECK_TAGS
+        for symbol in common.TABULAR_OBJECTS[0]['symbols']:
+            aggregator.assert_metric_has_tag("snmp." + symbol, rack, count=4)
+        for metric in common.SCALAR_OBJECTS:
+            metric_name = "snmp." + (metric.get('name') or metric.get('symbol'))
+            aggregator.assert_metric(metric_name, tags=tags, count=1)
+        aggregator.assert_metric('datadog.agent.snmp.device_poll.time', tags=tags, count=1)
+        aggregator.assert_metric('datadog.agent.snmp.device_poll.timeouts', value=0, tags=tags, count=1)
+        aggregator.assert_service_check("snmp.can_check", status=SnmpCheck.OK, tags=tags, count=1)
+
+    tags = ['network:core', 'rack:2'] + common.CHECK_TAGS
+    aggregator.assert_metric('datadog.agent.snmp.device_poll.timeouts', value=1, tags=tags, count=1)
+    aggregator.assert_service_check("snmp.can_check", status=SnmpCheck.CRITICAL, tags=tags, count=1)
@@ -4,6 +4,13 @@
 
 import mock
 import pytest
+from pyasn1.type.univ import Null
+from pysnmp import hlapi
+from pysnmp.proto.rfc1902 import Counter32, ObjectName
+from pysnmp.smi.exval import endOfMibView
+
+from datadog_checks.snmp.common import walked_out_of_table
+from datadog_checks.snmp.resolver import OIDResolver
 
 pytestmark = pytest.mark.unit
 
@@ -92,3 +99,76 @@ def test_parse_metrics(hlapi_mock, check):
     hlapi_mock.ObjectIdentity.assert_any_call("foo_mib", "bar")
     hlapi_mock.ObjectIdentity.assert_any_call("foo_mib", "baz")
     hlapi_mock.reset_mock()
+
+
+def test_oid_resolver(check):
+    _, mib_view_controller = check.create_snmp_engine(None)
+    resolver = OIDResolver()
+    if_in_octets = (1, 3, 6, 1, 2, 1, 2, 2, 1, 10)
+
+    with mock.patch("datadog_checks.snmp.resolver.hlapi.ObjectIdentity", wraps=hlapi.ObjectIdentity) as object_identity:
+        symbol, indexes = resolver.resolve(if_in_octets + (90,), mib_view_controller, ['IF-MIB'])
+        assert symbol == 'ifInOctets'
+        assert [index.prettyPrint() for index in indexes] == ['90']
+        assert object_identity.call_count == 1
+
+        # Other rows of the same column are decoded without resolving them with the MIBs
+        symbol, indexes = resolver.resolve(if_in_octets + (1,), mib_view_controller, ['IF-MIB'])
+        assert symbol == 'ifInOctets'
+        assert [index.prettyPrint() for index in indexes] == ['1']
+        assert object_identity.call_count == 1
+
+        # Scalars are cached as well
+        assert resolver.resolve((1, 3, 6, 1, 2, 1, 6, 9, 0), mib_view_controller, ['TCP-MIB'])[0] == 'tcpCurrEstab'
+        assert resolver.resolve((1, 3, 6, 1, 2, 1, 6, 9, 0), mib_view_controller, ['TCP-MIB'])[0] == 'tcpCurrEstab'
+        assert object_identity.call_count == 2
+
+
+def test_get_device_instances(check):
+    instance = {
+        'name': 'devices',
+        'community_string': 'public',
+        'port': 1161,
+        'tags': ['network:core'],
+        'metrics': [{"OID": "1.2.3"}],
+        'devices': [{'ip_address': '10.0.0.1', 'tags': ['rack:1']}, {'ip_address': '10.0.0.2', 'port': 161}],
+    }
+
+    assert check.get_device_instances(instance) == [
+        {
+            'name': '10.0.0.1:1161',
+            'ip_address': '10.0.0.1',
+            'community_string': 'public',
+            'port': 1161,
+            'tags': ['network:core', 'rack:1'],
+        },
+        {
+            'name': '10.0.0.2:161',
+            'ip_address': '10.0.0.2',
+            'community_string': 'public',
+            'port': 161,
+            'tags': ['network:core'],
+        },
+    ]
+
+
+def test_get_parsed_metrics(check):
+    instance = {'name': 'foo', 'ip_address': 'localhost'}
+    metrics = [{"OID": "1.2.3"}]
+
+    with mock.patch.object(check, 'parse_metrics', return_value=([], ['1.2.3'], set())) as parse_metrics:
+        assert check.get_parsed_metrics(instance, metrics, False) == ([], ['1.2.3'], set())
+        assert check.get_parsed_metrics(instance, metrics, False) == ([], ['1.2.3'], set())
+        assert parse_metrics.call_count == 1
+
+
+def test_walked_out_of_table():
+    prefix = (1, 3, 6, 1, 2, 1, 2, 2, 1, 10)
+    in_table = ObjectName('1.3.6.1.2.1.2.2.1.10.1')
+    next_column = ObjectName('1.3.6.1.2.1.2.2.1.11.1')
+
+    assert not walked_out_of_table(in_table, Counter32(42), prefix)
+    # The walk went past the end of the column
+    assert walked_out_of_table(next_column, Counter32(42), prefix)
+    assert walked_out_of_table(next_column, endOfMibView, prefix)
+    assert walked_out_of_table(in_table, Null(), prefix)
@@ -3,16 +3,19 @@
 # Licensed under a 3-clause BSD style license (see LICENSE)
 import os
 from collections import namedtuple
+from contextlib import contextmanager
+from itertools import chain
 
 import requests
 import requests_kerberos
 from bs4 import BeautifulSoup
 from requests.exceptions import ConnectionError, HTTPError, InvalidURL, Timeout
 from simplejson import JSONDecodeError
-from six import iteritems
+from six import iteritems, itervalues
 from six.moves.urllib.parse import urljoin, urlparse, urlsplit, urlunsplit
 
 from datadog_checks.base import AgentCheck, ConfigurationError, is_affirmative
+from datadog_checks.base.utils.concurrency import ThreadPoolMapper
 
 KERBEROS_STRATEGIES = {
     'required': requests_kerberos.REQUIRED,
@@ -51,6 +54,15 @@ MESOS_MASTER_APP_PATH = '/frameworks'
 YARN_APPLICATION_TYPES = 'SPARK'
 APPLICATION_STATES = 'RUNNING'
 
+# Number of requests to the Spark REST API running at the same time
+DEFAULT_MAX_CONCURRENT_REQUESTS = 1
+
+# Stages in these states are not updated anymore, they are only requested once
+COMPLETED_STAGE_STATUSES = ('COMPLETE', 'FAILED', 'SKIPPED')
+ACTIVE_STAGE_STATUSES = ('active', 'pending')
+# Above this number of stages completed since the previous run, all the stages are listed again
+MAX_COMPLETED_STAGES_REQUESTS = 10
+
 # Event types
 JOB_EVENT = 'job'
 STAGE_EVENT = 'stage'
@@ -154,6 +166,22 @@ RequestsConfig = namedtuple('RequestsConfig', ['auth', 'ssl_verify', 'ssl_cert',
 
 
 class SparkCheck(AgentCheck):
+    def __init__(self, name, init_config, agentConfig, instances=None):
+        AgentCheck.__init__(self, name, init_config, agentConfig, instances)
+
+        # Connections are kept open across runs
+        self.session = requests.Session()
+
+        # Runs the requests to the applications concurrently
+        self._mapper = ThreadPoolMapper()
+
+        # Completed stages of each application: {app_id: {'stages': {stage_id: [stage attempts]}, 'min_stage_id': id}}
+        self._completed_stages = {}
+
+    def stop(self):
+        self._mapper.terminate()
+        self.session.close()
+
     def check(self, instance):
         # Get additional tags from the conf file
         tags = instance.get('tags', [])
@@ -168,23 +196,24 @@ class SparkCheck(AgentCheck):
             raise ConfigurationError('The cluster_name must be specified in the instance configuration')
         tags.append('cluster_name:%s' % cluster_name)
 
-        spark_apps = self._get_running_apps(instance, requests_config)
+        with self._kerberos_keytab(requests_config):
+            spark_apps = self._get_running_apps(instance, requests_config)
 
-        # Get the job metrics
-        self._spark_job_metrics(instance, spark_apps, tags, requests_config)
+            # Get the job metrics
+            jobs = self._spark_job_metrics(instance, spark_apps, tags, requests_config)
 
-        # Get the stage metrics
-        self._spark_stage_metrics(instance, spark_apps, tags, requests_config)
+            # Get the stage metrics
+            self._spark_stage_metrics(instance, spark_apps, tags, requests_config, jobs)
 
-        # Get the executor metrics
-        self._spark_executor_metrics(instance, spark_apps, tags, requests_config)
+            # Get the executor metrics
+            self._spark_executor_metrics(instance, spark_apps, tags, requests_config)
 
-        # Get the rdd metrics
-        self._spark_rdd_metrics(instance, spark_apps, tags, requests_config)
+            # Get the rdd metrics
+            self._spark_rdd_metrics(instance, spark_apps, tags, requests_config)
 
-        # Get the streaming statistics metrics
-        if is_affirmative(instance.get('streaming_metrics', True)):
-            self._spark_streaming_statistics_metrics(instance, spark_apps, tags, requests_config)
+            # Get the streaming statistics metrics
+            if is_affirmative(instance.get('streaming_metrics', True)):
+                self._spark_streaming_statistics_metrics(instance, spark_apps, tags, requests_config)
 
         # Report success after gathering all metrics from the ApplicationMaster
         if spark_apps:
@@ -229,6 +258,52 @@ class SparkCheck(AgentCheck):
             kerberos_keytab=instance.get('kerberos_keytab'),
         )
 
+    @staticmethod
+    @contextmanager
+    def _kerberos_keytab(requests_config):
+        """
+        Use the configured keytab for the requests sent in the block, the requests of a run share it
+        """
+        old_keytab_path = None
+        if requests_config.kerberos_keytab:
+            old_keytab_path = os.getenv('KRB5_CLIENT_KTNAME')
+            os.environ['KRB5_CLIENT_KTNAME'] = requests_config.kerberos_keytab
+
+        try:
+            yield
+        finally:
+            if old_keytab_path is not None:
+                os.environ['KRB5_CLIENT_KTNAME'] = old_keytab_path
+
+    def _map_concurrently(self, instance, func, items):
+        """
+        Call `func` on every item, with at most `max_concurrent_requests` calls running at the same time.
+        Return the list of (item, result, exception), see `ThreadPoolMapper`.
+        """
+        size = instance.get('max_concurrent_requests', DEFAULT_MAX_CONCURRENT_REQUESTS)
+        return self._mapper.map(func, items, size=size, key=instance.get(MASTER_ADDRESS))
+
+    def _get_apps_json(self, instance, running_apps, addl_tags, requests_config, *args):
+        """
+        Query the same path of the REST API of every application, concurrently.
+
+        Return the list of (app_id, app_name, response, exception), `exception` is None when the request succeeded.
+        """
+
+        def get_app_json(app):
+            app_id, (app_name, tracking_url) = app
+            base_url = self._get_request_url(instance, tracking_url)
+            return self._rest_request_to_json(
+                base_url, SPARK_APPS_PATH, SPARK_SERVICE_CHECK, requests_config, addl_tags, app_id, *args
+            )
+
+        return [
+            (app_id, app_name, response, e)
+            for (app_id, (app_name, _)), response, e in self._map_concurrently(
+                instance, get_app_json, list(iteritems(running_apps))
+            )
+        ]
+
     def _get_master_address(self, instance):
         """
         Get the master address from the instance configuration
@@ -266,9 +341,8 @@ class SparkCheck(AgentCheck):
         """
         Determine what mode was specified
         """
-        tags = instance.get('tags', [])
-        if tags is None:
-            tags = []
+        # Copy the tags, the instance is used again on the next run
+        tags = list(instance.get('tags') or [])
         master_address = self._get_master_address(instance)
         # Get the cluster name from the instance configuration
         cluster_name = instance.get('cluster_name')
@@ -292,11 +366,11 @@ class SparkCheck(AgentCheck):
 
         elif cluster_mode == SPARK_MESOS_MODE:
             running_apps = self._mesos_init(instance, master_address, requests_config, tags)
-            return self._get_spark_app_ids(running_apps, requests_config, tags)
+            return self._get_spark_app_ids(instance, running_apps, requests_config, tags)
 
         elif cluster_mode == SPARK_YARN_MODE:
             running_apps = self._yarn_init(master_address, requests_config, tags)
-            return self._get_spark_app_ids(running_apps, requests_config, tags)
+            return self._get_spark_app_ids(instance, running_apps, requests_config, tags)
 
         else:
             raise Exception('Invalid setting for %s. Received %s.' % (SPARK_CLUSTER_MODE, cluster_mode))
@@ -453,17 +527,22 @@ class SparkCheck(AgentCheck):
 
         return running_apps
 
-    def _get_spark_app_ids(self, running_apps, requests_config, tags):
+    def _get_spark_app_ids(self, instance, running_apps, requests_config, tags):
         """
         Traverses the Spark application master in YARN to get a Spark application ID.
 
         Return a dictionary of {app_id: (app_name, tracking_url)} for Spark applications
         """
+
+        def get_spark_apps(tracking_url):
+            return self._rest_request_to_json(tracking_url, SPARK_APPS_PATH, SPARK_SERVICE_CHECK, requests_config, tags)
+
+        tracking_urls = [tracking_url for app_name, tracking_url in itervalues(running_apps)]
+
         spark_apps = {}
-        for app_id, (app_name, tracking_url) in iteritems(running_apps):
-            response = self._rest_request_to_json(
-                tracking_url, SPARK_APPS_PATH, SPARK_SERVICE_CHECK, requests_config, tags
-            )
+        for tracking_url, response, e in self._map_concurrently(instance, get_spark_apps, tracking_urls):
+            if e is not None:
+                raise e
 
             for app in response:
                 app_id = app.get('id')
@@ -477,14 +556,17 @@ class SparkCheck(AgentCheck):
     def _spark_job_metrics(self, instance, running_apps, addl_tags, requests_config):
         """
         Get metrics for each Spark job.
-        """
-        for app_id, (app_name, tracking_url) in iteritems(running_apps):
 
-            base_url = self._get_request_url(instance, tracking_url)
-            response = self._rest_request_to_json(
-                base_url, SPARK_APPS_PATH, SPARK_SERVICE_CHECK, requests_config, addl_tags, app_id, 'jobs'
-            )
+        Return the jobs of each application.
+        """
+        jobs = {}
+        for app_id, app_name, response, e in self._get_apps_json(
+            instance, running_apps, addl_tags, requests_config, 'jobs'
+        ):
+            if e is not None:
+                raise e
 
+            jobs[app_id] = response
             for job in response:
 
                 status = job.get('status')
@@ -496,16 +578,28 @@ class SparkCheck(AgentCheck):
                 self._set_metrics_from_json(tags, job, SPARK_JOB_METRICS)
                 self._set_metric('spark.job.count', COUNT, 1, tags)
 
-    def _spark_stage_metrics(self, instance, running_apps, addl_tags, requests_config):
+        return jobs
+
+    def _spark_stage_metrics(self, instance, running_apps, addl_tags, requests_config, jobs):
         """
         Get metrics for each Spark stage.
         """
-        for app_id, (app_name, tracking_url) in iteritems(running_apps):
 
+        def get_stages(app):
+            app_id, (app_name, tracking_url) = app
             base_url = self._get_request_url(instance, tracking_url)
-            response = self._rest_request_to_json(
-                base_url, SPARK_APPS_PATH, SPARK_SERVICE_CHECK, requests_config, addl_tags, app_id, 'stages'
-            )
+            return self._get_app_stages(base_url, app_id, jobs.get(app_id), addl_tags, requests_config)
+
+        # Forget the applications that are not running anymore
+        for app_id in list(self._completed_stages):
+            if app_id not in running_apps:
+                del self._completed_stages[app_id]
+
+        for (app_id, (app_name, _)), response, e in self._map_concurrently(
+            instance, get_stages, list(iteritems(running_apps))
+        ):
+            if e is not None:
+                raise e
 
             for stage in response:
 
@@ -518,17 +612,87 @@ class SparkCheck(AgentCheck):
                 self._set_metrics_from_json(tags, stage, SPARK_STAGE_METRICS)
                 self._set_metric('spark.stage.count', COUNT, 1, tags)
 
-    def _spark_executor_metrics(self, instance, running_apps, addl_tags, requests_config):
+    def _get_app_stages(self, base_url, app_id, jobs, addl_tags, requests_config):
         """
-        Get metrics for each Spark executor.
+        Return the stages of an application.
+
+        The completed stages are kept, so that only the active stages and the stages completed since
+        the previous run are requested. The stages are found from the `stageIds` of the jobs: the stages
+        lower than the first one listed by Spark have been removed from its history.
         """
-        for app_id, (app_name, tracking_url) in iteritems(running_apps):
 
-            base_url = self._get_request_url(instance, tracking_url)
-            response = self._rest_request_to_json(
-                base_url, SPARK_APPS_PATH, SPARK_SERVICE_CHECK, requests_config, addl_tags, app_id, 'executors'
+        def get_stages(*args, **kwargs):
+            return self._rest_request_to_json(
+                base_url,
+                SPARK_APPS_PATH,
+                SPARK_SERVICE_CHECK,
+                requests_config,
+                addl_tags,
+                app_id,
+                'stages',
+                *args,
+                **kwargs
             )
 
+        completed = self._completed_stages.get(app_id)
+        if completed is not None and jobs is not None:
+            stage_ids = set(chain.from_iterable(job.get('stageIds', []) for job in jobs))
+
+            active_stages = []
+            for status in ACTIVE_STAGE_STATUSES:
+                active_stages.extend(get_stages(status=status))
+
+            # A completed stage can be attempted again
+            for stage in active_stages:
+                completed['stages'].pop(stage.get('stageId'), None)
+            active_stage_ids = {stage.get('stageId') for stage in active_stages}
+
+            new_stage_ids = [
+                stage_id
+                for stage_id in stage_ids
+                if stage_id not in completed['stages']
+                and stage_id not in active_stage_ids
+                and stage_id >= completed['min_stage_id']
+            ]
+            if len(new_stage_ids) <= MAX_COMPLETED_STAGES_REQUESTS:
+                for stage_id in new_stage_ids:
+                    attempts = get_stages(str(stage_id))
+                    if all(stage.get('status') in COMPLETED_STAGE_STATUSES for stage in attempts):
+                        completed['stages'][stage_id] = attempts
+                    else:
+                        active_stages.extend(attempts)
+
+                # Only keep the stages of the jobs still listed
+                for stage_id in list(completed['stages']):
+                    if stage_id not in stage_ids:
+                        del completed['stages'][stage_id]
+
+                return active_stages + list(chain.from_iterable(itervalues(completed['stages'])))
+
+        stages = get_stages()
+
+        completed = {'stages': {}, 'min_stage_id': min(stage.get('stageId', 0) for stage in stages) if stages else 0}
+        for stage in stages:
+            if stage.get('status') in COMPLETED_STAGE_STATUSES:
+                completed['stages'].setdefault(stage.get('stageId'), []).append(stage)
+        # A stage with an active attempt is requested again until all its attempts are completed
+        for stage in stages:
+            if stage.get('status') not in COMPLETED_STAGE_STATUSES:
+                completed['stages'].pop(stage.get('stageId'), None)
+        self._completed_stages[app_id] = completed
+
+        return stages
+
+    def _spark_executor_metrics(self, instance, running_apps, addl_tags, requests_config):
+        """
+        Get metrics for each Spark executor.
+        """
+        for app_id, app_name, response, e in self._get_apps_json(
+            instance, running_apps, addl_tags, requests_config, 'executors'
+        ):
+            if e is not None:
+                raise e
+
             tags = ['app_name:%s' % str(app_name)]
             tags.extend(addl_tags)
 
@@ -545,12 +709,11 @@ class SparkCheck(AgentCheck):
         """
         Get metrics for each Spark RDD.
         """
-        for app_id, (app_name, tracking_url) in iteritems(running_apps):
-
-            base_url = self._get_request_url(instance, tracking_url)
-            response = self._rest_request_to_json(
-                base_url, SPARK_APPS_PATH, SPARK_SERVICE_CHECK, requests_config, addl_tags, app_id, 'storage/rdd'
-            )
+        for app_id, app_name, response, e in self._get_apps_json(
+            instance, running_apps, addl_tags, requests_config, 'storage/rdd'
+        ):
+            if e is not None:
+                raise e
 
             tags = ['app_name:%s' % str(app_name)]
             tags.extend(addl_tags)
@@ -565,29 +728,22 @@ class SparkCheck(AgentCheck):
         """
         Get metrics for each application streaming statistics.
         """
-        for app_id, (app_name, tracking_url) in iteritems(running_apps):
-            try:
-                base_url = self._get_request_url(instance, tracking_url)
-                response = self._rest_request_to_json(
-                    base_url,
-                    SPARK_APPS_PATH,
-                    SPARK_SERVICE_CHECK,
-                    requests_config,
-                    addl_tags,
-                    app_id,
-                    'streaming/statistics',
-                )
-                self.log.debug('streaming/statistics: %s', response)
-                tags = ['app_name:%s' % str(app_name)]
-                tags.extend(addl_tags)
-
-                # NOTE: response is a dict
-                self._set_metrics_from_json(tags, response, SPARK_STREAMING_STATISTICS_METRICS)
-            except HTTPError as e:
+        for app_id, app_name, response, e in self._get_apps_json(
+            instance, running_apps, addl_tags, requests_config, 'streaming/statistics'
+        ):
+            if e is not None:
                 # NOTE: If api call returns response 404
                 # then it means that the application is not a streaming application, we should skip metric submission
-                if e.response.status_code != 404:
-                    raise
+                if isinstance(e, HTTPError) and e.response.status_code == 404:
+                    continue
+                raise e
+
+            self.log.debug('streaming/statistics: %s', response)
+            tags = ['app_name:%s' % str(app_name)]
+            tags.extend(addl_tags)
+
+            # NOTE: response is a dict
+            self._set_metrics_from_json(tags, response, SPARK_STREAMING_STATISTICS_METRICS)
 
     def _set_metrics_from_json(self, tags, metrics_json, metrics):
         """
@@ -650,14 +806,9 @@ class SparkCheck(AgentCheck):
             query = '&'.join(['{0}={1}'.format(key, value) for key, value in iteritems(kwargs)])
             url = urljoin(url, '?' + query)
 
-        old_keytab_path = None
-        if requests_config.kerberos_keytab:
-            old_keytab_path = os.getenv('KRB5_CLIENT_KTNAME')
-            os.environ['KRB5_CLIENT_KTNAME'] = requests_config.kerberos_keytab
-
         try:
             self.log.debug('Spark check URL: %s' % url)
-            response = requests.get(url, auth=requests_config.auth, verify=verify, cert=cert)
+            response = self.session.get(url, auth=requests_config.auth, verify=verify, cert=cert)
 
             response.raise_for_status()
 
@@ -686,10 +837,6 @@ class SparkCheck(AgentCheck):
         else:
             return response
 
-        finally:
-            if old_keytab_path is not None:
-                os.environ['KRB5_CLIENT_KTNAME'] = old_keytab_path
-
     def _rest_request_to_json(self, address, object_path, service_name, requests_config, tags, *args, **kwargs):
         """
         Query the given URL and return the JSON response
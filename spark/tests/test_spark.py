@@ -88,6 +88,15 @@ YARN_APP_URL = Url(urljoin(SPARK_YARN_URL, YARN_APPS_PATH) + '?states=RUNNING&ap
 YARN_SPARK_APP_URL = Url(join_url_dir(SPARK_YARN_URL, 'proxy', YARN_APP_ID, SPARK_REST_PATH))
 YARN_SPARK_JOB_URL = Url(join_url_dir(SPARK_YARN_URL, 'proxy', YARN_APP_ID, SPARK_REST_PATH, SPARK_APP_ID, 'jobs'))
 YARN_SPARK_STAGE_URL = Url(join_url_dir(SPARK_YARN_URL, 'proxy', YARN_APP_ID, SPARK_REST_PATH, SPARK_APP_ID, 'stages'))
+YARN_SPARK_STAGE_1_URL = Url(
+    join_url_dir(SPARK_YARN_URL, 'proxy', YARN_APP_ID, SPARK_REST_PATH, SPARK_APP_ID, 'stages', '1')
+)
+YARN_SPARK_ACTIVE_STAGE_URL = Url(
+    join_url_dir(SPARK_YARN_URL, 'proxy', YARN_APP_ID, SPARK_REST_PATH, SPARK_APP_ID, 'stages') + '?status=active'
+)
+YARN_SPARK_PENDING_STAGE_URL = Url(
+    join_url_dir(SPARK_YARN_URL, 'proxy', YARN_APP_ID, SPARK_REST_PATH, SPARK_APP_ID, 'stages') + '?status=pending'
+)
 YARN_SPARK_EXECUTOR_URL = Url(
     join_url_dir(SPARK_YARN_URL, 'proxy', YARN_APP_ID, SPARK_REST_PATH, SPARK_APP_ID, 'executors')
 )
@@ -564,7 +573,7 @@ SPARK_METRIC_TAGS = ['cluster_name:' + CLUSTER_NAME, 'app_name:' + APP_NAME]
 
 
 def test_yarn(aggregator):
-    with mock.patch('requests.get', yarn_requests_get_mock):
+    with mock.patch('requests.Session.get', side_effect=yarn_requests_get_mock):
         c = SparkCheck('spark', None, {}, [YARN_CONFIG])
         c.check(YARN_CONFIG)
 
@@ -613,7 +622,7 @@ def test_yarn(aggregator):
 
 
 def test_auth_yarn(aggregator):
-    with mock.patch('requests.get', yarn_requests_auth_mock):
+    with mock.patch('requests.Session.get', side_effect=yarn_requests_auth_mock):
         c = SparkCheck('spark', None, {}, [YARN_AUTH_CONFIG])
         c.check(YARN_AUTH_CONFIG)
 
@@ -631,8 +640,79 @@ def test_auth_yarn(aggregator):
             assert sc.tags == tags
 
 
+def test_yarn_concurrent_requests(aggregator):
+    config = dict(YARN_CONFIG, tags=list(CUSTOM_TAGS), max_concurrent_requests=4)
+    with mock.patch('requests.Session.get', side_effect=yarn_requests_get_mock):
+        c = SparkCheck('spark', None, {}, [config])
+        try:
+            c.check(config)
+        finally:
+            c.stop()
+
+        for metric, value in iteritems(SPARK_STAGE_RUNNING_METRIC_VALUES):
+            aggregator.assert_metric(metric, value=value, tags=SPARK_STAGE_RUNNING_METRIC_TAGS + CUSTOM_TAGS)
+        for metric, value in iteritems(SPARK_EXECUTOR_METRIC_VALUES):
+            aggregator.assert_metric(metric, value=value, tags=SPARK_METRIC_TAGS + CUSTOM_TAGS)
+        assert c._mapper._pools == {}
+
+
+def test_yarn_completed_stages(aggregator):
+    with open(os.path.join(FIXTURE_DIR, 'stage_metrics'), 'r') as f:
+        stages = json.load(f)
+    completed_stages = [dict(stage, status='COMPLETE') for stage in stages if stage['stageId'] == 1]
+
+    def get_mock(url, *args, **kwargs):
+        requested.append(Url(url))
+        if Url(url) == YARN_SPARK_STAGE_1_URL:
+            return MockResponse(completed_stages)
+        elif Url(url) == YARN_SPARK_ACTIVE_STAGE_URL:
+            # The stages that are not completed
+            return MockResponse([stage for stage in stages if stage['stageId'] == 1])
+        elif Url(url) == YARN_SPARK_PENDING_STAGE_URL:
+            return MockResponse([])
+        return yarn_requests_get_mock(url, *args, **kwargs)
+
+    class MockResponse:
+        def __init__(self, data):
+            self.data = data
+
+        def json(self):
+            return self.data
+
+        def raise_for_status(self):
+            return True
+
+    config = dict(YARN_CONFIG, tags=list(CUSTOM_TAGS))
+    requested = []
+    with mock.patch('requests.Session.get', side_effect=get_mock):
+        c = SparkCheck('spark', None, {}, [config])
+        c.check(config)
+        assert requested.count(YARN_SPARK_STAGE_URL) == 1
+
+        aggregator.reset()
+        c.check(config)
+
+        # Only the active stages are requested again
+        assert requested.count(YARN_SPARK_STAGE_URL) == 1
+        assert requested.count(YARN_SPARK_ACTIVE_STAGE_URL) == 1
+
+        for metric, value in iteritems(SPARK_STAGE_RUNNING_METRIC_VALUES):
+            aggregator.assert_metric(metric, value=value, tags=SPARK_STAGE_RUNNING_METRIC_TAGS + CUSTOM_TAGS)
+        for metric, value in iteritems(SPARK_STAGE_COMPLETE_METRIC_VALUES):
+            aggregator.assert_metric(metric, value=value, tags=SPARK_STAGE_COMPLETE_METRIC_TAGS + CUSTOM_TAGS)
+
+        # The running stage completed, it is requested alone
+        stages = [stage for stage in stages if stage['stageId'] == 0]
+        aggregator.reset()
+        c.check(config)
+
+        assert requested.count(YARN_SPARK_STAGE_URL) == 1
+        assert requested.count(YARN_SPARK_STAGE_1_URL) == 1
+        aggregator.assert_metric('spark.stage.count', count=5, tags=SPARK_STAGE_COMPLETE_METRIC_TAGS + CUSTOM_TAGS)
+
+
 def test_mesos(aggregator):
-    with mock.patch('requests.get', mesos_requests_get_mock):
+    with mock.patch('requests.Session.get', side_effect=mesos_requests_get_mock):
         c = SparkCheck('spark', None, {}, [MESOS_CONFIG])
         c.check(MESOS_CONFIG)
 
@@ -688,7 +768,7 @@ def test_mesos(aggregator):
 
 
 def test_mesos_filter(aggregator):
-    with mock.patch('requests.get', mesos_requests_get_mock):
+    with mock.patch('requests.Session.get', side_effect=mesos_requests_get_mock):
         c = SparkCheck('spark', None, {}, [MESOS_FILTERED_CONFIG])
         c.check(MESOS_FILTERED_CONFIG)
 
@@ -700,7 +780,7 @@ def test_mesos_filter(aggregator):
 
 
 def test_standalone_unit(aggregator):
-    with mock.patch('requests.get', standalone_requests_get_mock):
+    with mock.patch('requests.Session.get', side_effect=standalone_requests_get_mock):
         c = SparkCheck('spark', None, {}, [STANDALONE_CONFIG])
         c.check(STANDALONE_CONFIG)
 
@@ -753,7 +833,7 @@ def test_standalone_unit(aggregator):
 
 
 def test_standalone_pre20(aggregator):
-    with mock.patch('requests.get', standalone_requests_pre20_get_mock):
+    with mock.patch('requests.Session.get', side_effect=standalone_requests_pre20_get_mock):
         c = SparkCheck('spark', None, {}, [STANDALONE_CONFIG_PRE_20])
         c.check(STANDALONE_CONFIG_PRE_20)
 
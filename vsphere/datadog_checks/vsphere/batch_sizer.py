@@ -0,0 +1,62 @@
+# (C) Datadog, Inc. 2019
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+from __future__ import division
+
+import threading
+
+
+class BatchSizer:
+    """
+    Computes, for each instance key, how many Mor objects should be queried in the same QueryPerf call.
+
+    The size is adjusted after each call so that a call takes about `target_latency` seconds and returns
+    at most `max_payload` values. It can at most halve or double at each step, and always stays between
+    1 and `max_size`. When `target_latency` is 0, nothing is adapted and the default size is always used.
+    BatchSizer is threadsafe and can be used from different workers in the threading pool.
+    """
+
+    def __init__(self, max_size, target_latency=0, max_payload=0):
+        self.max_size = max_size
+        self.target_latency = target_latency
+        self.max_payload = max_payload
+        self._sizes = {}
+        self._lock = threading.RLock()
+
+    @property
+    def adaptive(self):
+        return self.target_latency > 0
+
+    def get_size(self, key, default):
+        """
+        Return the batch size to use for the given key, `default` if nothing was recorded yet.
+        """
+        with self._lock:
+            return self._sizes.get(key, default)
+
+    def record(self, key, batch_len, latency, payload):
+        """
+        Record the outcome of a QueryPerf call for `batch_len` objects that took `latency` seconds
+        and returned `payload` values, and return the new batch size.
+        """
+        with self._lock:
+            size = self._sizes.get(key, batch_len)
+            if not self.adaptive or batch_len <= 0:
+                return size
+
+            ideal = size * 2
+            if latency > 0:
+                ideal = min(ideal, int(batch_len * self.target_latency / latency))
+            if self.max_payload and payload > 0:
+                ideal = min(ideal, int(batch_len * self.max_payload / payload))
+
+            size = max(ideal, size // 2, 1)
+            if self.max_size:
+                size = min(size, self.max_size)
+
+            self._sizes[key] = size
+            return size
+
+    def reset(self, key):
+        with self._lock:
+            self._sizes.pop(key, None)
@@ -0,0 +1,68 @@
+# (C) Datadog, Inc. 2019
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+import threading
+
+
+class Inventory:
+    """
+    Keeps the attributes of all the objects of a vCenter instance up to date from the update sets
+    returned by a PropertyCollector, see
+    https://code.vmware.com/apis/358/vsphere#/doc/vmodl.query.PropertyCollector.html#waitForUpdatesEx
+
+    The first update set lists every object, the following ones only the objects that were created,
+    modified or deleted since the previous one. The inventory maps: mor --> {property_path: value}
+    Inventory is threadsafe and can be used from different workers in the threading pool.
+    """
+
+    def __init__(self, server_instance, collector, filter_):
+        # Objects that have to be kept to get the next updates, they belong to the session of `server_instance`
+        self.server_instance = server_instance
+        self.collector = collector
+        self.filter = filter_
+        # An empty version asks the collector for all the objects
+        self.version = ''
+        self._objects = {}
+        self._lock = threading.RLock()
+
+    def objects(self):
+        """
+        Return a copy of the mapping mor --> attributes.
+        """
+        with self._lock:
+            return {obj: dict(properties) for obj, properties in self._objects.items()}
+
+    def size(self):
+        with self._lock:
+            return len(self._objects)
+
+    def apply_update_set(self, update_set):
+        """
+        Apply the changes described by a `vmodl.query.PropertyCollector.UpdateSet` and return
+        the set of objects that were created, modified or deleted.
+        """
+        changed = set()
+        if update_set is None:
+            return changed
+
+        with self._lock:
+            for filter_update in update_set.filterSet or []:
+                for object_update in filter_update.objectSet or []:
+                    obj = object_update.obj
+                    kind = object_update.kind
+                    if kind == 'leave':
+                        self._objects.pop(obj, None)
+                    else:
+                        if kind == 'enter':
+                            self._objects[obj] = {}
+                        properties = self._objects.setdefault(obj, {})
+                        for change in object_update.changeSet or []:
+                            if change.op in ('remove', 'indirectRemove'):
+                                properties.pop(change.name, None)
+                            else:
+                                properties[change.name] = change.val
+                    changed.add(obj)
+
+            self.version = update_set.version
+
+        return changed
@@ -110,6 +110,16 @@ class MorCache:
                 names_chunk = mor_names[idx : min(idx + batch_size, total)]
                 yield {name: mors_dict[name] for name in names_chunk}
 
+    def remove(self, key, names):
+        """
+        Remove the Mor objects identified by `names` from the cache for the given key,
+        the ones that are not in the cache are ignored.
+        If the key is not in the cache, raises a KeyError.
+        """
+        with self._mor_lock:
+            for name in names:
+                self._mor[key].pop(name, None)
+
     def purge(self, key, ttl):
         """
         Remove all the items in the cache for the given key that are older than
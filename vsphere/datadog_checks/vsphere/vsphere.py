@@ -19,16 +19,18 @@ from six.moves import range
 
 from datadog_checks.base import ensure_unicode, to_string
 from datadog_checks.base.checks import AgentCheck
-from datadog_checks.base.checks.libs.thread_pool import SENTINEL, Pool
+from datadog_checks.base.checks.libs.thread_pool import Pool
 from datadog_checks.base.checks.libs.timer import Timer
 from datadog_checks.base.checks.libs.vmware.all_metrics import ALL_METRICS
 from datadog_checks.base.checks.libs.vmware.basic_metrics import BASIC_METRICS
 from datadog_checks.base.config import is_affirmative
 
+from .batch_sizer import BatchSizer
 from .cache_config import CacheConfig
 from .common import SOURCE_TYPE
 from .errors import BadConfigError, ConnectionError
 from .event import VSphereEvent
+from .inventory import Inventory
 from .metadata_cache import MetadataCache, MetadataNotFoundError
 from .mor_cache import MorCache, MorNotFoundError
 from .objects_queue import ObjectsQueue
@@ -45,6 +47,8 @@ REFRESH_MORLIST_INTERVAL = 3 * 60
 REFRESH_METRICS_METADATA_INTERVAL = 10 * 60
 # The amount of objects batched at the same time in the QueryPerf method to query available metrics
 BATCH_MORLIST_SIZE = 50
+# Upper bound of the QueryPerf batch size when it is adapted to the observed latency
+MAX_BATCH_MORLIST_SIZE = 500
 # Maximum number of objects to collect at once by the propertyCollector. The size of the response returned by the query
 # is significantly lower than the size of the queryPerf response, so allow specifying a different value.
 BATCH_COLLECTOR_SIZE = 500
@@ -99,6 +103,19 @@ class VSphereCheck(AgentCheck):
 
         self.batch_morlist_size = max(init_config.get("batch_morlist_size", BATCH_MORLIST_SIZE), 0)
         self.batch_collector_size = max(init_config.get("batch_property_collector_size", BATCH_COLLECTOR_SIZE), 0)
+        # When a target latency is set, the QueryPerf batch size starts at `batch_morlist_size` and is then adapted
+        # to the latency and payload size observed for each vCenter instance
+        self.batch_sizer = BatchSizer(
+            max(init_config.get("max_batch_morlist_size", MAX_BATCH_MORLIST_SIZE), 0),
+            target_latency=max(float(init_config.get("batch_morlist_target_latency", 0)), 0),
+            max_payload=max(int(init_config.get("batch_morlist_max_payload", 0)), 0),
+        )
+
+        # The pool is kept across runs, limit how many QueryPerf jobs can be queued in it at the same time
+        # so that collection does not starve the other jobs (e.g. the morlist refresh)
+        self.pool_size = int(init_config.get('threads_count', DEFAULT_SIZE_POOL))
+        self.max_query_perf_in_flight = max(int(init_config.get('max_query_perf_in_flight', 2 * self.pool_size)), 1)
+        self.query_perf_slots = threading.Semaphore(self.max_query_perf_in_flight)
 
         self.refresh_morlist_interval = init_config.get('refresh_morlist_interval', REFRESH_MORLIST_INTERVAL)
         self.clean_morlist_interval = max(
@@ -130,9 +147,16 @@ class VSphereCheck(AgentCheck):
         # Queue of raw Mor objects to process
         self.mor_objects_queue = ObjectsQueue()
 
+        # Instances for which a morlist refresh is running in the pool
+        self.morlist_refreshing = set()
+        self.morlist_refreshing_lock = threading.Lock()
+
         # Cache of processed Mor objects
         self.mor_cache = MorCache()
 
+        # Objects of each instance kept up to date by a PropertyCollector, when the inventory is incremental
+        self.inventories = {}
+
         # managed entity raw view
         self.registry = {}
 
@@ -150,23 +174,36 @@ class VSphereCheck(AgentCheck):
             self.exception_printed += 1
 
     def start_pool(self):
+        """ Start the thread pool, unless it is already running from a previous run
+        """
+        if self.pool is not None:
+            return
         self.log.info("Starting Thread Pool")
-        pool_size = int(self.init_config.get('threads_count', DEFAULT_SIZE_POOL))
-        self.pool = Pool(pool_size)
+        self.pool = Pool(self.pool_size)
 
     def terminate_pool(self):
+        if self.pool is None:
+            return
         self.log.info("Terminating Thread Pool")
         self.pool.terminate()
         self.pool.join()
         assert self.pool.get_nworkers() == 0
+        self.pool = None
+        # Queued jobs were dropped with the pool, so were the QueryPerf slots and the morlist refreshes they held
+        self.query_perf_slots = threading.Semaphore(self.max_query_perf_in_flight)
+        with self.morlist_refreshing_lock:
+            self.morlist_refreshing.clear()
 
-    def stop_pool(self):
-        self.log.info("Stopping Thread Pool, waiting for queued jobs to finish")
-        for _ in self.pool._workers:
-            self.pool._workq.put(SENTINEL)
-        self.pool.close()
-        self.pool.join()
-        assert self.pool.get_nworkers() == 0
+    def stop(self):
+        self.terminate_pool()
+
+    def wait_for_query_perf_jobs(self):
+        """ Block until all the QueryPerf jobs queued in the pool are done
+        """
+        for _ in range(self.max_query_perf_in_flight):
+            self.query_perf_slots.acquire()
+        for _ in range(self.max_query_perf_in_flight):
+            self.query_perf_slots.release()
 
     def _query_event(self, instance):
         i_key = self._instance_key(instance)
@@ -363,17 +400,16 @@ class VSphereCheck(AgentCheck):
             return parent_tags
         return []
 
-    def _collect_mors_and_attributes(self, server_instance):
+    def _build_filter_spec(self, server_instance):
+        """
+        Return the PropertyCollector filter spec selecting all the objects we need with their attributes.
+        """
         resources = list(RESOURCE_TYPE_METRICS)
         resources.extend(RESOURCE_TYPE_NO_METRIC)
 
         content = server_instance.content
         view_ref = content.viewManager.CreateContainerView(content.rootFolder, resources, True)
 
-        # Object used to query MORs as well as the attributes we require in one API call
-        # See https://code.vmware.com/apis/358/vsphere#/doc/vmodl.query.PropertyCollector.html
-        collector = content.propertyCollector
-
         # Specify the root object from where we collect the rest of the objects
         obj_spec = vmodl.query.PropertyCollector.ObjectSpec()
         obj_spec.obj = view_ref
@@ -402,6 +438,14 @@ class VSphereCheck(AgentCheck):
         filter_spec = vmodl.query.PropertyCollector.FilterSpec()
         filter_spec.objectSet = [obj_spec]
         filter_spec.propSet = property_specs
+        return filter_spec
+
+    def _collect_mors_and_attributes(self, server_instance):
+        filter_spec = self._build_filter_spec(server_instance)
+
+        # Object used to query MORs as well as the attributes we require in one API call
+        # See https://code.vmware.com/apis/358/vsphere#/doc/vmodl.query.PropertyCollector.html
+        collector = server_instance.content.propertyCollector
 
         retr_opts = vmodl.query.PropertyCollector.RetrieveOptions()
         # To limit the number of objects retrieved per call.
@@ -459,16 +503,37 @@ class VSphereCheck(AgentCheck):
         instance level and will be processed by a subsequent job.
         """
         start = time.time()
-        obj_list = defaultdict(list)
 
         # Collect objects and their attributes
         all_objects = self._collect_mors_and_attributes(server_instance)
+        obj_list = self._get_mors_from_objects(
+            server_instance, all_objects, regexes, include_only_marked, tags, use_guest_hostname
+        )
+
+        self.log.debug("All objects with attributes cached in %s seconds.", time.time() - start)
+        return obj_list
+
+    def _get_mors_from_objects(
+        self, server_instance, all_objects, regexes, include_only_marked, tags, use_guest_hostname, objects=None
+    ):
+        """
+        Compute the Mor objects to collect metrics for, with their tags, from the attributes of all the objects
+        of the vCenter infrastructure. Return a dict mapping (vimtype --> Mor objects[]).
+        If `objects` is given, only the Mor objects of these objects are computed.
+        """
+        obj_list = defaultdict(list)
 
         # Add rootFolder since it is not explored by the propertyCollector
         rootFolder = server_instance.content.rootFolder
         all_objects[rootFolder] = {"name": rootFolder.name, "parent": None}
 
-        for obj, properties in all_objects.items():
+        if objects is None:
+            objects = all_objects
+        for obj in objects:
+            properties = all_objects.get(obj)
+            if properties is None:
+                # Deleted object
+                continue
             instance_tags = []
             if not self._is_excluded(obj, properties, regexes, include_only_marked) and isinstance(
                 obj, RESOURCE_TYPE_METRICS
@@ -535,9 +600,136 @@ class VSphereCheck(AgentCheck):
                     {"mor_type": mor_type, "mor": obj, "hostname": hostname, "tags": tags + instance_tags}
                 )
 
-        self.log.debug("All objects with attributes cached in %s seconds.", time.time() - start)
         return obj_list
 
+    def _get_inventory(self, i_key, server_instance):
+        """
+        Return the incremental inventory of the instance, creating a PropertyCollector and its filter if needed.
+        They are bound to the session, so they are created again after a reconnection.
+        """
+        inventory = self.inventories.get(i_key)
+        if inventory is not None:
+            if inventory.server_instance is server_instance:
+                return inventory
+            self._destroy_inventory(i_key)
+
+        # Use a dedicated collector, so that the filter does not affect the other calls made with the default one
+        collector = server_instance.content.propertyCollector.CreatePropertyCollector()
+        filter_ = collector.CreateFilter(self._build_filter_spec(server_instance), partialUpdates=False)
+        inventory = Inventory(server_instance, collector, filter_)
+        self.inventories[i_key] = inventory
+        return inventory
+
+    def _destroy_inventory(self, i_key):
+        inventory = self.inventories.pop(i_key, None)
+        if inventory is None:
+            return
+        try:
+            inventory.collector.DestroyPropertyCollector()
+        except Exception as e:
+            self.log.debug("Unable to destroy the property collector of instance %s: %s", i_key, e)
+
+    def _update_inventory(self, i_key, server_instance):
+        """
+        Apply the updates that happened since the previous call to the inventory of the instance,
+        all the objects are returned by the first call. Return the inventory and the set of changed objects.
+        """
+        inventory = self._get_inventory(i_key, server_instance)
+
+        wait_opts = vmodl.query.PropertyCollector.WaitOptions()
+        # Don't wait for changes, return immediately if there are none
+        wait_opts.maxWaitSeconds = 0
+        # If batch_collector_size is 0, collect maximum number of objects.
+        wait_opts.maxObjectUpdates = self.batch_collector_size or None
+
+        changed = set()
+        try:
+            update_set = inventory.collector.WaitForUpdatesEx(inventory.version, wait_opts)
+            while update_set is not None:
+                changed.update(inventory.apply_update_set(update_set))
+                # Updates can be paginated
+                if not update_set.truncated:
+                    break
+                update_set = inventory.collector.WaitForUpdatesEx(inventory.version, wait_opts)
+        except Exception:
+            # Start over with a full inventory on the next refresh
+            self._destroy_inventory(i_key)
+            raise
+
+        return inventory, changed
+
+    def _get_changed_objs(self, instance, server_instance, regexes, include_only_marked, tags, use_guest_hostname):
+        """
+        Incremental version of `_get_all_objs`: only return the Mor objects that are new or have changed
+        since the previous call, and remove from the Mor cache the ones that are gone.
+        """
+        start = time.time()
+        i_key = self._instance_key(instance)
+        inventory, changed = self._update_inventory(i_key, server_instance)
+        self.log.debug("%s objects changed out of %s", len(changed), inventory.size())
+
+        self.mor_cache.init_instance(i_key)
+        obj_list = defaultdict(list)
+        if not changed:
+            return obj_list
+
+        # Tags depend on the parents, so recompute them for the changed objects and their descendants but
+        # only queue the Mor objects that differ from the cached ones, this avoids querying their available
+        # metrics again
+        all_objects = inventory.objects()
+        affected = self._get_descendants(all_objects, changed)
+        gone_names = {str(obj) for obj in affected}
+        realtime_only = is_affirmative(instance.get("collect_realtime_only", True))
+        changed_objs = self._get_mors_from_objects(
+            server_instance, all_objects, regexes, include_only_marked, tags, use_guest_hostname, objects=affected
+        )
+        for vimtype, mors in iteritems(changed_objs):
+            for mor in mors:
+                mor_name = str(mor['mor'])
+                gone_names.discard(mor_name)
+                try:
+                    cached_mor = self.mor_cache.get_mor(i_key, mor_name)
+                except MorNotFoundError:
+                    cached_mor = None
+
+                if cached_mor is not None and self._is_same_mor(cached_mor, mor, realtime_only):
+                    continue
+                obj_list[vimtype].append(mor)
+
+        # What is left was deleted or is now excluded
+        self.mor_cache.remove(i_key, gone_names)
+
+        self.log.debug("Changed objects with attributes cached in %s seconds.", time.time() - start)
+        return obj_list
+
+    @staticmethod
+    def _get_descendants(all_objects, objects):
+        """
+        Return the set of `objects` and all their descendants: the objects below them in the inventory
+        and, for hosts, their VMs.
+        """
+        children = defaultdict(list)
+        for obj, properties in iteritems(all_objects):
+            for parent in (properties.get("parent"), properties.get("runtime.host")):
+                if parent is not None:
+                    children[parent].append(obj)
+
+        descendants = set()
+        to_visit = list(objects)
+        while to_visit:
+            obj = to_visit.pop()
+            if obj not in descendants:
+                descendants.add(obj)
+                to_visit.extend(children.get(obj, []))
+        return descendants
+
+    @staticmethod
+    def _is_same_mor(cached_mor, mor, realtime_only):
+        if not realtime_only and mor['mor_type'] not in REALTIME_RESOURCES and 'metrics' not in cached_mor:
+            # The available metrics were never computed, e.g. the query failed
+            return False
+        return all(cached_mor.get(attr) == mor[attr] for attr in ('mor_type', 'hostname', 'tags'))
+
     @staticmethod
     def _is_excluded(obj, properties, regexes, include_only_marked):
         """
@@ -606,13 +798,53 @@ class VSphereCheck(AgentCheck):
         # Discover hosts and virtual machines
         server_instance = self._get_server_instance(instance)
         use_guest_hostname = is_affirmative(instance.get("use_guest_hostname", False))
-        all_objs = self._get_all_objs(
-            server_instance, regexes, include_only_marked, tags, use_guest_hostname=use_guest_hostname
-        )
+        if is_affirmative(instance.get("incremental_inventory", False)):
+            all_objs = self._get_changed_objs(
+                instance, server_instance, regexes, include_only_marked, tags, use_guest_hostname
+            )
+        else:
+            all_objs = self._get_all_objs(
+                server_instance, regexes, include_only_marked, tags, use_guest_hostname=use_guest_hostname
+            )
 
         self.mor_objects_queue.fill(i_key, dict(all_objs))
         self.cache_config.set_last(CacheConfig.Morlist, i_key, time.time())
 
+    @trace_method
+    def _cache_morlist_raw_async(self, instance):
+        """
+        Refresh the morlist in the pool, so that it overlaps with the collection of metrics
+        for the Mor objects that are already cached.
+        """
+        try:
+            self._cache_morlist_raw(instance)
+        finally:
+            with self.morlist_refreshing_lock:
+                self.morlist_refreshing.discard(self._instance_key(instance))
+
+    def refresh_morlist(self, instance):
+        """
+        Refresh the morlist synchronously the first time, when there is nothing to collect metrics for yet,
+        then asynchronously in the pool. Only one refresh can be running for a given instance.
+        """
+        i_key = self._instance_key(instance)
+        if not self.mor_cache.contains(i_key) or not self.mor_cache.instance_size(i_key):
+            self._cache_morlist_raw(instance)
+            return
+
+        with self.morlist_refreshing_lock:
+            if i_key in self.morlist_refreshing:
+                self.log.debug("Skipping morlist collection: a refresh is still running for instance %s", i_key)
+                return
+            self.morlist_refreshing.add(i_key)
+
+        try:
+            self.pool.apply_async(self._cache_morlist_raw_async, args=(instance,))
+        except Exception:
+            with self.morlist_refreshing_lock:
+                self.morlist_refreshing.discard(i_key)
+            raise
+
     @trace_method
     def _process_mor_objects_queue_async(self, instance, mors):
         """
@@ -770,6 +1002,14 @@ class VSphereCheck(AgentCheck):
         # Defaults to return the value without transformation
         return value
 
+    def _collect_metrics_job(self, instance, query_specs):
+        """ Run _collect_metrics_async, then free the QueryPerf slot taken when the job was queued
+        """
+        try:
+            self._collect_metrics_async(instance, query_specs)
+        finally:
+            self.query_perf_slots.release()
+
     @trace_method
     def _collect_metrics_async(self, instance, query_specs):
         """ Task that collects the metrics listed in the morlist for one MOR
@@ -781,7 +1021,11 @@ class VSphereCheck(AgentCheck):
         server_instance = self._get_server_instance(instance)
         perfManager = server_instance.content.perfManager
         custom_tags = instance.get('tags', [])
+        start = time.time()
         results = perfManager.QueryPerf(query_specs)
+        if self.batch_sizer.adaptive:
+            payload = sum(len(mor_perfs.value) for mor_perfs in results) if results else 0
+            self.batch_sizer.record(i_key, len(query_specs), time.time() - start, payload)
         if results:
             for mor_perfs in results:
                 mor_name = str(mor_perfs.entity)
@@ -861,8 +1105,11 @@ class VSphereCheck(AgentCheck):
 
         # Request metrics for several objects at once. We can limit the number of objects with batch_size
         # If batch_size is 0, process everything at once
-        batch_size = self.batch_morlist_size or n_mors
-        for batch in self.mor_cache.mors_batch(i_key, batch_size):
+        batch_size = self.batch_morlist_size and self.batch_sizer.get_size(i_key, self.batch_morlist_size)
+        batch_size = batch_size or n_mors
+        # The batches are copied first: `mors_batch` holds the lock of the cache while iterated, the jobs need it
+        # to free their QueryPerf slot
+        for batch in list(self.mor_cache.mors_batch(i_key, batch_size)):
             query_specs = []
             for _, mor in iteritems(batch):
                 if mor['mor_type'] == 'vm':
@@ -881,7 +1128,13 @@ class VSphereCheck(AgentCheck):
                 query_specs.append(query_spec)
 
             if query_specs:
-                self.pool.apply_async(self._collect_metrics_async, args=(instance, query_specs))
+                # Back-pressure: wait for a previous QueryPerf to complete if too many are already queued
+                self.query_perf_slots.acquire()
+                try:
+                    self.pool.apply_async(self._collect_metrics_job, args=(instance, query_specs))
+                except Exception:
+                    self.query_perf_slots.release()
+                    raise
 
         self.gauge('vsphere.vm.count', vm_count, tags=tags)
 
@@ -895,12 +1148,14 @@ class VSphereCheck(AgentCheck):
                 self._cache_metrics_metadata(instance)
 
             if self._should_cache(instance, CacheConfig.Morlist):
-                self._cache_morlist_raw(instance)
+                self.refresh_morlist(instance)
 
             self._process_mor_objects_queue(instance)
 
-            # Remove old objects that might be gone from the Mor cache
-            self.mor_cache.purge(self._instance_key(instance), self.clean_morlist_interval)
+            # Remove old objects that might be gone from the Mor cache,
+            # the incremental inventory removes them as soon as they are deleted
+            if not is_affirmative(instance.get("incremental_inventory", False)):
+                self.mor_cache.purge(self._instance_key(instance), self.clean_morlist_interval)
 
             # Second part: do the job
             self.collect_metrics(instance)
@@ -909,7 +1164,9 @@ class VSphereCheck(AgentCheck):
 
             self.set_external_tags(self.get_external_host_tags())
 
-            self.stop_pool()
+            # The pool is kept for the next run, only wait for the metrics of this run to be collected.
+            # A morlist refresh may still be running, it will be picked up by the next run.
+            self.wait_for_query_perf_jobs()
             if self.exception_printed > 0:
                 self.log.error("One thread in the pool crashed, check the logs")
         except Exception:
@@ -0,0 +1,57 @@
+# (C) Datadog, Inc. 2019
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+from datadog_checks.vsphere.batch_sizer import BatchSizer
+
+
+def test_not_adaptive():
+    sizer = BatchSizer(500)
+    assert not sizer.adaptive
+    assert sizer.record('foo', 50, 100, 1000) == 50
+    assert sizer.get_size('foo', 50) == 50
+
+
+def test_get_size_default():
+    sizer = BatchSizer(500, target_latency=10)
+    assert sizer.get_size('foo', 42) == 42
+
+
+def test_grow_when_fast():
+    sizer = BatchSizer(500, target_latency=10)
+    # At most doubles at each step
+    assert sizer.record('foo', 50, 1, 100) == 100
+    assert sizer.record('foo', 100, 1, 100) == 200
+    assert sizer.record('foo', 200, 1, 100) == 400
+    # Never more than the max size
+    assert sizer.record('foo', 400, 1, 100) == 500
+    # Other keys are not affected
+    assert sizer.get_size('bar', 50) == 50
+
+
+def test_shrink_when_slow():
+    sizer = BatchSizer(500, target_latency=10)
+    assert sizer.record('foo', 50, 12.5, 100) == 40
+    # At most halves at each step
+    assert sizer.record('foo', 40, 100, 100) == 20
+    # Never less than 1
+    for _ in range(10):
+        sizer.record('foo', 1, 100, 100)
+    assert sizer.get_size('foo', 50) == 1
+
+
+def test_max_payload():
+    sizer = BatchSizer(500, target_latency=10, max_payload=1000)
+    # Fast enough to double, but the payload would be too large
+    assert sizer.record('foo', 50, 1, 1600) == 31
+
+
+def test_unlimited_max_size():
+    sizer = BatchSizer(0, target_latency=10)
+    assert sizer.record('foo', 1000, 1, 100) == 2000
+
+
+def test_reset():
+    sizer = BatchSizer(500, target_latency=10)
+    sizer.record('foo', 50, 1, 100)
+    sizer.reset('foo')
+    assert sizer.get_size('foo', 50) == 50
@@ -0,0 +1,61 @@
+# (C) Datadog, Inc. 2019
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+import pytest
+from mock import MagicMock
+
+from datadog_checks.vsphere.inventory import Inventory
+
+from .utils import update_set_mock
+
+
+@pytest.fixture
+def inventory():
+    return Inventory(MagicMock(), MagicMock(), MagicMock())
+
+
+def test___init__(inventory):
+    assert inventory.version == ''
+    assert inventory.size() == 0
+
+
+def test_apply_update_set_none(inventory):
+    assert inventory.apply_update_set(None) == set()
+    assert inventory.version == ''
+
+
+def test_apply_update_set(inventory):
+    changed = inventory.apply_update_set(
+        update_set_mock(
+            [('enter', 'vm1', {'name': 'vm1', 'parent': 'host1'}), ('enter', 'vm2', {'name': 'vm2'})], version='1'
+        )
+    )
+    assert changed == {'vm1', 'vm2'}
+    assert inventory.version == '1'
+    assert inventory.objects() == {'vm1': {'name': 'vm1', 'parent': 'host1'}, 'vm2': {'name': 'vm2'}}
+
+    changed = inventory.apply_update_set(
+        update_set_mock(
+            [('modify', 'vm1', {'parent': 'host2'}), ('leave', 'vm2', {}), ('enter', 'vm3', {'name': 'vm3'})],
+            version='2',
+        )
+    )
+    assert changed == {'vm1', 'vm2', 'vm3'}
+    assert inventory.version == '2'
+    assert inventory.objects() == {'vm1': {'name': 'vm1', 'parent': 'host2'}, 'vm3': {'name': 'vm3'}}
+
+
+def test_apply_update_set_remove_property(inventory):
+    inventory.apply_update_set(update_set_mock([('enter', 'vm1', {'name': 'vm1', 'guest.hostName': 'foo'})]))
+
+    update_set = update_set_mock([('modify', 'vm1', {'guest.hostName': None})])
+    update_set.filterSet[0].objectSet[0].changeSet[0].op = 'remove'
+    inventory.apply_update_set(update_set)
+
+    assert inventory.objects() == {'vm1': {'name': 'vm1'}}
+
+
+def test_objects_is_a_copy(inventory):
+    inventory.apply_update_set(update_set_mock([('enter', 'vm1', {'name': 'vm1'})]))
+    inventory.objects()['vm1']['name'] = 'foo'
+    assert inventory.objects() == {'vm1': {'name': 'vm1'}}
@@ -120,3 +120,9 @@ def test_purge(cache):
     cache.purge('foo_instance', 60)
     assert len(cache._mor['foo_instance']) == 1
     assert 'hero' in cache._mor['foo_instance']
+
+
+def test_remove(cache):
+    cache._mor['foo_instance'] = {'foo': {}, 'bar': {}}
+    cache.remove('foo_instance', ['foo', 'baz'])
+    assert list(cache._mor['foo_instance']) == ['bar']
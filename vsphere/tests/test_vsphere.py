@@ -3,6 +3,8 @@
 # Licensed under Simplified BSD License (see LICENSE)
 from __future__ import unicode_literals
 
+import os
+import threading
 import time
 from datetime import datetime
 
@@ -11,6 +13,7 @@ import pytest
 from mock import MagicMock
 from pyVmomi import vim
 
+from datadog_checks.base.checks.libs.thread_pool import Pool
 from datadog_checks.vsphere import VSphereCheck
 from datadog_checks.vsphere.cache_config import CacheConfig
 from datadog_checks.vsphere.common import SOURCE_TYPE
@@ -22,7 +25,16 @@ from datadog_checks.vsphere.vsphere import (
     SHORT_ROLLUP,
 )
 
-from .utils import MockedMOR, assertMOR, disable_thread_pool, get_mocked_server
+from .utils import (
+    HERE,
+    MockedMOR,
+    assertMOR,
+    create_topology,
+    disable_thread_pool,
+    enter_update_set_mock,
+    get_mocked_server,
+    update_set_mock,
+)
 
 SERVICE_CHECK_TAGS = ["vcenter_server:vsphere_mock", "vcenter_host:None", "foo:bar"]
 
@@ -290,6 +302,75 @@ def test__cache_morlist_raw(vsphere, instance):
         assertMOR(vsphere, instance, name="vm4", spec="vm", subset=True, tags=tags)
 
 
+def test__cache_morlist_incremental(vsphere, instance):
+    """
+    Only the objects that changed since the previous refresh are queued, the deleted ones are removed from the cache
+    """
+    instance["incremental_inventory"] = True
+    i_key = vsphere._instance_key(instance)
+    server_instance = vsphere._get_server_instance(instance)
+    all_mors = create_topology(os.path.join(HERE, 'fixtures', 'vsphere_topology.json'))
+    mors_by_name = {mor.name: mor for mor in all_mors}
+    collector = server_instance.content.propertyCollector.CreatePropertyCollector.return_value
+    collector.WaitForUpdatesEx.side_effect = [
+        # First refresh: every object
+        enter_update_set_mock(all_mors),
+        # Second refresh: nothing changed
+        None,
+        # Third refresh: host3 moved to another cluster, vm1 was deleted
+        update_set_mock(
+            [('modify', mors_by_name['host3'], {'parent': mors_by_name['compute_resource1']})], truncated=True
+        ),
+        update_set_mock([('leave', mors_by_name['vm1'], {})], version='2'),
+    ]
+
+    def queued_names():
+        queue = vsphere.mor_objects_queue._objects_queue[i_key]
+        return sorted(mor['hostname'] or str(mor['mor'].name) for mors in queue.values() for mor in mors)
+
+    with mock.patch('datadog_checks.vsphere.vsphere.vmodl'):
+        vsphere._cache_morlist_raw(instance)
+        assertMOR(vsphere, instance, count=11)
+        vsphere._process_mor_objects_queue(instance)
+        assert vsphere.mor_cache.instance_size(i_key) == 11
+
+        vsphere._cache_morlist_raw(instance)
+        assert queued_names() == []
+        assert vsphere.mor_cache.instance_size(i_key) == 11
+
+        vsphere._get_mors_from_objects = mock.MagicMock(wraps=vsphere._get_mors_from_objects)
+        vsphere._cache_morlist_raw(instance)
+        # Only the changed objects and the descendants of host3 were computed again
+        computed = vsphere._get_mors_from_objects.call_args[1]['objects']
+        assert sorted(obj.name for obj in computed) == ['host3', 'vm1', 'vm2', 'vm3', 'vm4']
+        # The tags of host3 and its VMs changed
+        assert queued_names() == ['host3', 'vm2', 'vm4']
+        vsphere._process_mor_objects_queue(instance)
+        assert vsphere.mor_cache.instance_size(i_key) == 10
+        host3 = vsphere.mor_cache.get_mor(i_key, str(mors_by_name['host3']))
+        assert 'vsphere_cluster:compute_resource1' in host3['tags']
+
+    # The same collector was used for all the refreshes
+    server_instance.content.propertyCollector.CreatePropertyCollector.assert_called_once()
+    assert vsphere.inventories[i_key].version == '2'
+
+
+def test__cache_morlist_incremental_error(vsphere, instance):
+    instance["incremental_inventory"] = True
+    i_key = vsphere._instance_key(instance)
+    server_instance = vsphere._get_server_instance(instance)
+    collector = server_instance.content.propertyCollector.CreatePropertyCollector.return_value
+    collector.WaitForUpdatesEx.side_effect = Exception("Session expired")
+
+    with mock.patch('datadog_checks.vsphere.vsphere.vmodl'):
+        with pytest.raises(Exception):
+            vsphere._cache_morlist_raw(instance)
+
+    # Start over with a new collector next time
+    assert i_key not in vsphere.inventories
+    collector.DestroyPropertyCollector.assert_called_once()
+
+
 def test_use_guest_hostname(vsphere, instance):
     # Default value
     with mock.patch("datadog_checks.vsphere.VSphereCheck._get_all_objs") as mock_get_all_objs, mock.patch(
@@ -454,6 +535,66 @@ def test_collect_metrics(vsphere, instance):
             assert len(call_args[0][1]) == 1
 
 
+def test_collect_metrics_back_pressure(vsphere, instance):
+    with mock.patch('datadog_checks.vsphere.vsphere.vmodl'):
+        vsphere.batch_morlist_size = 1
+        vsphere._cache_metrics_metadata(instance)
+        vsphere._cache_morlist_raw(instance)
+        vsphere._process_mor_objects_queue(instance)
+
+        # More batches than QueryPerf slots, the collection waits for the jobs to free their slot
+        vsphere.max_query_perf_in_flight = 1
+        vsphere.query_perf_slots = threading.Semaphore(1)
+        # Like the results of QueryPerf, the jobs look the objects up in the cache
+        i_key = vsphere._instance_key(instance)
+        vsphere._collect_metrics_async = MagicMock(
+            side_effect=lambda instance, query_specs: vsphere.mor_cache.instance_size(i_key)
+        )
+        vsphere.pool = Pool(2)
+        try:
+            collection = threading.Thread(target=vsphere.collect_metrics, args=(instance,))
+            collection.daemon = True
+            collection.start()
+            collection.join(10)
+            assert not collection.is_alive()
+
+            vsphere.wait_for_query_perf_jobs()
+            assert vsphere._collect_metrics_async.call_count == 6
+        finally:
+            vsphere.pool.terminate()
+
+
+def test_collect_metrics_adaptive_batch_size(vsphere, instance):
+    vsphere.batch_sizer.target_latency = 10
+    with mock.patch('datadog_checks.vsphere.vsphere.vmodl'):
+        vsphere.batch_morlist_size = 1
+        vsphere._cache_metrics_metadata(instance)
+        vsphere._cache_morlist_raw(instance)
+        vsphere._process_mor_objects_queue(instance)
+
+        vsphere.collect_metrics(instance)
+        # Each QueryPerf was fast, the batch size doubled after each of them
+        assert vsphere.batch_sizer.get_size(vsphere._instance_key(instance), 1) == 64
+
+        vsphere._collect_metrics_async = MagicMock()
+        vsphere.collect_metrics(instance)
+        # All the objects are queried at once
+        assert vsphere._collect_metrics_async.call_count == 1
+        assert len(vsphere._collect_metrics_async.call_args[0][1]) == 6
+
+
+def test_wait_for_query_perf_jobs(vsphere, instance):
+    vsphere.query_perf_slots.acquire()
+    vsphere._collect_metrics_async = MagicMock(side_effect=Exception("Crash"))
+    with pytest.raises(Exception):
+        vsphere._collect_metrics_job(instance, [])
+    # Returns, since the job freed its slot even though it failed
+    vsphere.wait_for_query_perf_jobs()
+    for _ in range(vsphere.max_query_perf_in_flight):
+        assert vsphere.query_perf_slots.acquire(False)
+    assert not vsphere.query_perf_slots.acquire(False)
+
+
 def test__collect_metrics_async_compatibility(vsphere, instance):
     server_instance = vsphere._get_server_instance(instance)
     server_instance.content.perfManager.QueryPerf.return_value = [MagicMock(value=[MagicMock()])]
@@ -561,6 +702,49 @@ def test_check(vsphere, instance):
             ]
 
 
+def test_refresh_morlist(vsphere, instance):
+    i_key = vsphere._instance_key(instance)
+    vsphere._cache_morlist_raw = MagicMock()
+    vsphere.pool = MagicMock()
+
+    # Nothing cached yet, refresh synchronously
+    vsphere.refresh_morlist(instance)
+    vsphere._cache_morlist_raw.assert_called_once_with(instance)
+    vsphere.pool.apply_async.assert_not_called()
+
+    # Then in the pool, only once at a time
+    vsphere.mor_cache.init_instance(i_key)
+    vsphere.mor_cache.set_mor(i_key, 'vm1', {})
+    vsphere.refresh_morlist(instance)
+    vsphere.refresh_morlist(instance)
+    vsphere.pool.apply_async.assert_called_once_with(vsphere._cache_morlist_raw_async, args=(instance,))
+    assert vsphere._cache_morlist_raw.call_count == 1
+
+    # Once done, it can be refreshed again
+    vsphere._cache_morlist_raw_async(instance)
+    assert vsphere._cache_morlist_raw.call_count == 2
+    vsphere.refresh_morlist(instance)
+    assert vsphere.pool.apply_async.call_count == 2
+
+
+def test_pool_is_kept_across_runs(instance):
+    check = VSphereCheck('vsphere', {'threads_count': 1}, {}, [instance])
+    try:
+        check.start_pool()
+        pool = check.pool
+        check.start_pool()
+        assert check.pool is pool
+        assert pool.apply_async(lambda: 42).get(5) == 42
+    finally:
+        check.terminate_pool()
+    assert check.pool is None
+
+    check.start_pool()
+    assert check.pool is not pool
+    check.stop()
+    assert check.pool is None
+
+
 def test_service_check_ko(aggregator, instance):
     check = disable_thread_pool(VSphereCheck('disk', {}, {}, [instance]))
 
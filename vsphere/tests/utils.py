@@ -81,6 +81,32 @@ def retrieve_properties_mock(all_mors):
     return properties_res
 
 
+def update_set_mock(object_updates, truncated=False, version='1'):
+    """
+    Return a mocked PropertyCollector UpdateSet from a list of (kind, mor, {property_path: value}) tuples.
+    """
+    object_set = []
+    for kind, mor, changes in object_updates:
+        change_set = []
+        for prop_name, val in iteritems(changes):
+            change = MagicMock(op='assign', val=val)
+            change.name = prop_name
+            change_set.append(change)
+        object_set.append(MagicMock(kind=kind, obj=mor, changeSet=change_set))
+
+    return MagicMock(filterSet=[MagicMock(objectSet=object_set)], truncated=truncated, version=version)
+
+
+def enter_update_set_mock(all_mors):
+    """
+    Return the mocked UpdateSet returned by the first call to WaitForUpdatesEx, listing all the objects.
+    """
+    object_updates = []
+    for obj in retrieve_properties_mock(all_mors).objects:
+        object_updates.append(('enter', obj.obj, {prop.name: prop.val for prop in obj.propSet}))
+    return update_set_mock(object_updates)
+
+
 def assertMOR(check, instance, name=None, spec=None, tags=None, count=None, subset=False):
     """
     Helper, assertion on vCenter Manage Object References.
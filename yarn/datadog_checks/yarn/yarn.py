@@ -2,6 +2,7 @@
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
 import os
+from itertools import chain
 
 import requests
 import requests_kerberos
@@ -10,6 +11,7 @@ from six import iteritems
 from six.moves.urllib.parse import urljoin, urlsplit, urlunsplit
 
 from datadog_checks.base import AgentCheck, is_affirmative
+from datadog_checks.base.utils.extractor import PathExtractor
 
 KERBEROS_STRATEGIES = {
     'required': requests_kerberos.REQUIRED,
@@ -145,6 +147,13 @@ YARN_QUEUE_METRICS = {
     'maxApplicationsPerUser': ('yarn.queue.max_applications_per_user', GAUGE),
 }
 
+# The paths of the metrics above, split once
+YARN_CLUSTER_METRICS_EXTRACTOR = PathExtractor(iteritems(YARN_CLUSTER_METRICS))
+YARN_APP_METRICS_EXTRACTOR = PathExtractor(chain(iteritems(DEPRECATED_YARN_APP_METRICS), iteritems(YARN_APP_METRICS)))
+YARN_NODE_METRICS_EXTRACTOR = PathExtractor(iteritems(YARN_NODE_METRICS))
+YARN_ROOT_QUEUE_METRICS_EXTRACTOR = PathExtractor(iteritems(YARN_ROOT_QUEUE_METRICS))
+YARN_QUEUE_METRICS_EXTRACTOR = PathExtractor(iteritems(YARN_QUEUE_METRICS))
+
 
 class YarnCheck(AgentCheck):
     """
@@ -206,7 +215,7 @@ class YarnCheck(AgentCheck):
             yarn_metrics = metrics_json[YARN_CLUSTER_METRICS_ELEMENT]
 
             if yarn_metrics is not None:
-                self._set_yarn_metrics_from_json(addl_tags, yarn_metrics, YARN_CLUSTER_METRICS)
+                self._set_yarn_metrics_from_json(addl_tags, yarn_metrics, YARN_CLUSTER_METRICS_EXTRACTOR)
 
     def _yarn_app_metrics(self, rm_address, instance, app_tags, addl_tags):
         """
@@ -231,8 +240,7 @@ class YarnCheck(AgentCheck):
 
                 tags.extend(addl_tags)
 
-                self._set_yarn_metrics_from_json(tags, app_json, DEPRECATED_YARN_APP_METRICS)
-                self._set_yarn_metrics_from_json(tags, app_json, YARN_APP_METRICS)
+                self._set_yarn_metrics_from_json(tags, app_json, YARN_APP_METRICS_EXTRACTOR)
 
     def _yarn_node_metrics(self, rm_address, instance, addl_tags):
         """
@@ -248,7 +256,7 @@ class YarnCheck(AgentCheck):
                 tags = ['node_id:{}'.format(str(node_id))]
                 tags.extend(addl_tags)
 
-                self._set_yarn_metrics_from_json(tags, node_json, YARN_NODE_METRICS)
+                self._set_yarn_metrics_from_json(tags, node_json, YARN_NODE_METRICS_EXTRACTOR)
 
     def _yarn_scheduler_metrics(self, rm_address, instance, addl_tags, queue_blacklist):
         """
@@ -272,7 +280,7 @@ class YarnCheck(AgentCheck):
         tags = ['queue_name:{}'.format(metrics_json['queueName'])]
         tags.extend(addl_tags)
 
-        self._set_yarn_metrics_from_json(tags, metrics_json, YARN_ROOT_QUEUE_METRICS)
+        self._set_yarn_metrics_from_json(tags, metrics_json, YARN_ROOT_QUEUE_METRICS_EXTRACTOR)
 
         if metrics_json['queues'] is not None and metrics_json['queues']['queue'] is not None:
 
@@ -295,31 +303,17 @@ class YarnCheck(AgentCheck):
                 tags = ['queue_name:{}'.format(str(queue_name))]
                 tags.extend(addl_tags)
 
-                self._set_yarn_metrics_from_json(tags, queue_json, YARN_QUEUE_METRICS)
+                self._set_yarn_metrics_from_json(tags, queue_json, YARN_QUEUE_METRICS_EXTRACTOR)
 
     def _set_yarn_metrics_from_json(self, tags, metrics_json, yarn_metrics):
         """
-        Parse the JSON response and set the metrics
+        Parse the JSON response and set the metrics, `yarn_metrics` extracts the values found
+        under N keys, represented as str("key1.key2...key{n}")
         """
-        for dict_path, metric in iteritems(yarn_metrics):
-            metric_name, metric_type = metric
-
-            metric_value = self._get_value_from_json(dict_path, metrics_json)
-
+        for (metric_name, metric_type), metric_value in yarn_metrics.extract(metrics_json):
             if metric_value is not None:
                 self._set_metric(metric_name, metric_type, metric_value, tags)
 
-    def _get_value_from_json(self, dict_path, metrics_json):
-        """
-        Get a value from a dictionary under N keys, represented as str("key1.key2...key{n}")
-        """
-        for key in dict_path.split('.'):
-            if key in metrics_json:
-                metrics_json = metrics_json.get(key)
-            else:
-                return None
-        return metrics_json
-
     def _set_metric(self, metric_name, metric_type, value, tags=None, device_name=None):
         """
         Set a metric